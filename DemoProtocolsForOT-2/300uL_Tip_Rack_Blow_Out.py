@@ -1,8 +1,21 @@
 import subprocess
+
 from opentrons import protocol_api, types
 
 audio_file = "/Audio Files/Mariah Carey - All I Want For Christmas Is You.mp3"
 
+
+def play_sound(protocol, path):
+    """Plays an audio file in the background with mpg123; silent when simulating."""
+    if protocol.is_simulating():
+        return None
+    try:
+        return subprocess.Popen(["mpg123", "-q", path],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        protocol.comment(f"Could not play {path}: {e}")
+        return None
+
 metadata = {"apiLevel": "2.20", 
             "protocolName": "300uL Blow Out Clean", 
             "description": """A simple protocol designed to test the 
@@ -12,20 +25,11 @@ metadata = {"apiLevel": "2.20",
 
 requirements = {"robotType": "OT-2"}
 
-def run_quiet_process(command): 
-    subprocess.check_output('{} &> /dev/null'.format(command), shell=True) 
-
-def test_speaker(): 
-    print('Speaker') 
-    print('Next\t--> CTRL-C')
-    try:
-        run_quiet_process('mpg123 {}'.format(audio_file))
-    except KeyboardInterrupt:
-        pass
-        print()
-
 def run(protocol: protocol_api.ProtocolContext):
     
+    # Plays in the background while the tips are cleaned (not when simulating)
+    play_sound(protocol, audio_file)
+
     # Loading Labware
     tips_multi = protocol.load_labware("opentrons_96_tiprack_300ul", 11)
 
@@ -5,6 +5,7 @@ def get_values(*names):
 
 
 import subprocess
+
 from opentrons import protocol_api
 
 metadata = {
@@ -17,21 +18,23 @@ metadata = {
 AUDIO_FILE_PATH = '/etc/audio/speaker-test.mp3'
 
 
-def run_quiet_process(command):
-    subprocess.check_output('{} &> /dev/null'.format(command), shell=True)
+def play_sound(protocol, path):
+    """Plays an audio file in the background with mpg123; silent when simulating."""
+    if protocol.is_simulating():
+        return None
+    try:
+        return subprocess.Popen(['mpg123', '-q', path],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        protocol.comment(f'Could not play {path}: {e}')
+        return None
 
 
 def test_speaker(protocol):
-    print('Speaker')
-    print('Next\t--> CTRL-C')
-    try:
-        if not protocol.is_simulating():
-            run_quiet_process('mpg123 {}'.format(AUDIO_FILE_PATH))
-        else:
-            print('Not playing mp3, simulating')
-    except KeyboardInterrupt:
-        pass
-        print()
+    # mpg123 runs in the background, so the protocol carries on meanwhile
+    if protocol.is_simulating():
+        print('Not playing mp3, simulating')
+    play_sound(protocol, AUDIO_FILE_PATH)
 
 
 def run(protocol: protocol_api.ProtocolContext):
@@ -1,10 +1,12 @@
 def get_values(*names):
     import json
-    _all_values = json.loads("""{"lw_checkit":"checkit_8_wellplate_50ul","pipette_type":"p300_multi_gen2","pipette_mount":"left"}""")
+    _all_values = json.loads("""{"lw_checkit":"checkit_8_wellplate_50ul","pipette_type":"p300_multi_gen2","pipette_mount":"left","flow_settings":"/var/lib/jupyter/notebooks/flow_settings.csv","calibration_sweep":"","calibration_run":1,"batch_reader":"","batch_results":"checkit_readings.csv","batch_tolerance":5,"batch_timeout":120}""")
     return [_all_values[n] for n in names]
 
 
+import csv
 import math
+import os
 
 metadata = {
     'protocolName': 'Next Advance Checkit Go',
@@ -13,10 +15,69 @@ metadata = {
 }
 
 
+# Calibrated flow rates and speeds (ot2tools.flow_calibration fit) are read
+# with the csv module so the protocol still uploads as a single file
+
+
+def read_table(path):
+    """Rows of a CSV table as dicts; none if there is no such file."""
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        return list(csv.DictReader(f))
+
+
+def settings_for(rows, pipette, volume):
+    """
+    Flow rate and speed for a volume, as flow_calibration.settings_for:
+    a calibrated volume's own setting, or between two calibrated volumes
+    one interpolated on a log volume scale. None outside the calibrated
+    range, where the protocol keeps its own rates.
+    """
+    points = sorted((float(r['Volume (µL)']), float(r['Flow Rate (µL/s)']),
+                     float(r['Speed (mm/s)']))
+                    for r in rows if r['Pipette'] == pipette)
+    for point in points:
+        if math.isclose(point[0], volume):
+            return {'Flow Rate (µL/s)': point[1], 'Speed (mm/s)': point[2]}
+    for low, high in zip(points, points[1:]):
+        if low[0] < volume < high[0]:
+            w = math.log(volume/low[0])/math.log(high[0]/low[0])
+            return {'Flow Rate (µL/s)': low[1] + w*(high[1] - low[1]),
+                    'Speed (mm/s)': low[2] + w*(high[2] - low[2])}
+    return None
+
+
+def run_trials(path, pipette, run, volume=None):
+    """The trials of one sweep run, in the order they are dispensed."""
+    trials = [r for r in read_table(path)
+              if r['Pipette'] == pipette and int(r['Run']) == int(run)
+              and (volume is None
+                   or math.isclose(float(r['Volume (µL)']), volume))]
+    if not trials:
+        raise ValueError(f'Sweep {path} has no run {run} for {pipette}.')
+    return trials
+
+
+def apply_settings(ctx, pipette, settings):
+    """Sets the flow rates and, as checkit does by hand, the axis speeds."""
+    flow = float(settings['Flow Rate (µL/s)'])
+    speed = float(settings['Speed (mm/s)'])
+    pipette.flow_rate.aspirate = flow
+    pipette.flow_rate.dispense = flow
+    for axis in 'XYZA':
+        ctx.max_speeds[axis] = speed
+    return f'Flow rate {flow:g} µL/s, speed {speed:g} mm/s'
+
+
 def run(ctx):
 
-    [lw_checkit, pipette_type, pipette_mount] = get_values(  # noqa: F821
-        'lw_checkit', 'pipette_type', 'pipette_mount')
+    [lw_checkit, pipette_type, pipette_mount, flow_settings,
+     calibration_sweep, calibration_run, batch_reader, batch_results,
+     batch_tolerance, batch_timeout] = get_values(  # noqa: F821
+        'lw_checkit', 'pipette_type', 'pipette_mount', 'flow_settings',
+        'calibration_sweep', 'calibration_run', 'batch_reader',
+        'batch_results', 'batch_tolerance', 'batch_timeout')
 
     tiprack_map = {
         'p20_single_gen2': 'opentrons_96_tiprack_20ul',
@@ -100,11 +161,45 @@ below tested pipette volume ({pip.max_volume}). Proceed?')
     ctx.max_speeds['Y'] = 100
     ctx.max_speeds['Z'] = 100
 
+    # calibrated settings (flow_settings, copied from
+    # ErrorTests/flow_settings.csv) replace the defaults above once the
+    # flow-rate sweeps have been fitted
+    settings = settings_for(read_table(flow_settings), pipette_type,
+                            checkit_params['VOLUME'])
+    if settings is not None:
+        ctx.comment(apply_settings(ctx, pip, settings))
+
+    # calibration mode: each well gets the next trial of the sweep run
+    trials = None
+    if calibration_sweep:
+        trials = run_trials(calibration_sweep, pipette_type, calibration_run,
+                            checkit_params['VOLUME'])
+
+    # batch mode: readings come from the reader while the pipette carries
+    # on, and the run only pauses for one outside tolerance; simulations
+    # use the mock reader rather than a real instrument
+    reader = None
+    if batch_reader:
+        # only batch runs need ot2tools on the robot
+        from ot2tools.balance_reader import describe, open_reader
+        if ctx.is_simulating():
+            reader = open_reader('mock://', tolerance=batch_tolerance,
+                                 pipette=pipette_type)
+        else:
+            reader = open_reader(batch_reader, batch_results,
+                                 tolerance=batch_tolerance,
+                                 pipette=pipette_type)
+
     # transfer
     wells = cartridge.wells()[:(9-pip.channels)]
+    if trials is not None:
+        wells = wells[:len(trials)]
     num_aspirations = math.ceil(checkit_params['VOLUME']/pip.max_volume)
     vol_per_aspiration = round(checkit_params['VOLUME']/num_aspirations, 2)
     for i, well in enumerate(wells):
+        if trials is not None:
+            ctx.comment(f'Trial {trials[i]["Trial"]}: '
+                        + apply_settings(ctx, pip, trials[i]))
         pip.pick_up_tip()
         for _ in range(num_aspirations):
             pip.aspirate(vol_per_aspiration,
@@ -117,8 +212,27 @@ below tested pipette volume ({pip.max_volume}). Proceed?')
         else:
             pip.return_tip()
 
-        if i < len(wells) - 1:
+        if reader is not None:
+            # a multichannel fills the whole column, one reading per channel
+            column = cartridge.wells()[i:i + pip.channels]
+            for j, filled in enumerate(column):
+                reader.expect(filled.well_name, checkit_params['VOLUME'],
+                              'ABCDEFGH'[j] if pip.channels > 1 else '1',
+                              int(trials[i]['Trial']) if trials is not None
+                              else None)
+            for row in reader.poll():
+                ctx.pause(describe(row, batch_tolerance))
+        elif i < len(wells) - 1:
             ctx.pause('Please flip cartridge tab. Resume once measurement \
 is read.')
         else:
             ctx.comment('Please flip cartridge tab.')
+
+    if reader is not None:
+        for row in reader.wait(batch_timeout):
+            ctx.pause(describe(row, batch_tolerance))
+        if reader.missing():
+            ctx.pause(f'No reading for wells {", ".join(reader.missing())}. '
+                      'Record them by hand, then resume.')
+        reader.close()
+        ctx.comment(f'{len(reader.rows)} readings recorded')
@@ -1,7 +1,32 @@
+import csv
+import math
+import os
 import subprocess
+
 from opentrons import protocol_api
 
-audio_file = "etc/audio/speaker-test.mp3"
+audio_file = "/etc/audio/speaker-test.mp3"
+
+
+def play_sound(protocol, path):
+    """Plays an audio file in the background with mpg123; silent when simulating."""
+    if protocol.is_simulating():
+        return None
+    try:
+        return subprocess.Popen(["mpg123", "-q", path],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError as e:
+        protocol.comment(f"Could not play {path}: {e}")
+        return None
+
+# Calibrated flow rates and speeds from "python -m ot2tools.flow_calibration fit",
+# copied to the robot's Jupyter folder; without the file the pipette keeps its defaults
+FLOW_SETTINGS = "/var/lib/jupyter/notebooks/flow_settings.csv"
+
+# Calibration mode: set to a sweep CSV from ot2tools.flow_calibration to give
+# each tube one trial (volume, flow rate, speed) of run CALIBRATION_RUN
+CALIBRATION_SWEEP = None
+CALIBRATION_RUN = 1
 
 
 metadata = {"apiLevel": "2.20", 
@@ -13,21 +38,68 @@ metadata = {"apiLevel": "2.20",
 
 requirements = {"robotType": "OT-2"}
 
-def run_quiet_process(command): 
-    subprocess.check_output('{} &> /dev/null'.format(command), shell=True) 
 
-def test_speaker(): 
-    print('Speaker') 
-    print('Next\t--> CTRL-C')
-    try:
-        run_quiet_process('mpg123 {}'.format(audio_file))
-    except KeyboardInterrupt:
-        pass
-        print()
+# The settings tables are read with the csv module so the protocol still
+# uploads as a single file
+
+def read_table(path):
+    """
+    Rows of a CSV table as dictionaries; none if there is no such file.
+    """
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, newline="", encoding="utf-8-sig") as file:
+        return list(csv.DictReader(file))
+
+
+def settings_for(rows, pipette, volume):
+    """
+    Flow rate and speed for a volume, as ot2tools.flow_calibration.settings_for:
+    a calibrated volume's own setting, or between two calibrated volumes one
+    interpolated on a log volume scale. None outside the calibrated range.
+    """
+    points = sorted((float(row["Volume (µL)"]), float(row["Flow Rate (µL/s)"]), float(row["Speed (mm/s)"]))
+                    for row in rows if row["Pipette"] == pipette)
+    for point in points:
+        if math.isclose(point[0], volume):
+            return {"Flow Rate (µL/s)": point[1], "Speed (mm/s)": point[2]}
+    for low, high in zip(points, points[1:]):
+        if low[0] < volume < high[0]:
+            weight = math.log(volume / low[0]) / math.log(high[0] / low[0])
+            return {"Flow Rate (µL/s)": low[1] + weight * (high[1] - low[1]),
+                    "Speed (mm/s)": low[2] + weight * (high[2] - low[2])}
+    return None
+
+
+def run_trials(path, pipette, run):
+    """
+    The trials of one sweep run, in the order they are dispensed.
+    """
+    trials = [row for row in read_table(path) if row["Pipette"] == pipette and int(row["Run"]) == int(run)]
+    if not trials:
+        raise ValueError(f"Sweep {path} has no run {run} for {pipette}.")
+    return trials
+
+
+def apply_settings(pipette, settings):
+    """
+    Sets the aspirate/dispense flow rate and the gantry speed.
+    """
+    flow, speed = float(settings["Flow Rate (µL/s)"]), float(settings["Speed (mm/s)"])
+    pipette.flow_rate.aspirate = flow
+    pipette.flow_rate.dispense = flow
+    pipette.default_speed = speed
+    return f"Flow rate {flow:g} µL/s, speed {speed:g} mm/s"
+
 
 def run(protocol: protocol_api.ProtocolContext):
     
-    test_speaker()
+    # The speaker test plays in the background while the deck is set up;
+    # nothing plays when simulating
+    play_sound(protocol, audio_file)
+    run_error_test(protocol)
+
+def run_error_test(protocol: protocol_api.ProtocolContext):
 
     # Loading Labware
     tips_single = protocol.load_labware("opentrons_96_tiprack_1000ul", 1)
@@ -55,4 +127,17 @@ def run(protocol: protocol_api.ProtocolContext):
         volume += 40
         volume_List.append(volume)
 
-    right_pipette.transfer(volume_List, reservoir["A1"], tube_Rack.wells(), blow_out=True, new_tip="always", touch_tip=True)
\ No newline at end of file
+    # Each tube is dispensed with the calibrated flow rate and speed for its
+    # volume (FLOW_SETTINGS), or with its sweep trial's in calibration mode;
+    # without either the pipette keeps its defaults
+    settings = read_table(FLOW_SETTINGS)
+    trials = None
+    if CALIBRATION_SWEEP:
+        trials = run_trials(CALIBRATION_SWEEP, right_pipette.name, CALIBRATION_RUN)[:len(tube_Rack.wells())]
+        volume_List = [float(trial["Volume (µL)"]) for trial in trials]
+
+    for i, (volume, tube) in enumerate(zip(volume_List, tube_Rack.wells())):
+        row = trials[i] if trials is not None else settings_for(settings, right_pipette.name, volume)
+        if row is not None:
+            protocol.comment(apply_settings(right_pipette, row))
+        right_pipette.transfer(volume, reservoir["A1"], tube, blow_out=True, new_tip="always", touch_tip=True)
\ No newline at end of file
@@ -1,6 +1,16 @@
 from opentrons import protocol_api
+import numpy as np
 import pandas as pd
 
+from ot2tools.design_loader import load_design
+from ot2tools.liquid_ledger import LiquidLedger
+from ot2tools.module_scheduler import Step, heater_shaker_steps, pipette_resources, schedule
+from ot2tools.multi_dispense import compare_plans, dispense_plan, format_comparison, predict_time
+from ot2tools.plate_layout import PlateLayout, heater_shaker_neighbours, load_plates
+from ot2tools.tip_budget import DEFAULT_TIP_TIMINGS, load_tip_racks, masked, plan_tips, tip_groups
+from ot2tools.transfer_plan import TransferPlan
+from ot2tools.travel_path import format_travel_report, merge_reports, plan_pass, well_points
+
 metadata = {
     "apiLevel": "2.20",
     "protocolName": "Ksp determination of Cu (II) glycinate",
@@ -13,24 +23,28 @@ metadata = {
 requirements = {"robotType": "OT-2"}
 
 
-def read_excel(file_path: str, sheet_name: str = None) -> pd.DataFrame:
+def read_excel(file_path: str, sheet_name="OT-2 Input") -> pd.DataFrame:
     """
-    Reads the Excel file and returns a DataFrame.
+    Reads one sheet of the Excel file and returns a DataFrame.
+
+    The sheet is parsed once and then served from a cache next to the
+    file, so re-analysing the protocol skips openpyxl. CSV and Parquet
+    designs are also accepted.
     
     Args:
         file_path (str): Path to the Excel file.
-        sheet_name (str): Optional, specific sheet to read.
+        sheet_name: Name or index of the sheet to read.
     
     Returns:
         pd.DataFrame: DataFrame with the Excel content.
     """
     try:
-        return pd.read_excel(file_path, sheet_name=sheet_name)
+        return load_design(file_path, sheet_name)
     except Exception as e:
         raise ValueError(f"Failed to read the Excel file: {e}")
 
 
-def process_arrays(file_path: str, sheet_name: str, x: int):
+def process_arrays(file_path: str, sheet_name: str, x: int) -> TransferPlan:
     """
     Processes the Excel file columns, calculates the totals and subtracts from x.
     
@@ -40,44 +54,20 @@ def process_arrays(file_path: str, sheet_name: str, x: int):
         x (int): The value to subtract the total from.
     
     Returns:
-        list: A list of dictionaries with processed arrays for Cu and Glycine, along with totals and remaining values.
+        TransferPlan: Columnar plan for Cu, Glycine, totals and remaining values.
+        Indexing or iterating it gives one dictionary per well, as before.
     """
     # Read the Excel data
     df = read_excel(file_path, sheet_name)
 
-    # Ensure column names are correct based on the input file
-    if "Cu Values" not in df.columns or "Glycine Values" not in df.columns:
-        raise KeyError("Excel file must contain 'Cu Values' and 'Glycine Values' columns.")
-
-    # Convert columns to NumPy arrays to ensure proper array behavior
-    cu_values = df["Cu Values"].to_numpy()  # Convert column to NumPy array
-    gly_values = df["Glycine Values"].to_numpy()  # Convert column to NumPy array
-
-    results = []
-    
-    for cu, gly in zip(cu_values, gly_values):
-        # Ensure all values are valid floats
-        cu = float(cu)
-        gly = float(gly)
-        overall_total = cu + gly
-        remaining = float(x - overall_total)  # DI water volume is the remaining volume to reach x
-
-        # Append results as dictionaries
-        results.append({
-            "cu_array": cu,  # Now properly read as array values
-            "gly_array": gly,
-            "total": overall_total,
-            "remaining": max(0, remaining)  # Ensure remaining is not negative
-        })
-    
-    return results
+    # Totals and DI water are computed in one vectorized pass; a row with a
+    # missing or negative volume stops the run here
+    return TransferPlan.from_dataframe(df, x)
 
 
 def run(protocol: protocol_api.ProtocolContext):
-    # Load Labware
-    tips_single = protocol.load_labware("opentrons_96_tiprack_1000ul", 4)
+    # Load Labware (plates and tip racks are loaded once the design is read)
     reservoir = protocol.load_labware("nest_12_reservoir_15ml", 5)
-    plate = protocol.load_labware("nest_96_wellplate_100ul_pcr_full_skirt", 2)
 
     # Define Liquids
     diwater = protocol.define_liquid(
@@ -96,72 +86,138 @@ def run(protocol: protocol_api.ProtocolContext):
         display_color="#FFFFFF"
     )
 
-    # Load Liquids
-    reservoir["A1"].load_liquid(liquid=diwater, volume=120000)
-    reservoir["A2"].load_liquid(liquid=cuStockSolution, volume=10000)
-    reservoir["A3"].load_liquid(liquid=glyStockSolution, volume=10000)
-
     # Load Pipettes
-    right_pipette = protocol.load_instrument("p1000_single_gen2", "right", tip_racks=[tips_single])
+    right_pipette = protocol.load_instrument("p1000_single_gen2", "right")
 
     # Example Excel File and Parameters
     file_path = "LabData.xlsx"
     sheet_name = "OT-2 Input"
     x = 100  # Define total volume for each well
+    heater_shaker_slot = None  # e.g. 7 to put the first plate on the Heater-Shaker
 
     # Process the data
     results = process_arrays(file_path, sheet_name, x)
 
+    # Spread the design over as many plates as it needs (slot 2 first, then
+    # the nearest free slots) and record which row went to which well
+    plates = load_plates(protocol, "nest_96_wellplate_100ul_pcr_full_skirt", len(results),
+                         first_slot=2, heater_shaker_slot=heater_shaker_slot)
+    layout = PlateLayout(plates, len(results))
+    for line in layout.comments():
+        protocol.comment(line)
+
     # Map results to wells and command the robot
-    well_mapping = plate.wells()  # Get all wells in the plate
-
-    # Step 1: Dispense all Cu values using a single tip
-    right_pipette.pick_up_tip()
-    for i, result in enumerate(results):
-        if i >= len(well_mapping):  # Avoid overflow
-            break
-        target_well = well_mapping[i]
-        
-        # Dispense Cu into the well
-        right_pipette.transfer(
-            float(result["cu_array"]),  # Ensure volume is a valid float
-            reservoir["A2"], 
-            target_well.top(),
-            new_tip='never'  # Reuse the same tip
-        )
-    right_pipette.drop_tip()
-
-    # Step 2: Dispense DI Water using the "remaining" value
-    right_pipette.pick_up_tip()
-    for i, result in enumerate(results):
-        if i >= len(well_mapping):  # Avoid overflow
-            break
-        target_well = well_mapping[i]
-        
-        # Dispense DI Water (remaining volume)
-        if result["remaining"] > 0:  # Ensure there's remaining volume to dispense
-            right_pipette.transfer(
-                float(result["remaining"]),  # Ensure volume is a valid float
-                reservoir["A1"],
-                target_well.top(),
-                new_tip='never'  # Reuse the same tip
-            )
-    right_pipette.drop_tip()
-
-    # Step 3: Dispense all Glycine values using a single tip
-    right_pipette.pick_up_tip()
-    for i, result in enumerate(results):
-        if i >= len(well_mapping):  # Avoid overflow
-            break
-        target_well = well_mapping[i]
-        
-        # Dispense Glycine into the well
-        right_pipette.transfer(
-            float(result["gly_array"]),  # Ensure volume is a valid float
-            reservoir["A3"], 
-            target_well.top(),
-            new_tip='never'  # Reuse the same tip
-        )
-    right_pipette.drop_tip()
+    well_mapping = layout.wells  # One well per design row, across all plates
+    destinations = [well.top() for well in well_mapping]
+    points = well_points(well_mapping)
+
+    # Load Liquids: each reagent takes as many nest_12_reservoir_15ml wells
+    # as the design needs (DI water A1/A4/A7/A10, Cu A2/A5/..., glycine
+    # A3/A6/...), each filled with its share plus the dead volume. The same
+    # volumes start the ledger that sets each aspirate height
+    ledger = LiquidLedger.from_labware(reservoir)
+    first_wells = {}
+    for name, liquid, volumes, column in (("DI Water", diwater, results.water, 0),
+                                          ("Cu", cuStockSolution, results.cu, 1),
+                                          ("Glycine", glyStockSolution, results.gly, 2)):
+        wells = [well.well_name for well in reservoir.rows()[0][column::3]]
+        loads = ledger.fill(wells, float(volumes.sum()), right_pipette.max_volume, liquid.name)
+        for well, volume in loads:
+            reservoir[well].load_liquid(liquid=liquid, volume=volume)
+        first_wells[name] = reservoir[loads[0][0]]
+
+    # Plan multi-dispense aspirations for each reagent pass
+    disposal_volume = 10  # Extra uL per aspiration, blown back into the reservoir
+    # Shortest volume dispensed out of a shared aspiration; smaller ones get
+    # an aspiration of their own. The p1000 is rated down to 100 uL; lower
+    # this (after checking with ErrorTests) to multi-dispense smaller volumes
+    min_dispense = right_pipette.min_volume
+    passes = [
+        ("Cu", first_wells["Cu"], results.cu),
+        ("DI Water", first_wells["DI Water"], results.water),
+        ("Glycine", first_wells["Glycine"], results.gly),
+    ]
+    for name, _, volumes in passes:
+        protocol.comment(format_comparison(
+            name, compare_plans(volumes, right_pipette.max_volume, disposal_volume,
+                               min_dispense=min_dispense)))
+
+    # With a Heater-Shaker its plate is filled as its own group, so it can
+    # heat and shake while the deck plates are filled
+    plate_groups = [("", np.arange(len(results)))]
+    if heater_shaker_slot is not None:
+        on_module = (layout.table["Plate"] == 1).to_numpy()
+        plate_groups = [(" (heater-shaker)", np.flatnonzero(on_module)),
+                        (" (deck)", np.flatnonzero(~on_module))]
+
+    # Pick the cheapest tip policy the contamination rules allow (by default
+    # a new tip per reagent) and load enough racks for it, slot 4 first
+    budget = plan_tips([(name + group, masked(volumes, wells))
+                        for group, wells in plate_groups for name, _, volumes in passes],
+                       right_pipette.max_volume, disposal_volume, min_dispense=min_dispense)
+    protocol.comment(budget.report())
+    right_pipette.tip_racks = load_tip_racks(protocol, "opentrons_96_tiprack_1000ul",
+                                             budget.tips, near=2, preferred=[4],
+                                             exclude=heater_shaker_neighbours(protocol))
+
+    # Step 1: Dispense all Cu values, Step 2: DI Water using the "remaining"
+    # value, Step 3: Glycine values - each pass sweeps its plates and each tip
+    # visits its wells in a low-travel order. The Heater-Shaker plate is
+    # heated and shaken before its glycine, as in the notebook
+    transfers, heights = {}, {}
+
+    def transfer(name):
+        def action():
+            source, plan = transfers[name]
+            if not right_pipette.has_tip:
+                right_pipette.pick_up_tip()
+            dispense_plan(right_pipette, source, destinations, plan, aspirate_heights=heights[name])
+            if budget.policy != "never":
+                right_pipette.drop_tip()
+        return action
+
+    steps = []
+    tip_seconds = DEFAULT_TIP_TIMINGS["pick_up_tip"] + DEFAULT_TIP_TIMINGS["drop_tip"]
+    for group, group_wells in plate_groups:
+        resources = ("pipette", "hs_plate") if group == " (heater-shaker)" else ("pipette",)
+        # Steps reaching a slot next to the Heater-Shaker wait for it to stop shaking
+        resources = pipette_resources(protocol, [reservoir, *plates, *right_pipette.tip_racks],
+                                      resources)
+        previous = []
+        for name, source, volumes in passes:
+            if name == "Glycine" and group == " (heater-shaker)":
+                module_steps = heater_shaker_steps(protocol, protocol.loaded_modules[heater_shaker_slot],
+                                                   after=previous)
+                steps += module_steps
+                previous = [module_steps[-1].name]
+            reports = []
+            for k, wells in enumerate(tip_groups(masked(volumes, group_wells), budget.policy)):
+                plan, travel = plan_pass(points, well_points([source])[0], masked(volumes, wells),
+                                         right_pipette.max_volume, disposal_volume,
+                                         min_dispense=min_dispense)
+                reports.append(travel)
+                step_name = f"{name}{group} tip {k + 1}"
+                transfers[step_name] = (source, plan)
+                steps.append(Step(step_name, predict_time(plan) + tip_seconds, resources, previous,
+                                  action=transfer(step_name)))
+                previous = [step_name]
+            if reports:
+                protocol.comment(format_travel_report(name + group, merge_reports(reports)))
+    timeline = schedule(steps)
+    protocol.comment(timeline.report())
+
+    # Draw every aspiration from the reservoir ledger in run order before any
+    # liquid moves, so a reagent that would run dry stops the run here; a
+    # pass moves on to the reagent's next well when one runs low
+    for step in timeline.steps:
+        if step.name in transfers:
+            source, plan = transfers[step.name]
+            sources, heights[step.name] = ledger.draw(source.well_name, plan)
+            transfers[step.name] = ([reservoir[well] for well in sources], plan)
+    protocol.comment(f"Reservoir after the run: {ledger.report()}")
+
+    timeline.run(protocol)
+    if right_pipette.has_tip:
+        right_pipette.drop_tip()
 
     protocol.comment("Liquid transfer completed.")
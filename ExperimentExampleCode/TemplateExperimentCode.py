@@ -1,4 +1,5 @@
 from opentrons import protocol_api
+import numpy as np
 import pandas as pd
 
 metadata = {
@@ -30,7 +31,7 @@ def read_excel(file_path: str, sheet_name: str = None) -> pd.DataFrame:
         raise ValueError(f"Failed to read the Excel file: {e}")
 
 
-def process_arrays(file_path: str, sheet_name: str, x: int):
+def process_arrays(file_path: str, sheet_name: str, x: int) -> list:
     """
     Processes the Excel file columns, calculates the totals and subtracts from x.
     
@@ -41,6 +42,9 @@ def process_arrays(file_path: str, sheet_name: str, x: int):
     
     Returns:
         list: A list of dictionaries with processed arrays for Cu and Glycine, along with totals and remaining values.
+
+    Raises:
+        ValueError: If a row has a missing or negative volume.
     """
     # Read the Excel data
     df = read_excel(file_path, sheet_name)
@@ -49,28 +53,18 @@ def process_arrays(file_path: str, sheet_name: str, x: int):
     if "Cu Values" not in df.columns or "Glycine Values" not in df.columns:
         raise KeyError("Excel file must contain 'Cu Values' and 'Glycine Values' columns.")
 
-    # Convert columns to NumPy arrays to ensure proper array behavior
-    cu_values = df["Cu Values"].to_numpy()  # Convert column to NumPy array
-    gly_values = df["Glycine Values"].to_numpy()  # Convert column to NumPy array
-
-    results = []
-    
-    for cu, gly in zip(cu_values, gly_values):
-        # Ensure all values are valid floats
-        cu = float(cu)
-        gly = float(gly)
-        overall_total = cu + gly
-        remaining = float(x - overall_total)  # DI water volume is the remaining volume to reach x
+    # Totals and DI water for every row in one vectorized pass (as
+    # ot2tools.transfer_plan, kept inline so the protocol uploads on its own)
+    cu = df["Cu Values"].to_numpy(dtype=float)
+    gly = df["Glycine Values"].to_numpy(dtype=float)
+    bad = np.flatnonzero(~(np.isfinite(cu) & np.isfinite(gly) & (cu >= 0) & (gly >= 0)))
+    if bad.size:
+        raise ValueError(f"Design rows {', '.join(str(row + 2) for row in bad)} have a missing or negative volume.")
+    total = cu + gly
+    remaining = np.maximum(x - total, 0.0)  # Ensure remaining is not negative
 
-        # Append results as dictionaries
-        results.append({
-            "cu_array": cu,  # Now properly read as array values
-            "gly_array": gly,
-            "total": overall_total,
-            "remaining": max(0, remaining)  # Ensure remaining is not negative
-        })
-    
-    return results
+    return [{"cu_array": c, "gly_array": g, "total": t, "remaining": r}
+            for c, g, t, r in zip(cu.tolist(), gly.tolist(), total.tolist(), remaining.tolist())]
 
 
 def run(protocol: protocol_api.ProtocolContext):
@@ -1,48 +1,29 @@
-import pandas as pd
+import os
+import sys
+
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# Data extracted from excel
-data = {
-    "Tip": ["A", "B", "C", "D", "E", "F", "G", "H"] * 4,
-    "Run": ["50 uL - Run 1"] * 8 + ["50 uL - Run 2"] * 8 + ["20 uL - Run 1 "] * 8 + ["20 uL - Run 2 "] * 8,
-    "Programmed Volume (µL)": [50] * 16 + [20] * 16,
-    "Measured Volume (µL)": [
-        50, 49.5, 50, 50.5, 50, 42.5, 48, 50,  # 50uL - Run 1
-        52, 51.5, 51, 51.5, 51, 51.5, 51.5, 51,  # 50 uL - Run 2
-        21, 21, 21, 21, 21, 21, 21, 21,  # 20 uL - Run 1
-        21, 21, 21, 21, 21, 21, 21, 21  # 20 uL - Run 2
-    ],
-    "Error (µL)": [
-        0.0, 0.5, 0.0, -0.5, 0.0, 7.5, 2.0, 0.0,  # 50uL - Run 1
-        -2.0, -1.5, -1.0, -1.5, -1.0, -1.5, -1.5, -1.0,  # 50 uL - Run 2
-        -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0,  # 20 uL - Run 1
-        -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0  # 20 uL - Run 2 
-    ],
-    "% Error": [
-        0, 1, 0, 1, 0, 15, 4, 0,  # 50uL - Run 1
-        4, 3, 2, 3, 2, 3, 3, 2,  # 50 uL - Run 2
-        5, 5, 5, 5, 5, 5, 5, 5,  # 20 uL - Run 1
-        5, 5, 5, 5, 5, 5, 5, 5 # 20 uL - Run 2 
-    ]
-}
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, ".."))
+from ot2tools.accuracy_store import seeded_store
+
+# Checkit runs of the multichannel from the accuracy store, which is built
+# from accuracy_runs.csv the first time
+store = seeded_store(os.path.join(HERE, "accuracy_store"), os.path.join(HERE, "accuracy_runs.csv"))
+df = store.load(runs=["50 uL - Run 1", "50 uL - Run 2", "20 uL - Run 1", "20 uL - Run 2"])
+summary = store.summary(("Pipette", "Programmed (µL)"))
+print(summary[summary["Pipette"] == "p300_multi_gen2"].to_string(index=False))
 
-# Create a DataFrame
-df = pd.DataFrame(data)
+# % error as a magnitude, as in the original table
+df["% Error"] = df["% Error"].abs()
 
 # Remove the 15% error point
 df = df[df["% Error"] != 15].reset_index(drop=True)
 
-# Combine Run 1 and Run 2 for 50 µL volumes
-df_combined_50ul = df[df["Programmed Volume (µL)"] == 50].copy()
-df_combined_50ul["Run"] = "50 µL"  # Label combined data
-
-# Combine Run 1 and Run 2 for 20 µL volumes
-df_combined_20ul = df[df["Programmed Volume (µL)"] == 20].copy()
-df_combined_20ul["Run"] = "20 µL"  # Label combined data
-
-# Combine both datasets back into one
-df_final = pd.concat([df_combined_50ul, df_combined_20ul], ignore_index=True)
+# Combine the runs of each programmed volume
+df_final = df.assign(Run=df["Programmed (µL)"].map(lambda v: f"{v:g} µL"))
+df_final = df_final.sort_values("Programmed (µL)", ascending=False)
 
 # Plot: Box Plot for % Error Across Combined Runs
 plt.figure(figsize=(10, 6))
@@ -0,0 +1,10 @@
+"""
+Planning and analysis tools shared by the OT-2 protocols and notebooks.
+
+Modules are imported individually (e.g. ``from ot2tools.transfer_plan import
+TransferPlan``) so that a protocol only pays for the dependencies it uses.
+"""
+import os
+
+# Folder holding ot2tools and the protocol folders, for paths to files kept in the repository
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
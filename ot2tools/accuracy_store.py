@@ -0,0 +1,316 @@
+"""
+Append-only store of pipetting accuracy runs.
+
+Every gravimetric or Checkit run is appended as one columnar segment
+(pipette, channel, programmed and measured volume, run and timestamp) and
+is never rewritten. Alongside the segments the store keeps running sums per
+pipette, volume and channel, so bias, CV and per-channel drift are updated
+from the new rows alone when a run is appended; coarser groupings just add
+the sums up. Outliers are flagged with a median/MAD rule per group:
+
+    python -m ot2tools.accuracy_store STORE append run.csv --run "50 uL - Run 3" --pipette p300_multi_gen2
+    python -m ot2tools.accuracy_store STORE append runs.csv     # one run per value of its Run column
+    python -m ot2tools.accuracy_store STORE summary --by Pipette "Programmed (µL)"
+    python -m ot2tools.accuracy_store STORE outliers
+
+An appended CSV needs "Programmed (µL)" and "Measured (µL)" columns and
+optionally "Channel" (the tip/row of a multichannel, "1" otherwise).
+
+The manifest (runs.json) is the store's commit point: a run's segment and
+the new summary file are written first, and the manifest naming them is
+then swapped in with an atomic rename, so an interrupted append leaves the
+store as it was. The readable source of the runs recorded before the store
+existed is GraphicallyDisplayedData/accuracy_runs.csv; seeded_store builds
+a store from it.
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ot2tools.design_loader import load_columns, save_columns
+
+SEGMENTS_DIR = "segments"
+MANIFEST_NAME = "runs.json"
+SUMMARY_NAME = "summary.npz"  # Stores written before the manifest named its summary
+# Running sums kept per group; all are additive over runs and groups
+SUMS = ("n", "e", "ee", "m", "mm", "t", "tt", "te")
+GROUP_KEYS = ("Pipette", "Programmed (µL)", "Channel")
+# |x - median| / (1.4826 * MAD) above this is an outlier
+MAD_THRESHOLD = 3.5
+
+
+def add_errors(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds signed Error (µL) and % Error from the programmed and measured volumes.
+    """
+    df["Error (µL)"] = df["Measured (µL)"] - df["Programmed (µL)"]
+    df["% Error"] = df["Error (µL)"] / df["Programmed (µL)"] * 100
+    return df
+
+
+def group_sums(df: pd.DataFrame, by=GROUP_KEYS) -> pd.DataFrame:
+    """
+    The additive sums behind summarize for each group, from rows with errors
+    and a Run Index.
+    """
+    e = df["% Error"].to_numpy(float)
+    m = df["Measured (µL)"].to_numpy(float)
+    t = df["Run Index"].to_numpy(float)
+    terms = pd.DataFrame({"n": 1.0, "e": e, "ee": e * e, "m": m, "mm": m * m, "t": t, "tt": t * t,
+                          "te": t * e})
+    for key in by:
+        terms[key] = df[key].to_numpy()
+    return terms.groupby(list(by), sort=True, as_index=False)[list(SUMS)].sum()
+
+
+def summarize(sums: pd.DataFrame, by=GROUP_KEYS) -> pd.DataFrame:
+    """
+    Bias, spread and drift per group from group_sums.
+
+    Returns:
+        pd.DataFrame: the by columns, N, Bias (%) (mean % error), SD (%),
+        CV (%) of the measured volume, and Drift (% per run), the slope of %
+        error over run order (NaN until a group spans two runs).
+    """
+    s = sums.groupby(list(by), sort=True, as_index=False)[list(SUMS)].sum()
+    n = s["n"].to_numpy()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bias = s["e"] / n
+        sd = np.sqrt(np.maximum(s["ee"] - s["e"] ** 2 / n, 0) / (n - 1))
+        mean = s["m"] / n
+        cv = np.sqrt(np.maximum(s["mm"] - s["m"] ** 2 / n, 0) / (n - 1)) / mean * 100
+        spread = n * s["tt"] - s["t"] ** 2
+        drift = np.where(spread > 0, (n * s["te"] - s["t"] * s["e"]) / spread, np.nan)
+    result = s[list(by)].copy()
+    result["N"] = n.astype(int)
+    result["Bias (%)"] = bias
+    result["SD (%)"] = sd
+    result["CV (%)"] = cv
+    result["Drift (% per run)"] = drift
+    return result
+
+
+def mad_outliers(values, groups=None, threshold: float = MAD_THRESHOLD) -> np.ndarray:
+    """
+    Flags values far from their group median in units of the scaled MAD.
+
+    Groups whose MAD is zero flag nothing, so a run of identical readings
+    is never an outlier.
+
+    Args:
+        values (array-like): e.g. % Error.
+        groups (array-like or list of arrays): Optional, group label(s) per value.
+        threshold (float): Robust z-score above which a value is flagged.
+
+    Returns:
+        np.ndarray: bool per value.
+    """
+    values = pd.Series(np.asarray(values, dtype=np.float64))
+    if groups is None:
+        by = np.zeros(len(values))
+    else:
+        by = [np.asarray(g) for g in groups] if isinstance(groups, list) else np.asarray(groups)
+    grouped = values.groupby(by)
+    deviation = (values - grouped.transform("median")).abs()
+    mad = deviation.groupby(by).transform("median") * 1.4826
+    with np.errstate(invalid="ignore", divide="ignore"):
+        z = (deviation / mad).to_numpy()
+    return np.nan_to_num(z, nan=0.0, posinf=0.0) > threshold
+
+
+class AccuracyStore:
+    """
+    An accuracy store folder.
+
+    Args:
+        root (str): Folder of the store; created on the first append.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.manifest = {"runs": []}
+        path = os.path.join(root, MANIFEST_NAME)
+        if os.path.exists(path):
+            with open(path) as file:
+                self.manifest = json.load(file)
+
+    @property
+    def runs(self) -> list:
+        """
+        One dict per run (Run, Run Index, Pipette, Timestamp, Rows, File), in append order.
+        """
+        return self.manifest["runs"]
+
+    def append(self, df: pd.DataFrame, run: str, pipette: str = None, timestamp: str = None) -> int:
+        """
+        Appends one run.
+
+        Args:
+            df (pd.DataFrame): Programmed (µL), Measured (µL) and optionally
+                Channel and Pipette columns.
+            run (str): Run name, unique in the store.
+            pipette (str): Pipette name, if df has no Pipette column.
+            timestamp (str): ISO time of the run, "" if unknown. Defaults to now.
+
+        Returns:
+            int: The run's index (append order, from 1).
+
+        Raises:
+            ValueError: If the run is already stored or columns are missing.
+        """
+        if any(r["Run"] == run for r in self.runs):
+            raise ValueError(f"Run '{run}' is already in the store; runs are never rewritten.")
+        missing = {"Programmed (µL)", "Measured (µL)"} - set(df.columns)
+        if "Pipette" not in df.columns and pipette is None:
+            missing.add("Pipette")
+        if missing:
+            raise ValueError(f"Run '{run}' is missing columns {sorted(missing)}.")
+
+        index = len(self.runs) + 1
+        if timestamp is None:
+            timestamp = datetime.datetime.now().isoformat(timespec="seconds")
+        rows = pd.DataFrame({
+            "Run": run, "Run Index": index, "Timestamp": timestamp,
+            "Pipette": df["Pipette"].astype(str).to_numpy() if "Pipette" in df.columns else pipette,
+            "Channel": df["Channel"].astype(str).to_numpy() if "Channel" in df.columns else "1",
+            "Programmed (µL)": df["Programmed (µL)"].to_numpy(float),
+            "Measured (µL)": df["Measured (µL)"].to_numpy(float)})
+
+        os.makedirs(os.path.join(self.root, SEGMENTS_DIR), exist_ok=True)
+        name = f"{index:05d}-" + re.sub(r"[^\w.-]+", "_", run).strip("_") + ".npz"
+        save_columns(rows, os.path.join(self.root, SEGMENTS_DIR, name))
+
+        # Only the new rows' sums are computed; the stored ones are added to.
+        # The summary goes to a new file so the current one stays valid
+        # until the manifest names its successor
+        sums = group_sums(add_errors(rows))
+        previous = self._summary_path()
+        if os.path.exists(previous):
+            sums = pd.concat([load_columns(previous), sums], ignore_index=True)
+            sums = sums.groupby(list(GROUP_KEYS), sort=True, as_index=False)[list(SUMS)].sum()
+        summary_name = f"summary-{index:05d}.npz"
+        save_columns(sums, os.path.join(self.root, summary_name))
+
+        manifest = {**self.manifest, "Summary": summary_name,
+                    "runs": self.runs + [{"Run": run, "Run Index": index,
+                                          "Pipette": str(rows["Pipette"].iat[0]),
+                                          "Timestamp": timestamp, "Rows": len(rows), "File": name}]}
+        tmp = os.path.join(self.root, MANIFEST_NAME + ".tmp")
+        with open(tmp, "w") as file:
+            json.dump(manifest, file, indent=2)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, os.path.join(self.root, MANIFEST_NAME))
+        self.manifest = manifest
+        if os.path.exists(previous) and previous != self._summary_path():
+            os.remove(previous)
+        return index
+
+    def append_runs(self, df: pd.DataFrame, pipette: str = None, timestamp: str = None) -> list:
+        """
+        Appends every run of a table with a Run column, in the order the
+        runs first appear.
+
+        Returns:
+            list: The runs' indices.
+        """
+        if "Run" not in df.columns:
+            raise ValueError("The table has no Run column; give the run name instead.")
+        return [self.append(rows.drop(columns="Run"), run, pipette, timestamp)
+                for run, rows in df.groupby("Run", sort=False)]
+
+    def _summary_path(self) -> str:
+        return os.path.join(self.root, self.manifest.get("Summary", SUMMARY_NAME))
+
+    def load(self, runs=None) -> pd.DataFrame:
+        """
+        All rows (or those of the named runs) with Error (µL) and % Error.
+        """
+        entries = [r for r in self.runs if runs is None or r["Run"] in runs]
+        frames = [load_columns(os.path.join(self.root, SEGMENTS_DIR, r["File"])) for r in entries]
+        if not frames:
+            return add_errors(pd.DataFrame({"Run": [], "Run Index": [], "Timestamp": [], "Pipette": [],
+                                            "Channel": [], "Programmed (µL)": [], "Measured (µL)": []}))
+        df = pd.concat(frames, ignore_index=True)
+        df["Programmed (µL)"] = df["Programmed (µL)"].astype(float)
+        df["Measured (µL)"] = df["Measured (µL)"].astype(float)
+        return add_errors(df)
+
+    def summary(self, by=GROUP_KEYS) -> pd.DataFrame:
+        """
+        summarize() of the stored running sums, without reading the segments.
+
+        by must be a subset of GROUP_KEYS.
+        """
+        path = self._summary_path()
+        if not os.path.exists(path):
+            return summarize(pd.DataFrame(columns=list(by) + list(SUMS)), by)
+        return summarize(load_columns(path), by)
+
+    def outliers(self, by=("Pipette", "Programmed (µL)"), threshold: float = MAD_THRESHOLD,
+                 runs=None) -> pd.DataFrame:
+        """
+        The stored rows with an Outlier column, flagged by mad_outliers
+        on % Error within each group.
+        """
+        df = self.load(runs)
+        df["Outlier"] = mad_outliers(df["% Error"], [df[key].to_numpy() for key in by], threshold)
+        return df
+
+    def __repr__(self):
+        return f"AccuracyStore({self.root!r}, runs={len(self.runs)})"
+
+
+def seeded_store(root: str, seed: str) -> AccuracyStore:
+    """
+    Opens the store at root, first building it from the seed CSV (one run
+    per value of its Run column, timestamps unknown) if it has no runs yet.
+    """
+    store = AccuracyStore(root)
+    if not store.runs:
+        store.append_runs(pd.read_csv(seed, dtype={"Channel": str}), timestamp="")
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("store", help="store folder")
+    commands = parser.add_subparsers(dest="command", required=True)
+    append = commands.add_parser("append", help="append one run from a CSV")
+    append.add_argument("csv")
+    append.add_argument("--run", help="run name, unique in the store (default: the CSV's Run column)")
+    append.add_argument("--pipette", help="pipette name, if the CSV has no Pipette column")
+    append.add_argument("--timestamp", help="ISO time of the run (default: now)")
+    summary = commands.add_parser("summary", help="bias, CV and drift per group")
+    summary.add_argument("--by", nargs="+", default=list(GROUP_KEYS), choices=GROUP_KEYS)
+    outliers = commands.add_parser("outliers", help="rows flagged by the MAD rule")
+    outliers.add_argument("--by", nargs="+", default=["Pipette", "Programmed (µL)"])
+    outliers.add_argument("--threshold", type=float, default=MAD_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    store = AccuracyStore(args.store)
+    if args.command == "append":
+        df = pd.read_csv(args.csv, dtype={"Channel": str})
+        if args.run is None:
+            indices = store.append_runs(df, args.pipette, args.timestamp)
+        else:
+            indices = [store.append(df.drop(columns="Run", errors="ignore"), args.run, args.pipette,
+                                    args.timestamp)]
+        for index in indices:
+            print(f"Appended run {index}: {store.runs[index - 1]['Run']}")
+    elif args.command == "summary":
+        print(store.summary(args.by).to_string(index=False))
+    else:
+        df = store.outliers(args.by, args.threshold)
+        print(df[df["Outlier"]].to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
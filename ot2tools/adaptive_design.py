@@ -0,0 +1,273 @@
+"""
+Adaptive design of experiments for the Ksp boundary.
+
+generate_random_data() spreads wells uniformly over the Cu/Glycine
+triangle, so most land far from the solubility line. propose_plate instead
+fits the boundary to all flagged wells so far (ksp_fit, "logistic" method),
+bootstraps it, and places the next plate's wells along hyperbolas
+x * y = a spread over the bootstrap interval, where the outcome is least
+certain, plus a few uniform exploration wells. Proposals respect the
+pipette's minimum volume and the well cap and come back as the
+'Cu Values'/'Glycine Values' table process_arrays reads.
+
+The minimum volume is the pipette's (run_time.PIPETTES), the p1000 the
+protocols load by default. Its 100 µL minimum does not fit two reagents
+under the 75 µL cap, so pick the pipette that will dispense the plate:
+
+    python -m ot2tools.adaptive_design RESULTS... --pipette p300_single_gen2 --out next_plate.xlsx
+    python -m ot2tools.adaptive_design --simulate --pipette p20_single_gen2   # adaptive vs random, offline
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ot2tools import ksp_fit
+from ot2tools.analysis import WELL_VOLUME
+from ot2tools.design_loader import load_design
+from ot2tools.run_time import PIPETTES
+from ot2tools.synthetic import synthetic_flags
+
+# Pipetting resolution the design is rounded to, as in generate_random_data()
+RESOLUTION = 0.1
+# The pipette the protocols dispense the design with
+DEFAULT_PIPETTE = "p1000_single_gen2"
+
+
+def min_volume_for(pipette: str = DEFAULT_PIPETTE, cap: float = WELL_VOLUME,
+                   min_volume: float = None) -> float:
+    """
+    The smallest Cu or Glycine volume to design with: min_volume if given,
+    otherwise the pipette's minimum.
+
+    Raises:
+        ValueError: On an unknown pipette, or if two dispenses of that
+            volume do not fit under the cap.
+    """
+    if min_volume is None:
+        if pipette not in PIPETTES:
+            raise ValueError(f"Unknown pipette '{pipette}'; known: {', '.join(PIPETTES)}.")
+        min_volume = PIPETTES[pipette][1]
+    if 2 * min_volume > cap:
+        raise ValueError(f"Cu and Glycine of at least {min_volume:g} µL each do not fit under a "
+                         f"{cap:g} µL cap; use a pipette with a lower minimum or a larger cap.")
+    return float(min_volume)
+
+
+def random_design(n: int = 96, cap: float = WELL_VOLUME, min_volume: float = None,
+                  rng=None, pipette: str = DEFAULT_PIPETTE) -> pd.DataFrame:
+    """
+    Uniform compositions over the feasible triangle, the non-adaptive baseline.
+
+    min_volume defaults to the pipette's minimum (see min_volume_for).
+
+    Returns:
+        pd.DataFrame: 'Cu Values' and 'Glycine Values' in µL.
+    """
+    min_volume = min_volume_for(pipette, cap, min_volume)
+    rng = np.random.default_rng(rng)
+    # Uniform on the triangle cu, gly >= min_volume, cu + gly <= cap
+    u = rng.random((n, 2))
+    flip = u.sum(axis=1) > 1
+    u[flip] = 1 - u[flip]
+    volumes = min_volume + u * (cap - 2 * min_volume)
+    return _to_design(volumes[:, 0], volumes[:, 1], cap, min_volume)
+
+
+def _to_design(cu, gly, cap, min_volume) -> pd.DataFrame:
+    """
+    Rounds volumes to RESOLUTION without leaving the feasible region.
+    """
+    cu = np.maximum(np.round(cu / RESOLUTION) * RESOLUTION, min_volume)
+    gly = np.maximum(np.round(gly / RESOLUTION) * RESOLUTION, min_volume)
+    over = cu + gly > cap
+    gly[over] = np.floor((cap - cu[over]) / RESOLUTION) * RESOLUTION
+    return pd.DataFrame({"Cu Values": cu.round(1), "Glycine Values": gly.round(1)})
+
+
+def _feasible_x(product, cap_fraction, min_fraction):
+    """
+    Range of x with x * y = product, x, y >= min_fraction and x + y <= cap_fraction.
+    """
+    root = np.sqrt(np.maximum(cap_fraction ** 2 - 4 * product, 0))
+    low = np.maximum((cap_fraction - root) / 2, min_fraction)
+    high = np.minimum((cap_fraction + root) / 2, product / min_fraction)
+    return low, high
+
+
+def propose_plate(results: pd.DataFrame = None, n: int = 96, cap: float = WELL_VOLUME,
+                  min_volume: float = None, well_volume: float = WELL_VOLUME,
+                  explore: float = 0.1, n_boot: int = 500, widen: float = 1.2,
+                  seed: int = 0, pipette: str = DEFAULT_PIPETTE) -> pd.DataFrame:
+    """
+    Proposes the next plate's compositions from the flagged wells so far.
+
+    Args:
+        results (pd.DataFrame): Earlier wells with 'Cu Fraction', 'Gly Fraction'
+            and 'Flag' (e.g. the batch wells table). None starts with a random plate.
+        n (int): Wells to propose.
+        cap (float): Largest Cu + Glycine volume per well (µL).
+        min_volume (float): Optional, smallest Cu or Glycine volume (µL).
+            Defaults to the pipette's minimum.
+        well_volume (float): Volume the fractions are taken against.
+        explore (float): Share of wells placed uniformly, to catch a wrong model.
+        n_boot (int): Bootstrap replicates for the boundary interval.
+        widen (float): Factor the interval is stretched by on each side (log scale).
+        seed (int): Random seed.
+        pipette (str): Pipette that dispenses the plate, for its minimum volume.
+
+    Returns:
+        pd.DataFrame: 'Cu Values' and 'Glycine Values' in µL, one row per well.
+
+    Raises:
+        ValueError: If the minimum volume does not fit twice under the cap.
+    """
+    min_volume = min_volume_for(pipette, cap, min_volume)
+    rng = np.random.default_rng(seed)
+    if results is None or not len(results):
+        return random_design(n, cap, min_volume, rng)
+
+    cap_fraction, min_fraction = cap / well_volume, min_volume / well_volume
+    # Largest product the region can reach, at x = y = cap / 2
+    top = (cap_fraction / 2) ** 2
+    bottom = min_fraction ** 2
+
+    fit = ksp_fit.fit_runs(results.assign(Run=0), "logistic", n_boot, seed=seed)
+    a, low, high = fit.loc[0, ["Ksp", "Ksp Low", "Ksp High"]]
+    if not np.isfinite(a):
+        # Only one class seen: move past the extreme well of that class
+        product = results["Cu Fraction"] * results["Gly Fraction"]
+        flagged = results["Flag"].isin(["y", "n"])
+        if (results.loc[flagged, "Flag"] == "y").all():
+            low, high = bottom, product[flagged].min()
+        else:
+            low, high = product[flagged].max(), top
+    else:
+        if not (np.isfinite(low) and high > low):
+            low, high = a, a
+        low, high = low / widen, high * widen
+    low, high = np.clip([low, high], bottom, top)
+
+    n_explore = int(round(n * explore))
+    n_focus = n - n_explore
+    # Stratified products over the interval (log scale), stratified positions along each curve
+    products = np.exp(np.log(low) + (np.arange(n_focus) + rng.random(n_focus)) / n_focus
+                      * (np.log(high) - np.log(low)))
+    x_low, x_high = _feasible_x(products, cap_fraction, min_fraction)
+    position = (rng.permutation(n_focus) + rng.random(n_focus)) / n_focus
+    # Log spacing along the curve covers the steep (low Cu) and flat ends evenly
+    x = np.exp(np.log(x_low) + position * (np.log(np.maximum(x_high, x_low)) - np.log(x_low)))
+    y = products / x
+
+    design = _to_design(x * well_volume, y * well_volume, cap, min_volume)
+    if n_explore:
+        design = pd.concat([design, random_design(n_explore, cap, min_volume, rng)],
+                           ignore_index=True)
+    return design.sample(frac=1, random_state=rng.integers(2 ** 31)).reset_index(drop=True)
+
+
+def to_fractions(design: pd.DataFrame, well_volume: float = WELL_VOLUME) -> pd.DataFrame:
+    """
+    Fraction columns for a design, as add_fractions gives for a run.
+    """
+    return pd.DataFrame({"Cu Fraction": design["Cu Values"].to_numpy() / well_volume,
+                         "Gly Fraction": design["Glycine Values"].to_numpy() / well_volume})
+
+
+def simulate(strategy: str = "adaptive", ksp: float = 0.1, noise: float = 0.1,
+             target: float = 0.05, max_plates: int = 20, n: int = 96, n_boot: int = 500,
+             seed: int = 0, **options) -> dict:
+    """
+    Runs plates offline until the Ksp interval is narrow enough.
+
+    Flags come from synthetic_flags with the true ksp and noise. After each
+    plate all wells so far are fitted ("logistic" method) and the run stops
+    once the bootstrap interval width relative to the estimate is <= target.
+
+    Args:
+        strategy (str): "adaptive" (propose_plate) or "random" (random_design).
+        options: Passed to propose_plate; cap, min_volume and pipette also
+            apply to random_design.
+
+    Returns:
+        dict: plates used, final Ksp estimate, interval and relative width.
+    """
+    rng = np.random.default_rng(seed)
+    results = None
+    fit = None
+    for plate in range(1, max_plates + 1):
+        plate_seed = int(rng.integers(2 ** 31))
+        if strategy == "adaptive":
+            design = propose_plate(results, n, n_boot=n_boot, seed=plate_seed, **options)
+        elif strategy == "random":
+            design = random_design(n, options.get("cap", WELL_VOLUME), options.get("min_volume"),
+                                   plate_seed, options.get("pipette", DEFAULT_PIPETTE))
+        else:
+            raise ValueError(f"Unknown strategy '{strategy}', expected 'adaptive' or 'random'.")
+        wells = to_fractions(design)
+        wells["Flag"] = synthetic_flags(wells["Cu Fraction"], wells["Gly Fraction"], ksp, noise,
+                                        seed=plate_seed)
+        results = wells if results is None else pd.concat([results, wells], ignore_index=True)
+        fit = ksp_fit.fit_runs(results.assign(Run=0), "logistic", n_boot, seed=plate_seed).iloc[0]
+        width = (fit["Ksp High"] - fit["Ksp Low"]) / fit["Ksp"]
+        if np.isfinite(width) and width <= target:
+            break
+    return {"strategy": strategy, "plates": plate, "ksp": fit["Ksp"], "low": fit["Ksp Low"],
+            "high": fit["Ksp High"], "width": width, "converged": bool(width <= target)}
+
+
+def compare_strategies(seeds=range(5), **kwargs) -> pd.DataFrame:
+    """
+    simulate() for both strategies over several seeds.
+    """
+    return pd.DataFrame([simulate(strategy, seed=seed, **kwargs)
+                         for strategy in ("random", "adaptive") for seed in seeds])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("results", nargs="*",
+                        help="earlier per-well tables with Cu/Gly Fraction and Flag columns")
+    parser.add_argument("--out", default="next_plate.xlsx", help=".xlsx (sheet 'OT-2 Input') or .csv")
+    parser.add_argument("--wells", type=int, default=96)
+    parser.add_argument("--cap", type=float, default=WELL_VOLUME, help="max Cu + Glycine (µL)")
+    parser.add_argument("--pipette", default=DEFAULT_PIPETTE, choices=sorted(PIPETTES),
+                        help=f"pipette dispensing the plate (default: {DEFAULT_PIPETTE})")
+    parser.add_argument("--min-volume", type=float,
+                        help="smallest Cu or Glycine volume (µL, default: the pipette minimum)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--simulate", action="store_true",
+                        help="compare adaptive and random designs offline instead")
+    parser.add_argument("--ksp", type=float, default=0.1, help="true Ksp for --simulate")
+    parser.add_argument("--noise", type=float, default=0.1, help="flag noise for --simulate")
+    parser.add_argument("--target", type=float, default=0.05,
+                        help="relative interval width to stop at, for --simulate")
+    args = parser.parse_args(argv)
+    try:
+        min_volume_for(args.pipette, args.cap, args.min_volume)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.simulate:
+        table = compare_strategies(ksp=args.ksp, noise=args.noise, target=args.target,
+                                   n=args.wells, cap=args.cap, min_volume=args.min_volume,
+                                   pipette=args.pipette)
+        print(table.to_string(index=False))
+        print(table.groupby("strategy")["plates"].mean().to_string())
+        return 0
+
+    results = pd.concat([load_design(path) for path in args.results], ignore_index=True) \
+        if args.results else None
+    design = propose_plate(results, args.wells, args.cap, args.min_volume, seed=args.seed,
+                           pipette=args.pipette)
+    if args.out.lower().endswith(".csv"):
+        design.to_csv(args.out, index=False)
+    else:
+        design.to_excel(args.out, sheet_name="OT-2 Input", index=False)
+    print(f"Wrote {len(design)} wells to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
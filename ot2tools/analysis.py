@@ -0,0 +1,112 @@
+"""
+The Data Analysis notebook steps as importable functions.
+
+These match the cells in ``Assisting Documentation/Data Analysis.ipynb`` and
+are the reference the faster tools are checked and benchmarked against.
+"""
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+# Well volume the fractions are taken against (see the notebook)
+WELL_VOLUME = 75
+
+
+# Load the JSON file
+def load_json(filepath):
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(f"File not found: {filepath}")
+
+    with open(filepath, 'r') as file:
+        data = json.load(file)
+    return data
+
+
+# Extract relevant data
+def extract_dispense_data(data, cu_well="A2", gly_well="A3"):
+    well_data = {}
+    last_aspirate_source = None  # Track last aspirate command
+
+    for entry in data.get("commands", {}).get("data", []):
+        if entry.get("commandType") == "aspirate":
+            last_aspirate_source = entry["params"]["wellName"]
+
+        elif entry.get("commandType") == "dispense":
+            well = entry["params"]["wellName"]
+            volume = entry["params"]["volume"]
+
+            if last_aspirate_source == cu_well:
+                if well not in well_data:
+                    well_data[well] = {"Cu (µL)": 0, "Gly (µL)": 0}
+                well_data[well]["Cu (µL)"] += volume
+            elif last_aspirate_source == gly_well:
+                if well not in well_data:
+                    well_data[well] = {"Cu (µL)": 0, "Gly (µL)": 0}
+                well_data[well]["Gly (µL)"] += volume
+
+    return well_data
+
+
+# Convert extracted data to a DataFrame
+def create_dataframe(well_data):
+    df = pd.DataFrame.from_dict(well_data, orient='index').reset_index()
+    df.rename(columns={'index': 'Well'}, inplace=True)
+    return df
+
+
+def add_fractions(df, well_volume=WELL_VOLUME):
+    """
+    Adds the 'Cu Fraction' and 'Gly Fraction' columns used for concentration space.
+    """
+    df['Cu Fraction'] = df['Cu (µL)'] / well_volume
+    df['Gly Fraction'] = df['Gly (µL)'] / well_volume
+    return df
+
+
+def ksp_model(x, a):
+    return a / x
+
+
+def fit_ksp(df):
+    """
+    Fits y = a / x to the precipitated ('y') wells with curve_fit, as in the notebook.
+
+    The notebook passes p0=[0.18, 0], which has one value too many for the
+    one-parameter model; only the 0.18 starting guess is used here.
+
+    Returns:
+        float: The fitted a.
+    """
+    from scipy.optimize import curve_fit
+
+    fit_data = df[df['Flag'] == 'y']
+    xdata = fit_data['Cu Fraction'].values
+    ydata = fit_data['Gly Fraction'].values
+    popt, _ = curve_fit(ksp_model, xdata, ydata, p0=[0.18])
+    return float(popt[0])
+
+
+def plot_fitted_curve(filtered_df, a, ax=None):
+    """
+    Draws the notebook's fitted Ksp figure (one scatter call per well).
+    """
+    import matplotlib.pyplot as plt
+
+    ax = plt.gca() if ax is None else ax
+    colors = filtered_df['Flag'].map({'y': 'red', 'n': 'blue'})
+    markers = filtered_df['Flag'].map({'y': 'o', 'n': 's'})
+
+    xrange = np.linspace(0.01, 1, 500)
+    yfit = ksp_model(xrange, a)
+
+    # Keep only (x, y) pairs where x + y <= 2
+    valid_mask = (xrange + yfit) <= 2
+
+    for i in range(len(filtered_df)):
+        ax.scatter(filtered_df.iloc[i]['Cu Fraction'], filtered_df.iloc[i]['Gly Fraction'],
+                   color=colors.iloc[i], marker=markers.iloc[i], edgecolor='k', s=60)
+    ax.plot(xrange[valid_mask], yfit[valid_mask], 'g--', linewidth=2, label='Fitted Boundary')
+    ax.plot([0, 1, 0, 0], [0, 0, 1, 0], 'k--', lw=1.5, label="Concentration Boundary")
+    return ax
@@ -0,0 +1,281 @@
+"""
+Asynchronous balance and volume-reader interface for batch accuracy runs.
+
+Instead of pausing after every dispense for the operator to read the
+instrument, a protocol tells the reader which wells it has filled and
+carries on pipetting. A background thread reads the instrument's output
+lines, pairs each reading with the oldest well still waiting for one, and
+appends it to a results CSV as it arrives (the CSV can be appended to the
+accuracy store as it is). The protocol only stops for readings outside the
+tolerance:
+
+    reader = open_reader("tcp://192.168.1.50:4001", "readings.csv", tolerance=5,
+                         pipette="p300_multi_gen2")
+    reader.expect("A1", 50.0, channel="A")     # after each dispense
+    for row in reader.poll():                  # readings outside tolerance so far
+        ctx.pause(describe(row, reader.tolerance))
+    for row in reader.wait(timeout=60):        # at the end of the run
+        ...
+    reader.close()
+
+Addresses:
+    serial:///dev/ttyUSB0?baud=9600   a balance or reader on a serial port (needs pyserial)
+    tcp://host:port                   a serial-to-Ethernet bridge or networked balance
+    mock://?bias=0&cv=0.5&delay=0     a local stand-in that answers every expect()
+
+Each line the instrument sends is one reading; the first number on it is
+taken, in µL, or as a mass of water when it is followed by mg or g.
+"""
+import collections
+import csv
+import datetime
+import queue
+import re
+import socket
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from ot2tools.flow_calibration import WATER_DENSITY
+
+# % error allowed before the protocol pauses
+TOLERANCE = 5.0
+RESULT_COLUMNS = ["Time", "Run", "Pipette", "Well", "Channel", "Trial", "Programmed (µL)",
+                  "Measured (µL)", "% Error", "In Tolerance"]
+_NUMBER = re.compile(r"[-+]?\d+(?:\.\d*)?|[-+]?\.\d+")
+
+
+def parse_reading(line: str):
+    """
+    The volume (µL) on one instrument line, or None if it has no number.
+    """
+    match = _NUMBER.search(line)
+    if match is None:
+        return None
+    value = float(match.group())
+    unit = re.match(r"\s*(mg|g)\b", line[match.end():], re.IGNORECASE)
+    if unit is not None:
+        value *= (1.0 if unit.group(1).lower() == "mg" else 1000.0) / WATER_DENSITY
+    return value
+
+
+class SerialDevice:
+    """
+    A balance or reader on a serial port.
+
+    Args:
+        port (str): e.g. /dev/ttyUSB0 or COM3.
+        baudrate (int): Line speed.
+    """
+
+    def __init__(self, port: str, baudrate: int = 9600):
+        try:
+            import serial
+        except ImportError:
+            raise ValueError(f"Reading from serial port {port} needs pyserial installed.")
+        self.connection = serial.Serial(port, baudrate, timeout=0.5)
+
+    def readline(self, timeout: float):
+        self.connection.timeout = timeout
+        line = self.connection.readline()
+        return line.decode(errors="replace").strip() if line else None
+
+    def close(self):
+        self.connection.close()
+
+
+class TcpDevice:
+    """
+    A balance or reader behind a TCP socket, sending one reading per line.
+    """
+
+    def __init__(self, host: str, port: int):
+        self.connection = socket.create_connection((host, port), timeout=5)
+        self.buffer = b""
+
+    def readline(self, timeout: float):
+        while b"\n" not in self.buffer:
+            self.connection.settimeout(timeout)
+            try:
+                chunk = self.connection.recv(4096)
+            except socket.timeout:
+                return None
+            if not chunk:
+                return None
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b"\n", 1)
+        return line.decode(errors="replace").strip()
+
+    def close(self):
+        self.connection.close()
+
+
+class MockDevice:
+    """
+    Local stand-in for testing: answers every expected dispense after delay
+    seconds with volume * (1 + bias/100) plus normal noise of cv % of it.
+    """
+
+    def __init__(self, bias: float = 0.0, cv: float = 0.5, delay: float = 0.0, seed: int = 0):
+        self.bias = bias
+        self.cv = cv
+        self.delay = delay
+        self.rng = np.random.default_rng(seed)
+        self.lines = queue.Queue()
+
+    def notify(self, volume: float):
+        value = volume * (1 + self.bias / 100 + self.rng.normal(0, self.cv / 100))
+        self.lines.put((time.monotonic() + self.delay, f"{value:.2f} uL"))
+
+    def readline(self, timeout: float):
+        try:
+            due, line = self.lines.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        time.sleep(max(due - time.monotonic(), 0.0))
+        return line
+
+    def close(self):
+        pass
+
+
+def open_device(address: str):
+    """
+    Opens the device for an address (see the module docstring).
+
+    Raises:
+        ValueError: On an unknown scheme.
+    """
+    url = urlparse(address)
+    options = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    if url.scheme == "mock":
+        return MockDevice(float(options.get("bias", 0)), float(options.get("cv", 0.5)),
+                          float(options.get("delay", 0)), int(options.get("seed", 0)))
+    if url.scheme == "tcp":
+        return TcpDevice(url.hostname, url.port)
+    if url.scheme == "serial":
+        return SerialDevice(url.netloc + url.path, int(options.get("baud", 9600)))
+    raise ValueError(f"Unknown reader address '{address}'; use serial://, tcp:// or mock://.")
+
+
+class BackgroundReader:
+    """
+    Reads a device on a background thread and tags readings with wells.
+
+    Args:
+        device: From open_device.
+        results_path (str): Optional, CSV every reading is appended to as it arrives.
+        tolerance (float): Allowed |% error|.
+        pipette (str): Written with each reading.
+        run (str): Run name written with each reading. Defaults to the start time.
+    """
+
+    def __init__(self, device, results_path: str = None, tolerance: float = TOLERANCE,
+                 pipette: str = "", run: str = None):
+        self.device = device
+        self.tolerance = tolerance
+        self.pipette = pipette
+        self.run = run or datetime.datetime.now().isoformat(timespec="seconds")
+        self.rows = []
+        self.pending = collections.deque()
+        self.flagged = queue.Queue()
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.file = None
+        if results_path is not None:
+            self.file = open(results_path, "a", newline="")
+            self.writer = csv.DictWriter(self.file, RESULT_COLUMNS)
+            if self.file.tell() == 0:
+                self.writer.writeheader()
+        self.thread = threading.Thread(target=self._read, name="balance-reader", daemon=True)
+        self.thread.start()
+
+    def expect(self, well: str, volume: float, channel: str = "1", trial=None):
+        """
+        Queues a well for the next reading; call right after dispensing into it.
+        """
+        with self.lock:
+            self.pending.append({"Well": well, "Channel": channel, "Trial": trial,
+                                 "Programmed (µL)": float(volume)})
+        if hasattr(self.device, "notify"):
+            self.device.notify(volume)
+
+    def poll(self) -> list:
+        """
+        Readings outside tolerance since the last poll, without waiting.
+        """
+        flagged = []
+        while True:
+            try:
+                flagged.append(self.flagged.get_nowait())
+            except queue.Empty:
+                return flagged
+
+    def wait(self, timeout: float = 60.0) -> list:
+        """
+        Waits up to timeout seconds for every expected well to be read.
+
+        Returns:
+            list: Readings outside tolerance since the last poll; wells still
+            unread are left in missing().
+        """
+        end = time.monotonic() + timeout
+        while self.missing() and time.monotonic() < end and self.thread.is_alive():
+            time.sleep(0.05)
+        return self.poll()
+
+    def missing(self) -> list:
+        """
+        Wells expected but not read yet.
+        """
+        with self.lock:
+            return [tag["Well"] for tag in self.pending]
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join(timeout=2)
+        self.device.close()
+        if self.file is not None:
+            self.file.close()
+
+    def _read(self):
+        while not self.stopped.is_set():
+            try:
+                line = self.device.readline(0.2)
+            except OSError:
+                return
+            volume = parse_reading(line) if line else None
+            if volume is None:
+                continue
+            with self.lock:
+                if not self.pending:
+                    continue  # e.g. a tare or a reading nobody asked for
+                tag = self.pending.popleft()
+            error = (volume - tag["Programmed (µL)"]) / tag["Programmed (µL)"] * 100
+            row = dict(tag, **{"Time": datetime.datetime.now().isoformat(timespec="seconds"),
+                               "Run": self.run, "Pipette": self.pipette, "Measured (µL)": volume,
+                               "% Error": round(error, 4), "In Tolerance": abs(error) <= self.tolerance})
+            self.rows.append(row)
+            if self.file is not None:
+                self.writer.writerow(row)
+                self.file.flush()
+            if not row["In Tolerance"]:
+                self.flagged.put(row)
+
+
+def open_reader(address: str, results_path: str = None, **kwargs) -> BackgroundReader:
+    """
+    open_device plus a BackgroundReader (kwargs as BackgroundReader).
+    """
+    return BackgroundReader(open_device(address), results_path, **kwargs)
+
+
+def describe(row: dict, tolerance: float = TOLERANCE) -> str:
+    """
+    Operator message for a reading outside tolerance.
+    """
+    return (f"Well {row['Well']} (channel {row['Channel']}) read {row['Measured (µL)']:g} µL for "
+            f"{row['Programmed (µL)']:g} µL ({row['% Error']:+.1f}%), outside ±{tolerance:g}%. "
+            "Check the well, then resume.")
@@ -0,0 +1,262 @@
+"""
+Batch analysis of a directory of OT-2 run logs.
+
+Does the Data Analysis notebook for every run at once: extract the Cu/Gly
+volumes, add the fractions and attach the precipitation flags in a process
+pool, then fit the Ksp boundary of every run in one batched pass (see
+ksp_fit). Results are written to one per-well table and one per-run fit
+table:
+
+    python -m ot2tools.batch RUN_LOG_DIR --out results
+
+Flags for run ``name.json`` are read from ``name.flags.csv`` next to it (or
+in --flags DIR): either Well and Flag columns, or a single Flag column in the
+order the wells were dosed, like the notebook's ``flags`` list. For runs over
+several plates add a Slot (or Labware) column to tell the plates apart; the
+design row of each well is read from the run's layout comments (see
+plate_layout). Runs without flags are still extracted but not fitted.
+
+A manifest in the output folder records the content hash of every run log
+and flags file; unchanged runs are not re-analysed on the next invocation.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ot2tools import analysis, ksp_fit
+from ot2tools.design_loader import file_hash, load_columns, save_columns
+from ot2tools.flags import FLAGS_SUFFIX, flags_path
+from ot2tools.plate_layout import join_layout, read_layout
+from ot2tools.run_log import extract_dispense_columns
+
+MANIFEST_NAME = "manifest.json"
+RUNS_DIR_NAME = "runs"
+
+
+def find_runs(log_dir: str, flags_dir: str = None) -> dict:
+    """
+    Maps run name to (run-log path, flags path or None) for every .json in log_dir.
+    """
+    flags_dir = flags_dir or log_dir
+    runs = {}
+    for name in sorted(os.listdir(log_dir)):
+        stem, extension = os.path.splitext(name)
+        if extension.lower() != ".json" or name == MANIFEST_NAME:
+            continue
+        flags = flags_path(flags_dir, name)
+        runs[stem] = (os.path.join(log_dir, name), flags if os.path.exists(flags) else None)
+    return runs
+
+
+def read_flags(path: str, wells, labware=None, slots=None) -> np.ndarray:
+    """
+    Reads a flags file and lines it up with the extracted wells.
+
+    A Labware or Slot column alongside Well tells apart wells on different plates.
+
+    Returns:
+        np.ndarray: 'y'/'n' (or '' where a well has no flag) per well.
+    """
+    flags = pd.read_csv(path, dtype=str)
+    flags.columns = [c.strip() for c in flags.columns]
+    if "Flag" not in flags.columns:
+        raise KeyError(f"Flags file must contain a 'Flag' column: {path}")
+    values = flags["Flag"].fillna("").str.strip().str.lower()
+    if "Well" in flags.columns:
+        keys = flags["Well"].str.strip()
+        if "Labware" in flags.columns and labware is not None:
+            keys = zip(flags["Labware"].str.strip(), keys)
+            wells = zip(labware, wells)
+        elif "Slot" in flags.columns and slots is not None:
+            keys = zip(flags["Slot"].str.strip(), keys)
+            wells = zip(slots, wells)
+        lookup = dict(zip(keys, values))
+        return np.array([lookup.get(w, "") for w in wells], dtype=object)
+    if len(values) != len(wells):
+        raise ValueError(f"{path} has {len(values)} flags for {len(wells)} wells.")
+    return values.to_numpy(dtype=object)
+
+
+def analyse_run(name: str, log_path: str, flags_path: str = None,
+                well_volume: float = analysis.WELL_VOLUME) -> tuple:
+    """
+    Extracts and flags a single run. Runs in a worker process.
+
+    Returns:
+        tuple: (per-well DataFrame, per-run summary dict).
+    """
+    columns = extract_dispense_columns(log_path, by_labware=True)
+    df = pd.DataFrame({"Run": name, "Labware": columns["Labware"], "Slot": columns["Slot"],
+                       "Well": columns["Well"], "Cu (µL)": columns["Cu (µL)"],
+                       "Gly (µL)": columns["Gly (µL)"]})
+    layout = read_layout(log_path)
+    if len(layout):
+        df = join_layout(df, layout)
+    analysis.add_fractions(df, well_volume)
+    df["Flag"] = ""
+    error = "no flags"
+    if flags_path:
+        try:
+            df["Flag"] = read_flags(flags_path, df["Well"].to_numpy(), df["Labware"].to_numpy(),
+                                    df["Slot"].to_numpy())
+            error = ""
+        except (KeyError, ValueError) as exc:
+            error = str(exc).strip("'\"")
+
+    summary = {"Run": name, "Wells": len(df), "Precipitated": int((df["Flag"] == "y").sum()),
+               "Error": error}
+    if not error and summary["Precipitated"] == 0:
+        summary["Error"] = "no precipitated wells"
+    return df, summary
+
+
+def _analyse(job):
+    return analyse_run(*job)
+
+
+def _fingerprint(paths, previous: dict = None) -> dict:
+    """
+    Content hashes of a run's files. A file whose size and mtime match the
+    previous fingerprint keeps its old hash instead of being read again.
+    """
+    previous = previous or {}
+    fingerprint = {}
+    for key, path in zip(("log", "flags"), paths):
+        if path is None:
+            fingerprint[key] = None
+            continue
+        stat = os.stat(path)
+        old = previous.get(key) or {}
+        if old.get("size") == stat.st_size and old.get("mtime_ns") == stat.st_mtime_ns:
+            fingerprint[key] = old
+        else:
+            fingerprint[key] = {"sha256": file_hash(path), "size": stat.st_size,
+                                "mtime_ns": stat.st_mtime_ns}
+    return fingerprint
+
+
+def _same_content(a: dict, b: dict) -> bool:
+    return all((a.get(k) or {}).get("sha256") == (b.get(k) or {}).get("sha256") for k in ("log", "flags"))
+
+
+def write_table(df: pd.DataFrame, path_stem: str) -> str:
+    """
+    Writes a table as Parquet, or as .npz columns if no Parquet engine is installed.
+
+    Returns:
+        str: The path written.
+    """
+    try:
+        df.to_parquet(path_stem + ".parquet", index=False)
+        return path_stem + ".parquet"
+    except ImportError:
+        save_columns(df, path_stem + ".npz")
+        return path_stem + ".npz"
+
+
+def run_batch(log_dir: str, out_dir: str, flags_dir: str = None, jobs: int = None,
+              well_volume: float = analysis.WELL_VOLUME, method: str = "lsq", n_boot: int = 0,
+              force: bool = False, seed: int = 0, log=print) -> dict:
+    """
+    Analyses every run log in log_dir, skipping runs unchanged since the last call.
+
+    Args:
+        log_dir (str): Folder of OT-2 run-log JSON files.
+        out_dir (str): Output folder for the tables, per-run results and manifest.
+        flags_dir (str): Optional, folder holding the .flags.csv files.
+        jobs (int): Worker processes. Defaults to the number of CPUs.
+        well_volume (float): Volume the fractions are taken against.
+        method (str): Ksp fit, see ksp_fit.METHODS.
+        n_boot (int): Bootstrap replicates for the Ksp confidence interval; 0 skips it.
+        force (bool): Re-analyse every run.
+        seed (int): Random seed for the bootstrap.
+        log: Progress callback.
+
+    Returns:
+        dict: Paths of the "wells" and "fits" tables and the "analysed"/"skipped" run names.
+    """
+    runs = find_runs(log_dir, flags_dir)
+    runs_dir = os.path.join(out_dir, RUNS_DIR_NAME)
+    os.makedirs(runs_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+    if manifest.get("well_volume") != well_volume:
+        manifest = {}
+    entries = manifest.get("runs", {})
+
+    fingerprints = {name: _fingerprint(paths, entries.get(name, {}).get("fingerprint"))
+                    for name, paths in runs.items()}
+    stale = [name for name in runs
+             if name not in entries
+             or not _same_content(entries[name]["fingerprint"], fingerprints[name])
+             or not os.path.exists(os.path.join(runs_dir, name + ".npz"))]
+    for name in runs:
+        if name not in stale:
+            entries[name]["fingerprint"] = fingerprints[name]  # Refresh touched mtimes
+
+    if stale:
+        jobs_list = [(name, *runs[name], well_volume) for name in stale]
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            for df, summary in pool.map(_analyse, jobs_list):
+                name = summary["Run"]
+                save_columns(df, os.path.join(runs_dir, name + ".npz"))
+                entries[name] = {"fingerprint": fingerprints[name], "summary": summary}
+                log(f"{name}: {summary['Wells']} wells, {summary['Precipitated']} precipitated"
+                    + (f" ({summary['Error']})" if summary["Error"] else ""))
+
+    # Forget runs whose logs were removed
+    for name in set(entries) - set(runs):
+        del entries[name]
+        path = os.path.join(runs_dir, name + ".npz")
+        if os.path.exists(path):
+            os.remove(path)
+
+    frames = [load_columns(os.path.join(runs_dir, name + ".npz")) for name in runs]
+    wells = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    # Fitting is cheap once batched, so every run is refitted on each call
+    fits = pd.DataFrame([entries[name]["summary"] for name in runs],
+                        columns=["Run", "Wells", "Precipitated", "Error"])
+    if len(wells):
+        fitted = ksp_fit.fit_runs(wells, method, n_boot, seed=seed).drop(columns="Points")
+        fits = fits.merge(fitted, on="Run", how="left")
+    result = {"wells": write_table(wells, os.path.join(out_dir, "wells")),
+              "fits": write_table(fits, os.path.join(out_dir, "fits")),
+              "analysed": stale, "skipped": [name for name in runs if name not in stale]}
+
+    with open(manifest_path + ".tmp", "w") as file:
+        json.dump({"well_volume": well_volume, "runs": entries}, file, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("log_dir", help="folder of OT-2 run-log JSON files")
+    parser.add_argument("--out", default="batch_results", help="output folder")
+    parser.add_argument("--flags", help=f"folder of {FLAGS_SUFFIX} files (default: log_dir)")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--well-volume", type=float, default=analysis.WELL_VOLUME)
+    parser.add_argument("--method", choices=ksp_fit.METHODS, default="lsq",
+                        help="Ksp fit (lsq matches the notebook's curve_fit)")
+    parser.add_argument("--bootstrap", type=int, default=0, metavar="N",
+                        help="bootstrap replicates for a 95%% confidence interval")
+    parser.add_argument("--force", action="store_true", help="re-analyse unchanged runs")
+    args = parser.parse_args(argv)
+
+    result = run_batch(args.log_dir, args.out, args.flags, args.jobs, args.well_volume,
+                       args.method, args.bootstrap, args.force)
+    print(f"{len(result['analysed'])} run(s) analysed, {len(result['skipped'])} unchanged")
+    print(f"Wells: {result['wells']}\nFits:  {result['fits']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+"""
+Benchmarks for the analysis and planning hot paths.
+
+Feeds synthetic designs and run logs of increasing size through each stage
+and records wall time, peak traced memory and the memory blocks it still
+holds when it returns. Results can be saved as a baseline (the committed
+one is benchmarks/baseline.json) and later runs compared against it:
+
+    python -m ot2tools.benchmark --save-baseline
+    python -m ot2tools.benchmark            # flags regressions, exit code 1
+
+Stages that are very slow at scale (Excel parsing and the per-point plot)
+stop at --slow-limit wells unless it is raised.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from ot2tools import REPO_ROOT, analysis, ksp_fit, plotting
+from ot2tools.design_loader import load_design
+from ot2tools.multi_dispense import plan_multi_dispense
+from ot2tools.run_log import extract_dispense_columns
+from ot2tools.synthetic import synthetic_design, synthetic_flags, synthetic_run_log
+from ot2tools.transfer_plan import TransferPlan
+
+DEFAULT_SIZES = [96, 1000, 10000, 100000]
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, "benchmarks", "baseline.json")
+
+
+class Stage:
+    """
+    A benchmarked step: setup(n, tmpdir) builds the input, run(data) is timed.
+    """
+
+    def __init__(self, name: str, setup, run, slow: bool = False):
+        self.name = name
+        self.setup = setup
+        self.run = run
+        self.slow = slow
+
+
+def _excel_setup(n, tmpdir):
+    path = os.path.join(tmpdir, f"design_{n}.xlsx")
+    synthetic_design(n).to_excel(path, sheet_name="OT-2 Input", index=False)
+    return path
+
+
+def _json_setup(n, tmpdir):
+    path = os.path.join(tmpdir, f"run_{n}.json")
+    with open(path, "w") as file:
+        json.dump(synthetic_run_log(n), file)
+    return path
+
+
+def _fit_setup(n, tmpdir):
+    design = synthetic_design(n)
+    df = analysis.add_fractions(analysis.create_dataframe(
+        analysis.extract_dispense_data(synthetic_run_log(n, design=design))))
+    df["Flag"] = synthetic_flags(df["Cu Fraction"], df["Gly Fraction"], noise=0.2)
+    return df
+
+
+def _plot(df):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 6))
+    FigureCanvasAgg(fig)
+    analysis.plot_fitted_curve(df, 0.18, fig.add_subplot())
+    fig.canvas.draw()
+
+
+def _plot_vectorized(df):
+    fig = plotting.new_figure(8, 6)
+    plotting.plot_concentration_space(fig.add_subplot(), df["Cu Fraction"], df["Gly Fraction"],
+                                      df["Flag"], 0.18)
+    fig.canvas.draw()
+
+
+STAGES = [
+    Stage("read_excel",
+          _excel_setup,
+          lambda path: analysis.pd.read_excel(path, sheet_name="OT-2 Input"),
+          slow=True),
+    # The warm-up run in measure() fills the cache
+    Stage("load_design_cached", _excel_setup, load_design),
+    Stage("process_arrays",
+          lambda n, tmpdir: synthetic_design(n),
+          lambda df: list(TransferPlan.from_dataframe(df, 100))),
+    Stage("multi_dispense",
+          lambda n, tmpdir: synthetic_design(n)["Cu Values"].to_numpy(),
+          lambda cu: plan_multi_dispense(cu, 1000, 10)),
+    Stage("load_json", _json_setup, analysis.load_json),
+    Stage("extract_dispense_data",
+          lambda n, tmpdir: synthetic_run_log(n),
+          analysis.extract_dispense_data),
+    Stage("extract_streaming", _json_setup, extract_dispense_columns),
+    Stage("create_dataframe",
+          lambda n, tmpdir: analysis.extract_dispense_data(synthetic_run_log(n)),
+          analysis.create_dataframe),
+    Stage("curve_fit", _fit_setup, analysis.fit_ksp),
+    Stage("ksp_closed_form", _fit_setup, ksp_fit.fit_runs),
+    Stage("ksp_bootstrap", _fit_setup, lambda df: ksp_fit.fit_runs(df, n_boot=1000)),
+    Stage("plot", _fit_setup, _plot, slow=True),
+    Stage("plot_vectorized", _fit_setup, _plot_vectorized),
+]
+
+
+def measure(stage: Stage, data, repeats: int = 3) -> dict:
+    """
+    Times a stage (best of repeats) and traces its memory in a separate run.
+
+    Returns:
+        dict: seconds, peak_kb and retained_blocks (memory blocks the stage
+        still held when it returned, including its result; tracemalloc only
+        sees live blocks, so short-lived allocations are not counted).
+    """
+    stage.run(data)  # Warm-up, so lazy imports are not timed
+    best = float("inf")
+    for _ in range(repeats):
+        gc.collect()
+        start = time.perf_counter()
+        stage.run(data)
+        best = min(best, time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = stage.run(data)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    retained = sum(s.count_diff for s in after.compare_to(before, "filename") if s.count_diff > 0)
+    return {"seconds": best, "peak_kb": peak / 1024, "retained_blocks": int(retained)}
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, stages=None, slow_limit: int = 10000,
+                   repeats: int = 3, log=print) -> dict:
+    """
+    Runs every stage at every size.
+
+    Returns:
+        dict: {stage: {size: measurement}} plus environment details.
+    """
+    results = {}
+    selected = [s for s in STAGES if stages is None or s.name in stages]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for stage in selected:
+            results[stage.name] = {}
+            for n in sizes:
+                if stage.slow and n > slow_limit:
+                    continue
+                data = stage.setup(n, tmpdir)
+                m = measure(stage, data, repeats)
+                results[stage.name][str(n)] = m
+                log(f"{stage.name:<22}{n:>8}  {m['seconds'] * 1000:10.2f} ms"
+                    f"  {m['peak_kb']:10.0f} KiB  {m['retained_blocks']:8d} blocks held")
+    return {"commit": _git_commit(), "python": platform.python_version(),
+            "numpy": np.__version__, "results": results}
+
+
+def compare(current: dict, baseline: dict, tolerance: float = 0.25,
+            min_seconds: float = 0.001, min_blocks: int = 100) -> list:
+    """
+    Lists stage/size pairs that got slower or hungrier than the baseline.
+
+    Args:
+        current (dict): Output of run_benchmarks.
+        baseline (dict): Saved output of an earlier run.
+        tolerance (float): Allowed fractional increase before flagging.
+        min_seconds (float): Timing changes smaller than this are noise.
+        min_blocks (int): Retained-block changes smaller than this are noise.
+
+    Returns:
+        list: One message per regression.
+    """
+    regressions = []
+    for stage, sizes in current["results"].items():
+        for n, m in sizes.items():
+            old = baseline["results"].get(stage, {}).get(n)
+            if old is None:
+                continue
+            for key, noise in (("seconds", min_seconds), ("peak_kb", 0), ("retained_blocks", min_blocks)):
+                if key not in old or m[key] - old[key] < noise:
+                    continue
+                if old[key] > 0 and m[key] > old[key] * (1 + tolerance):
+                    regressions.append(f"{stage} n={n}: {key} {old[key]:.4g} -> {m[key]:.4g} "
+                                       f"(+{(m[key] / old[key] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--stages", nargs="+", choices=[s.name for s in STAGES])
+    parser.add_argument("--slow-limit", type=int, default=10000,
+                        help="largest size for the slow stages (read_excel, plot)")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    import matplotlib
+    matplotlib.use("Agg")
+
+    current = run_benchmarks(args.sizes, args.stages, args.slow_limit, args.repeats)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, "w") as file:
+            json.dump(current, file, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print("No baseline found; run with --save-baseline first.")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(current, baseline, args.tolerance)
+    for message in regressions:
+        print(f"REGRESSION {message}")
+    print(f"{len(regressions)} regression(s) against baseline from {baseline.get('commit')}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
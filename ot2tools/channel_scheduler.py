@@ -0,0 +1,255 @@
+"""
+Hybrid single/8-channel scheduling for plate-wide dispenses.
+
+Library only: the protocols in this repository load a single p1000, so
+nothing here is called by them. It is for protocols that also mount an
+8-channel (e.g. a p300 multi gen2), which would call schedule_channels on a
+reagent's volume map and run it with dispense_schedule.
+"""
+import numpy as np
+
+from ot2tools.multi_dispense import dispense_plan, plan_multi_dispense
+
+ROWS = "ABCDEFGH"
+N_ROWS, N_COLUMNS = 8, 12
+
+
+def to_grid(volumes) -> np.ndarray:
+    """
+    Converts a 96-well volume map to an (8, 12) row x column grid.
+
+    Args:
+        volumes (array-like): 96 volumes in plate.wells() order (A1, B1, ..., H12)
+            or an (8, 12) grid.
+
+    Returns:
+        np.ndarray: (8, 12) grid of volumes, NaN replaced with 0.
+    """
+    volumes = np.nan_to_num(np.asarray(volumes, dtype=np.float64))
+    if volumes.shape == (N_ROWS, N_COLUMNS):
+        return volumes
+    if volumes.size != N_ROWS * N_COLUMNS:
+        raise ValueError("Volume map must have 96 wells or be an (8, 12) grid.")
+    # plate.wells() is column-major
+    return volumes.reshape(N_COLUMNS, N_ROWS).T
+
+
+class ChannelSchedule:
+    """
+    Split of one reagent pass between the 8-channel and single-channel pipettes.
+
+    Args:
+        multi (np.ndarray): One row per 8-channel motion with fields column,
+            start_row, n_rows and volume.
+        single (np.ndarray): One row per single-channel dispense with fields
+            well (index in plate.wells() order) and volume.
+        max_deviation (float): Largest change (µL) made to any well by quantizing
+            a segment to a single volume.
+    """
+
+    MULTI_DTYPE = np.dtype([("column", np.int64), ("start_row", np.int64),
+                            ("n_rows", np.int64), ("volume", np.float64)])
+    SINGLE_DTYPE = np.dtype([("well", np.int64), ("volume", np.float64)])
+
+    def __init__(self, multi: np.ndarray, single: np.ndarray, max_deviation: float):
+        self.multi = multi
+        self.single = single
+        self.max_deviation = float(max_deviation)
+
+    @property
+    def motions(self) -> int:
+        return int(self.multi.size + self.single.size)
+
+    @property
+    def baseline_motions(self) -> int:
+        """Dispense motions of the all-single-channel plan."""
+        return int(self.multi["n_rows"].sum() + self.single.size)
+
+    def pickups(self, policy: str = "per_pass") -> int:
+        """
+        Counts tip pick-up motions of the hybrid plan.
+
+        Args:
+            policy (str): "per_pass" (one pickup per pipette and nozzle layout,
+                as dispense_schedule does) or "per_well" (fresh tips for every motion).
+        """
+        if policy == "per_pass":
+            return int(np.unique(self.multi["n_rows"]).size) + int(self.single.size > 0)
+        if policy == "per_well":
+            return self.motions
+        raise ValueError(f"Unknown tip policy: {policy}")
+
+    def tips(self, policy: str = "per_pass") -> int:
+        """
+        Counts tips used by the hybrid plan: each 8-channel pickup takes one
+        tip per nozzle in its layout, each single-channel pickup one tip.
+
+        Args:
+            policy (str): As for pickups.
+        """
+        if policy == "per_pass":
+            return int(np.unique(self.multi["n_rows"]).sum()) + int(self.single.size > 0)
+        if policy == "per_well":
+            return int(self.multi["n_rows"].sum() + self.single.size)
+        raise ValueError(f"Unknown tip policy: {policy}")
+
+    def baseline_pickups(self, policy: str = "per_pass") -> int:
+        """Counts tip pick-ups of the all-single-channel plan."""
+        if policy == "per_pass":
+            return int(self.baseline_motions > 0)
+        if policy == "per_well":
+            return self.baseline_motions
+        raise ValueError(f"Unknown tip policy: {policy}")
+
+    def baseline_tips(self, policy: str = "per_pass") -> int:
+        """Counts tips used by the all-single-channel plan (one per pickup)."""
+        return self.baseline_pickups(policy)
+
+    def report(self) -> dict:
+        """
+        Returns motion, pickup and tip counts against the all-single-channel plan.
+
+        Only motions are given as a saving, since the hybrid plan never makes
+        more. Pickups and tips are given for both plans: per pass the hybrid
+        plan uses more of them (a pickup per nozzle layout, and 8 tips per
+        full-column pickup against 1).
+        """
+        return {
+            "multi_motions": int(self.multi.size),
+            "single_motions": int(self.single.size),
+            "motions_saved": self.baseline_motions - self.motions,
+            "pickups_per_pass": self.pickups("per_pass"),
+            "baseline_pickups_per_pass": self.baseline_pickups("per_pass"),
+            "pickups_per_well": self.pickups("per_well"),
+            "baseline_pickups_per_well": self.baseline_pickups("per_well"),
+            "tips_per_pass": self.tips("per_pass"),
+            "baseline_tips_per_pass": self.baseline_tips("per_pass"),
+            "tips_per_well": self.tips("per_well"),
+            "baseline_tips_per_well": self.baseline_tips("per_well"),
+            "max_deviation": self.max_deviation,
+        }
+
+    def __repr__(self) -> str:
+        return f"ChannelSchedule(multi={self.multi.size}, single={self.single.size})"
+
+
+def _segments(column: np.ndarray, tolerance: float, min_rows: int):
+    """
+    Splits a column into maximal runs of rows whose volumes agree within tolerance.
+    """
+    start = 0
+    while start < N_ROWS:
+        end = start + 1
+        lo = hi = column[start]
+        while end < N_ROWS:
+            lo, hi = min(lo, column[end]), max(hi, column[end])
+            if hi - lo > tolerance:
+                break
+            end += 1
+        if end - start >= min_rows:
+            yield start, end
+        start = end
+
+
+def schedule_channels(volumes, tolerance: float = 0.0, allow_partial: bool = False,
+                      min_partial_rows: int = 2, multi_min_volume: float = 20.0,
+                      multi_max_volume: float = 300.0) -> ChannelSchedule:
+    """
+    Finds the columns (or parts of columns) the 8-channel can dispense in one motion.
+
+    A segment qualifies when its volumes agree within tolerance and its
+    (quantized) volume is within the 8-channel's range; the segment is then
+    dispensed at its mean volume. Everything else goes to the single channel.
+
+    Args:
+        volumes (array-like): Volume map, see to_grid.
+        tolerance (float): Largest volume spread (µL) allowed inside a segment.
+        allow_partial (bool): Also use partial-column nozzle layouts (API 2.20+).
+        min_partial_rows (int): Smallest partial segment worth an 8-channel motion.
+        multi_min_volume (float): 8-channel min volume (p300 multi gen2).
+        multi_max_volume (float): 8-channel max volume per motion.
+
+    Returns:
+        ChannelSchedule: The split plan.
+    """
+    grid = to_grid(volumes)
+    min_rows = min_partial_rows if allow_partial else N_ROWS
+    multi, max_deviation = [], 0.0
+    covered = np.zeros_like(grid, dtype=bool)
+
+    for c in range(N_COLUMNS):
+        column = grid[:, c]
+        for start, end in _segments(column, tolerance, min_rows):
+            segment = column[start:end]
+            volume = float(segment.mean())
+            if segment.min() <= 0 or not multi_min_volume <= volume <= multi_max_volume:
+                continue
+            multi.append((c, start, end - start, volume))
+            covered[start:end, c] = True
+            max_deviation = max(max_deviation, float(np.abs(segment - volume).max()))
+
+    # Leftovers in plate.wells() order for the single channel
+    leftover = (~covered & (grid > 0)).T.ravel()
+    single = np.empty(int(leftover.sum()), dtype=ChannelSchedule.SINGLE_DTYPE)
+    single["well"] = np.flatnonzero(leftover)
+    single["volume"] = grid.T.ravel()[leftover]
+    return ChannelSchedule(np.array(multi, dtype=ChannelSchedule.MULTI_DTYPE), single,
+                           max_deviation)
+
+
+def quantize(volumes, step: float) -> np.ndarray:
+    """
+    Snaps volumes to a grid of step µL, so near-identical wells become identical.
+    """
+    volumes = np.asarray(volumes, dtype=np.float64)
+    return volumes if step <= 0 else np.round(volumes / step) * step
+
+
+def dispense_schedule(multi_pipette, single_pipette, source, plate,
+                      schedule: ChannelSchedule, disposal_volume: float = 0.0,
+                      partial_tip_rack=None):
+    """
+    Executes a ChannelSchedule, picking up and dropping tips once per layout.
+
+    Args:
+        multi_pipette: 8-channel InstrumentContext.
+        single_pipette: Single-channel InstrumentContext.
+        source: Reservoir well to aspirate from.
+        plate: The 96-well plate Labware.
+        schedule (ChannelSchedule): Output of schedule_channels.
+        disposal_volume (float): Disposal volume for the single-channel pass.
+        partial_tip_rack: Optional, tip rack reserved for partial-column pickups
+            (full-column tip tracking breaks if both share a rack). Without it
+            partial segments go to the single channel.
+    """
+    columns = plate.columns()
+    full_tip_racks = multi_pipette.tip_racks
+    volumes = np.zeros(N_ROWS * N_COLUMNS)
+    volumes[schedule.single["well"]] = schedule.single["volume"]
+
+    for n_rows in np.unique(schedule.multi["n_rows"])[::-1].tolist():
+        segments = schedule.multi[schedule.multi["n_rows"] == n_rows]
+        if n_rows < N_ROWS:
+            if partial_tip_rack is None:
+                for column, start, rows, volume in segments.tolist():
+                    volumes[column * N_ROWS + start:column * N_ROWS + start + rows] = volume
+                continue
+            from opentrons.protocol_api import PARTIAL_COLUMN
+            # The H nozzle leads, so it goes to the bottom row of the segment
+            multi_pipette.configure_nozzle_layout(style=PARTIAL_COLUMN, start="H1",
+                                                  end=f"{ROWS[N_ROWS - n_rows]}1",
+                                                  tip_racks=[partial_tip_rack])
+        multi_pipette.pick_up_tip()
+        for column, start, rows, volume in segments.tolist():
+            multi_pipette.aspirate(volume, source)
+            multi_pipette.dispense(volume, columns[column][start + rows - 1].top())
+        multi_pipette.drop_tip()
+        if n_rows < N_ROWS:
+            from opentrons.protocol_api import ALL
+            multi_pipette.configure_nozzle_layout(style=ALL, tip_racks=full_tip_racks)
+
+    if volumes.any():
+        plan = plan_multi_dispense(volumes, single_pipette.max_volume, disposal_volume)
+        single_pipette.pick_up_tip()
+        dispense_plan(single_pipette, source, [well.top() for well in plate.wells()], plan)
+        single_pipette.drop_tip()
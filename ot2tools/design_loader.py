@@ -0,0 +1,204 @@
+"""
+Cached loader for design sheets.
+
+Parsing LabData.xlsx with openpyxl is the slowest step of protocol analysis.
+The first load of a sheet stores its columns in a compact .npz file keyed by
+the SHA-256 of the workbook and the sheet name; later loads of the same
+workbook read the .npz instead. Editing the workbook changes its hash, so a
+stale cache can never be served, and the old entry is removed on the next
+load. CSV, Parquet and .npz designs are read directly.
+"""
+import datetime
+import hashlib
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+CACHE_DIR_NAME = ".design_cache"
+
+
+def file_hash(path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a file's contents.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_path(path: str, sheet_name, digest: str, cache_dir: str = None) -> str:
+    """
+    Returns the cache file for a workbook/sheet/content-hash combination.
+
+    The readable stem is sanitized, so "OT-2 Input" and "OT-2_Input" share
+    it; a hash of the exact sheet name (and whether it is a name or an
+    index) keeps their caches apart.
+    """
+    cache_dir = cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    return os.path.join(cache_dir, f"{_cache_stem(path, sheet_name)}-{digest[:16]}.npz")
+
+
+def _cache_stem(path: str, sheet_name) -> str:
+    stem = re.sub(r"[^\w.-]+", "_", f"{os.path.basename(path)}-{sheet_name}")
+    sheet_key = hashlib.sha256(repr(sheet_name).encode()).hexdigest()[:8]
+    return f"{stem}-{sheet_key}"
+
+
+def _prune_stale(path: str, sheet_name, cached: str):
+    """
+    Removes the caches of earlier versions of a workbook/sheet, in both the
+    current "<stem>-<sheet key>-<hash>.npz" format and the older
+    "<stem>-<hash>.npz" one (written before the sheet key was added).
+    """
+    stem, sheet_key = _cache_stem(path, sheet_name).rsplit("-", 1)
+    stale = re.compile(re.escape(stem) + rf"-(?:{sheet_key}-)?[0-9a-f]{{16}}\.npz")
+    cache_dir = os.path.dirname(cached)
+    for name in os.listdir(cache_dir):
+        if stale.fullmatch(name) and name != os.path.basename(cached):
+            os.remove(os.path.join(cache_dir, name))
+
+
+def _encode_objects(values) -> tuple:
+    """
+    Splits an object column into per-value type codes and text, so mixed
+    columns (numbers and labels, blanks, dates) load back as the same objects.
+
+    Raises:
+        ValueError: On a value of a type not listed in _DECODERS.
+    """
+    kinds, texts = [], []
+    for value in values:
+        if value is None:
+            kind, text = "n", ""
+        elif value is pd.NaT:
+            kind, text = "x", ""
+        elif isinstance(value, str):
+            kind, text = "s", value
+        elif isinstance(value, (bool, np.bool_)):
+            kind, text = "b", str(int(value))
+        elif isinstance(value, (int, np.integer)):
+            kind, text = "i", str(int(value))
+        elif isinstance(value, (float, np.floating)):
+            kind, text = "f", repr(float(value))
+        elif isinstance(value, pd.Timestamp):
+            kind, text = "T", value.isoformat()
+        elif isinstance(value, datetime.datetime):
+            kind, text = "d", value.isoformat()
+        elif isinstance(value, datetime.date):
+            kind, text = "D", value.isoformat()
+        elif isinstance(value, datetime.time):
+            kind, text = "t", value.isoformat()
+        else:
+            raise ValueError(f"Cannot store a {type(value).__name__} value without pickling.")
+        kinds.append(kind)
+        texts.append(text)
+    return np.array(kinds, dtype="<U1"), np.array(texts, dtype=str)
+
+
+_DECODERS = {
+    "n": lambda text: None, "x": lambda text: pd.NaT, "s": str, "b": lambda text: text == "1",
+    "i": int, "f": float, "T": pd.Timestamp, "d": datetime.datetime.fromisoformat,
+    "D": datetime.date.fromisoformat, "t": datetime.time.fromisoformat,
+}
+
+
+def _decode_objects(kinds, texts) -> np.ndarray:
+    values = np.empty(len(kinds), dtype=object)
+    values[:] = [_DECODERS[kind](text) for kind, text in zip(kinds.tolist(), texts.tolist())]
+    return values
+
+
+def save_columns(df: pd.DataFrame, path: str):
+    """
+    Writes a DataFrame's columns to an .npz without pickling.
+
+    Numeric, boolean and datetime columns keep their NumPy dtype; object
+    columns and the column labels are stored as type codes plus text, so
+    load_columns gives back the same values and dtypes.
+
+    Raises:
+        ValueError: If an object column holds a value that cannot be stored.
+    """
+    arrays = {}
+    arrays["__columns_kind__"], arrays["__columns__"] = _encode_objects(list(df.columns))
+    for i, column in enumerate(df.columns):
+        values = df.iloc[:, i].to_numpy()
+        if values.dtype == object:
+            arrays[f"k{i}"], arrays[f"c{i}"] = _encode_objects(values)
+        else:
+            arrays[f"c{i}"] = values
+    # Write then rename so a crash never leaves a half-written cache
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def load_columns(path: str) -> pd.DataFrame:
+    """
+    Reads a DataFrame written by save_columns (or by its earlier versions,
+    which stored object columns and labels as plain text).
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if "__columns_kind__" in data.files:
+            columns = list(_decode_objects(data["__columns_kind__"], data["__columns__"]))
+        else:
+            columns = data["__columns__"].tolist()
+        values = [_decode_objects(data[f"k{i}"], data[f"c{i}"]) if f"k{i}" in data.files
+                  else data[f"c{i}"] for i in range(len(columns))]
+    df = pd.DataFrame(dict(enumerate(values)))
+    df.columns = pd.Index(columns)
+    return df
+
+
+def load_design(path: str, sheet_name="OT-2 Input", cache_dir: str = None,
+                use_cache: bool = True) -> pd.DataFrame:
+    """
+    Loads a design table from Excel (cached), CSV, Parquet or .npz.
+
+    Args:
+        path (str): Path to the design file.
+        sheet_name: Excel sheet name or index (one sheet; None, which
+            pandas reads as "every sheet", is rejected). Ignored for other
+            formats.
+        cache_dir (str): Optional, where to keep Excel caches. Defaults to a
+            .design_cache folder next to the workbook.
+        use_cache (bool): Set False to always parse the workbook.
+
+    Returns:
+        pd.DataFrame: The design table.
+
+    Raises:
+        ValueError: If sheet_name is None for an Excel design.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        return pd.read_csv(path)
+    if extension == ".parquet":
+        return pd.read_parquet(path)
+    if extension == ".npz":
+        return load_columns(path)
+    if sheet_name is None:
+        raise ValueError("load_design reads a single sheet; pass its name or index, not None.")
+    if not use_cache:
+        return pd.read_excel(path, sheet_name=sheet_name)
+
+    digest = file_hash(path)
+    cached = cache_path(path, sheet_name, digest, cache_dir)
+    if os.path.exists(cached):
+        try:
+            return load_columns(cached)
+        except (OSError, KeyError, ValueError):
+            pass  # Unreadable cache, rebuild it below
+
+    df = pd.read_excel(path, sheet_name=sheet_name)
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok=True)
+        _prune_stale(path, sheet_name, cached)
+        save_columns(df, cached)
+    except (OSError, ValueError):
+        pass  # Read-only location or an uncacheable value: still return the parsed sheet
+    return df
@@ -0,0 +1,16 @@
+"""
+Naming of the precipitation flags files shared by plate_image and batch.
+
+plate_image writes ``<name>.flags.csv`` for the plate photo ``<name>.png``
+and batch reads it for the run log ``<name>.json``.
+"""
+import os
+
+FLAGS_SUFFIX = ".flags.csv"
+
+
+def flags_path(folder: str, name: str) -> str:
+    """
+    Path of the flags file for a run log or plate image named ``name``.
+    """
+    return os.path.join(folder, os.path.splitext(os.path.basename(name))[0] + FLAGS_SUFFIX)
@@ -0,0 +1,281 @@
+"""
+Flow-rate and gantry-speed calibration from the gravimetric error tests.
+
+1. ``sweep`` lays out trials over flow rates and gantry speeds for a pipette
+   and volumes, numbered into runs that fit one Checkit cartridge set or the
+   24 tubes of p1000_Error_Test.
+2. The protocols run one sweep run at a time (checkit's calibration_sweep /
+   calibration_run values, p1000_Error_Test's CALIBRATION_SWEEP /
+   CALIBRATION_RUN), each destination with its trial's settings.
+3. ``fit`` reads the measured volumes (µL, or mg of water), fits the
+   absolute % error of every pipette and volume as a linear function of flow
+   rate and speed, and keeps the fastest tested setting whose predicted
+   error plus a margin of residual SDs stays within --max-error.
+
+    python -m ot2tools.flow_calibration sweep p1000_single_gen2 --volumes 40 200 1000 \\
+        --flow-rates 137 274.7 500 --speeds 100 200 400 --per-run 24 --out sweep.csv
+    python -m ot2tools.flow_calibration fit sweep.csv measured.csv --max-error 1 \\
+        --out ErrorTests/flow_settings.csv
+
+The protocols upload to the robot as single files, so they carry their own
+csv reader and the same settings_for lookup instead of importing this
+module. Copy the fitted table to the robot's Jupyter folder
+(/var/lib/jupyter/notebooks/flow_settings.csv, their FLOW_SETTINGS /
+flow_settings path); without it they keep their own rates.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ot2tools import REPO_ROOT
+
+SETTINGS_PATH = os.path.join(REPO_ROOT, "ErrorTests", "flow_settings.csv")
+# mg per µL of water at room temperature, as p1000_Error_Test assumes
+WATER_DENSITY = 1.0
+# Rough gantry travel (mm) per transfer, to rank speed against flow rate
+TRAVEL_MM = 300.0
+SPEED_AXES = ("X", "Y", "Z", "A")
+
+
+def sweep_grid(pipette: str, volumes, flow_rates, speeds, repeats: int = 1, per_run: int = 24,
+               seed: int = 0) -> pd.DataFrame:
+    """
+    Every flow rate x speed combination for each volume, in runs of per_run trials.
+
+    Trials are shuffled within each volume so drift over a run does not line
+    up with one setting, and a run never mixes volumes (a Checkit cartridge
+    holds one volume).
+
+    Returns:
+        pd.DataFrame: Trial, Run, Pipette, Volume (µL), Flow Rate (µL/s), Speed (mm/s).
+    """
+    rng = np.random.default_rng(seed)
+    frames, run = [], 0
+    for volume in volumes:
+        flow, speed = np.meshgrid(np.asarray(flow_rates, float), np.asarray(speeds, float))
+        flow, speed = np.repeat(flow.ravel(), repeats), np.repeat(speed.ravel(), repeats)
+        order = rng.permutation(flow.size)
+        frames.append(pd.DataFrame({"Run": run + 1 + np.arange(flow.size) // per_run,
+                                    "Pipette": pipette, "Volume (µL)": float(volume),
+                                    "Flow Rate (µL/s)": flow[order], "Speed (mm/s)": speed[order]}))
+        run = int(frames[-1]["Run"].max())
+    sweep = pd.concat(frames, ignore_index=True)
+    sweep.insert(0, "Trial", np.arange(1, len(sweep) + 1))
+    return sweep
+
+
+def run_trials(sweep, pipette: str, run: int, volume: float = None) -> pd.DataFrame:
+    """
+    The trials of one sweep run, in the order they are dispensed.
+
+    Args:
+        sweep: Sweep DataFrame, or the path of its CSV.
+        pipette (str): Pipette name.
+        run (int): Run number.
+        volume (float): Optional, only trials of this volume.
+
+    Raises:
+        ValueError: If the sweep has no such run for the pipette (and volume).
+    """
+    if isinstance(sweep, str):
+        sweep = pd.read_csv(sweep)
+    trials = sweep[(sweep["Pipette"] == pipette) & (sweep["Run"] == int(run))]
+    if volume is not None:
+        trials = trials[np.isclose(trials["Volume (µL)"], volume)]
+    if not len(trials):
+        raise ValueError(f"Sweep has no run {run} for {pipette}"
+                         + (f" at {volume:g} µL." if volume is not None else "."))
+    return trials.reset_index(drop=True)
+
+
+def read_measurements(sweep: pd.DataFrame, path: str) -> pd.DataFrame:
+    """
+    Joins measured volumes onto the sweep.
+
+    The measurements file has a Trial column and either "Measured (µL)" or
+    "Mass (mg)" (converted with WATER_DENSITY). Trials without a
+    measurement are dropped.
+
+    Returns:
+        pd.DataFrame: The sweep rows with Measured (µL) and % Error.
+    """
+    measured = pd.read_csv(path)
+    measured.columns = [c.strip() for c in measured.columns]
+    if "Measured (µL)" not in measured.columns:
+        if "Mass (mg)" not in measured.columns:
+            raise KeyError(f"{path} needs a 'Measured (µL)' or 'Mass (mg)' column.")
+        measured["Measured (µL)"] = measured["Mass (mg)"] / WATER_DENSITY
+    data = sweep.merge(measured[["Trial", "Measured (µL)"]], on="Trial", how="inner")
+    data["% Error"] = (data["Measured (µL)"] - data["Volume (µL)"]) / data["Volume (µL)"] * 100
+    return data
+
+
+def fit_error_model(data: pd.DataFrame, margin: float = 2.0) -> pd.DataFrame:
+    """
+    Predicted |% error| of every tested setting, per pipette and volume.
+
+    Each pipette/volume gets |% error| = b0 + b1 * flow + b2 * speed by
+    least squares. The Bound adds margin residual SDs, so a setting is
+    judged on its spread as well as its bias. With fewer than four trials
+    the observed mean and SD per setting are used instead.
+
+    Returns:
+        pd.DataFrame: Pipette, Volume (µL), Flow Rate (µL/s), Speed (mm/s),
+        Trials, Observed % Error (mean |error|), Predicted % Error and Bound.
+    """
+    data = data.assign(**{"|% Error|": data["% Error"].abs()})
+    keys = ["Pipette", "Volume (µL)"]
+    settings = ["Flow Rate (µL/s)", "Speed (mm/s)"]
+    rows = []
+    for _, group in data.groupby(keys, sort=True):
+        per_setting = group.groupby(keys + settings, as_index=False).agg(
+            **{"Trials": ("|% Error|", "size"), "Observed % Error": ("|% Error|", "mean"),
+               "SD": ("% Error", "std")})
+        X = np.column_stack([np.ones(len(group)), group[settings].to_numpy(float)])
+        y = group["|% Error|"].to_numpy(float)
+        if len(group) >= 4 and np.linalg.matrix_rank(X) == X.shape[1]:
+            coef, *_ = np.linalg.lstsq(X, y, rcond=None)
+            sd = np.sqrt(np.sum((y - X @ coef) ** 2) / (len(y) - X.shape[1]))
+            grid = np.column_stack([np.ones(len(per_setting)), per_setting[settings].to_numpy(float)])
+            predicted = np.maximum(grid @ coef, 0.0)
+            bound = predicted + margin * sd
+        else:
+            predicted = per_setting["Observed % Error"].to_numpy()
+            bound = predicted + margin * per_setting["SD"].fillna(0).to_numpy()
+        rows.append(per_setting.drop(columns="SD").assign(
+            **{"Predicted % Error": predicted, "Bound": bound}))
+    return pd.concat(rows, ignore_index=True)
+
+
+def best_settings(model: pd.DataFrame, max_error: float = 1.0, travel_mm: float = TRAVEL_MM) -> pd.DataFrame:
+    """
+    The fastest setting per pipette and volume whose Bound is within max_error.
+
+    Speed is ranked by the time to aspirate and dispense the volume plus
+    travel_mm of gantry travel. Pipette/volumes with no setting inside the
+    limit are left out, so protocols keep their own rates for them.
+
+    Returns:
+        pd.DataFrame: The settings table for load_settings.
+    """
+    ok = model[model["Bound"] <= max_error].copy()
+    ok["Seconds"] = (2 * ok["Volume (µL)"] / ok["Flow Rate (µL/s)"] + travel_mm / ok["Speed (mm/s)"])
+    best = ok.sort_values("Seconds").groupby(["Pipette", "Volume (µL)"], sort=True).head(1)
+    return best.sort_values(["Pipette", "Volume (µL)"]).reset_index(drop=True)
+
+
+def load_settings(path: str = SETTINGS_PATH) -> pd.DataFrame:
+    """
+    Reads the settings table; empty if none has been calibrated yet.
+    """
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=["Pipette", "Volume (µL)", "Flow Rate (µL/s)", "Speed (mm/s)"])
+    return pd.read_csv(path)
+
+
+def settings_for(settings: pd.DataFrame, pipette: str, volume: float):
+    """
+    The calibrated setting for a volume.
+
+    A calibrated volume gets its own row. Between two calibrated volumes the
+    flow rate and speed are interpolated on a log volume scale; outside the
+    calibrated range nothing was tested, so there is no setting.
+
+    Returns:
+        pd.Series: The row (Volume (µL) set to volume), or None if the
+        pipette has no calibration covering the volume.
+    """
+    rows = settings[settings["Pipette"] == pipette].sort_values("Volume (µL)")
+    volumes = rows["Volume (µL)"].to_numpy(float)
+    volume = float(volume)
+    exact = np.flatnonzero(np.isclose(volumes, volume))
+    if len(exact):
+        return rows.iloc[exact[0]]
+    if not len(rows) or not volumes[0] < volume < volumes[-1]:
+        return None
+    i = int(np.searchsorted(volumes, volume))
+    weight = np.log(volume / volumes[i - 1]) / np.log(volumes[i] / volumes[i - 1])
+    row = rows.iloc[i - 1].copy()
+    for column in ("Flow Rate (µL/s)", "Speed (mm/s)"):
+        low, high = float(rows[column].iloc[i - 1]), float(rows[column].iloc[i])
+        row[column] = low + weight * (high - low)
+    row["Volume (µL)"] = volume
+    return row
+
+
+def apply_settings(ctx, pipette, settings) -> str:
+    """
+    Sets the aspirate/dispense flow rate and the gantry speed.
+
+    Protocols below API 2.14 (checkit) cap every axis with ctx.max_speeds,
+    as checkit does by hand; later ones, where max_speeds was removed, set
+    the pipette's default_speed.
+
+    Args:
+        ctx: The ProtocolContext.
+        pipette: The InstrumentContext.
+        settings: A settings or sweep row with Flow Rate (µL/s) and Speed (mm/s).
+
+    Returns:
+        str: A description for ctx.comment.
+    """
+    flow, speed = float(settings["Flow Rate (µL/s)"]), float(settings["Speed (mm/s)"])
+    pipette.flow_rate.aspirate = flow
+    pipette.flow_rate.dispense = flow
+    if tuple(ctx.api_version) < (2, 14):
+        for axis in SPEED_AXES:
+            ctx.max_speeds[axis] = speed
+    else:
+        pipette.default_speed = speed
+    return f"Flow rate {flow:g} µL/s, speed {speed:g} mm/s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sweep = commands.add_parser("sweep", help="write a sweep of trials")
+    sweep.add_argument("pipette", help="pipette name, e.g. p1000_single_gen2")
+    sweep.add_argument("--volumes", type=float, nargs="+", required=True)
+    sweep.add_argument("--flow-rates", type=float, nargs="+", required=True)
+    sweep.add_argument("--speeds", type=float, nargs="+", required=True)
+    sweep.add_argument("--repeats", type=int, default=1)
+    sweep.add_argument("--per-run", type=int, default=24,
+                       help="destinations per protocol run (24 tubes, 8 Checkit wells)")
+    sweep.add_argument("--seed", type=int, default=0)
+    sweep.add_argument("--out", default="sweep.csv")
+
+    fit = commands.add_parser("fit", help="fit the error model and write the settings table")
+    fit.add_argument("sweep", help="sweep CSV from the sweep command")
+    fit.add_argument("measurements", nargs="+", help="CSV(s) with Trial and Measured (µL) or Mass (mg)")
+    fit.add_argument("--max-error", type=float, default=1.0, help="allowed |%% error|")
+    fit.add_argument("--margin", type=float, default=2.0, help="residual SDs added to the prediction")
+    fit.add_argument("--out", default=SETTINGS_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "sweep":
+        table = sweep_grid(args.pipette, args.volumes, args.flow_rates, args.speeds, args.repeats,
+                           args.per_run, args.seed)
+        table.to_csv(args.out, index=False)
+        print(f"Wrote {len(table)} trials in {table['Run'].max()} run(s) to {args.out}")
+        return 0
+
+    trials = pd.read_csv(args.sweep)
+    data = pd.concat([read_measurements(trials, path) for path in args.measurements], ignore_index=True)
+    model = fit_error_model(data, args.margin)
+    table = best_settings(model, args.max_error)
+    print(model.to_string(index=False))
+    missing = model[["Pipette", "Volume (µL)"]].drop_duplicates().merge(
+        table[["Pipette", "Volume (µL)"]], how="left", indicator=True).query("_merge == 'left_only'")
+    for _, row in missing.iterrows():
+        print(f"No setting within {args.max_error:g}% for {row['Pipette']} at {row['Volume (µL)']:g} µL")
+    table.to_csv(args.out, index=False)
+    print(f"Wrote {len(table)} setting(s) to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""
+Batched Ksp boundary fitting with bootstrap confidence intervals.
+
+The notebook fits y = a / x to the precipitated wells with curve_fit. That
+model is linear in a, so its least-squares solution has a closed form,
+
+    a = sum(y / x) / sum(1 / x**2)
+
+which is what curve_fit converges to. Here every fit works on padded
+(runs, wells) arrays, so any number of runs is fitted in one pass:
+
+- "lsq": the notebook's fit, in closed form.
+- "log": least squares on log y = log a - log x, i.e. the geometric mean of
+  x * y over the precipitated wells.
+- "boundary": uses the 'y' and the 'n' wells. a is the x * y level that
+  misclassifies the fewest wells, placed midway (in log space) between the
+  neighbouring wells on either side. Runs need both kinds of well.
+- "logistic": also uses both kinds of well, modelling P('y') as a logistic
+  function of log(x * y); a is where P('y') = 1/2. Smooth in the data, so
+  its interval keeps shrinking as wells are added near the boundary.
+
+Bootstrap resamples are drawn as one array of per-well counts, and each
+replicate is then a weighted version of the same sums. No fit is repeated
+per resample. "lsq", "log" and "boundary" are one pass over the counts;
+"logistic" still needs a few Newton steps per replicate, so it starts each
+replicate from its run's own fit and is the slowest (1,000 runs of 96 wells
+with 1,000 resamples: about 2 s for lsq, 7 s for boundary, 12 s for
+logistic on one core).
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+METHODS = ("lsq", "log", "boundary", "logistic")
+# Ridge on the logistic slope, keeping perfectly separated runs finite
+LOGISTIC_RIDGE = 1e-2
+LOGISTIC_ITERATIONS = 30
+# Replicates per block of logistic Newton steps, small enough to stay in cache
+BLOCK = 1024
+
+
+def pad_runs(runs) -> tuple:
+    """
+    Stacks runs of different lengths into padded arrays.
+
+    Args:
+        runs: Iterable of (cu_fraction, gly_fraction, flags) per run, with
+            flags 'y'/'n' (anything else is ignored).
+
+    Returns:
+        tuple: x, y (float), precipitated, mask (bool), each (runs, max wells).
+    """
+    runs = [tuple(np.asarray(a) for a in run) for run in runs]
+    width = max((len(run[0]) for run in runs), default=0)
+    x = np.ones((len(runs), width))
+    y = np.ones((len(runs), width))
+    precipitated = np.zeros((len(runs), width), dtype=bool)
+    mask = np.zeros((len(runs), width), dtype=bool)
+    for i, (cu, gly, flags) in enumerate(runs):
+        n = len(cu)
+        x[i, :n] = cu
+        y[i, :n] = gly
+        precipitated[i, :n] = flags == "y"
+        mask[i, :n] = (flags == "y") | (flags == "n")
+    return x, y, precipitated, mask
+
+
+def used_wells(x, y, precipitated, mask, method: str = "lsq") -> np.ndarray:
+    """
+    Wells a method fits to. Wells with a zero fraction have no finite a / x
+    (or log) and are left out.
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {METHODS}.")
+    used = mask & (x > 0)
+    if method != "lsq":
+        used &= y > 0
+    if method in ("lsq", "log"):
+        used &= precipitated
+    return used
+
+
+def _weighted_sum(weights, values):
+    return np.einsum("...n,...n->...", weights, np.broadcast_to(values, weights.shape))
+
+
+def _fit_lsq(x, y, weights):
+    sxy = _weighted_sum(weights, y / x)
+    sxx = _weighted_sum(weights, 1 / x ** 2)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(sxx > 0, sxy / sxx, np.nan)
+
+
+def _fit_log(x, y, weights):
+    total = weights.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.exp(_weighted_sum(weights, np.log(x * y)) / total)
+
+
+def _fit_boundary(log_product, precipitated, weights):
+    """
+    log_product and precipitated are sorted by log_product along the last axis.
+    """
+    log_product = np.broadcast_to(log_product, weights.shape)
+    precipitated = np.broadcast_to(precipitated, weights.shape)
+    n = log_product.shape[-1]
+    zeros = np.zeros(weights.shape[:-1] + (1,))
+    wrong_below = np.concatenate([zeros, np.cumsum(weights * precipitated, axis=-1)], axis=-1)
+    not_below = np.concatenate([zeros, np.cumsum(weights * ~precipitated, axis=-1)], axis=-1)
+    # Errors for a cut before sorted well k: 'y' wells below it + 'n' wells above it
+    errors = wrong_below + (not_below[..., -1:] - not_below)
+    cut = np.argmin(errors, axis=-1)[..., None]
+
+    # The first best cut sits just after a weighted well; the boundary goes
+    # midway to the next weighted well above it
+    position = np.where(weights > 0, np.arange(n), n)
+    next_weighted = np.minimum.accumulate(position[..., ::-1], axis=-1)[..., ::-1]
+    next_weighted = np.concatenate([next_weighted, np.full(zeros.shape, n)], axis=-1)
+    upper_index = np.take_along_axis(next_weighted, cut, axis=-1)
+    padded = np.concatenate([log_product, np.full(zeros.shape, np.nan)], axis=-1)
+    lower = np.take_along_axis(padded, np.maximum(cut - 1, 0), axis=-1)
+    upper = np.take_along_axis(padded, np.minimum(upper_index, n), axis=-1)
+    lower = np.where(cut == 0, upper, lower)
+    upper = np.where(upper_index >= n, lower, upper)
+    with np.errstate(invalid="ignore"):
+        result = np.exp((lower + upper) / 2)[..., 0]
+    # Without both 'y' and 'n' wells the boundary is only bounded on one side
+    return np.where((wrong_below[..., -1] > 0) & (not_below[..., -1] > 0), result, np.nan)
+
+
+def _compact(x, y, precipitated, used):
+    """
+    Moves each run's used wells to the front, sorted by x * y.
+
+    Returns:
+        tuple: x, y, log x*y, precipitated (sorted) and the used count per run.
+    """
+    with np.errstate(divide="ignore"):
+        log_product = np.where(used, np.log(np.where(used, x * y, 1.0)), np.inf)
+    order = np.argsort(log_product, axis=-1, kind="stable")
+    take = lambda a: np.take_along_axis(a, order, axis=-1)
+    counts = used.sum(axis=-1)
+    valid = np.arange(x.shape[-1]) < counts[..., None]
+    x, y = np.where(valid, take(x), 1.0), np.where(valid, take(y), 1.0)
+    return x, y, np.where(valid, take(log_product), 0.0), take(precipitated), counts
+
+
+def _rowsum(a, b):
+    return np.einsum("ij,ij->i", a, b)
+
+
+def _newton(t, weights, y_sum, yt_sum, b0, b1):
+    """
+    Logistic Newton iterations over rows of (wells,) arrays. Each row stops
+    once its step is below tolerance, so late iterations only touch the
+    slow rows.
+
+    Returns:
+        tuple: b0, b1 and whether each row converged.
+    """
+    b0, b1 = b0.copy(), b1.copy()
+    converged = np.zeros(len(t), dtype=bool)
+    rows = np.arange(len(t))
+    tt = t * t
+    c0, c1 = b0, b1
+    for _ in range(LOGISTIC_ITERATIONS):
+        if not len(rows):
+            break
+        p = c0[:, None] + c1[:, None] * t
+        np.negative(p, out=p)
+        with np.errstate(over="ignore"):
+            np.exp(p, out=p)
+        p += 1
+        np.reciprocal(p, out=p)
+        wp = weights * p
+        g0 = y_sum - wp.sum(axis=-1)
+        g1 = yt_sum - _rowsum(wp, t) - LOGISTIC_RIDGE * c1
+        curvature = wp - wp * p
+        h00 = curvature.sum(axis=-1) + 1e-9
+        h01 = _rowsum(curvature, t)
+        h11 = _rowsum(curvature, tt) + LOGISTIC_RIDGE
+        det = h00 * h11 - h01 ** 2
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            step0, step1 = (h11 * g0 - h01 * g1) / det, (h00 * g1 - h01 * g0) / det
+        c0, c1 = c0 + step0, c1 + step1
+        # A start far out on the flat of the sigmoid runs off in b0 alone
+        small = (np.abs(step0) < 1e-8) & (np.abs(step1) < 1e-8)
+        done = small | ~np.isfinite(step0 + step1)
+        if done.any():
+            b0[rows[done]], b1[rows[done]] = c0[done], c1[done]
+            converged[rows[small]] = True
+            rows, t, tt, weights, y_sum, yt_sum, c0, c1 = (
+                a[~done] for a in (rows, t, tt, weights, y_sum, yt_sum, c0, c1))
+    b0[rows], b1[rows] = c0, c1
+    return b0, b1, converged
+
+
+def _logistic_coefficients(log_product, precipitated, weights, start=None):
+    """
+    Ridge-penalised logistic fit for every run and replicate at once;
+    P('y') = sigmoid(b0 + b1 * (t - centre)), t = log x*y.
+
+    Args:
+        start (tuple): Optional (centre, b0, b1) per run to start every
+            replicate of that run from, e.g. the fit to the run's own wells.
+            Replicates that do not converge from there are refitted from zero.
+
+    Returns:
+        tuple: centre, b0, b1 and whether the row has both kinds of well.
+    """
+    shape = weights.shape
+    total = weights.sum(axis=-1)
+    target = np.broadcast_to(precipitated, shape)
+    y_weight = _weighted_sum(weights, target)
+    fits = (y_weight > 0) & (y_weight < total)
+    if start is None:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            centre = _weighted_sum(weights, log_product) / total
+        b0, b1 = np.zeros(total.shape), np.zeros(total.shape)
+    else:
+        centre = start[0][..., None]
+        b0, b1 = (np.broadcast_to(a[..., None], total.shape) for a in start[1:])
+    b0, b1 = np.nan_to_num(b0), np.nan_to_num(b1)
+    t = np.broadcast_to(log_product - np.nan_to_num(centre)[..., None], shape)
+
+    # Only rows with both kinds of well have a boundary to fit; rows are
+    # taken BLOCK at a time so each Newton step stays in cache
+    rows = np.flatnonzero(fits)
+    for block in range(0, len(rows), BLOCK):
+        index = np.unravel_index(rows[block:block + BLOCK], total.shape)
+        block_t, block_weights = t[index], weights[index]
+        y_sum = y_weight[index]
+        yt_sum = _rowsum(block_weights * target[index], block_t)
+        b0[index], b1[index], converged = _newton(block_t, block_weights, y_sum, yt_sum,
+                                                  b0[index], b1[index])
+        if not converged.all() and start is not None:
+            again = tuple(i[~converged] for i in index)
+            zeros = np.zeros(len(again[0]))
+            b0[again], b1[again], _ = _newton(block_t[~converged], block_weights[~converged],
+                                              y_sum[~converged], yt_sum[~converged], zeros, zeros)
+    return centre, b0, b1, fits
+
+
+def _fit_logistic(log_product, precipitated, weights, start=None):
+    centre, b0, b1, fits = _logistic_coefficients(log_product, precipitated, weights, start)
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        result = np.exp(centre - b0 / b1)
+    return np.where((b1 > 0) & fits, result, np.nan)
+
+
+def _fit_compact(method, x, y, log_product, precipitated, weights, start=None):
+    if method == "lsq":
+        return _fit_lsq(x, y, weights)
+    if method == "log":
+        return _fit_log(x, y, weights)
+    if method == "logistic":
+        return _fit_logistic(log_product, precipitated, weights, start)
+    return _fit_boundary(log_product, precipitated, weights)
+
+
+def fit(x, y, precipitated, mask=None, method: str = "lsq") -> np.ndarray:
+    """
+    Fits a for every run (row) at once.
+
+    Args:
+        x, y (np.ndarray): Cu and Glycine fractions, shape (runs, wells) or (wells,).
+        precipitated (np.ndarray): True for 'y' wells.
+        mask (np.ndarray): Optional, False for padding and unflagged wells.
+        method (str): One of METHODS.
+
+    Returns:
+        np.ndarray: a per run (NaN where a run has nothing to fit).
+    """
+    x, y = np.atleast_2d(np.asarray(x, dtype=float)), np.atleast_2d(np.asarray(y, dtype=float))
+    precipitated = np.atleast_2d(np.asarray(precipitated, dtype=bool))
+    mask = np.ones(x.shape, dtype=bool) if mask is None else np.atleast_2d(mask)
+    used = used_wells(x, y, precipitated, mask, method)
+    x, y, log_product, precipitated, counts = _compact(x, y, precipitated, used)
+    weights = (np.arange(x.shape[-1]) < counts[:, None]).astype(float)
+    return _fit_compact(method, x, y, log_product, precipitated, weights)
+
+
+def bootstrap(x, y, precipitated, mask=None, method: str = "lsq", n_boot: int = 1000,
+              ci: float = 0.95, seed: int = 0, max_elements: int = 1 << 25) -> tuple:
+    """
+    Percentile bootstrap confidence intervals for fit(), for every run at once.
+
+    Each replicate resamples, with replacement, the wells the method fits to
+    within each run. Runs are processed in chunks of at most max_elements
+    resample counts to bound memory.
+
+    Returns:
+        tuple: (estimate, low, high) arrays, one value per run.
+    """
+    x, y = np.atleast_2d(np.asarray(x, dtype=float)), np.atleast_2d(np.asarray(y, dtype=float))
+    precipitated = np.atleast_2d(np.asarray(precipitated, dtype=bool))
+    mask = np.ones(x.shape, dtype=bool) if mask is None else np.atleast_2d(mask)
+    used = used_wells(x, y, precipitated, mask, method)
+    x, y, log_product, precipitated, counts = _compact(x, y, precipitated, used)
+    width = max(int(counts.max(initial=0)), 1)
+    x, y, log_product, precipitated = (a[:, :width] for a in (x, y, log_product, precipitated))
+
+    weights = (np.arange(width) < counts[:, None]).astype(float)
+    estimate = _fit_compact(method, x, y, log_product, precipitated, weights)
+    # Logistic replicates start from their run's own fit, a few Newton steps away
+    coefficients = None
+    if method == "logistic":
+        coefficients = _logistic_coefficients(log_product, precipitated, weights)[:3]
+    low = np.full(len(x), np.nan)
+    high = np.full(len(x), np.nan)
+    rng = np.random.default_rng(seed)
+    step = max(1, max_elements // (n_boot * width))
+    alpha = (1 - ci) / 2 * 100
+
+    for start in range(0, len(x), step):
+        part = slice(start, start + step)
+        n_runs = len(x[part])
+        n = counts[part][:, None, None]
+        # Draw n wells per run and replicate; draws past a run's count go to a spare bin
+        draws = rng.random((n_runs, n_boot, width), dtype=np.float32)
+        draws *= n.astype(np.float32)
+        draws = draws.astype(np.intp)
+        if (n < width).any():
+            draws = np.where(np.arange(width) < n, draws, width)
+        draws += (np.arange(n_runs * n_boot) * (width + 1)).reshape(n_runs, n_boot, 1)
+        resampled = np.bincount(draws.ravel(), minlength=n_runs * n_boot * (width + 1))
+        resampled = resampled.reshape(n_runs, n_boot, width + 1)[..., :width].astype(float)
+
+        replicates = _fit_compact(method, x[part, None], y[part, None], log_product[part, None],
+                                  precipitated[part, None], resampled,
+                                  coefficients and tuple(a[part] for a in coefficients))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # Runs with nothing to fit
+            percentile = np.percentile if np.isfinite(replicates).all() else np.nanpercentile
+            low[part], high[part] = percentile(replicates, [alpha, 100 - alpha], axis=-1)
+    return estimate, low, high
+
+
+def fit_runs(df: pd.DataFrame, method: str = "lsq", n_boot: int = 0, ci: float = 0.95,
+             by: str = "Run", seed: int = 0) -> pd.DataFrame:
+    """
+    Fits every run in a per-well table such as the batch output.
+
+    Args:
+        df (pd.DataFrame): 'Cu Fraction', 'Gly Fraction' and 'Flag' columns,
+            plus the `by` column when it holds several runs.
+        method (str): One of METHODS.
+        n_boot (int): Bootstrap replicates; 0 skips the confidence interval.
+        ci (float): Confidence level of the interval.
+        by (str): Column naming the run.
+        seed (int): Random seed for the bootstrap.
+
+    Returns:
+        pd.DataFrame: One row per run with 'Ksp', 'Points' (wells fitted) and,
+        with n_boot, 'Ksp Low'/'Ksp High'.
+    """
+    groups = list(df.groupby(by, sort=False)) if by in df.columns else [(None, df)]
+    x, y, precipitated, mask = pad_runs(
+        (g["Cu Fraction"].to_numpy(), g["Gly Fraction"].to_numpy(), g["Flag"].to_numpy())
+        for _, g in groups)
+    result = pd.DataFrame({by: [name for name, _ in groups]})
+    result["Points"] = used_wells(x, y, precipitated, mask, method).sum(axis=-1)
+    if n_boot:
+        result["Ksp"], result["Ksp Low"], result["Ksp High"] = bootstrap(
+            x, y, precipitated, mask, method, n_boot, ci, seed)
+    else:
+        result["Ksp"] = fit(x, y, precipitated, mask, method)
+    return result
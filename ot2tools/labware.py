@@ -0,0 +1,430 @@
+"""
+Labware definitions and well geometry.
+
+Every definition is loaded once into a LabwareGeometry: NumPy arrays of the
+well centres, depths, volumes and sizes in plate.wells() order, with O(1)
+lookup of a well by name and vectorized lookup of lists of wells.
+Definitions are deduplicated by a hash of the file contents, so the Checkit
+plates kept under both ErrorTests folders are one entry.
+
+The registry can be compiled to an .npz cache that is checked against the
+size and modification time of each source file, so later start-ups read
+arrays instead of parsing JSON or importing opentrons_shared_data. Nothing
+is written unless asked for, with use_cache() (.labware_cache at the
+repository root by default) or a LabwareRegistry cache_dir:
+
+    plate = get_geometry("nest_96_wellplate_100ul_pcr_full_skirt")
+    plate.coordinates(2, ["A1", "H12"])      # (2, 3) well tops in slot 2
+    registry().duplicates()                  # identical definitions kept twice
+"""
+import functools
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from ot2tools import REPO_ROOT
+
+CACHE_DIR_NAME = ".labware_cache"
+CACHE_NAME = "registry.npz"
+DEFAULT_CACHE_DIR = os.path.join(REPO_ROOT, CACHE_DIR_NAME)
+# Protocol folders sit at most this many levels below the root
+CUSTOM_LABWARE_DEPTH = 2
+
+# Front-left corner of each OT-2 deck slot (mm, deck coordinates)
+SLOT_ORIGINS = {
+    1: (0.0, 0.0), 2: (132.5, 0.0), 3: (265.0, 0.0),
+    4: (0.0, 90.5), 5: (132.5, 90.5), 6: (265.0, 90.5),
+    7: (0.0, 181.0), 8: (132.5, 181.0), 9: (265.0, 181.0),
+    10: (0.0, 271.5), 11: (132.5, 271.5), 12: (265.0, 271.5),
+}
+# Per-labware and per-well fields of a LabwareGeometry, as stored in the cache
+_LABWARE_FIELDS = ("load_name", "namespace", "version", "display_name", "is_tiprack", "height",
+                   "offset", "digest", "source")
+_WELL_FIELDS = ("names", "centres", "depths", "volumes", "diameters", "x_dims", "y_dims")
+
+
+def _custom_files(root: str) -> list:
+    # Definition files in custom_labware folders up to CUSTOM_LABWARE_DEPTH
+    # below the root; only those levels are listed, not the whole tree
+    found = []
+    for depth in range(CUSTOM_LABWARE_DEPTH + 1):
+        pattern = os.path.join(glob.escape(root), *["*"] * depth, "custom_labware", "*.json")
+        found += sorted(glob.glob(pattern))
+    return found
+
+
+def find_custom_definitions(root: str = REPO_ROOT) -> dict:
+    """
+    Finds the custom labware definitions kept in the repository.
+
+    Args:
+        root (str): Directory to search, defaults to the repository root.
+
+    Returns:
+        dict: Maps each loadName to the path of its definition file.
+    """
+    found = {}
+    for path in _custom_files(root):
+        with open(path, "r", encoding="utf-8") as file:
+            found.setdefault(json.load(file)["parameters"]["loadName"], path)
+    return found
+
+
+class LabwareGeometry:
+    """
+    Well geometry of one labware definition as arrays in plate.wells() order.
+
+    Build with from_definition or from_file; the registry's get() returns
+    shared instances.
+
+    Attributes:
+        names (np.ndarray): Well names.
+        centres (np.ndarray): (n, 3) centre of each well bottom relative to
+            the labware's corner (before cornerOffsetFromSlot).
+        depths, volumes (np.ndarray): Depth (mm) and capacity (µL) per well.
+        diameters (np.ndarray): Diameter (mm) of circular wells, NaN otherwise.
+        x_dims, y_dims (np.ndarray): Size (mm) of rectangular wells, NaN otherwise.
+        column_sizes (np.ndarray): Wells per column of the definition's ordering.
+        offset (np.ndarray): cornerOffsetFromSlot.
+    """
+
+    def __init__(self, load_name: str, namespace: str, version: int, display_name: str,
+                 is_tiprack: bool, height: float, offset, names, centres, depths, volumes, diameters,
+                 x_dims, y_dims, column_sizes, digest: str = "", source: str = ""):
+        self.load_name = str(load_name)
+        self.namespace = str(namespace)
+        self.version = int(version)
+        self.display_name = str(display_name)
+        self.is_tiprack = bool(is_tiprack)
+        self.height = float(height)
+        self.offset = np.asarray(offset, dtype=np.float64)
+        self.names = np.asarray(names, dtype=str)
+        self.centres = np.asarray(centres, dtype=np.float64).reshape(-1, 3)
+        self.depths = np.asarray(depths, dtype=np.float64)
+        self.volumes = np.asarray(volumes, dtype=np.float64)
+        self.diameters = np.asarray(diameters, dtype=np.float64)
+        self.x_dims = np.asarray(x_dims, dtype=np.float64)
+        self.y_dims = np.asarray(y_dims, dtype=np.float64)
+        self.column_sizes = np.asarray(column_sizes, dtype=np.int64)
+        self.digest = str(digest)
+        self.source = str(source)
+        self.index = {name: i for i, name in enumerate(self.names.tolist())}
+        self._sorted = np.argsort(self.names)
+
+    @classmethod
+    def from_definition(cls, definition: dict, digest: str = "", source: str = "") -> "LabwareGeometry":
+        parameters, wells = definition["parameters"], definition["wells"]
+        names = well_names(definition)
+        nan = float("nan")
+        return cls(parameters["loadName"], definition.get("namespace", ""), definition.get("version", 1),
+                   definition.get("metadata", {}).get("displayName", parameters["loadName"]),
+                   parameters.get("isTiprack", False), definition.get("dimensions", {}).get("zDimension", 0.0),
+                   [definition["cornerOffsetFromSlot"][axis] for axis in "xyz"], names,
+                   [[wells[w]["x"], wells[w]["y"], wells[w]["z"]] for w in names],
+                   [wells[w]["depth"] for w in names], [wells[w]["totalLiquidVolume"] for w in names],
+                   [wells[w].get("diameter", nan) if wells[w]["shape"] == "circular" else nan for w in names],
+                   [wells[w].get("xDimension", nan) for w in names],
+                   [wells[w].get("yDimension", nan) for w in names],
+                   [len(column) for column in definition["ordering"]], digest, source)
+
+    @classmethod
+    def from_file(cls, path: str) -> "LabwareGeometry":
+        with open(path, "rb") as file:
+            content = file.read()
+        return cls.from_definition(json.loads(content), hashlib.sha256(content).hexdigest(), path)
+
+    @property
+    def definition(self) -> dict:
+        """
+        The full definition, read from the source file on each access.
+        """
+        with open(self.source, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def indices(self, wells) -> np.ndarray:
+        """
+        Positions of well names in plate.wells() order, vectorized.
+
+        Raises:
+            ValueError: On a name the labware does not have.
+        """
+        wells = np.asarray(wells, dtype=str).reshape(-1)
+        found = np.searchsorted(self.names, wells, sorter=self._sorted)
+        found = self._sorted[np.minimum(found, len(self.names) - 1)]
+        bad = self.names[found] != wells
+        if bad.any():
+            raise ValueError(f"{self.load_name} has no wells {wells[bad].tolist()}.")
+        return found
+
+    def columns(self) -> list:
+        """
+        Well names per column, as the definition's ordering.
+        """
+        bounds = np.cumsum(self.column_sizes)[:-1]
+        return [column.tolist() for column in np.split(self.names, bounds)]
+
+    def coordinates(self, slot: int, wells=None, position: str = "top") -> np.ndarray:
+        """
+        (n, 3) deck coordinates of wells with the labware in a slot.
+
+        Args:
+            slot (int): OT-2 deck slot.
+            wells (list): Optional, well names. Defaults to every well in order.
+            position (str): "top", "center" or "bottom" of the well.
+        """
+        rows = slice(None) if wells is None else self.indices(wells)
+        origin = np.array([SLOT_ORIGINS[int(slot)][0], SLOT_ORIGINS[int(slot)][1], 0.0]) + self.offset
+        points = self.centres[rows] + origin
+        if position != "bottom":
+            points[:, 2] += self.depths[rows] * (1.0 if position == "top" else 0.5)
+        return points
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        return f"LabwareGeometry({self.load_name!r}, {len(self)} wells)"
+
+
+def _pack(geometries: list, sources: dict, keys: dict) -> dict:
+    # Concatenates every geometry's well arrays; starts index into them
+    arrays = {field: np.array([getattr(g, field) for g in geometries]) for field in _LABWARE_FIELDS}
+    arrays["offset"] = np.array([g.offset for g in geometries]).reshape(-1, 3)
+    for field in _WELL_FIELDS + ("column_sizes",):
+        parts = [getattr(g, field) for g in geometries]
+        arrays[field] = np.concatenate(parts) if parts else np.zeros((0, 3) if field == "centres" else 0)
+    arrays["well_starts"] = np.cumsum([0] + [len(g) for g in geometries])
+    arrays["column_starts"] = np.cumsum([0] + [len(g.column_sizes) for g in geometries])
+    paths = sorted(sources)
+    arrays["source_paths"] = np.array(paths, dtype=str)
+    arrays["source_stats"] = np.array([sources[p][:2] for p in paths], dtype=np.int64).reshape(-1, 2)
+    arrays["source_digests"] = np.array([sources[p][2] for p in paths], dtype=str)
+    arrays["keys"] = np.array(sorted(keys), dtype=str)
+    arrays["key_digests"] = np.array([keys[k] for k in sorted(keys)], dtype=str)
+    return arrays
+
+
+def _unpack(data) -> tuple:
+    data = {name: data[name] for name in data.files}  # each NpzFile lookup re-reads the zip
+    geometries = {}
+    wells, columns = data["well_starts"], data["column_starts"]
+    for i, digest in enumerate(data["digest"].tolist()):
+        w, c = slice(wells[i], wells[i + 1]), slice(columns[i], columns[i + 1])
+        geometries[digest] = LabwareGeometry(
+            *(data[field][i] for field in _LABWARE_FIELDS[:7]),
+            *(data[field][w] for field in _WELL_FIELDS), data["column_sizes"][c],
+            digest, data["source"][i])
+    sources = {path: (int(stats[0]), int(stats[1]), digest) for path, stats, digest in
+               zip(data["source_paths"].tolist(), data["source_stats"], data["source_digests"].tolist())}
+    keys = dict(zip(data["keys"].tolist(), data["key_digests"].tolist()))
+    return geometries, sources, keys
+
+
+def _stat(path: str) -> tuple:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class LabwareRegistry:
+    """
+    Every labware definition the tools use, loaded once and shared.
+
+    Custom definitions are found in the root's custom_labware folders
+    (the first file of a loadName wins, as find_custom_definitions); stock
+    definitions are added from opentrons_shared_data the first time they
+    are asked for.
+
+    Args:
+        root (str): Folder searched for custom_labware folders.
+        cache_dir (str): Optional, folder of the compiled cache, read at
+            start-up and rewritten when a definition is added. Defaults to
+            None, keeping nothing on disk.
+    """
+
+    def __init__(self, root: str = REPO_ROOT, cache_dir: str = None):
+        self.root = root
+        self.cache_path = os.path.join(cache_dir, CACHE_NAME) if cache_dir else None
+        self.geometries = {}  # digest -> LabwareGeometry
+        self.sources = {}  # path -> (mtime_ns, size, digest)
+        self.keys = {}  # load name (custom) or stock:name[/version] -> digest
+        if self.cache_path and os.path.exists(self.cache_path):
+            try:
+                with np.load(self.cache_path, allow_pickle=False) as data:
+                    self.geometries, self.sources, self.keys = _unpack(data)
+            except (OSError, KeyError, ValueError):
+                pass  # Unreadable cache, rebuilt below
+        self._changed = False
+        self._refresh()
+
+    def _refresh(self):
+        # Drop entries whose source changed or vanished, then add new custom files
+        for path, (mtime, size, digest) in list(self.sources.items()):
+            try:
+                current = _stat(path)
+            except OSError:
+                current = None
+            if current != (mtime, size):
+                del self.sources[path]
+                self._changed = True
+        custom = _custom_files(self.root)
+        for path in custom:
+            if path not in self.sources:
+                self._add_file(path)
+        live = {digest for _, _, digest in self.sources.values()}
+        self.geometries = {d: g for d, g in self.geometries.items() if d in live}
+        keys = {k: d for k, d in self.keys.items() if k.startswith("stock:") and d in live}
+        for path in custom:
+            keys.setdefault(self.geometries[self.sources[path][2]].load_name, self.sources[path][2])
+        self._changed |= keys != self.keys
+        self.keys = keys
+        self.save()
+
+    def _add_file(self, path: str) -> "LabwareGeometry":
+        stats = _stat(path)
+        with open(path, "rb") as file:
+            content = file.read()
+        digest = hashlib.sha256(content).hexdigest()
+        if digest not in self.geometries:
+            self.geometries[digest] = LabwareGeometry.from_definition(json.loads(content), digest, path)
+        self.sources[path] = stats + (digest,)
+        self._changed = True
+        return self.geometries[digest]
+
+    def save(self):
+        """
+        Writes the compiled cache if anything changed since it was read.
+        """
+        if not self._changed or not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp = self.cache_path + ".tmp.npz"
+            np.savez(tmp, **_pack(list(self.geometries.values()), self.sources, self.keys))
+            os.replace(tmp, self.cache_path)
+            self._changed = False
+        except OSError:
+            pass  # Read-only location: the registry still works from memory
+
+    def get(self, name: str, version: int = None) -> LabwareGeometry:
+        """
+        The geometry for a definition file path, custom loadName or stock loadName.
+
+        Raises:
+            ValueError: If the labware is unknown, or stock and opentrons is not installed.
+        """
+        if name.endswith(".json") and os.path.exists(name):
+            path = os.path.abspath(name)
+            if path in self.sources:
+                return self.geometries[self.sources[path][2]]
+            geometry = self._add_file(path)
+            self.save()
+            return geometry
+        if version is None and name in self.keys:
+            return self.geometries[self.keys[name]]
+        key = f"stock:{name}" + ("" if version is None else f"/{version}")
+        if key not in self.keys:
+            self.keys[key] = self._add_file(_stock_path(name, version)).digest
+            self.save()
+        return self.geometries[self.keys[key]]
+
+    def duplicates(self) -> dict:
+        """
+        Definitions stored in more than one file: loadName -> the identical files.
+        """
+        paths = {}
+        for path, (_, _, digest) in sorted(self.sources.items()):
+            paths.setdefault(digest, []).append(path)
+        return {self.geometries[d].load_name: p for d, p in paths.items() if len(p) > 1}
+
+    def __repr__(self):
+        return f"LabwareRegistry({self.root!r}, {len(self.geometries)} definitions, {len(self.sources)} files)"
+
+
+def _stock_path(name: str, version: int = None) -> str:
+    try:
+        from opentrons_shared_data import get_shared_data_root
+    except ImportError:
+        raise ValueError(f"Labware '{name}' is not a custom definition and "
+                         "opentrons is not installed to load stock labware.")
+    versions = get_shared_data_root() / "labware" / "definitions" / "2" / name
+    if not versions.exists():
+        raise ValueError(f"Unknown labware: {name}")
+    if version is None:
+        version = max(int(p.stem) for p in versions.glob("*.json"))
+    path = versions / f"{int(version)}.json"
+    if not path.exists():
+        raise ValueError(f"Unknown labware: {name} version {version}")
+    return str(path)
+
+
+_cache_dir = None
+
+
+@functools.lru_cache(maxsize=None)
+def registry() -> LabwareRegistry:
+    """
+    The shared registry of the repository's labware.
+    """
+    return LabwareRegistry(cache_dir=_cache_dir)
+
+
+def use_cache(cache_dir: str = DEFAULT_CACHE_DIR):
+    """
+    Opts the shared registry in to the compiled cache in cache_dir, or out
+    of it with None. The registry is rebuilt on its next use.
+    """
+    global _cache_dir
+    _cache_dir = cache_dir
+    registry.cache_clear()
+
+
+def get_geometry(name: str, version: int = None) -> LabwareGeometry:
+    """
+    registry().get: the geometry for a definition path, custom or stock loadName.
+    """
+    return registry().get(name, version)
+
+
+def load_definition(name: str, version: int = None) -> dict:
+    """
+    Loads a labware definition by file path, custom loadName or stock loadName.
+
+    Stock definitions come from opentrons_shared_data, which is installed
+    with the opentrons package.
+
+    Args:
+        name (str): Path to a definition JSON, or a loadName.
+        version (int): Optional, stock definition version. Defaults to the latest.
+
+    Returns:
+        dict: The labware definition.
+    """
+    return get_geometry(name, version).definition
+
+
+def well_names(definition: dict) -> list:
+    """
+    Returns the well names in plate.wells() order (column by column).
+    """
+    return [name for column in definition["ordering"] for name in column]
+
+
+def well_coordinates(definition, slot: int, wells=None, position: str = "top") -> np.ndarray:
+    """
+    Computes deck coordinates of wells of a labware placed in a slot.
+
+    Args:
+        definition: The labware definition, or its LabwareGeometry.
+        slot (int): OT-2 deck slot the labware sits in.
+        wells (list): Optional, well names. Defaults to every well in order.
+        position (str): "top", "center" or "bottom" of the well.
+
+    Returns:
+        np.ndarray: (n, 3) array of x, y, z in mm.
+    """
+    if not isinstance(definition, LabwareGeometry):
+        definition = LabwareGeometry.from_definition(definition)
+    return definition.coordinates(slot, wells, position)
@@ -0,0 +1,191 @@
+"""
+Reservoir liquid ledger.
+
+Tracks the volume left in each source well across a run's dispense plans
+and turns it into a liquid height from the well geometry, so each aspirate
+goes only as deep as the liquid needs instead of to the default 1 mm above
+the bottom. The whole run is drawn from the ledger before any liquid
+moves, so a reagent that would run dry stops the protocol at the start
+rather than halfway through a plate. A reagent can be spread over several
+wells; draw moves on to the next one when a well runs low.
+
+Heights treat each well as a straight-sided prism (volume / cross-section).
+In V- or U-bottom wells the real surface is higher than that at low
+volumes, so the estimate errs towards aspirating deeper.
+"""
+import numpy as np
+
+# Tip depth below the liquid surface once the aspiration is done (mm)
+SUBMERGE_DEPTH = 2.0
+# Lowest aspirate height above the well bottom (mm), the API default
+MIN_HEIGHT = 1.0
+
+
+class LiquidLedger:
+    """
+    Remaining volume per source well.
+
+    Args:
+        geometry (dict): Well name -> (cross-section area mm², depth mm,
+            capacity µL).
+        dead_volume (float): µL per well that cannot be aspirated. Defaults
+            to the volume below MIN_HEIGHT.
+    """
+
+    def __init__(self, geometry: dict, dead_volume: float = None):
+        self.geometry = geometry
+        self.dead_volume = dead_volume
+        self.volumes = {}
+        self.names = {}
+
+    @classmethod
+    def from_definition(cls, definition: dict, **kwargs) -> "LiquidLedger":
+        """
+        Geometry from a labware definition (see labware.load_definition).
+        """
+        return cls({name: _geometry(well["shape"], well.get("xDimension"), well.get("yDimension"),
+                                    well.get("diameter"), well["depth"], well["totalLiquidVolume"])
+                    for name, well in definition["wells"].items()}, **kwargs)
+
+    @classmethod
+    def from_labware(cls, labware, **kwargs) -> "LiquidLedger":
+        """
+        Geometry from a loaded Opentrons labware.
+        """
+        return cls({well.well_name: _geometry("circular" if well.diameter else "rectangular",
+                                              well.length, well.width, well.diameter, well.depth,
+                                              well.max_volume)
+                    for well in labware.wells()}, **kwargs)
+
+    def _dead_volume(self, well: str) -> float:
+        if self.dead_volume is not None:
+            return self.dead_volume
+        return self.geometry[well][0] * MIN_HEIGHT
+
+    def load(self, well: str, volume: float, name: str = None):
+        """
+        Sets the starting volume of a well.
+
+        Raises:
+            ValueError: If the volume does not fit in the well.
+        """
+        capacity = self.geometry[well][2]
+        if volume > capacity:
+            raise ValueError(f"{name or well}: {volume:g} µL does not fit in reservoir well "
+                             f"{well} ({capacity:g} µL).")
+        self.volumes[well] = float(volume)
+        self.names[well] = name or well
+
+    def height(self, well: str, volume: float = None) -> float:
+        """
+        Liquid height (mm above the bottom) for a volume, by default the current one.
+        """
+        area, depth, _ = self.geometry[well]
+        volume = self.volumes[well] if volume is None else volume
+        return float(np.clip(volume / area, 0.0, depth))
+
+    def fill(self, wells: list, volume: float, max_aspirate: float, name: str = None) -> list:
+        """
+        Loads a liquid into as many of the given wells as it needs.
+
+        Each well gets an equal share of the volume plus its dead volume and
+        one aspiration of slack: draw only moves to the next well when the
+        next aspiration no longer fits, so up to one aspiration is left
+        behind in every well.
+
+        Args:
+            wells (list): Wells the liquid may use, in the order to use them.
+            volume (float): Total µL the run takes out of them.
+            max_aspirate (float): Largest single aspiration (µL).
+            name (str): Optional, liquid name for reports and errors.
+
+        Returns:
+            list: (well, µL loaded) for each well used, in order.
+
+        Raises:
+            ValueError: If the wells cannot hold the volume.
+        """
+        spare = [self.geometry[w][2] - self._dead_volume(w) - max_aspirate for w in wells]
+        n, held = 0, 0.0
+        while n < len(wells) and held < volume:
+            held += max(spare[n], 0.0)
+            n += 1
+        n = max(n, 1)
+        if held < volume:
+            raise ValueError(f"{name or wells[0]}: {volume:g} µL does not fit in reservoir wells "
+                             f"{', '.join(wells)}; add wells or use a larger reservoir.")
+        loads = []
+        for well in wells[:n]:
+            load = min(np.ceil(volume / n + self._dead_volume(well) + max_aspirate),
+                       self.geometry[well][2])
+            self.load(well, load, name)
+            loads.append((well, float(load)))
+        return loads
+
+    def draw(self, well: str, plan, submerge: float = SUBMERGE_DEPTH) -> tuple:
+        """
+        Takes a DispensePlan's aspirations out of a well, moving on to the
+        next well loaded with the same liquid when the next aspiration would
+        take it below its dead volume.
+
+        Every group aspirates its volume plus the disposal volume; the disposal
+        volume is blown back into the well before the next aspiration.
+
+        Args:
+            well (str): First source well to draw from.
+            plan (DispensePlan): Plan whose aspirations come from the liquid.
+            submerge (float): Tip depth below the surface after aspirating (mm).
+
+        Returns:
+            tuple: The source well name (list) and the aspirate height in mm
+                above the bottom (np.ndarray) of each group.
+
+        Raises:
+            ValueError: If the liquid runs out in every well loaded with it.
+        """
+        if well not in self.volumes:
+            raise ValueError(f"Reservoir well {well} has no liquid loaded in the ledger.")
+        same = [w for w in self.volumes if self.names[w] == self.names[well]]
+        candidates = same[same.index(well):]
+        aspirate = plan.aspirate_volumes
+        used = aspirate - plan.disposal_volume
+        sources, heights, left = [], [], {}
+        start = 0
+        for k, source in enumerate(candidates):
+            before = self.volumes[source] - np.r_[0.0, np.cumsum(used[start:])[:-1]]
+            after = before - aspirate[start:]
+            short = np.flatnonzero(after < self._dead_volume(source))
+            stop = start + (short[0] if short.size else after.size)
+            if short.size and k == len(candidates) - 1:
+                need = float(self._dead_volume(source) - after.min())
+                raise ValueError(f"{self.names[well]} runs dry in reservoir well {source} at "
+                                 f"aspiration {stop + 1} of {aspirate.size}: load at least "
+                                 f"{need:.0f} µL more.")
+            if stop > start:
+                area, depth, _ = self.geometry[source]
+                left[source] = float(before[stop - start - 1] - used[stop - 1])
+                sources += [source] * (stop - start)
+                heights += np.clip(after[:stop - start] / area - submerge, MIN_HEIGHT, depth).tolist()
+            start = stop
+            if start == aspirate.size:
+                break
+        self.volumes.update(left)
+        return sources, np.asarray(heights)
+
+    def report(self) -> str:
+        """
+        Volume and height left in each loaded well.
+        """
+        return "; ".join(f"{self.names[w]} ({w}): {v / 1000:.2f} mL left, {self.height(w):.1f} mm"
+                         for w, v in self.volumes.items())
+
+    def __repr__(self):
+        return f"LiquidLedger({self.volumes})"
+
+
+def _geometry(shape: str, x: float, y: float, diameter: float, depth: float, capacity: float) -> tuple:
+    if shape == "circular":
+        area = np.pi * (diameter / 2) ** 2
+    else:
+        area = x * y
+    return float(area), float(depth), float(capacity)
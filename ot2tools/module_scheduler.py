@@ -0,0 +1,263 @@
+"""
+Module-aware step scheduler.
+
+The notebook heats and shakes with blocking calls (set the temperature,
+protocol.delay for 5 minutes, shake, another delay), so the pipette sits
+idle while the Heater-Shaker works. Here every pipetting step and module
+operation is a Step holding one or more exclusive resources ("pipette",
+"heater", "shaker", "hs_plate", "hs_neighbours") for an estimated duration, with explicit
+dependencies where the chemistry needs them. schedule() places steps as
+early as their dependencies and resources allow, so independent pipetting
+fills the module's ramp and hold times, and reports the critical path and
+the wall-clock saving over running every step back to back.
+
+The pipette may not go to the Heater-Shaker or to a slot next to it while
+the module shakes. The shake step holds "hs_plate" and "hs_neighbours", so
+pipetting steps should list "hs_plate" if they reach the module's plate
+and take their resources from pipette_resources(), which adds
+"hs_neighbours" when the step reaches a neighbouring slot (a tip rack or
+the reservoir).
+
+Module steps start with a non-blocking call and are only waited for (the
+remaining hold time, measured on the clock) when a later step depends on
+them or needs one of their resources:
+
+    steps = [Step("Cu into plate 1", 300, ("pipette", "hs_plate"), action=...),
+             *heater_shaker_steps(protocol, module, after=["Cu into plate 1"]),
+             Step("Cu into plate 2", 300, action=...)]
+    plan = schedule(steps)
+    protocol.comment(plan.report())
+    plan.run(protocol)
+"""
+import time
+
+from ot2tools.plate_layout import heater_shaker_neighbours, labware_slot
+
+# Rough Heater-Shaker costs (s) on top of the requested hold times
+HEATER_SHAKER_TIMINGS = {"set_speed": 10.0, "deactivate": 5.0}
+
+
+class Step:
+    """
+    One unit of protocol work.
+
+    Args:
+        name (str): Unique step name.
+        duration (float): Estimated seconds.
+        resources (tuple): Exclusive resources held for the whole step.
+            Steps without "pipette" run in the background.
+        after (tuple): Names of steps that must finish first.
+        action: Called to start the step. Pipetting actions block until
+            done; background actions only start the module.
+        wait: Called with the seconds left of the step's duration when a
+            later step needs it finished, e.g. to delay or to wait for a
+            temperature. Defaults to doing nothing.
+    """
+
+    def __init__(self, name: str, duration: float, resources=("pipette",), after=(), action=None,
+                 wait=None):
+        self.name = name
+        self.duration = float(duration)
+        self.resources = tuple(resources)
+        self.after = tuple(after)
+        self.action = action
+        self.wait = wait
+
+    @property
+    def background(self) -> bool:
+        return "pipette" not in self.resources
+
+    def __repr__(self):
+        return f"Step({self.name!r}, {self.duration:g} s, {self.resources})"
+
+
+class Schedule:
+    """
+    Start and finish times of a set of steps.
+
+    Args:
+        steps (list): Steps in scheduled (start time) order.
+        start (dict): Step name -> start (s).
+        finish (dict): Step name -> finish (s).
+        cause (dict): Step name -> the step whose finish set its start, or None.
+    """
+
+    def __init__(self, steps: list, start: dict, finish: dict, cause: dict):
+        self.steps = steps
+        self.start = start
+        self.finish = finish
+        self.cause = cause
+
+    @property
+    def makespan(self) -> float:
+        return max(self.finish.values(), default=0.0)
+
+    @property
+    def serial(self) -> float:
+        """
+        Seconds with every step run back to back, as with blocking calls.
+        """
+        return sum(step.duration for step in self.steps)
+
+    def critical_path(self) -> list:
+        """
+        Steps that set the makespan, first to last.
+        """
+        if not self.steps:
+            return []
+        name = max(self.finish, key=self.finish.get)
+        path = []
+        while name is not None:
+            path.append(name)
+            name = self.cause[name]
+        return path[::-1]
+
+    def report(self) -> str:
+        path = " -> ".join(f"{name} ({(self.finish[name] - self.start[name]) / 60:.1f} min)"
+                           for name in self.critical_path())
+        saving = self.serial - self.makespan
+        return (f"Schedule: ~{self.makespan / 60:.1f} min vs ~{self.serial / 60:.1f} min back to back "
+                f"(~{saving / 60:.1f} min saved). Critical path: {path}")
+
+    def run(self, protocol=None, clock=None):
+        """
+        Executes the steps in start order on one protocol thread.
+
+        Before a step starts, every background step it depends on or shares
+        a resource with is waited for with the time it still has left.
+
+        Args:
+            protocol: Optional, ProtocolContext to comment background steps on.
+            clock: Seconds clock used to measure how long background steps ran.
+                Defaults to the protocol's own clock if it has one (the
+                run_time estimator's), else time.monotonic.
+        """
+        if clock is None:
+            clock = getattr(protocol, "clock", None) or time.monotonic
+        by_name = {step.name: step for step in self.steps}
+        running = {}  # background step name -> clock at start
+
+        def finish(name):
+            step = by_name[name]
+            left = max(step.duration - (clock() - running.pop(name)), 0.0)
+            if step.wait is not None:
+                step.wait(left)
+
+        for step in self.steps:
+            for name in list(running):
+                other = by_name[name]
+                if name in step.after or set(other.resources) & set(step.resources):
+                    finish(name)
+            if protocol is not None and step.background:
+                protocol.comment(f"Started {step.name} in the background")
+            if step.action is not None:
+                step.action()
+            if step.background:
+                running[step.name] = clock()
+        for name in list(running):
+            finish(name)
+
+
+def pipette_resources(protocol, labware, resources=("pipette",)) -> tuple:
+    """
+    Resources for a pipetting step that goes to the given labware, adding
+    "hs_neighbours" if any of it sits next to a Heater-Shaker so the step
+    never runs while the module shakes.
+
+    Args:
+        protocol: The ProtocolContext, with its modules loaded.
+        labware (list): Everything the step moves to, e.g. the source
+            reservoir, the plates and the tip racks. The OT-2 trash in slot 12
+            is never next to a Heater-Shaker, which may only go in slots 1,
+            3, 4, 6, 7 and 10.
+        resources (tuple): The step's other resources.
+    """
+    blocked = set(heater_shaker_neighbours(protocol))
+    if any(int(labware_slot(item)) in blocked for item in labware):
+        return tuple(resources) + ("hs_neighbours",)
+    return tuple(resources)
+
+
+def schedule(steps) -> Schedule:
+    """
+    List-schedules steps: each goes at the earliest time its dependencies and
+    resources allow, ties broken by the order given.
+
+    Raises:
+        ValueError: On unknown or circular dependencies.
+    """
+    steps = list(steps)
+    names = {step.name for step in steps}
+    for step in steps:
+        missing = set(step.after) - names
+        if missing:
+            raise ValueError(f"Step '{step.name}' depends on unknown steps {sorted(missing)}.")
+
+    start, finish, cause = {}, {}, {}
+    free = {}  # resource -> (time it is free, step that last held it)
+    pending, ordered = list(steps), []
+    while pending:
+        ready = [step for step in pending if all(name in finish for name in step.after)]
+        if not ready:
+            raise ValueError(f"Circular dependencies between {[step.name for step in pending]}.")
+        candidates = []
+        for step in ready:
+            # (time, step whose finish it waits for) over dependencies and resources
+            bounds = [(finish[name], name) for name in step.after]
+            bounds += [free[r] for r in step.resources if r in free]
+            candidates.append(max(bounds, default=(0.0, None), key=lambda b: b[0]) + (step,))
+        t, because, step = min(candidates, key=lambda c: c[0])
+        start[step.name], finish[step.name], cause[step.name] = t, t + step.duration, because
+        for r in step.resources:
+            free[r] = (finish[step.name], step.name)
+        pending.remove(step)
+        ordered.append(step)
+    return Schedule(ordered, start, finish, cause)
+
+
+def heater_shaker_steps(protocol, module, temperature: float = 70, heat_minutes: float = 5,
+                        rpm: int = 1000, shake_minutes: float = 2, after=(), prefix: str = "",
+                        timings: dict = None) -> list:
+    """
+    The notebook's heat, shake and stop sequence as background steps.
+
+    Args:
+        protocol: The ProtocolContext, for the delays.
+        module: The loaded Heater-Shaker.
+        temperature (float): Target °C.
+        heat_minutes (float): Time allowed for heating before shaking.
+        rpm (int): Shake speed.
+        shake_minutes (float): Shake time.
+        after (tuple): Steps that must finish before heating, e.g. the
+            dispenses into the module's plate.
+        prefix (str): Prepended to the step names.
+        timings (dict): Optional, overrides for HEATER_SHAKER_TIMINGS.
+
+    Returns:
+        list: Steps "heat", "shake" and "stop" (with the prefix); steps that
+        need the plate heated and mixed should depend on the last one.
+    """
+    t = dict(HEATER_SHAKER_TIMINGS, **(timings or {}))
+
+    def delay(seconds):
+        if seconds > 0:
+            protocol.delay(seconds=round(seconds, 1))
+
+    def heated(seconds):
+        delay(seconds)
+        module.wait_for_temperature()
+
+    def shaken(seconds):
+        delay(seconds)
+        module.deactivate_shaker()
+
+    heat, shake, stop = prefix + "heat", prefix + "shake", prefix + "stop"
+    return [
+        Step(heat, heat_minutes * 60, ("heater",), after,
+             action=lambda: module.set_target_temperature(temperature), wait=heated),
+        Step(shake, shake_minutes * 60 + t["set_speed"],
+             ("heater", "shaker", "hs_plate", "hs_neighbours"), [heat],
+             action=lambda: module.set_and_wait_for_shake_speed(rpm), wait=shaken),
+        Step(stop, t["deactivate"], ("heater", "shaker"), [shake],
+             action=module.deactivate_heater),
+    ]
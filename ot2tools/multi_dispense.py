@@ -0,0 +1,220 @@
+import numpy as np
+
+# Rough per-step costs (s) used to predict run time before and after
+# planning, fitted to the kinematic moves of ot2tools.run_time on the
+# CompleteExperimentCode deck so both give the same run time. Moves
+# dominate: each aspirate is a trip back to the reservoir.
+DEFAULT_TIMINGS = {
+    "aspirate": 3.7,  # travel from the plate to the source and back
+    "dispense": 0.5,  # hop to the next well
+    "blow_out": 0.9,  # blow out of the disposal volume over the source
+    "flow_rate": 274.7,  # µL/s, p1000 gen2 default aspirate/dispense rate
+}
+# Volumes sent to the pipette are rounded to 0.01 µL, so float sums such
+# as 994.9000000000001 never reach the robot
+VOLUME_DECIMALS = 2
+
+
+class DispensePlan:
+    """
+    Multi-dispense plan for one reagent pass.
+
+    Each dispense belongs to an aspiration group; a group is aspirated once
+    (plus the disposal volume) and then dispensed into consecutive wells.
+
+    Args:
+        wells (np.ndarray): Destination index of each dispense, in order.
+        volumes (np.ndarray): Volume (µL) of each dispense.
+        group (np.ndarray): Aspiration group of each dispense.
+        disposal_volume (float): Extra volume aspirated with every group.
+    """
+
+    def __init__(self, wells: np.ndarray, volumes: np.ndarray, group: np.ndarray,
+                 disposal_volume: float):
+        self.wells = wells
+        self.volumes = volumes
+        self.group = group
+        self.disposal_volume = float(disposal_volume)
+
+    @property
+    def n_aspirations(self) -> int:
+        return int(self.group[-1]) + 1 if self.group.size else 0
+
+    @property
+    def n_dispenses(self) -> int:
+        return int(self.volumes.size)
+
+    @property
+    def aspirate_volumes(self) -> np.ndarray:
+        """Volume aspirated for each group, including the disposal volume."""
+        sums = np.bincount(self.group, weights=self.volumes, minlength=self.n_aspirations)
+        return sums + self.disposal_volume
+
+    def groups(self):
+        """
+        Yields (wells, volumes, aspirate_volume) for each aspiration group,
+        with volumes rounded to VOLUME_DECIMALS.
+        """
+        bounds = np.flatnonzero(np.diff(self.group)) + 1
+        for wells, volumes in zip(np.split(self.wells, bounds), np.split(self.volumes, bounds)):
+            volumes = np.round(volumes, VOLUME_DECIMALS)
+            aspirate_volume = round(float(volumes.sum()) + self.disposal_volume, VOLUME_DECIMALS)
+            yield wells.tolist(), volumes.tolist(), aspirate_volume
+
+    def __repr__(self) -> str:
+        return (f"DispensePlan(aspirations={self.n_aspirations}, "
+                f"dispenses={self.n_dispenses}, disposal_volume={self.disposal_volume:g})")
+
+
+def plan_multi_dispense(volumes, max_volume: float, disposal_volume: float = 0.0,
+                        order=None, min_dispense: float = 0.0) -> DispensePlan:
+    """
+    Groups consecutive destination wells into multi-dispense aspirations.
+
+    Wells with no volume are skipped. A volume larger than one aspiration can
+    hold is split into several single-dispense aspirations, and a volume
+    below min_dispense gets an aspiration of its own (a single transfer)
+    rather than being dispensed out of a larger aspirated volume.
+
+    Args:
+        volumes (array-like): Volume (µL) for each destination well.
+        max_volume (float): Pipette (or tip) max volume.
+        disposal_volume (float): Extra volume aspirated with each group and
+            blown out afterwards, so the last dispense is as accurate as the first.
+        order (array-like): Optional, well visit order. Defaults to the well order.
+        min_dispense (float): Shortest volume (µL) dispensed from a shared
+            aspiration, e.g. the pipette's min_volume (100 µL for a p1000).
+            Defaults to 0, which lets any volume share an aspiration.
+
+    Returns:
+        DispensePlan: The grouped plan.
+    """
+    volumes = np.asarray(volumes, dtype=np.float64)
+    capacity = max_volume - disposal_volume
+    if capacity <= 0:
+        raise ValueError("disposal_volume must be smaller than the pipette max volume.")
+
+    order = np.arange(volumes.size) if order is None else np.asarray(order, dtype=np.int64)
+    order = order[np.nan_to_num(volumes[order]) > 0]
+
+    wells, dispense_volumes, group = [], [], []
+    g, filled = -1, capacity  # Forces a new group on the first dispense
+    for i, v in zip(order.tolist(), volumes[order].tolist()):
+        if v > capacity:
+            # Too big to share an aspiration, so split it evenly
+            n = int(np.ceil(v / capacity))
+            for _ in range(n):
+                g += 1
+                wells.append(i)
+                dispense_volumes.append(v / n)
+                group.append(g)
+            filled = capacity
+            continue
+        if v < min_dispense:
+            # Too small to dispense accurately out of a larger volume
+            g += 1
+            wells.append(i)
+            dispense_volumes.append(v)
+            group.append(g)
+            filled = capacity
+            continue
+        if filled + v > capacity:
+            g += 1
+            filled = 0.0
+        filled += v
+        wells.append(i)
+        dispense_volumes.append(v)
+        group.append(g)
+
+    return DispensePlan(np.asarray(wells, dtype=np.int64), np.asarray(dispense_volumes),
+                        np.asarray(group, dtype=np.int64), disposal_volume)
+
+
+def plan_single_transfers(volumes, max_volume: float, order=None) -> DispensePlan:
+    """
+    Builds the one-aspirate-per-well plan that transfer() produces, for comparison.
+    """
+    volumes = np.asarray(volumes, dtype=np.float64)
+    order = np.arange(volumes.size) if order is None else np.asarray(order, dtype=np.int64)
+    order = order[np.nan_to_num(volumes[order]) > 0]
+    # transfer() splits volumes above max_volume into equal parts
+    parts = np.ceil(volumes[order] / max_volume).astype(np.int64)
+    wells = np.repeat(order, parts)
+    return DispensePlan(wells, volumes[wells] / np.repeat(parts, parts),
+                        np.arange(wells.size, dtype=np.int64), 0.0)
+
+
+def predict_time(plan: DispensePlan, timings: dict = None) -> float:
+    """
+    Predicts the time (s) a plan takes from the per-step costs in DEFAULT_TIMINGS.
+    """
+    t = dict(DEFAULT_TIMINGS, **(timings or {}))
+    moved = float(plan.aspirate_volumes.sum()) + float(plan.volumes.sum())
+    seconds = plan.n_aspirations * t["aspirate"] + plan.n_dispenses * t["dispense"]
+    if plan.disposal_volume > 0:
+        seconds += plan.n_aspirations * t["blow_out"]
+    return seconds + moved / t["flow_rate"]
+
+
+def compare_plans(volumes, max_volume: float, disposal_volume: float = 0.0,
+                  timings: dict = None, min_dispense: float = 0.0) -> dict:
+    """
+    Predicts aspirate counts and run time with and without multi-dispensing.
+
+    Args:
+        volumes (array-like): Volume (µL) for each destination well.
+        max_volume (float): Pipette (or tip) max volume.
+        disposal_volume (float): Disposal volume for the multi-dispense plan.
+        timings (dict): Optional, overrides for DEFAULT_TIMINGS.
+        min_dispense (float): Shortest shared dispense, see plan_multi_dispense.
+
+    Returns:
+        dict: Aspirations and predicted seconds before and after planning.
+    """
+    before = plan_single_transfers(volumes, max_volume)
+    after = plan_multi_dispense(volumes, max_volume, disposal_volume, min_dispense=min_dispense)
+    return {
+        "aspirations_before": before.n_aspirations,
+        "aspirations_after": after.n_aspirations,
+        "time_before_s": predict_time(before, timings),
+        "time_after_s": predict_time(after, timings),
+    }
+
+
+def format_comparison(name: str, comparison: dict) -> str:
+    """
+    Formats the output of compare_plans as a one-line report.
+    """
+    return (f"{name}: {comparison['aspirations_before']} -> {comparison['aspirations_after']} "
+            f"aspirations, ~{comparison['time_before_s'] / 60:.1f} -> "
+            f"{comparison['time_after_s'] / 60:.1f} min")
+
+
+def dispense_plan(pipette, source, destinations, plan: DispensePlan, blow_out_location=None,
+                  aspirate_heights=None):
+    """
+    Executes a DispensePlan with an Opentrons pipette that already holds a tip.
+
+    Args:
+        pipette: The InstrumentContext to use.
+        source: Well or Location to aspirate from, or a list with one for
+            each aspiration (e.g. from LiquidLedger.draw, when a reagent is
+            spread over several wells).
+        destinations (list): Well or Location for each destination index.
+        plan (DispensePlan): Plan from plan_multi_dispense.
+        blow_out_location: Optional, where to blow out the disposal volume.
+            Defaults to the aspiration's source, which keeps the reagent.
+        aspirate_heights (array-like): Optional, height above the bottom of
+            the source well (mm) for each aspiration, e.g. from
+            LiquidLedger.draw. source must then be a Well (or Wells).
+    """
+    sources = source if isinstance(source, (list, tuple)) else [source] * plan.n_aspirations
+    for k, (wells, volumes, aspirate_volume) in enumerate(plan.groups()):
+        if aspirate_heights is None:
+            pipette.aspirate(aspirate_volume, sources[k])
+        else:
+            pipette.aspirate(aspirate_volume, sources[k].bottom(float(aspirate_heights[k])))
+        for i, v in zip(wells, volumes):
+            pipette.dispense(v, destinations[i])
+        if plan.disposal_volume > 0:
+            pipette.blow_out(sources[k] if blow_out_location is None else blow_out_location)
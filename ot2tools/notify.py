@@ -0,0 +1,227 @@
+"""
+Non-blocking sound and event notifications for protocol runs.
+
+The speaker helper copied into the protocols shells out to mpg123 and
+waits for the file to finish, so the robot stands still for the length of
+the sound. A Notifier instead hands each event to a background thread that
+plays it (or posts it) while the protocol carries on; notify() only puts
+the event on a queue and never waits:
+
+    notes = notifier_for(protocol, "sound:///etc/audio/speaker-test.mp3")
+    notes.run_started()
+    ...
+    notes.operator_pause("Refill the reservoir")   # then protocol.pause(...)
+    notes.plate_finished("Plate 1")
+    notes.close()
+
+When protocol.is_simulating() the sound and webhook sinks are skipped, so
+simulation and analysis stay silent; the mock sink still records.
+
+Addresses:
+    sound:///path/to/file.mp3?error=/path/to/alarm.mp3   plays with mpg123 (or ?player=): the path
+                                                         for run_started, ?event=file for the others
+    http://host/hook (or https://)                       POSTs {"event", "message", "time"}
+    mock:///path/to/file.mp3?error=...&delay=0            records events in memory for tests, and
+                                                         the files sound:// would play
+"""
+import datetime
+import json
+import queue
+import subprocess
+import threading
+import time
+import urllib.request
+from urllib.parse import parse_qs, urlparse
+
+EVENTS = ("run_started", "operator_pause", "plate_finished", "error", "run_finished")
+PLAYER = "mpg123"
+# Events waiting for the worker; further events are dropped, never waited on
+QUEUE_SIZE = 32
+
+
+class SoundSink:
+    """
+    Plays a sound file per event with an external player.
+
+    Args:
+        sounds (dict): Event name to audio file; events without one stay silent.
+        player (str): Player command, given the file as its last argument.
+    """
+
+    live = True
+
+    def __init__(self, sounds: dict, player: str = PLAYER):
+        self.sounds = sounds
+        self.player = player
+
+    def send(self, event: str, message: str, timestamp: str):
+        path = self.sounds.get(event)
+        if path:
+            subprocess.run([self.player, "-q", path], stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, timeout=600, check=True)
+
+
+class WebhookSink:
+    """
+    POSTs each event as JSON, e.g. to a chat or lab-monitoring webhook.
+    """
+
+    live = True
+
+    def __init__(self, url: str, timeout: float = 5.0):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, event: str, message: str, timestamp: str):
+        body = json.dumps({"event": event, "message": message, "time": timestamp}).encode()
+        request = urllib.request.Request(self.url, body, {"Content-Type": "application/json"})
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+class MockSink:
+    """
+    Local stand-in for testing: keeps (event, message, time) in events and
+    (event, file) in played for the sounds a SoundSink would play,
+    optionally taking delay seconds per event like a sound would.
+    """
+
+    live = False
+
+    def __init__(self, delay: float = 0.0, sounds: dict = None):
+        self.delay = delay
+        self.sounds = sounds or {}
+        self.events = []
+        self.played = []
+
+    def send(self, event: str, message: str, timestamp: str):
+        time.sleep(self.delay)
+        self.events.append((event, message, timestamp))
+        if self.sounds.get(event):
+            self.played.append((event, self.sounds[event]))
+
+
+def open_sink(address: str):
+    """
+    Opens the sink for an address (see the module docstring).
+
+    Raises:
+        ValueError: On an unknown scheme, or a sound for an unknown event.
+    """
+    url = urlparse(address)
+    options = {key: values[-1] for key, values in parse_qs(url.query).items()}
+    if url.scheme == "sound":
+        player = options.pop("player", PLAYER)
+        return SoundSink(_sounds(address, url, options), player)
+    if url.scheme in ("http", "https"):
+        return WebhookSink(address)
+    if url.scheme == "mock":
+        delay = float(options.pop("delay", 0))
+        return MockSink(delay, _sounds(address, url, options))
+    raise ValueError(f"Unknown notification address '{address}'; use sound://, http(s):// or mock://.")
+
+
+def _sounds(address: str, url, options: dict) -> dict:
+    """
+    Event name to audio file: the address path for run_started, the query for the rest.
+    """
+    sounds = dict(options)
+    if url.netloc + url.path:
+        sounds.setdefault("run_started", url.netloc + url.path)
+    unknown = set(sounds) - set(EVENTS)
+    if unknown:
+        raise ValueError(f"Unknown events {sorted(unknown)} in '{address}'; use {', '.join(EVENTS)}.")
+    return sounds
+
+
+class Notifier:
+    """
+    Sends events to sinks from a background thread.
+
+    Args:
+        sinks (list): SoundSink, WebhookSink, MockSink or anything with send(event, message, timestamp).
+        simulating (bool): Skip the live sinks (sound, webhook).
+
+    Failures in a sink are kept in errors and never reach the protocol.
+    """
+
+    def __init__(self, sinks, simulating: bool = False):
+        self.sinks = [sink for sink in sinks if not (simulating and getattr(sink, "live", True))]
+        self.simulating = simulating
+        self.events = queue.Queue(QUEUE_SIZE)
+        self.errors = []
+        self.dropped = 0
+        self.thread = None
+        if self.sinks:
+            self.thread = threading.Thread(target=self._send, name="notifier", daemon=True)
+            self.thread.start()
+
+    def notify(self, event: str, message: str = ""):
+        """
+        Queues an event for the sinks and returns at once.
+        """
+        if self.thread is None:
+            return
+        try:
+            self.events.put_nowait((event, message, datetime.datetime.now().isoformat(timespec="seconds")))
+        except queue.Full:
+            self.dropped += 1
+
+    def run_started(self, message: str = ""):
+        self.notify("run_started", message)
+
+    def operator_pause(self, message: str = ""):
+        self.notify("operator_pause", message)
+
+    def plate_finished(self, message: str = ""):
+        self.notify("plate_finished", message)
+
+    def error(self, message: str = ""):
+        self.notify("error", message)
+
+    def run_finished(self, message: str = ""):
+        self.notify("run_finished", message)
+
+    def close(self, timeout: float = None):
+        """
+        Stops the worker once the queued events are sent.
+
+        Args:
+            timeout (float): Seconds to wait for that; by default the protocol
+                does not wait and sounds still queued play on after run() returns.
+        """
+        if self.thread is None:
+            return
+        try:
+            self.events.put_nowait(None)
+        except queue.Full:
+            self.dropped += 1
+        if timeout is not None:
+            self.thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc is not None:
+            self.error(f"{exc_type.__name__}: {exc}")
+        self.close()
+
+    def _send(self):
+        while True:
+            item = self.events.get()
+            if item is None:
+                return
+            for sink in self.sinks:
+                try:
+                    sink.send(*item)
+                except Exception as exc:  # a missing player or unreachable hook must not stop the run
+                    self.errors.append(f"{type(sink).__name__} {item[0]}: {exc}")
+
+
+def notifier_for(protocol, *addresses) -> Notifier:
+    """
+    Notifier over open_sink(address) for each address, silent when the
+    protocol is simulating.
+    """
+    return Notifier([open_sink(address) for address in addresses], protocol.is_simulating())
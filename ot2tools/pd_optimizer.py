@@ -0,0 +1,523 @@
+"""
+Command-stream optimizer for Protocol Designer (schema 8) JSON protocols.
+
+Protocol Designer writes every step as it was drawn: the demo pixel-art
+protocols pick up a fresh tip for single wells of a colour that is
+dispensed elsewhere from a shared tip, and visit wells in the order they
+were clicked. optimize_protocol rewrites the liquid-handling commands:
+
+1. The command list is split at every command other than tip pick-up,
+   aspirate, dispense and tip drop (modules, delays, ...), which stay where
+   they are; only the runs of liquid handling in between are rewritten.
+2. Each run becomes deliveries (pipette, source well, destination well,
+   volume) with a dependency graph: a delivery waits for earlier ones that
+   fill its source, aspirate from its destination, or put a different liquid
+   in its destination.
+3. Deliveries are grouped by liquid (pipette, source well and the
+   aspirate/dispense parameters) and the groups are placed in dependency
+   order. Each group's wells are put in a low-travel order and
+   multi-dispensed from as few aspirations as the tip holds
+   (travel_path.plan_pass), with one tip for the group. Dispenses into a well
+   already holding a different liquid keep a tip of their own.
+4. Tips are picked up from the protocol's own tip sequence, so the output
+   needs no more tips or labware than the input.
+
+A run whose commands do not fit this model (an aspirate not fully
+dispensed, a tip still attached at the end, dependencies between liquid
+groups that go both ways, or more tips needed) is copied unchanged.
+
+    python -m ot2tools.pd_optimizer "DemoProtocolsForOT-2/Robin Pixel Art.json" --out-dir optimized
+"""
+import argparse
+import copy
+import json
+import os
+import re
+import sys
+import uuid
+
+import numpy as np
+
+from ot2tools.labware import LabwareGeometry
+from ot2tools.multi_dispense import DEFAULT_TIMINGS
+from ot2tools.tip_budget import DEFAULT_TIP_TIMINGS
+from ot2tools.travel_path import path_cost, plan_pass
+
+SCHEMA_VERSION = 8
+# Commands a liquid-handling run may contain; anything else ends the run
+LIQUID_COMMANDS = ("pickUpTip", "aspirate", "dispense", "moveToAddressableAreaForDropTip",
+                   "dropTipInPlace", "dropTip")
+# Params that locate a liquid command; the rest (flow rate, well location)
+# must match for dispenses to share an aspiration
+_PLACE_PARAMS = ("pipetteId", "volume", "labwareId", "wellName")
+
+
+class Delivery:
+    """
+    One dispense and the aspirate it came from.
+
+    Args:
+        index (int): Position in the run.
+        pipette (str): pipetteId.
+        source (tuple): (labwareId, wellName) aspirated from.
+        dest (tuple): (labwareId, wellName) dispensed into.
+        volume (float): µL.
+        aspirate (dict): Aspirate command it came from.
+        dispense (dict): The dispense command.
+    """
+
+    def __init__(self, index: int, pipette: str, source: tuple, dest: tuple, volume: float,
+                 aspirate: dict, dispense: dict):
+        self.index = index
+        self.pipette = pipette
+        self.source = source
+        self.dest = dest
+        self.volume = float(volume)
+        self.aspirate = aspirate
+        self.dispense = dispense
+
+    @property
+    def liquid(self) -> tuple:
+        """
+        Deliveries with the same key can share a tip and an aspiration.
+        """
+        return (self.pipette, self.source, _settings(self.aspirate), _settings(self.dispense))
+
+    def __repr__(self):
+        return f"Delivery({self.volume:g} µL {self.source[1]} -> {self.dest[1]})"
+
+
+class Deck:
+    """
+    Labware, pipettes and well coordinates of a loaded protocol.
+
+    Args:
+        protocol (dict): The protocol JSON.
+    """
+
+    def __init__(self, protocol: dict):
+        self.definitions = protocol.get("labwareDefinitions", {})
+        self.labware, self.modules, self.pipettes = {}, {}, {}
+        for command in protocol["commands"]:
+            params = command.get("params", {})
+            if command["commandType"] == "loadLabware":
+                uri = f"{params['namespace']}/{params['loadName']}/{params['version']}"
+                self.labware[params["labwareId"]] = (uri, params.get("location", {}))
+            elif command["commandType"] == "loadModule":
+                self.modules[params["moduleId"]] = params.get("location", {})
+            elif command["commandType"] == "loadPipette":
+                self.pipettes[params["pipetteId"]] = params["pipetteName"]
+        self._geometries, self._points = {}, {}
+
+    def slot(self, labware_id: str):
+        """
+        Deck slot of a labware, following adapters and modules; None if off deck.
+        """
+        location = self.labware[labware_id][1]
+        while isinstance(location, dict):
+            if "slotName" in location:
+                return location["slotName"]
+            if "moduleId" in location:
+                location = self.modules.get(location["moduleId"])
+            elif "labwareId" in location:
+                location = self.labware[location["labwareId"]][1]
+            else:
+                return None
+        return None
+
+    def definition(self, labware_id: str) -> dict:
+        return self.definitions[self.labware[labware_id][0]]
+
+    def geometry(self, labware_id: str) -> LabwareGeometry:
+        """
+        Well arrays of a labware's definition, compiled once per definition.
+        """
+        uri = self.labware[labware_id][0]
+        if uri not in self._geometries:
+            self._geometries[uri] = LabwareGeometry.from_definition(self.definitions[uri])
+        return self._geometries[uri]
+
+    def point(self, labware_id: str, well: str) -> np.ndarray:
+        """
+        (3,) deck coordinates of the top of a well; the origin if the labware is off deck.
+        """
+        if labware_id not in self._points:
+            slot = self.slot(labware_id)
+            geometry = self.geometry(labware_id)
+            if slot is None or not str(slot).isdigit():
+                self._points[labware_id] = np.zeros((len(geometry), 3))
+            else:
+                self._points[labware_id] = geometry.coordinates(int(slot))
+        return self._points[labware_id][self.geometry(labware_id).index[well]]
+
+    def covered(self, pipette: str, labware_id: str, well: str) -> list:
+        """
+        Wells a pipette reaches at once: the column below the well for an
+        8-channel, one well otherwise.
+        """
+        if "multi" not in self.pipettes[pipette]:
+            return [(labware_id, well)]
+        for column in self.geometry(labware_id).columns():
+            if well in column:
+                start = column.index(well)
+                return [(labware_id, w) for w in column[start:start + 8]]
+        return [(labware_id, well)]
+
+    def capacity(self, pipette: str, tip_rack: str) -> float:
+        """
+        Most a pipette can aspirate with a tip from a rack.
+        """
+        match = re.match(r"p(\d+)_", self.pipettes[pipette])
+        pipette_max = float(match.group(1)) if match else np.inf
+        return min(pipette_max, float(self.geometry(tip_rack).volumes.min()))
+
+
+def load_protocol(path: str) -> dict:
+    """
+    Reads a Protocol Designer JSON protocol.
+
+    Raises:
+        ValueError: If it is not a schema 8 protocol.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        protocol = json.load(file)
+    if protocol.get("schemaVersion") != SCHEMA_VERSION or "commands" not in protocol:
+        raise ValueError(f"{path} is not a schema {SCHEMA_VERSION} Protocol Designer protocol.")
+    return protocol
+
+
+def liquid_runs(commands: list) -> list:
+    """
+    Splits commands into (is_liquid_handling, commands) runs, in order.
+    """
+    runs = []
+    for command in commands:
+        liquid = command["commandType"] in LIQUID_COMMANDS
+        if runs and runs[-1][0] == liquid:
+            runs[-1][1].append(command)
+        else:
+            runs.append((liquid, [command]))
+    return runs
+
+
+def parse_deliveries(commands: list):
+    """
+    The deliveries, tips and drop commands of a liquid-handling run.
+
+    Returns:
+        tuple: (deliveries, tips, drops): tips maps each pipette to its
+        pickUpTip commands, drops to the commands that dropped its first tip.
+        None if the run does not fit the model (see the module docstring).
+    """
+    deliveries, tips, drops = [], {}, {}
+    tip, aspirate, left = {}, None, 0.0
+    for command in commands:
+        kind, params = command["commandType"], command.get("params", {})
+        pipette = params.get("pipetteId")
+        if kind == "pickUpTip":
+            if tip.get(pipette) or left > 1e-6:
+                return None
+            tip[pipette] = True
+            tips.setdefault(pipette, []).append(command)
+        elif kind == "aspirate":
+            if not tip.get(pipette) or left > 1e-6:
+                return None
+            aspirate, left = command, float(params["volume"])
+        elif kind == "dispense":
+            if aspirate is None or aspirate["params"]["pipetteId"] != pipette:
+                return None
+            left -= float(params["volume"])
+            if left < -1e-6:
+                return None
+            source = (aspirate["params"]["labwareId"], aspirate["params"]["wellName"])
+            deliveries.append(Delivery(len(deliveries), pipette, source,
+                                       (params["labwareId"], params["wellName"]),
+                                       params["volume"], aspirate, command))
+        else:
+            if not tip.get(pipette) or left > 1e-6:
+                return None
+            if kind != "moveToAddressableAreaForDropTip":
+                tip[pipette] = False
+            if len(tips.get(pipette, ())) == 1:
+                drops.setdefault(pipette, []).append(command)
+    if any(tip.values()) or left > 1e-6:
+        return None
+    return deliveries, tips, drops
+
+
+def dependency_graph(deliveries: list, deck: Deck) -> list:
+    """
+    Predecessors of each delivery: earlier deliveries it must follow.
+
+    A delivery follows those that dispensed into its source, aspirated from
+    its destination, or put a different liquid into its destination.
+
+    Returns:
+        list: A set of delivery indices per delivery.
+    """
+    filled, read = {}, {}  # well -> [(delivery, liquid)], well -> [delivery]
+    graph = []
+    for d in deliveries:
+        before = set()
+        sources = deck.covered(d.pipette, *d.source)
+        dests = deck.covered(d.pipette, *d.dest)
+        for well in sources:
+            before.update(i for i, _ in filled.get(well, ()))
+        for well in dests:
+            before.update(read.get(well, ()))
+            before.update(i for i, liquid in filled.get(well, ()) if liquid != d.source)
+        graph.append(before)
+        for well in sources:
+            read.setdefault(well, []).append(d.index)
+        for well in dests:
+            filled.setdefault(well, []).append((d.index, d.source))
+    return graph
+
+
+def order_groups(deliveries: list, graph: list):
+    """
+    Liquid groups in dependency order, ties by first appearance.
+
+    Returns:
+        list: Lists of deliveries, one per liquid; None if groups depend on
+        each other both ways.
+    """
+    keys = list(dict.fromkeys(d.liquid for d in deliveries))
+    group_of = {d.index: keys.index(d.liquid) for d in deliveries}
+    needs = [set() for _ in keys]
+    for d, before in zip(deliveries, graph):
+        needs[group_of[d.index]].update(group_of[i] for i in before if group_of[i] != group_of[d.index])
+    done, order = set(), []
+    while len(order) < len(keys):
+        ready = [g for g in range(len(keys)) if g not in done and needs[g] <= done]
+        if not ready:
+            return None
+        order.append(ready[0])
+        done.add(ready[0])
+    return [[d for d in deliveries if group_of[d.index] == g] for g in order]
+
+
+def _settings(command: dict) -> str:
+    return json.dumps({k: v for k, v in command["params"].items() if k not in _PLACE_PARAMS},
+                      sort_keys=True)
+
+
+def _command(template: dict, key: str, **params) -> dict:
+    command = copy.deepcopy(template)
+    command["key"] = key
+    command["params"].update(params)
+    return command
+
+
+def rewrite_run(commands: list, deck: Deck, contents: dict, method: str = "2opt", keys=None):
+    """
+    Rewrites one liquid-handling run.
+
+    Args:
+        commands (list): The run's commands.
+        deck (Deck): Labware and pipettes of the protocol.
+        contents (dict): Well -> set of liquids (source wells) in it before
+            the run; updated with the run's dispenses.
+        method (str): Well ordering, see travel_path.order_wells.
+        keys: Iterator of new command keys.
+
+    Returns:
+        list: The new commands, or the run unchanged if it does not fit.
+    """
+    parsed = parse_deliveries(commands)
+    groups = None if parsed is None else order_groups(parsed[0], dependency_graph(parsed[0], deck))
+    if groups is None:
+        _fill_commands(contents, deck, commands)
+        return commands
+    deliveries, tips, drops = parsed
+
+    new, used, before = [], {pipette: 0 for pipette in tips}, copy.deepcopy(contents)
+    for group in groups:
+        first = group[0]
+        pipette = first.pipette
+        capacity = deck.capacity(pipette, tips[pipette][0]["params"]["labwareId"])
+        shared = [d for d in group
+                  if all(contents.get(w, set()) <= {d.source} for w in deck.covered(pipette, *d.dest))]
+        alone = [d for d in group if d not in shared]
+
+        def tip_cycle(plan_deliveries, order_method):
+            # One tip: the deliveries summed per destination, multi-dispensed
+            dests = list(dict.fromkeys(d.dest for d in plan_deliveries))
+            volumes = np.array([sum(d.volume for d in plan_deliveries if d.dest == dest)
+                                for dest in dests])
+            points = np.array([deck.point(*dest) for dest in dests])
+            plan, _ = plan_pass(points, deck.point(*first.source), volumes, capacity, 0.0, order_method)
+            new.append(_command(tips[pipette][0], next(keys)))
+            used[pipette] += 1
+            for wells, volumes, aspirate_volume in plan.groups():
+                new.append(_command(first.aspirate, next(keys), volume=_number(aspirate_volume)))
+                for well, volume in zip(wells, volumes):
+                    new.append(_command(first.dispense, next(keys), volume=_number(volume),
+                                        labwareId=dests[well][0], wellName=dests[well][1]))
+            new.extend(_command(drop, next(keys)) for drop in drops[pipette])
+
+        if shared:
+            tip_cycle(shared, method)
+        for d in alone:
+            tip_cycle([d], "plate")
+        _fill(contents, deck, group)
+
+    if any(used[pipette] > len(tips[pipette]) for pipette in tips):
+        contents.clear()
+        contents.update(before)
+        _fill_commands(contents, deck, commands)
+        return commands
+    return new
+
+
+def _fill(contents: dict, deck: Deck, deliveries: list):
+    for d in deliveries:
+        for well in deck.covered(d.pipette, *d.dest):
+            contents.setdefault(well, set()).add(d.source)
+
+
+def _fill_commands(contents: dict, deck: Deck, commands: list):
+    source = None
+    for command in commands:
+        params = command.get("params", {})
+        if command["commandType"] == "aspirate":
+            source = (params["labwareId"], params["wellName"])
+        elif command["commandType"] == "dispense":
+            for well in deck.covered(params["pipetteId"], params["labwareId"], params["wellName"]):
+                contents.setdefault(well, set()).add(source)
+
+
+def _number(volume: float):
+    volume = round(float(volume), 6)
+    return int(volume) if volume.is_integer() else volume
+
+
+def optimize_protocol(protocol: dict, method: str = "2opt") -> dict:
+    """
+    Returns an optimized copy of a schema 8 protocol (see the module docstring).
+
+    Args:
+        protocol (dict): From load_protocol.
+        method (str): Well ordering within a liquid, see travel_path.order_wells.
+    """
+    deck = Deck(protocol)
+    name = protocol.get("metadata", {}).get("protocolName", "")
+    counter = iter(range(1 << 62))
+    keys = (str(uuid.uuid5(uuid.NAMESPACE_URL, f"ot2tools/pd_optimizer/{name}/{i}")) for i in counter)
+
+    contents = {}
+    for command in protocol["commands"]:
+        if command["commandType"] == "loadLiquid":
+            labware = command["params"]["labwareId"]
+            for well in command["params"]["volumeByWell"]:
+                contents.setdefault((labware, well), set()).add((labware, well))
+
+    commands = []
+    for liquid, run in liquid_runs(protocol["commands"]):
+        commands += rewrite_run(run, deck, contents, method, keys) if liquid else run
+
+    # Tip pick-ups are renumbered across runs so every pipette uses its
+    # tips in the original order
+    originals = {}
+    for command in protocol["commands"]:
+        if command["commandType"] == "pickUpTip":
+            originals.setdefault(command["params"]["pipetteId"], []).append(command["params"])
+    picked = {pipette: iter(tips) for pipette, tips in originals.items()}
+    for command in commands:
+        if command["commandType"] == "pickUpTip":
+            original = next(picked[command["params"]["pipetteId"]])
+            command["params"].update(labwareId=original["labwareId"], wellName=original["wellName"])
+
+    optimized = copy.deepcopy({k: v for k, v in protocol.items() if k != "commands"})
+    optimized["commands"] = commands
+    surviving = {command["key"] for command in commands}
+    optimized["commandAnnotations"] = [
+        dict(a, commandKeys=[k for k in a.get("commandKeys", []) if k in surviving])
+        for a in protocol.get("commandAnnotations", [])
+        if any(k in surviving for k in a.get("commandKeys", []))]
+    return optimized
+
+
+def command_counts(protocol: dict) -> dict:
+    """
+    Commands in total and per liquid-handling type.
+    """
+    kinds = [command["commandType"] for command in protocol["commands"]]
+    return {"commands": len(kinds), "tips": kinds.count("pickUpTip"),
+            "aspirates": kinds.count("aspirate"), "dispenses": kinds.count("dispense")}
+
+
+def estimate_seconds(protocol: dict, timings: dict = None, tip_timings: dict = None) -> float:
+    """
+    Rough run time: per-step costs (multi_dispense.DEFAULT_TIMINGS and
+    tip_budget.DEFAULT_TIP_TIMINGS), plunger time at each command's flow
+    rate, gantry travel from each source through its dispenses and back
+    (travel_path.path_cost) and waitForDuration delays. Other module
+    commands are not timed.
+    """
+    t = dict(DEFAULT_TIMINGS, **(timings or {}))
+    tip_t = dict(DEFAULT_TIP_TIMINGS, **(tip_timings or {}))
+    deck = Deck(protocol)
+    seconds, source, stops = 0.0, None, []
+
+    def travel():
+        if source is not None and stops:
+            points = np.array(stops)
+            return path_cost(points, source, np.arange(len(stops)), np.zeros(len(stops)))["seconds"]
+        return 0.0
+
+    for command in protocol["commands"]:
+        kind, params = command["commandType"], command.get("params", {})
+        if kind == "pickUpTip":
+            seconds += tip_t["pick_up_tip"]
+        elif kind in ("dropTipInPlace", "dropTip"):
+            seconds += tip_t["drop_tip"]
+        elif kind == "aspirate":
+            seconds += travel()
+            source, stops = deck.point(params["labwareId"], params["wellName"]), []
+            seconds += t["aspirate"] + params["volume"] / params.get("flowRate", t["flow_rate"])
+        elif kind == "dispense":
+            stops.append(deck.point(params["labwareId"], params["wellName"]))
+            seconds += t["dispense"] + params["volume"] / params.get("flowRate", t["flow_rate"])
+        elif kind == "waitForDuration":
+            seconds += float(params.get("seconds", 0))
+    return seconds + travel()
+
+
+def format_report(name: str, before: dict, after: dict) -> str:
+    """
+    One-line summary of command counts and estimated time before and after.
+    """
+    parts = [f"{k} {before[k]} -> {after[k]}" for k in ("commands", "tips", "aspirates", "dispenses")]
+    saved = before["seconds"] - after["seconds"]
+    return (f"{name}: " + ", ".join(parts) + f", ~{before['seconds'] / 60:.1f} -> "
+            f"{after['seconds'] / 60:.1f} min ({saved / max(before['seconds'], 1e-9):.0%} faster)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("protocols", nargs="+", help="schema 8 protocol JSON files")
+    parser.add_argument("--out-dir", help="folder for the optimized protocols (default: next to each input)")
+    parser.add_argument("--suffix", default=" (optimized)", help="added to each output file name")
+    parser.add_argument("--order", default="2opt", choices=("plate", "serpentine", "nearest", "2opt"),
+                        help="well order within each liquid")
+    args = parser.parse_args(argv)
+
+    for path in args.protocols:
+        protocol = load_protocol(path)
+        optimized = optimize_protocol(protocol, args.order)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        out_dir = args.out_dir or os.path.dirname(path)
+        os.makedirs(out_dir or ".", exist_ok=True)
+        out = os.path.join(out_dir, stem + args.suffix + ".json")
+        with open(out, "w", encoding="utf-8") as file:
+            json.dump(optimized, file, indent=2, ensure_ascii=False)
+        before = dict(command_counts(protocol), seconds=estimate_seconds(protocol))
+        after = dict(command_counts(optimized), seconds=estimate_seconds(optimized))
+        print(format_report(stem, before, after))
+        print(f"  wrote {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
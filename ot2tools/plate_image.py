@@ -0,0 +1,304 @@
+"""
+Precipitation flags from top-down plate images.
+
+Replaces the notebook's hand-typed ``flags`` list. For each photo or scan
+of a 96-well plate:
+
+1. register_grid finds the 8 x 12 well centres. Pixel columns and rows
+   through wells cross many well rims, those between wells cross none, so
+   a lattice is fitted to the summed edge strength along each column and
+   row. Rotated photos can pass the A1/A12/H1 centres instead.
+2. well_features samples a disk inside every well at once and returns
+   colour, brightness and texture per well. Texture is the brightness
+   interquartile range over the median, so a glare spot or a dim corner
+   of the photo does not read as turbidity.
+3. flag_wells scores each well's texture against clear reference wells,
+   splits the scores into two classes (Otsu) and reports a confidence.
+
+Batch mode writes ``<image name>.flags.csv`` files that ot2tools.batch
+picks up for the run log of the same name:
+
+    python -m ot2tools.plate_image IMAGE_DIR --out RUN_LOG_DIR
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ot2tools.flags import FLAGS_SUFFIX, flags_path
+from ot2tools.synthetic import WELL_NAMES
+
+N_ROWS, N_COLUMNS = 8, 12
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+# Registration runs on a copy scaled down to about this many pixels across
+REGISTRATION_SIZE = 600
+
+
+def load_image(path: str) -> np.ndarray:
+    """
+    Reads an image as a float RGB array in [0, 1].
+    """
+    from PIL import Image
+
+    with Image.open(path) as image:
+        return np.asarray(image.convert("RGB"), dtype=np.float64) / 255
+
+
+def _downscale(image: np.ndarray, size: int = REGISTRATION_SIZE):
+    factor = max(1, max(image.shape[:2]) // size)
+    height, width = (image.shape[0] // factor) * factor, (image.shape[1] // factor) * factor
+    small = image[:height, :width].reshape(height // factor, factor, width // factor, factor, -1)
+    return small.mean(axis=(1, 3)), factor
+
+
+def _fit_lattice(profile: np.ndarray, n: int, min_fraction: float = 1 / 3,
+                 plateau: float = 0.2) -> tuple:
+    """
+    Fits n evenly spaced peaks to a profile.
+
+    Every (offset, pitch) pair is scored at once as the mean profile at the
+    n lattice points minus the mean at the n - 1 midpoints between them.
+    Offsets scoring within ``plateau`` of the best (relative to the median
+    offset) count as tied, and the middle of the tied run is returned.
+
+    Returns:
+        tuple: (first centre, pitch) in profile samples.
+    """
+    length = len(profile)
+    pitches = np.arange(length * min_fraction / n, (length - 1) / (n - 1), 0.25)
+    offsets = np.arange(0, length, 0.5)
+    steps = np.arange(n)
+    centres = offsets[None, :, None] + pitches[:, None, None] * steps
+    valid = centres[..., -1] <= length - 1
+    peaks = np.interp(centres, np.arange(length), profile).mean(axis=-1)
+    gaps = np.interp(centres[..., :-1] + pitches[:, None, None] / 2,
+                     np.arange(length), profile).mean(axis=-1)
+    score = np.where(valid, peaks - gaps, -np.inf)
+    p, o = np.unravel_index(np.argmax(score), score.shape)
+    # A line anywhere across a well crosses the same rims, so the best
+    # offsets form a plateau as wide as a well; take its middle
+    best = score[p]
+    on_plateau = best >= best[o] - plateau * (best[o] - np.median(best[np.isfinite(best)]))
+    first, last = o, o
+    while first > 0 and on_plateau[first - 1]:
+        first -= 1
+    while last < len(on_plateau) - 1 and on_plateau[last + 1]:
+        last += 1
+    return (offsets[first] + offsets[last]) / 2, pitches[p]
+
+
+def grid_from_corners(a1, a12, h1=None) -> np.ndarray:
+    """
+    Well centres from the A1 and A12 centres and either H1 or, for an
+    axis-aligned image, H12 given as the second point.
+
+    Returns:
+        np.ndarray: (8, 12, 2) x/y pixel centres, rows A-H by columns 1-12.
+    """
+    a1 = np.asarray(a1, dtype=float)
+    if h1 is None:
+        h12 = np.asarray(a12, dtype=float)
+        a12, h1 = np.array([h12[0], a1[1]]), np.array([a1[0], h12[1]])
+    column_step = (np.asarray(a12, dtype=float) - a1) / (N_COLUMNS - 1)
+    row_step = (np.asarray(h1, dtype=float) - a1) / (N_ROWS - 1)
+    rows, columns = np.mgrid[0:N_ROWS, 0:N_COLUMNS]
+    return a1 + columns[..., None] * column_step + rows[..., None] * row_step
+
+
+def register_grid(image: np.ndarray, corners=None) -> np.ndarray:
+    """
+    Locates the well centres of a top-down plate image, A1 at the top left.
+
+    Args:
+        image (np.ndarray): RGB image, (height, width, 3).
+        corners (tuple): Optional, (A1, A12, H1) or (A1, H12) centres as (x, y)
+            pixels; skips the automatic search.
+
+    Returns:
+        np.ndarray: (8, 12, 2) x/y pixel centres.
+    """
+    if corners is not None:
+        return grid_from_corners(*corners)
+
+    small, factor = _downscale(image)
+    gray = small.mean(axis=-1)
+    # A pixel column through a well row crosses two rim edges per well; one
+    # between wells crosses only the plate's own edges
+    column_edges = np.abs(np.diff(gray, axis=0)).sum(axis=0)
+    row_edges = np.abs(np.diff(gray, axis=1)).sum(axis=1)
+    x0, x_pitch = _fit_lattice(column_edges, N_COLUMNS)
+    y0, y_pitch = _fit_lattice(row_edges, N_ROWS)
+
+    # Block centres: sample i of the small image covers pixels [i*f, (i+1)*f)
+    to_full = lambda v: (v + 0.5) * factor - 0.5
+    a1 = (to_full(x0), to_full(y0))
+    h12 = (to_full(x0 + (N_COLUMNS - 1) * x_pitch), to_full(y0 + (N_ROWS - 1) * y_pitch))
+    return grid_from_corners(a1, h12)
+
+
+def well_features(image: np.ndarray, centres: np.ndarray, radius: float = None,
+                  max_samples: int = 400) -> pd.DataFrame:
+    """
+    Colour and texture of a disk inside every well, in one vectorized pass.
+
+    Args:
+        image (np.ndarray): RGB image in [0, 1].
+        centres (np.ndarray): (8, 12, 2) output of register_grid.
+        radius (float): Sampling radius in pixels. Defaults to 0.3 of the well
+            pitch, clear of the well walls.
+        max_samples (int): Upper bound on pixels sampled per well.
+
+    Returns:
+        pd.DataFrame: One row per well in WELL_NAMES order with 'Red',
+        'Green', 'Blue', 'Brightness' and 'Texture' (brightness interquartile
+        range over the median brightness).
+    """
+    # Column-major, like plate.wells()
+    points = centres.transpose(1, 0, 2).reshape(-1, 2)
+    if radius is None:
+        pitch = np.linalg.norm(centres[0, 1] - centres[0, 0])
+        radius = 0.3 * pitch
+    step = max(1.0, np.sqrt(np.pi * radius ** 2 / max_samples))
+    grid = np.arange(-radius, radius + step / 2, step)
+    dx, dy = np.meshgrid(grid, grid)
+    inside = dx ** 2 + dy ** 2 <= radius ** 2
+    offsets = np.stack([dx[inside], dy[inside]], axis=-1)
+
+    samples = np.rint(points[:, None, :] + offsets[None]).astype(np.intp)
+    xs = np.clip(samples[..., 0], 0, image.shape[1] - 1)
+    ys = np.clip(samples[..., 1], 0, image.shape[0] - 1)
+    pixels = image[ys, xs]  # (wells, samples, 3)
+    brightness = pixels @ np.array([0.299, 0.587, 0.114])
+    rgb = pixels.mean(axis=1)
+    low, median, high = np.percentile(brightness, [25, 50, 75], axis=1)
+    return pd.DataFrame({"Well": WELL_NAMES, "Red": rgb[:, 0], "Green": rgb[:, 1],
+                         "Blue": rgb[:, 2], "Brightness": brightness.mean(axis=1),
+                         "Texture": (high - low) / np.maximum(median, 1e-6)})
+
+
+def _robust_z(values, reference):
+    median = np.median(values[reference])
+    spread = 1.4826 * np.median(np.abs(values[reference] - median))
+    return (values - median) / max(spread, 1e-6)
+
+
+def _otsu(scores: np.ndarray) -> float:
+    """
+    Threshold splitting scores into two classes with the largest between-class variance.
+    """
+    ordered = np.sort(scores)
+    n = len(ordered)
+    k = np.arange(1, n)
+    below = np.cumsum(ordered)[:-1]
+    mean_low = below / k
+    mean_high = (ordered.sum() - below) / (n - k)
+    between = k * (n - k) * (mean_low - mean_high) ** 2
+    i = int(np.argmax(between))
+    return (ordered[i] + ordered[i + 1]) / 2
+
+
+def flag_wells(features: pd.DataFrame, blank_wells=None, threshold: float = None,
+               min_separation: float = 4.0) -> pd.DataFrame:
+    """
+    Turns well features into 'y'/'n' flags with a confidence.
+
+    A well's score is the robust z-score of its log texture against clear
+    reference wells: the blank_wells if given, otherwise the less textured
+    half of the plate. Brightness is left out, as a clear well's blue
+    deepens with its copper and the light falls off across a photo.
+
+    Args:
+        features (pd.DataFrame): Output of well_features.
+        blank_wells (list): Optional, wells known to be clear.
+        threshold (float): Optional, fixed score threshold. Defaults to an
+            Otsu split of this plate's scores.
+        min_separation (float): With no fixed threshold, if the two Otsu
+            classes are closer than this many within-class standard
+            deviations the plate is taken to have no precipitate.
+
+    Returns:
+        pd.DataFrame: 'Well', 'Flag', 'Confidence' (0.5-1) and 'Score',
+        followed by the features.
+    """
+    texture = features["Texture"].to_numpy()
+    if blank_wells is not None:
+        reference = features["Well"].isin(blank_wells).to_numpy()
+    else:
+        reference = texture <= np.median(texture)
+    score = _robust_z(np.log(np.maximum(texture, 1e-6)), reference)
+
+    split = _otsu(score) if threshold is None else threshold
+    high = score > split
+    spread = np.sqrt(np.mean([np.var(score[m]) for m in (high, ~high) if m.sum() > 1] or [1.0]))
+    spread = max(spread, 1e-6)
+    if threshold is None and high.any() and (~high).any():
+        separation = (score[high].mean() - score[~high].mean()) / spread
+        if separation < min_separation:
+            split, high = score.max() + spread, np.zeros(len(score), dtype=bool)
+
+    probability = 1 / (1 + np.exp(-(score - split) / spread))
+    result = features[["Well"]].copy()
+    result["Flag"] = np.where(high, "y", "n")
+    result["Confidence"] = np.where(high, probability, 1 - probability)
+    result["Score"] = score
+    return result.join(features.drop(columns="Well"))
+
+
+def flag_image(path: str, corners=None, blank_wells=None, threshold: float = None) -> pd.DataFrame:
+    """
+    Registers, measures and flags one plate image.
+    """
+    image = load_image(path)
+    centres = register_grid(image, corners)
+    return flag_wells(well_features(image, centres), blank_wells, threshold)
+
+
+def _flag_job(job):
+    path, out_path, blank_wells, threshold = job
+    flags = flag_image(path, blank_wells=blank_wells, threshold=threshold)
+    flags.to_csv(out_path, index=False)
+    return os.path.basename(path), int((flags["Flag"] == "y").sum()), float(flags["Confidence"].min())
+
+
+def flag_folder(image_dir: str, out_dir: str = None, blank_wells=None, threshold: float = None,
+                jobs: int = None, log=print) -> list:
+    """
+    Flags every plate image in a folder in parallel.
+
+    Writes ``<image name>.flags.csv`` (Well, Flag, Confidence and the
+    features) for each image, the flags file ot2tools.batch reads for the run
+    log with the same name.
+
+    Returns:
+        list: Paths of the flags files written.
+    """
+    out_dir = out_dir or image_dir
+    os.makedirs(out_dir, exist_ok=True)
+    images = sorted(name for name in os.listdir(image_dir)
+                    if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS)
+    work = [(os.path.join(image_dir, name), flags_path(out_dir, name), blank_wells, threshold)
+            for name in images]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        for name, precipitated, confidence in pool.map(_flag_job, work):
+            log(f"{name}: {precipitated} precipitated, lowest confidence {confidence:.2f}")
+    return [job[1] for job in work]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("image_dir", help="folder of top-down plate images")
+    parser.add_argument("--out", help=f"folder for the {FLAGS_SUFFIX} files (default: image_dir)")
+    parser.add_argument("--blank", nargs="+", metavar="WELL", help="wells known to be clear")
+    parser.add_argument("--threshold", type=float, help="fixed score threshold")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    flag_folder(args.image_dir, args.out, args.blank, args.threshold, args.jobs)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
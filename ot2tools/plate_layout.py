@@ -0,0 +1,210 @@
+"""
+Plate layouts for designs longer than one 96-well plate.
+
+load_plates loads as many plates as a design needs onto free deck slots,
+nearest the first plate, optionally putting the first plate on a
+Heater-Shaker as in the Heater Shaker Test tutorial. PlateLayout maps every
+design row to a (plate, well) so reagent passes can sweep all plates with
+one tip, and writes the mapping into the run log as one comment per plate.
+read_layout recovers it from a run log and join_layout attaches the design
+row to each extracted well:
+
+    columns = extract_dispense_columns("run.json", by_labware=True)
+    wells = join_layout(columns_to_dataframe(columns), read_layout("run.json"))
+"""
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from ot2tools.labware import SLOT_ORIGINS
+from ot2tools.run_log import iter_commands
+from ot2tools.tip_budget import allocate_slots, free_slots
+
+WELLS_PER_PLATE = 96
+# plate.wells() order of a 96-well plate, for logs that only carry the layout comments
+WELL_NAMES = [f"{r}{c}" for c in range(1, 13) for r in "ABCDEFGH"]
+HEATER_SHAKER_MODEL = "heaterShakerModuleV1"
+HEATER_SHAKER_ADAPTER = "opentrons_96_pcr_adapter"
+LAYOUT_COMMENT = "Plate {plate} (slot {slot}): design rows {first}-{last}"
+# Centre-to-centre distance of neighbouring deck slots (mm, x and y)
+SLOT_PITCH = (SLOT_ORIGINS[2][0] - SLOT_ORIGINS[1][0], SLOT_ORIGINS[4][1] - SLOT_ORIGINS[1][1])
+_LAYOUT_PATTERN = re.compile(r"Plate (\d+) \(slot (\w+)\): design rows (\d+)-(\d+)")
+
+
+def plates_needed(n_rows: int, wells_per_plate: int = WELLS_PER_PLATE) -> int:
+    """
+    Plates holding n_rows design rows, one row per well.
+    """
+    return -(-int(n_rows) // wells_per_plate)
+
+
+def labware_slot(labware) -> str:
+    """
+    Deck slot a labware sits in, following adapters and modules down to the deck.
+    """
+    parent = labware
+    while not isinstance(parent, str):
+        parent = parent.parent
+    return parent
+
+
+def heater_shaker_neighbours(protocol) -> list:
+    """
+    Slots left, right, in front of and behind each loaded Heater-Shaker.
+    The pipette may not move to labware in them while the module shakes,
+    and the OT-2 does not allow tall labware such as tip racks beside it.
+    """
+    blocked = []
+    for slot, module in protocol.loaded_modules.items():
+        if type(module).__name__ != "HeaterShakerContext":
+            continue
+        x, y = SLOT_ORIGINS[int(slot)]
+        # One slot pitch away along exactly one axis
+        blocked += [s for s, (sx, sy) in SLOT_ORIGINS.items()
+                    if (sx == x and abs(sy - y) == SLOT_PITCH[1])
+                    or (sy == y and abs(sx - x) == SLOT_PITCH[0])]
+    return sorted(set(blocked))
+
+
+def load_plates(protocol, load_name: str, n_rows: int, first_slot=2, heater_shaker_slot=None,
+                wells_per_plate: int = WELLS_PER_PLATE) -> list:
+    """
+    Loads enough plates for n_rows design rows.
+
+    Args:
+        protocol: The ProtocolContext.
+        load_name (str): Plate load name.
+        n_rows (int): Design rows, one well each.
+        first_slot: Slot of the first deck plate; further plates go on the
+            free slots nearest to it.
+        heater_shaker_slot: Optional, slot for a Heater-Shaker carrying the
+            first plate on its 96 PCR adapter. The latch is closed so the
+            pipette may reach it, and no deck plate goes in a slot next to
+            the module (see heater_shaker_neighbours), where the pipette may
+            not go while it shakes.
+        wells_per_plate (int): Wells per plate.
+
+    Returns:
+        list: The loaded plates, in the order design rows fill them.
+
+    Raises:
+        ValueError: If the deck has too few free slots.
+    """
+    n_plates = max(plates_needed(n_rows, wells_per_plate), 1)
+    plates = []
+    if heater_shaker_slot is not None:
+        module = protocol.load_module(HEATER_SHAKER_MODEL, heater_shaker_slot)
+        plates.append(module.load_adapter(HEATER_SHAKER_ADAPTER).load_labware(load_name))
+        module.close_labware_latch()
+        n_plates -= 1
+    if n_plates > 0:
+        free = [slot for slot in free_slots(protocol) if slot not in heater_shaker_neighbours(protocol)]
+        first = [int(first_slot)] if int(first_slot) in free else []
+        rest = allocate_slots(n_plates - len(first), [s for s in free if s not in first], first_slot)
+        plates += [protocol.load_labware(load_name, slot) for slot in first + rest]
+    return plates
+
+
+def layout_table(n_rows: int, slots, well_names=WELL_NAMES) -> pd.DataFrame:
+    """
+    Row -> (plate, slot, well) for design rows filling plates in order.
+
+    Args:
+        n_rows (int): Design rows.
+        slots (list): Slot of each plate, in fill order.
+        well_names (list): Well names in plate.wells() order.
+
+    Returns:
+        pd.DataFrame: Row (0-based design row), Plate (1-based), Slot and Well.
+    """
+    rows = np.arange(n_rows)
+    plate = rows // len(well_names)
+    if n_rows and plate[-1] >= len(slots):
+        raise ValueError(f"{n_rows} design rows need {plate[-1] + 1} plates, "
+                         f"only {len(slots)} given.")
+    return pd.DataFrame({"Row": rows, "Plate": plate + 1,
+                         "Slot": np.asarray([str(s) for s in slots], dtype=object)[plate],
+                         "Well": np.asarray(well_names, dtype=object)[rows % len(well_names)]})
+
+
+class PlateLayout:
+    """
+    Where each design row goes on a set of loaded plates.
+
+    Args:
+        plates (list): Loaded plates, in fill order (e.g. from load_plates).
+        n_rows (int): Design rows.
+
+    Raises:
+        ValueError: If the plates have fewer wells than there are rows.
+    """
+
+    def __init__(self, plates: list, n_rows: int):
+        self.plates = plates
+        self.n_rows = n_rows
+        well_names = [well.well_name for well in plates[0].wells()]
+        self.table = layout_table(n_rows, [labware_slot(p) for p in plates], well_names)
+        self.wells = [plates[p - 1][w] for p, w in zip(self.table["Plate"], self.table["Well"])]
+
+    def comments(self) -> list:
+        """
+        One LAYOUT_COMMENT per plate in use, for protocol.comment().
+        """
+        groups = self.table.groupby("Plate", sort=True)
+        return [LAYOUT_COMMENT.format(plate=plate, slot=g["Slot"].iat[0], first=g["Row"].iat[0],
+                                      last=g["Row"].iat[-1]) for plate, g in groups]
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def __repr__(self):
+        return f"PlateLayout(rows={self.n_rows}, plates={len(self.plates)})"
+
+
+def read_layout(source, well_names=WELL_NAMES) -> pd.DataFrame:
+    """
+    Rebuilds the layout table from the LAYOUT_COMMENT lines of a run log.
+
+    Args:
+        source: Path to the run-log JSON, an open file, or an iterable of commands.
+        well_names (list): Well names in plate.wells() order.
+
+    Returns:
+        pd.DataFrame: As layout_table; empty if the log has no layout comments.
+    """
+    if isinstance(source, (str, bytes, os.PathLike)) or hasattr(source, "read"):
+        commands = iter_commands(source)
+    else:
+        commands = source
+    parts = []
+    for entry in commands:
+        if entry.get("commandType") != "comment":
+            continue
+        match = _LAYOUT_PATTERN.search(entry.get("params", {}).get("message", ""))
+        if match:
+            plate, slot, first, last = match.groups()
+            rows = np.arange(int(first), int(last) + 1)
+            wells = np.asarray(well_names, dtype=object)[rows % len(well_names)]
+            parts.append(pd.DataFrame({"Row": rows, "Plate": int(plate), "Slot": slot, "Well": wells}))
+    if not parts:
+        return pd.DataFrame({"Row": [], "Plate": [], "Slot": [], "Well": []})
+    return pd.concat(parts, ignore_index=True)
+
+
+def join_layout(wells: pd.DataFrame, layout: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the design Row and Plate to extracted wells, matching on Slot and Well.
+
+    Args:
+        wells (pd.DataFrame): Extracted wells with Slot and Well columns
+            (extract_dispense_columns with by_labware=True).
+        layout (pd.DataFrame): From layout_table, PlateLayout.table or read_layout.
+
+    Returns:
+        pd.DataFrame: wells with Row and Plate columns, in the same order;
+        wells outside the layout get NaN.
+    """
+    keys = layout[["Slot", "Well", "Row", "Plate"]].astype({"Slot": str})
+    return wells.astype({"Slot": str}).merge(keys, on=["Slot", "Well"], how="left")
@@ -0,0 +1,225 @@
+"""
+Headless concentration-space plots for one or many runs.
+
+plot_concentration_space draws the notebook's fitted Ksp figure with one
+scatter call per flag instead of one per well, on a bare Agg figure (no
+pyplot, no display). export_grids lays many runs out as pages of subplots,
+renders the pages in worker processes and keeps every rendered page in a
+cache keyed by the SHA-256 of the data drawn on it, so unchanged pages are
+copied instead of redrawn:
+
+    python -m ot2tools.plotting BATCH_OUT_DIR --out plots
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from ot2tools.analysis import ksp_model
+from ot2tools.design_loader import load_design
+
+CACHE_DIR_NAME = ".plot_cache"
+# Bump when the drawing code changes so old cached images are not reused
+STYLE_VERSION = 1
+FLAG_STYLES = {"y": ("red", "o", "Precipitate"), "n": ("blue", "s", "No precipitate")}
+
+
+def new_figure(width: float, height: float):
+    """
+    Returns a Figure attached to an Agg canvas, independent of pyplot state.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(width, height))
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def plot_concentration_space(ax, cu_fraction, gly_fraction, flags, a: float = None,
+                             title: str = None, marker_size: float = 60, legend: bool = True):
+    """
+    Draws flagged wells, the fitted boundary y = a / x and the concentration triangle.
+
+    Args:
+        ax: Matplotlib axes to draw on.
+        cu_fraction, gly_fraction (array-like): Well fractions.
+        flags (array-like): 'y'/'n' per well; other wells are not drawn.
+        a (float): Optional, fitted Ksp. NaN or None skips the curve.
+        title (str): Optional, axes title.
+        marker_size (float): Scatter marker area.
+        legend (bool): Draw a legend.
+    """
+    cu_fraction, gly_fraction = np.asarray(cu_fraction), np.asarray(gly_fraction)
+    flags = np.asarray(flags)
+    for flag, (color, marker, label) in FLAG_STYLES.items():
+        mask = flags == flag
+        if mask.any():
+            ax.scatter(cu_fraction[mask], gly_fraction[mask], color=color, marker=marker,
+                       edgecolor="k", s=marker_size, label=label)
+
+    if a is not None and np.isfinite(a):
+        xrange = np.linspace(0.01, 1, 500)
+        yfit = ksp_model(xrange, a)
+        # Keep only (x, y) pairs where x + y <= 2, as in the notebook
+        valid = (xrange + yfit) <= 2
+        ax.plot(xrange[valid], yfit[valid], "g--", linewidth=2, label="Fitted Boundary")
+    ax.plot([0, 1, 0, 0], [0, 0, 1, 0], "k--", lw=1.5, label="Concentration Boundary")
+
+    ax.set_xlabel("Cu Fraction")
+    ax.set_ylabel("Glycine Fraction")
+    ax.set_title(title if title is not None else "Fitted Ksp Curve")
+    ax.set_xlim(-0.05, 1.05)
+    ax.set_ylim(-0.05, 1.05)
+    ax.grid(True)
+    if legend:
+        ax.legend()
+    return ax
+
+
+def data_hash(runs, **options) -> str:
+    """
+    SHA-256 over everything that affects a rendered image.
+
+    Args:
+        runs: Iterable of (name, cu_fraction, gly_fraction, flags, a).
+        options: Layout options, included in the hash.
+    """
+    digest = hashlib.sha256(f"v{STYLE_VERSION}|{sorted(options.items())}".encode())
+    for name, cu, gly, flags, a in runs:
+        digest.update(f"|{name}|{None if a is None else float(a)!r}|".encode())
+        digest.update(np.ascontiguousarray(cu, dtype=np.float64).tobytes())
+        digest.update(np.ascontiguousarray(gly, dtype=np.float64).tobytes())
+        digest.update("\0".join(np.asarray(flags, dtype=str)).encode())
+    return digest.hexdigest()
+
+
+def render_page(runs, path: str, ncols: int = 4, panel_size: float = 4.0, dpi: int = 100) -> str:
+    """
+    Renders a grid of runs, one subplot each, to an image file.
+
+    Args:
+        runs (list): (name, cu_fraction, gly_fraction, flags, a) per run.
+        path (str): Output image; the format follows the extension.
+        ncols (int): Subplots per row.
+        panel_size (float): Subplot width and height in inches.
+        dpi (int): Output resolution.
+    """
+    ncols = max(1, min(ncols, len(runs)))
+    nrows = -(-len(runs) // ncols)
+    fig = new_figure(ncols * panel_size, nrows * panel_size)
+    for i, (name, cu, gly, flags, a) in enumerate(runs):
+        ax = fig.add_subplot(nrows, ncols, i + 1)
+        title = name if a is None or not np.isfinite(a) else f"{name}: a = {a:.4f}"
+        plot_concentration_space(ax, cu, gly, flags, a, title,
+                                 marker_size=60 if len(runs) == 1 else 20, legend=i == 0)
+    fig.tight_layout()
+    fig.savefig(path, dpi=dpi)
+    return path
+
+
+def render_cached(runs, path: str, cache_dir: str, **options) -> bool:
+    """
+    render_page through an image cache keyed by data_hash.
+
+    Returns:
+        bool: True if the image came from the cache.
+    """
+    extension = os.path.splitext(path)[1]
+    cached = os.path.join(cache_dir, data_hash(runs, **options) + extension)
+    hit = os.path.exists(cached)
+    if not hit:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Render under a temporary name so a crash never leaves a broken cache entry
+        tmp = cached[:-len(extension)] + ".tmp" + extension
+        render_page(runs, tmp, **options)
+        os.replace(tmp, cached)
+    shutil.copyfile(cached, path)
+    return hit
+
+
+def _render_job(job):
+    runs, path, cache_dir, options = job
+    return render_cached(runs, path, cache_dir, **options)
+
+
+def split_runs(wells: pd.DataFrame, fits: pd.DataFrame = None, by: str = "Run") -> list:
+    """
+    Splits a per-well table (and optional per-run fits) into plotting tuples.
+
+    Returns:
+        list: (name, cu_fraction, gly_fraction, flags, a) per run, in table order.
+    """
+    ksp = {} if fits is None else dict(zip(fits[by], fits["Ksp"]))
+    groups = wells.groupby(by, sort=False) if by in wells.columns else [("", wells)]
+    return [(str(name), g["Cu Fraction"].to_numpy(), g["Gly Fraction"].to_numpy(),
+             g["Flag"].to_numpy(dtype=str), ksp.get(name)) for name, g in groups]
+
+
+def export_grids(runs, out_dir: str, per_page: int = 16, ncols: int = 4, fmt: str = "png",
+                 jobs: int = None, cache_dir: str = None, dpi: int = 100, log=print) -> list:
+    """
+    Renders runs as pages of subplot grids in parallel.
+
+    Args:
+        runs (list): Output of split_runs.
+        out_dir (str): Folder for the page images.
+        per_page (int): Runs per page.
+        ncols (int): Subplots per row.
+        fmt (str): Image format/extension, e.g. "png", "svg" or "pdf".
+        jobs (int): Worker processes. Defaults to the number of CPUs.
+        cache_dir (str): Image cache. Defaults to a .plot_cache folder in out_dir.
+        dpi (int): Output resolution.
+        log: Progress callback.
+
+    Returns:
+        list: Paths of the pages written.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    cache_dir = cache_dir or os.path.join(out_dir, CACHE_DIR_NAME)
+    options = {"ncols": ncols, "dpi": dpi}
+    pages = [runs[i:i + per_page] for i in range(0, len(runs), per_page)]
+    paths = [os.path.join(out_dir, f"page-{k + 1:03d}.{fmt}") for k in range(len(pages))]
+    work = [(page, path, cache_dir, options) for page, path in zip(pages, paths)]
+    if len(work) > 1 and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            hits = list(pool.map(_render_job, work))
+    else:
+        hits = [_render_job(job) for job in work]
+    log(f"{len(paths)} page(s) for {len(runs)} run(s), {sum(hits)} from cache")
+    return paths
+
+
+def _find_table(folder: str, stem: str) -> str:
+    for extension in (".parquet", ".npz", ".csv"):
+        path = os.path.join(folder, stem + extension)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"No {stem} table in {folder}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("results", help="ot2tools.batch output folder")
+    parser.add_argument("--out", default="plots", help="folder for the page images")
+    parser.add_argument("--per-page", type=int, default=16)
+    parser.add_argument("--columns", type=int, default=4)
+    parser.add_argument("--format", default="png")
+    parser.add_argument("--dpi", type=int, default=100)
+    parser.add_argument("--jobs", type=int, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    wells = load_design(_find_table(args.results, "wells"))
+    fits = load_design(_find_table(args.results, "fits"))
+    export_grids(split_runs(wells, fits), args.out, args.per_page, args.columns, args.format,
+                 args.jobs, dpi=args.dpi)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
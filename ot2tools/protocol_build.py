@@ -0,0 +1,315 @@
+"""
+Build step that bakes a Python protocol into a self-contained one.
+
+CompleteExperimentCode.py imports pandas and reads LabData.xlsx inside
+run(), so every analysis on the robot pays for pandas and openpyxl and needs
+the spreadsheet copied over. build_protocol runs the protocol off-robot
+against the run_time recording context, records every call run() makes on
+the ProtocolContext, its pipettes, labware, wells and modules (with the
+wells, locations and volumes they were given), and writes a protocol that
+carries those calls as an embedded OPS literal and replays them. The built
+file imports only opentrons, so analysing it on the robot is a short loop:
+
+    python -m ot2tools.protocol_build ExperimentExampleCode/CompleteExperimentCode.py --cwd ExperimentExampleCode
+
+writes "CompleteExperimentCode (built).py" next to the source. Rebuild it
+whenever the design or the protocol changes.
+
+Anything run() decides from outside the ProtocolContext is decided at build
+time: the design sheet is read once, is_simulating() is True (as in
+opentrons_simulate), and background module holds (module_scheduler) are
+waited out for the time left on the estimated clock (run_time) rather than
+the robot's. Protocols that talk to other devices during the run (checkit's
+balance reader, the speaker test) should be run as they are.
+"""
+import argparse
+import contextlib
+import datetime
+import functools
+import hashlib
+import os
+import pprint
+import sys
+import types
+
+import numpy as np
+
+from ot2tools.run_time import (DEFAULT_API_LEVEL, HeaterShakerContext, Labware, Location, RecordingContext,
+                               RecordingPipette, TemperatureModuleContext, Well, _placeholder_opentrons,
+                               _working_dir)
+
+# Calls recorded on each stand-in class; calls they make internally are not
+RECORDED = {
+    RecordingContext: ("load_labware", "load_instrument", "load_module", "define_liquid", "comment",
+                       "pause", "delay", "home", "set_rail_lights"),
+    RecordingPipette: ("pick_up_tip", "drop_tip", "return_tip", "aspirate", "dispense", "blow_out", "mix",
+                       "air_gap", "touch_tip", "move_to", "transfer", "home"),
+    Labware: ("load_labware",),
+    Well: ("load_liquid",),
+    HeaterShakerContext: ("load_adapter", "load_labware", "set_target_temperature", "wait_for_temperature",
+                          "set_and_wait_for_temperature", "deactivate_heater", "set_and_wait_for_shake_speed",
+                          "deactivate_shaker", "open_labware_latch", "close_labware_latch"),
+    TemperatureModuleContext: ("set_temperature", "start_set_temperature", "await_temperature", "deactivate"),
+}
+# Pipette attributes a protocol may set; their assignments are recorded
+SETTABLE = ("tip_racks", "starting_tip", "default_speed")
+BUILT_SUFFIX = " (built)"
+
+# The built file: header, metadata, OPS and the replay loop. Values in OPS
+# are literals except {"o": i} (the i-th object the run created, 0 is the
+# protocol), {"w": [i, well]}, {"l": [i, well, z, dx, dy]} (a location z mm
+# above the well bottom) and {"p": [x, y, z]} (a deck point)
+TEMPLATE = '''"""
+{name} - built by ot2tools.protocol_build from {source}
+(sha256 {digest}) on {date}.
+
+Every call the source protocol's run() makes is in OPS and replayed in
+order; the design it was built from is not needed. Do not edit: rebuild.
+"""
+from opentrons import protocol_api, types
+
+metadata = {metadata}
+
+requirements = {requirements}
+
+# (target, method, args, kwargs, keeps result)
+OPS = [
+{ops}
+]
+
+
+def _value(value, objects):
+    if isinstance(value, dict):
+        (tag, item), = value.items()
+        if tag == "o":
+            return objects[item]
+        if tag == "w":
+            return objects[item[0]][item[1]]
+        if tag == "l":
+            location = objects[item[0]][item[1]].bottom(item[2])
+            return location.move(types.Point(item[3], item[4], 0)) if len(item) > 3 else location
+        if tag == "p":
+            return types.Location(types.Point(*item), None)
+        return {{key: _value(v, objects) for key, v in item.items()}}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_value(v, objects) for v in value)
+    return value
+
+
+def run(protocol: protocol_api.ProtocolContext):
+    objects = [protocol]
+    for target, method, args, kwargs, keep in OPS:
+        target = _value(target, objects) if isinstance(target, dict) else objects[target]
+        args = _value(args, objects)
+        kwargs = {{key: _value(v, objects) for key, v in kwargs.items()}}
+        if method.startswith("="):
+            *path, name = method[1:].split(".")
+            for part in path:
+                target = getattr(target, part)
+            setattr(target, name, args[0])
+        elif method.startswith("[]"):
+            getattr(target, method[2:])[args[0]] = args[1]
+        elif method.startswith("."):
+            objects.append(getattr(target, method[1:]))
+        else:
+            result = getattr(target, method)(*args, **kwargs)
+            if keep:
+                objects.append(result)
+'''
+
+
+class Recorder:
+    """
+    The calls a protocol made, as OPS entries, and the objects they created.
+    """
+
+    def __init__(self, ctx: RecordingContext):
+        self.ctx = ctx
+        self.ops = []
+        self.depth = 0  # > 0 inside a recorded call
+        self.objects = [ctx]
+        self.refs = {id(ctx): 0}
+
+    def register(self, obj) -> int:
+        self.refs[id(obj)] = len(self.objects)
+        self.objects.append(obj)
+        return self.refs[id(obj)]
+
+    def ref(self, obj) -> int:
+        if id(obj) not in self.refs:
+            if obj is self.ctx.fixed_trash:
+                self.ops.append((0, ".fixed_trash", (), {}, 1))
+                return self.register(obj)
+            raise ValueError(f"{obj!r} was not created by a recorded call.")
+        return self.refs[id(obj)]
+
+    def encode(self, value):
+        """
+        An OPS literal for a call argument.
+
+        Raises:
+            ValueError: For values that cannot be written as literals.
+        """
+        if isinstance(value, Location):
+            well = value.labware
+            if not isinstance(well, Well):
+                return {"p": list(value.point)}
+            bottom = well.bottom().point
+            offset = [round(value.point.z - bottom.z, 6)]
+            if value.point.x != bottom.x or value.point.y != bottom.y:
+                offset += [round(value.point.x - bottom.x, 6), round(value.point.y - bottom.y, 6)]
+            return {"l": [self.ref(well.parent), well.well_name] + offset}
+        if isinstance(value, Well):
+            return {"w": [self.ref(value.parent), value.well_name]}
+        if isinstance(value, (Labware, RecordingPipette, HeaterShakerContext, types.SimpleNamespace)):
+            return {"o": self.ref(value)}
+        if isinstance(value, (list, tuple)):
+            return type(value)(self.encode(v) for v in value)
+        if isinstance(value, dict):
+            return {"d": {key: self.encode(v) for key, v in value.items()}}
+        if isinstance(value, np.generic):
+            return value.item()
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        raise ValueError(f"Cannot write {value!r} into a built protocol.")
+
+    def add(self, target, method: str, args=(), kwargs=None, result=None):
+        target = self.encode(target) if isinstance(target, Well) else self.ref(target)
+        op = (target, method, self.encode(tuple(args)), self.encode(dict(kwargs or {}))["d"])
+        keep = result is not None and id(result) not in self.refs and isinstance(
+            result, (Labware, RecordingPipette, HeaterShakerContext, types.SimpleNamespace))
+        self.ops.append(op + (int(keep),))
+        if keep:
+            self.register(result)
+            if isinstance(result, RecordingPipette):
+                for name in ("flow_rate", "well_bottom_clearance"):
+                    object.__setattr__(result, name, _Settings(self, result, name, getattr(result, name)))
+
+
+class _Settings(types.SimpleNamespace):
+    # pipette.flow_rate / well_bottom_clearance that records assignments
+    def __init__(self, recorder: Recorder, pipette, name: str, values):
+        super().__init__(**vars(values))
+        object.__setattr__(self, "_recorded", (recorder, pipette, name))
+
+    def __setattr__(self, attribute, value):
+        recorder, pipette, name = self._recorded
+        if not recorder.depth:
+            recorder.add(pipette, f"={name}.{attribute}", (value,))
+        super().__setattr__(attribute, value)
+
+
+class _MaxSpeeds(dict):
+    # ctx.max_speeds that records assignments
+    def __init__(self, recorder: Recorder):
+        super().__init__()
+        self.recorder = recorder
+
+    def __setitem__(self, axis, value):
+        if not self.recorder.depth:
+            self.recorder.add(self.recorder.ctx, "[]max_speeds", (axis, value))
+        super().__setitem__(axis, value)
+
+
+@contextlib.contextmanager
+def _recording(recorders: list):
+    # Wraps the stand-ins' public calls and pipette attribute assignments for
+    # the recorder at the end of the list while the protocol runs
+    def wrap(method, name):
+        @functools.wraps(method)
+        def recorded(self, *args, **kwargs):
+            recorder = recorders[-1] if recorders else None
+            if recorder is None or recorder.depth:
+                return method(self, *args, **kwargs)
+            recorder.depth += 1
+            try:
+                result = method(self, *args, **kwargs)
+            finally:
+                recorder.depth -= 1
+            recorder.add(self, name, args, kwargs, result)
+            return result
+        return recorded
+
+    def set_attribute(self, name, value):
+        recorder = recorders[-1] if recorders else None
+        if recorder is not None and not recorder.depth and name in SETTABLE and id(self) in recorder.refs:
+            recorder.add(self, "=" + name, (value,))
+        object.__setattr__(self, name, value)
+
+    originals = [(cls, name, cls.__dict__.get(name)) for cls, names in RECORDED.items() for name in names]
+    originals.append((RecordingPipette, "__setattr__", RecordingPipette.__dict__.get("__setattr__")))
+    for cls, name, _ in originals[:-1]:
+        setattr(cls, name, wrap(getattr(cls, name), name))
+    RecordingPipette.__setattr__ = set_attribute
+    try:
+        yield
+    finally:
+        for cls, name, original in reversed(originals):
+            if original is None:
+                delattr(cls, name)
+            else:
+                setattr(cls, name, original)
+
+
+def record_protocol(path: str, cwd: str = None) -> tuple:
+    """
+    Runs a protocol's run() against a recording context.
+
+    Args:
+        path (str): The protocol file.
+        cwd (str): Optional, folder to run in (where the design file is).
+
+    Returns:
+        tuple: (namespace of the protocol module, Recorder).
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        code = compile(file.read(), path, "exec")
+    namespace = {"__name__": "__protocol__", "__file__": os.path.abspath(path)}
+    recorders = []
+    with _placeholder_opentrons(), _working_dir(cwd), _recording(recorders):
+        exec(code, namespace)
+        level = namespace.get("metadata", {}).get("apiLevel")
+        level = namespace.get("requirements", {}).get("apiLevel", level)
+        ctx = RecordingContext(level or DEFAULT_API_LEVEL)
+        recorder = Recorder(ctx)
+        ctx.max_speeds = ctx.gantry.max_speeds = _MaxSpeeds(recorder)
+        recorders.append(recorder)
+        namespace["run"](ctx)
+    return namespace, recorder
+
+
+def build_protocol(path: str, cwd: str = None) -> str:
+    """
+    The source of the self-contained protocol built from a Python protocol.
+    """
+    namespace, recorder = record_protocol(path, cwd)
+    with open(path, "rb") as file:
+        digest = hashlib.sha256(file.read()).hexdigest()
+    metadata = dict(namespace.get("metadata", {}))
+    name = metadata.get("protocolName", os.path.splitext(os.path.basename(path))[0])
+    metadata["protocolName"] = name + BUILT_SUFFIX
+    return TEMPLATE.format(
+        name=name, source=os.path.basename(path), digest=digest[:16],
+        date=datetime.date.today().isoformat(), metadata=pprint.pformat(metadata, sort_dicts=False),
+        requirements=pprint.pformat(namespace.get("requirements", {}), sort_dicts=False),
+        ops="\n".join(f"    {op!r}," for op in recorder.ops))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("protocol", help="Python protocol to build")
+    parser.add_argument("--cwd", help="folder the protocol runs in, where its design file is "
+                                      "(default: the current folder)")
+    parser.add_argument("--out", help=f"built file (default: the protocol name + '{BUILT_SUFFIX}.py')")
+    args = parser.parse_args(argv)
+
+    source = build_protocol(args.protocol, args.cwd)
+    out = args.out or os.path.splitext(args.protocol)[0] + BUILT_SUFFIX + ".py"
+    with open(out, "w", encoding="utf-8") as file:
+        file.write(source)
+    print(f"Wrote {out} ({source.count(chr(10))} lines, {len(source) / 1024:.0f} KiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
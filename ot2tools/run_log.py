@@ -0,0 +1,258 @@
+"""
+Streaming reader for OT-2 run-log JSON.
+
+json.load on a long run log builds every command (and everything else in
+the file) in memory before extract_dispense_data walks it. iter_commands
+instead reads the file in chunks, skips everything outside
+["commands"]["data"] without building it, and decodes one command at a
+time, so memory stays flat however long the run was.
+"""
+import codecs
+import json
+import os
+import re
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_STRING_SPECIAL = re.compile(r'["\\]')
+_NESTING_SPECIAL = re.compile(r'["\[\]{}]')
+
+
+class _StreamReader:
+    """
+    Incremental cursor over a text stream with just enough JSON to navigate.
+    """
+
+    def __init__(self, file, chunk_size: int):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+        self.text_decoder = codecs.getincrementaldecoder("utf-8")()
+
+    def fill(self) -> bool:
+        """Reads another chunk, dropping what has been consumed. False at EOF."""
+        if self.eof:
+            return False
+        while True:
+            chunk = self.file.read(self.chunk_size)
+            if not chunk:
+                if isinstance(chunk, bytes):
+                    self.text_decoder.decode(b"", final=True)  # Raises on a truncated character
+                self.eof = True
+                return False
+            if isinstance(chunk, bytes):
+                # A chunk can end inside a multibyte character and decode to
+                # nothing yet; only an empty read is the end of the file
+                chunk = self.text_decoder.decode(chunk)
+                if not chunk:
+                    continue
+            self.buf = self.buf[self.pos:] + chunk
+            self.pos = 0
+            return True
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.fill():
+                raise ValueError("Unexpected end of run log.")
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' at offset {self.pos} of the run log.")
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number could continue into the next chunk
+            if end == len(self.buf) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip(self):
+        """Skips the next value without building it."""
+        if self.peek() not in "{[":
+            self.value()
+            return
+        depth, in_string = 0, False
+        while True:
+            pattern = _STRING_SPECIAL if in_string else _NESTING_SPECIAL
+            match = pattern.search(self.buf, self.pos)
+            if match is None or (in_string and match.group() == "\\" and match.end() == len(self.buf)):
+                self.pos = len(self.buf) if match is None else match.start()
+                if not self.fill():
+                    raise ValueError("Unexpected end of run log.")
+                continue
+            char = match.group()
+            self.pos = match.end()
+            if in_string:
+                if char == "\\":
+                    self.pos += 1  # Skip the escaped character
+                else:
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "{[":
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return
+
+    def members(self):
+        """Yields the keys of the object at the cursor; the caller consumes each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return
+
+
+def iter_commands(source, chunk_size: int = 1 << 16):
+    """
+    Yields the commands of an OT-2 run log one at a time.
+
+    Args:
+        source: Path to the run-log JSON, or an open (text or binary) file.
+        chunk_size (int): Characters/bytes read per chunk.
+
+    Yields:
+        dict: Each entry of ["commands"]["data"], in order.
+    """
+    if isinstance(source, (str, bytes, os.PathLike)):
+        with open(source, "rb") as file:
+            yield from iter_commands(file, chunk_size)
+        return
+
+    reader = _StreamReader(source, chunk_size)
+    for key in reader.members():
+        if key != "commands" or reader.peek() != "{":
+            reader.skip()
+            continue
+        for inner in reader.members():
+            if inner != "data" or reader.peek() != "[":
+                reader.skip()
+                continue
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+                continue
+            while True:
+                yield reader.value()
+                if reader.peek() == ",":
+                    reader.pos += 1
+                    continue
+                reader.expect("]")
+                break
+
+
+def extract_dispense_columns(source, cu_well: str = "A2", gly_well: str = "A3",
+                             by_labware: bool = False) -> dict:
+    """
+    Streaming, columnar equivalent of extract_dispense_data.
+
+    Volumes dispensed after an aspirate from cu_well count as Cu and after
+    gly_well as Glycine; wells appear in the order they were first dosed, and
+    sums are accumulated in command order, so the numbers are identical to
+    the notebook's function.
+
+    Args:
+        source: Path to the run-log JSON, an open file, or an iterable of commands.
+        cu_well (str): Reservoir well holding the Cu stock.
+        gly_well (str): Reservoir well holding the Glycine stock.
+        by_labware (bool): Key wells by (labwareId, wellName), for runs that
+            span several plates. The notebook keys by well name only.
+
+    Returns:
+        dict: Columns "Well", "Cu (µL)" and "Gly (µL)" as NumPy arrays, plus
+        "Labware" and its deck "Slot" (from the load commands, "" if the log
+        has none) when by_labware is set.
+    """
+    if isinstance(source, (str, bytes, os.PathLike)) or hasattr(source, "read"):
+        commands = iter_commands(source)
+    else:
+        commands = source
+    index, cu, gly = {}, [], []
+    slots = {}
+    last_aspirate_source = None
+
+    for entry in commands:
+        command_type = entry.get("commandType")
+        if by_labware and command_type in ("loadLabware", "loadModule"):
+            _record_slot(entry, slots)
+        elif command_type == "aspirate":
+            last_aspirate_source = entry["params"]["wellName"]
+        elif command_type == "dispense":
+            if last_aspirate_source != cu_well and last_aspirate_source != gly_well:
+                continue
+            params = entry["params"]
+            key = (params.get("labwareId"), params["wellName"]) if by_labware else params["wellName"]
+            i = index.get(key)
+            if i is None:
+                i = index[key] = len(cu)
+                cu.append(0)
+                gly.append(0)
+            if last_aspirate_source == cu_well:
+                cu[i] += params["volume"]
+            else:
+                gly[i] += params["volume"]
+
+    keys = list(index)
+    columns = {
+        "Well": np.array([k[1] for k in keys] if by_labware else keys, dtype=str),
+        "Cu (µL)": np.array(cu, dtype=np.float64),
+        "Gly (µL)": np.array(gly, dtype=np.float64),
+    }
+    if by_labware:
+        columns["Labware"] = np.array([str(k[0]) for k in keys], dtype=str)
+        columns["Slot"] = np.array([slots.get(k[0], "") for k in keys], dtype=str)
+    return columns
+
+
+def _record_slot(entry: dict, slots: dict):
+    """
+    Notes the deck slot of a loaded labware or module, following labware on
+    modules and adapters down to the deck.
+    """
+    params, result = entry.get("params", {}), entry.get("result") or {}
+    key = result.get("labwareId") or result.get("moduleId") or params.get("labwareId") \
+        or params.get("moduleId")
+    location = params.get("location") or {}
+    if "slotName" in location:
+        slots[key] = str(location["slotName"])
+    else:
+        parent = location.get("moduleId") or location.get("labwareId")
+        if parent in slots:
+            slots[key] = slots[parent]
+
+
+def columns_to_dataframe(columns: dict):
+    """
+    Builds the same DataFrame as create_dataframe from extracted columns.
+    """
+    import pandas as pd
+
+    return pd.DataFrame(columns)
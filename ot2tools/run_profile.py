@@ -0,0 +1,280 @@
+"""
+Per-command latency profile of completed OT-2 run logs.
+
+The Data Analysis notebook reads commandType, wellName and volume from a
+run log and ignores the startedAt/completedAt stamp on every command. This
+profiler streams one or many run logs (see run_log.iter_commands), times
+each command, tags it with its pipette, labware, slot and phase, and
+reports where the robot's time went:
+
+    python -m ot2tools.run_profile RUN_LOG.json [MORE.json ...] --top 15
+    python -m ot2tools.run_profile RUN_LOGS/*.json --plan ExperimentExampleCode/CompleteExperimentCode.py
+
+Phases follow the reservoir: a command belongs to the liquid last
+aspirated from PHASE_WELLS (A2 Cu, A1 DI Water, A3 Glycine), and the tip
+pick-up and moves that lead up to an aspirate belong to that aspirate's
+liquid. Module commands (Heater-Shaker waits, shaking, latch) are their
+own phase, and everything before the first aspirate is Setup.
+
+--plan puts the measured time per category next to the run_time estimate
+of the protocol. Measured tip pick-ups include the move to the rack, which
+the estimate counts as travel, so the pipetting/tips split is approximate;
+operator pauses are reported but not compared.
+"""
+import argparse
+import collections
+import datetime
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from ot2tools.run_log import _record_slot, iter_commands
+
+PHASE_WELLS = {"A2": "Cu", "A1": "DI Water", "A3": "Glycine"}
+MODULE_PHASES = {"heaterShaker": "Heater-Shaker", "temperatureModule": "Temperature Module",
+                 "thermocycler": "Thermocycler", "magneticModule": "Magnetic Module"}
+# Commands whose phase is decided by the next aspirate rather than the last one
+LEAD_IN = {"pickUpTip", "moveToWell", "moveToAddressableArea", "moveToCoordinates", "moveRelative"}
+CATEGORIES = {
+    "aspirate": "pipetting", "dispense": "pipetting", "blowout": "pipetting", "touchTip": "pipetting",
+    "moveToWell": "pipetting", "moveToAddressableArea": "pipetting", "moveToCoordinates": "pipetting",
+    "moveRelative": "pipetting", "aspirateInPlace": "pipetting", "dispenseInPlace": "pipetting",
+    "blowOutInPlace": "pipetting", "airGapInPlace": "pipetting",
+    "pickUpTip": "tips", "dropTip": "tips", "dropTipInPlace": "tips",
+    "moveToAddressableAreaForDropTip": "tips",
+    "waitForDuration": "delays", "home": "homing", "waitForResume": "pauses",
+}
+# run_time.Timeline kinds in the same categories
+PLAN_CATEGORIES = {"move": "pipetting", "aspirate": "pipetting", "dispense": "pipetting",
+                   "blow_out": "pipetting", "touch_tip": "pipetting", "tip": "tips",
+                   "module": "modules", "delay": "delays", "home": "homing"}
+COLUMNS = ["Run", "Index", "Command", "Phase", "Pipette", "Labware", "Slot", "Well",
+           "Volume (µL)", "Start (s)", "Duration (ms)", "Gap (ms)", "Status"]
+
+
+def _timestamp(value):
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def category(command: str) -> str:
+    """
+    The comparison category of a commandType (see CATEGORIES).
+    """
+    if "/" in command:
+        return "modules"
+    return CATEGORIES.get(command, "other")
+
+
+def profile_commands(source, run: str = "", phase_wells: dict = None) -> dict:
+    """
+    Times every command of one run log.
+
+    Args:
+        source: Path to the run-log JSON, an open file, or an iterable of commands.
+        run (str): Run name written in the "Run" column.
+        phase_wells (dict): Reservoir well name to phase; defaults to PHASE_WELLS.
+
+    Returns:
+        dict: COLUMNS as NumPy arrays, one row per command in run order.
+        "Start (s)" is from the first command's start, "Gap (ms)" the idle
+        time since the previous command completed, and durations are NaN for
+        commands that never ran.
+    """
+    if isinstance(source, (str, bytes, os.PathLike)) or hasattr(source, "read"):
+        source = iter_commands(source)
+    phase_wells = PHASE_WELLS if phase_wells is None else phase_wells
+    columns = {name: [] for name in COLUMNS}
+    labware, pipettes, slots = {}, {}, {}
+    phase, pending = "Setup", []
+    first_start = last_end = None
+
+    for entry in source:
+        command = entry.get("commandType", "")
+        params, result = entry.get("params") or {}, entry.get("result") or {}
+        if command in ("loadLabware", "loadModule"):
+            _record_slot(entry, slots)
+            key = result.get("labwareId") or result.get("moduleId")
+            labware[key] = params.get("loadName") or params.get("model") or ""
+        elif command == "loadPipette":
+            name, mount = params.get("pipetteName", ""), params.get("mount", "")
+            pipettes[result.get("pipetteId")] = f"{name} ({mount})"
+
+        start, end = _timestamp(entry.get("startedAt")), _timestamp(entry.get("completedAt"))
+        if first_start is None and start is not None:
+            first_start = start
+        gap = (start - last_end) * 1000 if start is not None and last_end is not None else np.nan
+        if end is not None:
+            last_end = end
+
+        row = len(columns["Index"])
+        if "/" in command:
+            row_phase = MODULE_PHASES.get(command.split("/")[0], command.split("/")[0])
+        elif command == "aspirate" and params.get("wellName") in phase_wells:
+            phase = row_phase = phase_wells[params["wellName"]]
+            for i in pending:
+                columns["Phase"][i] = phase
+            pending = []
+        elif command in LEAD_IN:
+            row_phase = phase
+            pending.append(row)
+        else:
+            row_phase = phase
+            pending = []
+
+        columns["Run"].append(run)
+        columns["Index"].append(row)
+        columns["Command"].append(command)
+        columns["Phase"].append(row_phase)
+        columns["Pipette"].append(pipettes.get(params.get("pipetteId"), ""))
+        columns["Labware"].append(labware.get(params.get("labwareId"), params.get("addressableAreaName", "")))
+        columns["Slot"].append(slots.get(params.get("labwareId"), ""))
+        columns["Well"].append(params.get("wellName", ""))
+        volume = params.get("volume")
+        columns["Volume (µL)"].append(np.nan if volume is None else volume)
+        columns["Start (s)"].append(start - first_start if start is not None else np.nan)
+        columns["Duration (ms)"].append((end - start) * 1000 if start is not None and end is not None
+                                        else np.nan)
+        columns["Gap (ms)"].append(gap)
+        columns["Status"].append(entry.get("status", ""))
+
+    dtypes = {"Index": np.int64, "Volume (µL)": np.float64, "Start (s)": np.float64,
+              "Duration (ms)": np.float64, "Gap (ms)": np.float64}
+    return {name: np.array(values, dtype=dtypes.get(name, str)) for name, values in columns.items()}
+
+
+def profile_runs(paths, phase_wells: dict = None) -> pd.DataFrame:
+    """
+    profile_commands for every run log, in one DataFrame (Run is the file stem).
+    """
+    frames = [pd.DataFrame(profile_commands(path, os.path.splitext(os.path.basename(path))[0],
+                                            phase_wells))
+              for path in paths]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+
+
+def summarise(df: pd.DataFrame, by="Command") -> pd.DataFrame:
+    """
+    Count, total, mean, median, 95th percentile and max duration per group,
+    with each group's share of the measured time, slowest total first.
+
+    Args:
+        df (pd.DataFrame): From profile_runs.
+        by: Column name(s) to group by, e.g. "Command", ["Phase", "Command"], "Pipette".
+    """
+    timed = df[df["Duration (ms)"].notna()]
+    grouped = timed.groupby(by, sort=False)["Duration (ms)"]
+    summary = pd.DataFrame({
+        "Count": grouped.size(),
+        "Total (s)": grouped.sum() / 1000,
+        "Mean (ms)": grouped.mean(),
+        "Median (ms)": grouped.median(),
+        "P95 (ms)": grouped.quantile(0.95),
+        "Max (ms)": grouped.max(),
+    })
+    total = summary["Total (s)"].sum()
+    summary["Share (%)"] = summary["Total (s)"] / total * 100 if total else 0.0
+    return summary.sort_values("Total (s)", ascending=False).round(1).reset_index()
+
+
+def slowest(df: pd.DataFrame, n: int = 10) -> pd.DataFrame:
+    """
+    The n slowest single commands.
+    """
+    columns = ["Run", "Index", "Command", "Phase", "Pipette", "Labware", "Well", "Duration (ms)"]
+    return df.nlargest(n, "Duration (ms)")[columns].round(1).reset_index(drop=True)
+
+
+def flame(df: pd.DataFrame, levels=("Phase", "Command", "Labware"), min_share: float = 0.5,
+          width: int = 40) -> str:
+    """
+    Flame-style text breakdown: measured time nested by levels, each line with
+    its share of the total as a bar. Branches under min_share % are folded
+    into their parent.
+    """
+    timed = df[df["Duration (ms)"].notna()]
+    total = timed["Duration (ms)"].sum()
+    lines = [f"Total {total / 60000:.1f} min over {timed['Run'].nunique()} run(s)"]
+    if not total:
+        return lines[0]
+
+    def walk(frame, depth):
+        if depth == len(levels):
+            return
+        sums = frame.groupby(levels[depth], sort=False)["Duration (ms)"].sum().sort_values(ascending=False)
+        for name, ms in sums.items():
+            share = ms / total * 100
+            if share < min_share:
+                continue
+            label = "  " * depth + (str(name) or "-")
+            lines.append(f"{label:<44} {ms / 1000:>9.1f} s {share:>5.1f}% "
+                         + "█" * max(round(share / 100 * width), 1))
+            walk(frame[frame[levels[depth]] == name], depth + 1)
+
+    walk(timed, 0)
+    return "\n".join(lines)
+
+
+def compare_plan(df: pd.DataFrame, timeline) -> pd.DataFrame:
+    """
+    Measured seconds per category (mean over the runs) beside a run_time estimate.
+
+    Args:
+        df (pd.DataFrame): From profile_runs.
+        timeline: run_time.Timeline for the protocol that produced the runs.
+
+    Returns:
+        pd.DataFrame: Category, Measured (s), Planned (s) and Measured/Planned,
+        with a Total row that leaves out operator pauses.
+    """
+    runs = max(df["Run"].nunique(), 1)
+    measured = (df.assign(Category=df["Command"].map(category))
+                .groupby("Category")["Duration (ms)"].sum() / 1000 / runs)
+    planned = collections.Counter()
+    for _, duration, kind, _ in timeline.events:
+        if kind in PLAN_CATEGORIES:
+            planned[PLAN_CATEGORIES[kind]] += duration / 1000
+    table = pd.DataFrame({"Measured (s)": measured, "Planned (s)": pd.Series(planned, dtype=float)})
+    table = table.fillna(0.0)
+    table.loc["Total"] = table.drop(index="pauses", errors="ignore").sum()
+    table["Measured/Planned"] = table["Measured (s)"] / table["Planned (s)"].replace(0, np.nan)
+    return table.round(2).rename_axis("Category").reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("logs", nargs="+", help="OT-2 run-log JSON files")
+    parser.add_argument("--top", type=int, default=10, help="slowest commands to list")
+    parser.add_argument("--by", nargs="+", default=["Command", "Pipette", "Labware", "Phase"],
+                        help="columns to summarise by, one table each")
+    parser.add_argument("--plan", help="protocol to estimate with run_time and compare against")
+    parser.add_argument("--cwd", help="folder the --plan protocol runs in")
+    parser.add_argument("--out", help="write the per-command table to this CSV")
+    args = parser.parse_args(argv)
+
+    df = profile_runs(args.logs)
+    if df["Duration (ms)"].notna().sum() == 0:
+        print("No timed commands: the run logs have no startedAt/completedAt stamps.")
+        return 1
+    print(flame(df))
+    for by in args.by:
+        print(f"\nBy {by}:")
+        print(summarise(df, by).to_string(index=False))
+    print(f"\nBetween commands: {np.nansum(df['Gap (ms)']) / 1000:.1f} s")
+    print(f"\nSlowest {args.top} commands:")
+    print(slowest(df, args.top).to_string(index=False))
+    if args.plan:
+        from ot2tools.run_time import estimate
+
+        print(f"\nMeasured vs planned ({os.path.basename(args.plan)}):")
+        print(compare_plan(df, estimate(args.plan, args.cwd)).to_string(index=False))
+    if args.out:
+        df.to_csv(args.out, index=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
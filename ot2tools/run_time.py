@@ -0,0 +1,823 @@
+"""
+Kinematic run-time estimator for OT-2 protocols.
+
+opentrons_simulate needs the full robot stack (a couple of seconds just to
+import) and only says what the robot would do, not how long it takes. This
+estimator runs a Python protocol against a recording stand-in for the
+ProtocolContext, or walks the commands of a schema 8 Protocol Designer
+JSON, and turns every move, plunger stroke, tip change, delay and module
+wait into a millisecond timeline:
+
+- moves follow the OT-2 arc (up to a safe height, across, down) between
+  well coordinates from the labware definitions, each axis with a
+  trapezoidal speed profile at DEFAULT_SPEEDS and DEFAULT_ACCELERATIONS,
+  capped by ctx.max_speeds (checkit) and the pipette's default_speed;
+- plunger strokes take volume / flow rate at the pipette's current rates;
+- tip pick-up and drop, blow out, latch and shake ramp take the fixed
+  FIXED_TIMINGS; Heater-Shaker heating runs in the background and only
+  waits count.
+
+    python -m ot2tools.run_time ExperimentExampleCode/CompleteExperimentCode.py
+    python -m ot2tools.run_time "DemoProtocolsForOT-2/Robin Pixel Art.json" --events
+
+Labware on modules and adapters is placed as if on the deck slot. The
+stand-in supports the API the protocols in this repository use
+(load_labware, load_instrument, load_module, transfer, aspirate, dispense,
+mix, blow_out, touch_tip, pick_up_tip, drop_tip, delay, pause, ...);
+operator pauses take no time but are counted.
+"""
+import argparse
+import collections
+import contextlib
+import json
+import math
+import os
+import sys
+import time
+import types
+
+import numpy as np
+import pandas as pd
+
+from ot2tools.labware import LabwareGeometry, get_geometry
+from ot2tools.module_scheduler import HEATER_SHAKER_TIMINGS
+from ot2tools.travel_path import DECK_CLEARANCE_Z, DEFAULT_SPEEDS, WELL_CLEARANCE
+
+# Axis accelerations (mm/s²), OT-2 defaults; Z is the left mount, A the right
+DEFAULT_ACCELERATIONS = {"X": 3000.0, "Y": 2000.0, "Z": 1500.0, "A": 1500.0}
+MOUNT_AXES = {"left": "Z", "right": "A"}
+# Rough fixed costs (s) on top of the moves
+FIXED_TIMINGS = {
+    "home": 8.0,
+    "pick_up_tip": 1.5,  # press onto the tip and shake it free of the rack
+    "drop_tip": 1.0,  # plunger eject
+    "blow_out": 0.5,
+    "latch": 2.0,  # Heater-Shaker labware latch
+    "shake_ramp": HEATER_SHAKER_TIMINGS["set_speed"],
+    "deactivate_shaker": HEATER_SHAKER_TIMINGS["deactivate"],
+    "heat_rate": 0.1,  # °C/s, Heater-Shaker and Temperature Module ramps
+    "touch_tip_speed": 60.0,  # mm/s, the API default
+}
+# Default pipette specs: max volume, min volume, channels, flow rate (µL/s)
+PIPETTES = {
+    "p20_single_gen2": (20.0, 1.0, 1, 7.56),
+    "p300_single_gen2": (300.0, 20.0, 1, 92.86),
+    "p1000_single_gen2": (1000.0, 100.0, 1, 274.7),
+    "p20_multi_gen2": (20.0, 1.0, 8, 7.6),
+    "p300_multi_gen2": (300.0, 20.0, 8, 94.0),
+}
+DEFAULT_SPEED = 400.0  # mm/s, InstrumentContext.default_speed
+HOME = (418.0, 353.0, 218.0)
+TRASH_SLOT = 12
+TRASH_LOAD_NAME = "opentrons_1_trash_1100ml_fixed"
+DEFAULT_API_LEVEL = "2.20"
+
+Point = collections.namedtuple("Point", "x y z")
+
+
+class Location:
+    """
+    A point on the deck and the well (or None) it belongs to, like opentrons.types.Location.
+    """
+
+    def __init__(self, point, labware=None):
+        self.point = Point(*(float(v) for v in point))
+        self.labware = labware
+
+    def move(self, point) -> "Location":
+        return Location(np.add(self.point, tuple(point)), self.labware)
+
+    def __repr__(self):
+        return f"Location({tuple(self.point)}, {self.labware!r})"
+
+
+def axis_seconds(distance: float, speed: float, acceleration: float) -> float:
+    """
+    Time of a move that accelerates to speed (if it gets there) and decelerates to a stop.
+    """
+    distance = abs(distance)
+    if distance == 0:
+        return 0.0
+    if distance <= speed * speed / acceleration:
+        return 2 * math.sqrt(distance / acceleration)
+    return distance / speed + speed / acceleration
+
+
+class Timeline:
+    """
+    Events on the robot's clock: start and duration in ms, kind and detail.
+
+    Kinds are move, aspirate, dispense, blow_out, tip, touch_tip, delay,
+    module, home, pause (no duration) and untimed (commands the estimator
+    does not model).
+    """
+
+    def __init__(self):
+        self.now = 0.0  # s
+        self.events = []
+
+    def add(self, kind: str, seconds: float, detail: str = ""):
+        self.events.append((round(self.now * 1000), round(seconds * 1000), kind, detail))
+        self.now += seconds
+
+    @property
+    def total_ms(self) -> int:
+        return round(self.now * 1000)
+
+    def totals(self) -> dict:
+        """
+        ms per kind, plus the number of pauses and untimed commands.
+        """
+        totals = collections.Counter()
+        for _, duration, kind, _ in self.events:
+            totals[kind] += duration
+        for kind in ("pause", "untimed"):
+            totals[kind] = sum(1 for event in self.events if event[2] == kind)
+        return dict(totals)
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.events, columns=["Start (ms)", "Duration (ms)", "Kind", "Detail"])
+
+    def report(self, name: str = "") -> str:
+        totals = self.totals()
+        parts = [f"{kind} {ms / 1000:.1f} s" for kind, ms in sorted(totals.items())
+                 if kind not in ("pause", "untimed") and ms]
+        line = (f"{name}: " if name else "") + f"~{self.now / 60:.1f} min ({', '.join(parts)})"
+        if totals["pause"]:
+            line += f", {totals['pause']} operator pauses not included"
+        if totals["untimed"]:
+            line += f", {totals['untimed']} untimed commands"
+        return line
+
+
+class Gantry:
+    """
+    Head position and axis limits; turns moves into timeline events.
+
+    Args:
+        timeline (Timeline): Where the moves go.
+        max_speeds (dict): Per-axis caps (mm/s), e.g. the protocol's ctx.max_speeds.
+        timings (dict): Optional, overrides for FIXED_TIMINGS.
+    """
+
+    def __init__(self, timeline: Timeline, max_speeds: dict = None, timings: dict = None):
+        self.timeline = timeline
+        self.max_speeds = {} if max_speeds is None else max_speeds
+        self.timings = dict(FIXED_TIMINGS, **(timings or {}))
+        self.xy = HOME[:2]
+        self.z = {"Z": HOME[2], "A": HOME[2]}
+        self.place = None  # (labware id, well) the active nozzle is in
+
+    def _speed(self, axis: str) -> float:
+        return min(dict(DEFAULT_SPEEDS, A=DEFAULT_SPEEDS["Z"])[axis], self.max_speeds.get(axis, math.inf))
+
+    def _straight(self, dx: float, dy: float, dz: float, axis: str, speed: float) -> float:
+        # One vector move; every axis stays under its own speed and acceleration
+        length = math.sqrt(dx * dx + dy * dy + dz * dz)
+        if length == 0:
+            return 0.0
+        for d, name in ((dx, "X"), (dy, "Y"), (dz, axis)):
+            if d:
+                speed = min(speed, self._speed(name) * length / abs(d))
+        acceleration = min(DEFAULT_ACCELERATIONS[name] * length / abs(d)
+                           for d, name in ((dx, "X"), (dy, "Y"), (dz, axis)) if d)
+        return axis_seconds(length, speed, acceleration)
+
+    def move(self, axis: str, point, place=None, speed: float = DEFAULT_SPEED, detail: str = ""):
+        """
+        Moves a mount's nozzle to point: straight within a well, otherwise an
+        arc clearing the labware (same labware) or the deck.
+        """
+        seconds = 0.0
+        other = "A" if axis == "Z" else "Z"
+        if self.z[other] < HOME[2]:
+            seconds += self._straight(0, 0, HOME[2] - self.z[other], other, speed)
+            self.z[other] = HOME[2]
+        x, y, z = point
+        dx, dy, z0 = x - self.xy[0], y - self.xy[1], self.z[axis]
+        if place is not None and place == self.place:
+            seconds += self._straight(dx, dy, z - z0, axis, speed)
+        elif dx or dy or z != z0:
+            high = max(z0, z)
+            same = place is not None and self.place is not None and place[0] == self.place[0]
+            clear = high + WELL_CLEARANCE if same else max(DECK_CLEARANCE_Z, high)
+            seconds += (self._straight(0, 0, clear - z0, axis, speed) + self._straight(dx, dy, 0, axis, speed)
+                        + self._straight(0, 0, clear - z, axis, speed))
+        self.xy, self.z[axis], self.place = (x, y), z, place
+        self.timeline.add("move", seconds, detail)
+
+    def home(self):
+        self.xy, self.z, self.place = HOME[:2], {"Z": HOME[2], "A": HOME[2]}, None
+        self.timeline.add("home", self.timings["home"])
+
+    def touch_tip(self, axis: str, length: float, width: float, radius: float = 1.0, speed: float = None):
+        # Out to each side of the well and back to the centre
+        travel = 2 * radius * (length + width)
+        self.timeline.add("touch_tip", travel / (speed or self.timings["touch_tip_speed"]))
+
+
+class HeaterShakerContext:
+    """
+    Recording Heater-Shaker: heating runs in the background and only
+    wait_for_temperature takes time; shaking and the latch block.
+    """
+
+    def __init__(self, timeline: Timeline, timings: dict, slot):
+        self.timeline = timeline
+        self.timings = timings
+        self.parent = str(slot)
+        self.temperature = 25.0
+        self.target = None
+        self.ready_at = 0.0
+
+    def load_adapter(self, name: str, **kwargs) -> "Labware":
+        return Labware(name, self, get_geometry(name))
+
+    load_labware = load_adapter
+
+    def set_target_temperature(self, celsius: float):
+        start = max(self.timeline.now, self.ready_at) if self.target is not None else self.timeline.now
+        current = self.target if self.target is not None and self.timeline.now >= self.ready_at else self.temperature
+        self.temperature, self.target = current, float(celsius)
+        self.ready_at = start + abs(self.target - current) / self.timings["heat_rate"]
+        self.timeline.add("module", 0.0, f"heat to {celsius:g} °C")
+
+    def wait_for_temperature(self):
+        self.timeline.add("module", max(self.ready_at - self.timeline.now, 0.0), "wait for temperature")
+        if self.target is not None:
+            self.temperature = self.target
+
+    def set_and_wait_for_temperature(self, celsius: float):
+        self.set_target_temperature(celsius)
+        self.wait_for_temperature()
+
+    def deactivate_heater(self):
+        self.target = None
+        self.timeline.add("module", 0.0, "heater off")
+
+    def set_and_wait_for_shake_speed(self, rpm: int):
+        self.timeline.add("module", self.timings["shake_ramp"], f"shake at {rpm} rpm")
+
+    def deactivate_shaker(self):
+        self.timeline.add("module", self.timings["deactivate_shaker"], "shaker off")
+
+    def open_labware_latch(self):
+        self.timeline.add("module", self.timings["latch"], "open latch")
+
+    def close_labware_latch(self):
+        self.timeline.add("module", self.timings["latch"], "close latch")
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.timeline.add("untimed", 0.0, name)
+
+
+class TemperatureModuleContext(HeaterShakerContext):
+    """
+    Recording Temperature Module: set_temperature blocks for the ramp.
+    """
+
+    def set_temperature(self, celsius: float):
+        self.set_and_wait_for_temperature(celsius)
+
+    start_set_temperature = HeaterShakerContext.set_target_temperature
+    await_temperature = HeaterShakerContext.wait_for_temperature
+
+    def deactivate(self):
+        self.deactivate_heater()
+
+
+def _size(value) -> float:
+    # NaN in the geometry arrays is "not this shape", None on an Opentrons well
+    return None if np.isnan(value) else float(value)
+
+
+class Well:
+    """
+    A recorded well: name, geometry and top/bottom locations.
+    """
+
+    def __init__(self, parent: "Labware", index: int, top):
+        geometry = parent.geometry
+        self.parent = parent
+        self.well_name = str(geometry.names[index])
+        self.depth = float(geometry.depths[index])
+        self.diameter = _size(geometry.diameters[index])
+        self.length = _size(geometry.x_dims[index])
+        self.width = _size(geometry.y_dims[index])
+        self.max_volume = float(geometry.volumes[index])
+        self._top = tuple(top)
+
+    @property
+    def has_tip(self) -> bool:
+        return self.parent.is_tiprack and self.well_name not in self.parent.used
+
+    def top(self, z: float = 0.0) -> Location:
+        return Location((self._top[0], self._top[1], self._top[2] + z), self)
+
+    def bottom(self, z: float = 0.0) -> Location:
+        return Location((self._top[0], self._top[1], self._top[2] - self.depth + z), self)
+
+    def center(self) -> Location:
+        return self.bottom(self.depth / 2)
+
+    def load_liquid(self, liquid=None, volume: float = 0.0):
+        pass
+
+    def __repr__(self):
+        return f"{self.well_name} of {self.parent.load_name}"
+
+
+class Labware:
+    """
+    A recorded labware in a slot, or on a module or adapter (parent).
+    """
+
+    def __init__(self, load_name: str, parent, geometry: LabwareGeometry):
+        self.load_name = load_name
+        self.parent = parent
+        self.geometry = geometry
+        self.is_tiprack = geometry.is_tiprack
+        self.used = set()  # tips taken
+        slot = parent
+        while not isinstance(slot, str):
+            slot = slot.parent
+        tops = geometry.coordinates(int(slot)) if slot.isdigit() else np.zeros((len(geometry), 3))
+        self._wells = [Well(self, i, top) for i, top in enumerate(tops)]
+        self._by_name = {well.well_name: well for well in self._wells}
+        self._columns = [[self._by_name[name] for name in column] for column in geometry.columns()]
+
+    def wells(self, *names) -> list:
+        return [self._by_name[name] for name in names] if names else list(self._wells)
+
+    def wells_by_name(self) -> dict:
+        return dict(self._by_name)
+
+    def __getitem__(self, name: str) -> Well:
+        return self._by_name[name]
+
+    def columns(self) -> list:
+        return [list(column) for column in self._columns]
+
+    def rows(self) -> list:
+        return [list(row) for row in zip(*self._columns)]
+
+    def columns_by_name(self) -> dict:
+        return {column[0].well_name[1:]: column for column in self.columns()}
+
+    def rows_by_name(self) -> dict:
+        return {row[0].well_name[0]: row for row in self.rows()}
+
+    def load_labware(self, name: str, **kwargs) -> "Labware":
+        return Labware(name, self, get_geometry(name))
+
+    def __repr__(self):
+        return f"{self.load_name} in {self.parent}"
+
+
+class RecordingPipette:
+    """
+    Recording InstrumentContext; every call adds to the context's timeline.
+    """
+
+    def __init__(self, ctx: "RecordingContext", name: str, mount: str, tip_racks=None):
+        if name not in PIPETTES:
+            raise ValueError(f"Unknown pipette '{name}'; known: {', '.join(PIPETTES)}.")
+        self.ctx = ctx
+        self.name = name
+        self.mount = mount
+        self.axis = MOUNT_AXES[mount]
+        self.max_volume, self.min_volume, self.channels, rate = PIPETTES[name]
+        self.flow_rate = types.SimpleNamespace(aspirate=rate, dispense=rate, blow_out=rate)
+        self.well_bottom_clearance = types.SimpleNamespace(aspirate=1.0, dispense=1.0)
+        self.default_speed = DEFAULT_SPEED
+        self.tip_racks = list(tip_racks or [])
+        self.trash_container = ctx.fixed_trash
+        self.starting_tip = None
+        self.has_tip = False
+        self.current_volume = 0.0
+        self.tip = None
+        self.location = None
+
+    # Locations
+
+    def _location(self, location, default: str = "bottom") -> Location:
+        if isinstance(location, Labware):
+            location = location.wells()[0]  # e.g. blow_out(trash_container)
+        if location is None:
+            if self.location is None:
+                raise ValueError(f"{self.name} has no current location to work in.")
+            return self.location
+        if isinstance(location, Well):
+            if default == "top":
+                return location.top()
+            clearance = getattr(self.well_bottom_clearance, default)
+            return location.bottom(clearance)
+        return location
+
+    def move_to(self, location, force_direct: bool = False, speed: float = None, **kwargs):
+        location = self._location(location, "top")
+        well = location.labware
+        place = (id(well.parent), well.well_name) if isinstance(well, Well) else None
+        self.ctx.gantry.move(self.axis, location.point, place, min(speed or math.inf, self.default_speed),
+                             repr(well) if well is not None else "")
+        self.location = location
+        return self
+
+    # Tips
+
+    def _next_tip(self) -> Well:
+        for rack in self.tip_racks:
+            for column in rack.columns():
+                if self.channels > 1:
+                    if not any(well.well_name in rack.used for well in column):
+                        rack.used.update(well.well_name for well in column)
+                        return column[0]
+                    continue
+                for well in column:
+                    if well.well_name not in rack.used:
+                        rack.used.add(well.well_name)
+                        return well
+        raise ValueError(f"{self.name} ran out of tips in {self.tip_racks}.")
+
+    def pick_up_tip(self, location=None, **kwargs):
+        well = location.labware if isinstance(location, Location) else location
+        if well is None:
+            well = self._next_tip()
+        else:
+            well.parent.used.add(well.well_name)
+        self.move_to(well.top())
+        self.ctx.timeline.add("tip", self.ctx.gantry.timings["pick_up_tip"], "pick up tip")
+        self.has_tip, self.tip = True, well
+        return self
+
+    def drop_tip(self, location=None, home_after=None):
+        self.move_to(self.ctx.fixed_trash["A1"].top() if location is None else self._location(location, "top"))
+        self.ctx.timeline.add("tip", self.ctx.gantry.timings["drop_tip"], "drop tip")
+        self.has_tip, self.current_volume = False, 0.0
+        return self
+
+    def return_tip(self, home_after=None):
+        self.move_to(self.tip.top())
+        self.ctx.timeline.add("tip", self.ctx.gantry.timings["drop_tip"], "return tip")
+        self.has_tip, self.current_volume = False, 0.0
+        return self
+
+    # Liquid
+
+    def _stroke(self, kind: str, volume: float, rate: float):
+        self.ctx.timeline.add(kind, volume / rate, f"{volume:g} µL")
+
+    def aspirate(self, volume: float = None, location=None, rate: float = 1.0):
+        volume = self.max_volume - self.current_volume if volume is None else float(volume)
+        self.move_to(self._location(location, "aspirate"))
+        self._stroke("aspirate", volume, self.flow_rate.aspirate * rate)
+        self.current_volume += volume
+        return self
+
+    def dispense(self, volume: float = None, location=None, rate: float = 1.0, **kwargs):
+        volume = self.current_volume if volume is None else float(volume)
+        self.move_to(self._location(location, "dispense"))
+        self._stroke("dispense", volume, self.flow_rate.dispense * rate)
+        self.current_volume = max(self.current_volume - volume, 0.0)
+        return self
+
+    def blow_out(self, location=None):
+        self.move_to(self._location(location, "top"))
+        self.ctx.timeline.add("blow_out", self.ctx.gantry.timings["blow_out"])
+        self.current_volume = 0.0
+        return self
+
+    def mix(self, repetitions: int = 1, volume: float = None, location=None, rate: float = 1.0):
+        volume = self.max_volume if volume is None else volume
+        for _ in range(repetitions):
+            self.aspirate(volume, location, rate)
+            self.dispense(volume, rate=rate)
+        return self
+
+    def air_gap(self, volume: float = None, height: float = 5.0):
+        well = self._location(None).labware
+        if isinstance(well, Well):
+            self.move_to(well.top(height))
+        return self.aspirate(volume)
+
+    def touch_tip(self, location=None, radius: float = 1.0, v_offset: float = -1.0, speed: float = 60.0):
+        well = location if isinstance(location, Well) else self._location(location).labware
+        if not isinstance(well, Well):
+            return self
+        self.move_to(well.top(v_offset))
+        size = well.diameter or 0.0
+        self.ctx.gantry.touch_tip(self.axis, well.length or size, well.width or size, radius, speed)
+        return self
+
+    def home(self):
+        self.ctx.gantry.home()
+        return self
+
+    # Complex commands
+
+    def _targets(self, target) -> list:
+        if isinstance(target, (Well, Location)):
+            return [target]
+        targets = []
+        for item in target:
+            if isinstance(item, (list, tuple)):
+                # A column or row: a multichannel goes to its first well
+                targets += list(item[:1]) if self.channels > 1 else list(item)
+            else:
+                targets.append(item)
+        return targets
+
+    def transfer(self, volume, source, dest, new_tip: str = "once", trash: bool = True,
+                 touch_tip: bool = False, blow_out: bool = False, mix_before=None, mix_after=None,
+                 air_gap: float = 0.0, blowout_location: str = None, **kwargs):
+        """
+        Liquid transfers as InstrumentContext.transfer plans them: sources
+        and destinations paired (a single one is repeated), volumes over the
+        tip's capacity split evenly, tips per new_tip.
+        """
+        sources, dests = self._targets(source), self._targets(dest)
+        volumes = [float(v) for v in volume] if isinstance(volume, (list, tuple)) else None
+        n = max(len(sources), len(dests), len(volumes or ()))
+        sources = sources * n if len(sources) == 1 else sources
+        dests = dests * n if len(dests) == 1 else dests
+        volumes = volumes or [float(volume)] * n
+        if not len(sources) == len(dests) == len(volumes):
+            raise ValueError(f"transfer got {len(sources)} sources, {len(dests)} destinations "
+                             f"and {len(volumes)} volumes.")
+
+        capacity = self.max_volume - air_gap
+        for src, dst, v in zip(sources, dests, volumes):
+            parts = max(math.ceil(v / capacity - 1e-9), 1)
+            for _ in range(parts):
+                if new_tip == "always" and self.has_tip:
+                    self.drop_tip() if trash else self.return_tip()
+                if new_tip != "never" and not self.has_tip:
+                    self.pick_up_tip()
+                if mix_before:
+                    self.mix(mix_before[0], mix_before[1], src)
+                self.aspirate(v / parts, src)
+                if touch_tip:
+                    self.touch_tip()
+                if air_gap:
+                    self.air_gap(air_gap)
+                self.dispense(v / parts + air_gap, dst)
+                if mix_after:
+                    self.mix(mix_after[0], mix_after[1], dst)
+                if touch_tip:
+                    self.touch_tip()
+                if blow_out:
+                    where = {"source well": src, "destination well": dst}.get(blowout_location)
+                    self.blow_out(self.ctx.fixed_trash["A1"] if where is None else where)
+        if new_tip != "never" and self.has_tip:
+            self.drop_tip() if trash else self.return_tip()
+        return self
+
+    def __repr__(self):
+        return f"{self.name} on {self.mount}"
+
+
+class _Deck(dict):
+    # protocol.deck[slot]: what is loaded in a slot (int or str), None if free
+    def __getitem__(self, slot):
+        return self.get(int(slot))
+
+
+class RecordingContext:
+    """
+    Stand-in for protocol_api.ProtocolContext that records a timeline instead
+    of driving a robot.
+
+    Args:
+        api_level (str): The protocol's apiLevel, e.g. "2.20".
+        timings (dict): Optional, overrides for FIXED_TIMINGS.
+    """
+
+    def __init__(self, api_level: str = DEFAULT_API_LEVEL, timings: dict = None):
+        self.api_version = tuple(int(part) for part in str(api_level).split("."))
+        self.max_speeds = {}
+        self.timeline = Timeline()
+        self.gantry = Gantry(self.timeline, self.max_speeds, timings)
+        self.deck = _Deck()
+        self.loaded_labwares = {}
+        self.loaded_modules = {}
+        self.loaded_instruments = {}
+        self.fixed_trash = Labware(TRASH_LOAD_NAME, str(TRASH_SLOT), get_geometry(TRASH_LOAD_NAME))
+        self.rail_lights_on = False
+        self.gantry.home()
+
+    def clock(self) -> float:
+        """
+        Seconds on the robot's (estimated) clock, for module_scheduler.Schedule.run.
+        """
+        return self.timeline.now
+
+    def is_simulating(self) -> bool:
+        return True
+
+    def load_labware(self, load_name: str, location, label: str = None, namespace: str = None,
+                     version: int = None, **kwargs) -> Labware:
+        labware = Labware(load_name, str(location), get_geometry(load_name, version))
+        self.deck[int(location)] = self.loaded_labwares[int(location)] = labware
+        return labware
+
+    def load_instrument(self, instrument_name: str, mount: str, tip_racks=None, **kwargs) -> RecordingPipette:
+        pipette = RecordingPipette(self, instrument_name, mount, tip_racks)
+        self.loaded_instruments[mount] = pipette
+        return pipette
+
+    def load_module(self, module_name: str, location=None, **kwargs):
+        kind = HeaterShakerContext if "heater" in module_name.lower() else TemperatureModuleContext
+        module = kind(self.timeline, self.gantry.timings, location)
+        self.deck[int(location)] = self.loaded_modules[int(location)] = module
+        return module
+
+    def define_liquid(self, name: str, description: str = None, display_color: str = None):
+        return types.SimpleNamespace(name=name, description=description, display_color=display_color)
+
+    def comment(self, msg: str):
+        pass
+
+    def pause(self, msg: str = None):
+        self.timeline.add("pause", 0.0, msg or "")
+
+    def delay(self, seconds: float = 0, minutes: float = 0, msg: str = None):
+        self.timeline.add("delay", float(seconds) + 60 * float(minutes), msg or "")
+
+    def home(self):
+        self.gantry.home()
+
+    def set_rail_lights(self, on: bool):
+        self.rail_lights_on = on
+
+
+@contextlib.contextmanager
+def _placeholder_opentrons():
+    # Protocols import opentrons for type hints only; unless it is already
+    # loaded, they get a small stand-in instead of the 2 s import
+    if "opentrons" in sys.modules:
+        yield
+        return
+    protocol_api = types.ModuleType("opentrons.protocol_api")
+    protocol_api.ProtocolContext = RecordingContext
+    protocol_api.InstrumentContext = RecordingPipette
+    protocol_api.Labware, protocol_api.Well = Labware, Well
+    opentrons_types = types.ModuleType("opentrons.types")
+    opentrons_types.Point, opentrons_types.Location = Point, Location
+    opentrons = types.ModuleType("opentrons")
+    opentrons.protocol_api, opentrons.types = protocol_api, opentrons_types
+    modules = {"opentrons": opentrons, "opentrons.protocol_api": protocol_api,
+               "opentrons.types": opentrons_types}
+    sys.modules.update(modules)
+    try:
+        yield
+    finally:
+        for name in modules:
+            sys.modules.pop(name, None)
+
+
+@contextlib.contextmanager
+def _working_dir(path):
+    previous = os.getcwd()
+    if path:
+        os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(previous)
+
+
+def estimate_python(path: str, cwd: str = None, timings: dict = None) -> Timeline:
+    """
+    Runs a Python protocol's run() against a RecordingContext.
+
+    Args:
+        path (str): The protocol file.
+        cwd (str): Optional, folder to run in (for protocols that read data
+            files). Defaults to the current folder, as opentrons_simulate.
+        timings (dict): Optional, overrides for FIXED_TIMINGS.
+
+    Returns:
+        Timeline: The recorded run.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        code = compile(file.read(), path, "exec")
+    namespace = {"__name__": "__protocol__", "__file__": os.path.abspath(path)}
+    with _placeholder_opentrons(), _working_dir(cwd):
+        exec(code, namespace)
+        level = namespace.get("metadata", {}).get("apiLevel")
+        level = namespace.get("requirements", {}).get("apiLevel", level)
+        ctx = RecordingContext(level or DEFAULT_API_LEVEL, timings)
+        namespace["run"](ctx)
+    return ctx.timeline
+
+
+def estimate_json(protocol: dict, timings: dict = None) -> Timeline:
+    """
+    Times the commands of a schema 8 (Protocol Designer) protocol.
+    """
+    from ot2tools.pd_optimizer import Deck
+
+    deck = Deck(protocol)
+    timeline = Timeline()
+    gantry = Gantry(timeline, timings=timings)
+    gantry.home()
+    trash = get_geometry(TRASH_LOAD_NAME).coordinates(TRASH_SLOT, ["A1"])[0]
+    pipettes, modules = {}, {}
+
+    def well_point(params):
+        point = deck.point(params["labwareId"], params["wellName"]).copy()
+        location = params.get("wellLocation", {})
+        if location.get("origin") == "bottom":
+            geometry = deck.geometry(params["labwareId"])
+            point[2] -= geometry.depths[geometry.index[params["wellName"]]]
+        point += [location.get("offset", {}).get(axis, 0.0) for axis in "xyz"]
+        return point, (params["labwareId"], params["wellName"])
+
+    for command in protocol["commands"]:
+        kind, params = command["commandType"], command.get("params", {})
+        pipette = pipettes.get(params.get("pipetteId"))
+        if kind == "loadPipette":
+            rate = PIPETTES.get(params["pipetteName"], (0, 0, 1, 100.0))[3]
+            pipettes[params["pipetteId"]] = (MOUNT_AXES[params["mount"]], rate)
+        elif kind == "loadModule":
+            model = params["model"].lower()
+            module = HeaterShakerContext if "heater" in model else TemperatureModuleContext
+            modules[params["moduleId"]] = module(timeline, gantry.timings, params["location"].get("slotName"))
+        elif kind == "home":
+            gantry.home()
+        elif kind in ("pickUpTip", "dropTip"):
+            gantry.move(pipette[0], *well_point(params), detail=params["wellName"])
+            timeline.add("tip", gantry.timings["pick_up_tip" if kind == "pickUpTip" else "drop_tip"])
+        elif kind in ("aspirate", "dispense", "blowout", "moveToWell", "touchTip"):
+            point, place = well_point(params)
+            gantry.move(pipette[0], point, place, detail=params["wellName"])
+            if kind in ("aspirate", "dispense"):
+                timeline.add(kind, params["volume"] / params.get("flowRate", pipette[1]),
+                             f"{params['volume']:g} µL")
+            elif kind == "blowout":
+                timeline.add("blow_out", gantry.timings["blow_out"])
+            elif kind == "touchTip":
+                geometry = deck.geometry(params["labwareId"])
+                i = geometry.index[params["wellName"]]
+                size = np.nan_to_num(geometry.diameters[i])
+                gantry.touch_tip(pipette[0], np.nan_to_num(geometry.x_dims[i], nan=size),
+                                 np.nan_to_num(geometry.y_dims[i], nan=size),
+                                 params.get("radius", 1.0), params.get("speed"))
+        elif kind in ("aspirateInPlace", "dispenseInPlace"):
+            timeline.add(kind[:-7], params["volume"] / params.get("flowRate", pipette[1]))
+        elif kind == "blowOutInPlace":
+            timeline.add("blow_out", gantry.timings["blow_out"])
+        elif kind in ("moveToAddressableAreaForDropTip", "moveToAddressableArea"):
+            gantry.move(pipette[0], trash, ("trash", "A1"), detail=params.get("addressableAreaName", ""))
+        elif kind == "dropTipInPlace":
+            timeline.add("tip", gantry.timings["drop_tip"])
+        elif kind in ("waitForDuration", "delay"):
+            timeline.add("delay", float(params.get("seconds", 0)), params.get("message", ""))
+        elif kind == "waitForResume":
+            timeline.add("pause", 0.0, params.get("message", ""))
+        elif "/" in kind and params.get("moduleId") in modules:
+            module, action = modules[params["moduleId"]], kind.split("/", 1)[1]
+            if action in ("setTargetTemperature", "startSetTemperature"):
+                module.set_target_temperature(params["celsius"])
+            elif action == "setAndWaitForShakeSpeed":
+                module.set_and_wait_for_shake_speed(params["rpm"])
+            else:
+                # deactivateHeater -> deactivate_heater, ...
+                getattr(module, "".join("_" + c.lower() if c.isupper() else c for c in action))()
+        elif not kind.startswith("load") and kind != "comment":
+            timeline.add("untimed", 0.0, kind)
+    return timeline
+
+
+def estimate(path: str, cwd: str = None, timings: dict = None) -> Timeline:
+    """
+    estimate_python or estimate_json by file extension.
+    """
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as file:
+            return estimate_json(json.load(file), timings)
+    return estimate_python(path, cwd, timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("protocols", nargs="+", help="Python protocols or schema 8 JSON files")
+    parser.add_argument("--cwd", help="folder Python protocols run in (default: the current folder)")
+    parser.add_argument("--events", action="store_true", help="print every timeline event")
+    args = parser.parse_args(argv)
+
+    for path in args.protocols:
+        started = time.perf_counter()
+        timeline = estimate(path, args.cwd)
+        elapsed = time.perf_counter() - started
+        name = os.path.splitext(os.path.basename(path))[0]
+        print(timeline.report(name) + f"  [estimated in {elapsed * 1000:.0f} ms]")
+        if args.events:
+            print(timeline.to_frame().to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Synthetic designs, OT-2 run logs and flags for benchmarks and offline checks.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+ROWS = "ABCDEFGH"
+WELL_NAMES = [f"{r}{c}" for c in range(1, 13) for r in ROWS]  # plate.wells() order
+# Slots synthetic run logs load their plates on, nearest slot 2 first
+PLATE_SLOTS = (2, 1, 3, 4, 6, 8, 7, 9, 10, 11)
+
+
+def synthetic_design(n: int, cap: float = 75.0, seed: int = 0) -> pd.DataFrame:
+    """
+    Random Cu/Glycine volumes with Cu + Glycine <= cap, like generate_random_data().
+
+    Returns:
+        pd.DataFrame: 'Cu Values' and 'Glycine Values' columns.
+    """
+    rng = np.random.default_rng(seed)
+    gly = rng.uniform(5, cap - 5, n).round(1)
+    cu = rng.uniform(0, 1, n) * (cap - gly)
+    return pd.DataFrame({"Cu Values": cu.round(1), "Glycine Values": gly})
+
+
+def synthetic_flags(cu_fraction, gly_fraction, ksp: float = 0.18, noise: float = 0.0,
+                    seed: int = 0) -> np.ndarray:
+    """
+    'y'/'n' precipitation flags for fractions, precipitating where x * y > ksp.
+
+    Args:
+        cu_fraction (array-like): Cu volume fractions.
+        gly_fraction (array-like): Glycine volume fractions.
+        ksp (float): True boundary constant.
+        noise (float): Std of log-normal noise on the product, blurring the boundary.
+        seed (int): Random seed.
+    """
+    rng = np.random.default_rng(seed)
+    product = np.asarray(cu_fraction) * np.asarray(gly_fraction)
+    if noise > 0:
+        product = product * np.exp(rng.normal(0, noise, product.shape))
+    return np.where(product > ksp, "y", "n")
+
+
+def _command(i, command_type, params, t, seconds):
+    started = t + datetime.timedelta(seconds=seconds * 0.05)
+    completed = started + datetime.timedelta(seconds=seconds)
+    return {
+        "id": f"cmd-{i}",
+        "createdAt": t.isoformat().replace("+00:00", "Z"),
+        "commandType": command_type,
+        "key": f"key-{i}",
+        "status": "succeeded",
+        "params": params,
+        "result": {},
+        "startedAt": started.isoformat().replace("+00:00", "Z"),
+        "completedAt": completed.isoformat().replace("+00:00", "Z"),
+    }, completed
+
+
+def synthetic_run_log(n_wells: int, seed: int = 0, design: pd.DataFrame = None) -> dict:
+    """
+    Builds an OT-2 run log for a Cu -> DI water -> Glycine protocol.
+
+    Each reagent pass picks up a tip, then aspirates from the reservoir and
+    dispenses into one well at a time (the per-well transfer() pattern), across
+    as many 96-well plates as the design needs. The plates are loaded on
+    PLATE_SLOTS in order (from the eleventh plate on the slots are reused, as
+    if plates were swapped between batches) and the layout is commented as
+    CompleteExperimentCode does.
+
+    Args:
+        n_wells (int): Number of design rows / wells.
+        seed (int): Random seed for the design.
+        design (pd.DataFrame): Optional, design to use instead of a random one.
+
+    Returns:
+        dict: Run log with the commands under ["commands"]["data"].
+    """
+    design = synthetic_design(n_wells, seed=seed) if design is None else design
+    cu = design["Cu Values"].to_numpy()
+    gly = design["Glycine Values"].to_numpy()
+    water = np.maximum(100 - cu - gly, 0)
+
+    t = datetime.datetime(2025, 3, 1, 9, 0, tzinfo=datetime.timezone.utc)
+    pipette = "pipette-right"
+    reservoir = "labware-reservoir"
+    tips = "labware-tiprack"
+    commands, i = [], 0
+
+    def add(command_type, params, seconds):
+        nonlocal t, i
+        command, t = _command(i, command_type, params, t, seconds)
+        commands.append(command)
+        i += 1
+
+    n_plates = -(-len(cu) // 96)
+    for p in range(n_plates):
+        slot = PLATE_SLOTS[p % len(PLATE_SLOTS)]
+        add("loadLabware", {"loadName": "nest_96_wellplate_100ul_pcr_full_skirt",
+                            "location": {"slotName": str(slot)}},
+            0.1)
+        commands[-1]["result"] = {"labwareId": f"labware-plate-{p + 1}"}
+        add("comment", {"message": f"Plate {p + 1} (slot {slot}): design rows "
+                                   f"{p * 96}-{min(len(cu), (p + 1) * 96) - 1}"}, 0.0)
+
+    for source, volumes in (("A2", cu), ("A1", water), ("A3", gly)):
+        add("pickUpTip", {"pipetteId": pipette, "labwareId": tips, "wellName": "A1"}, 6.0)
+        for k, volume in enumerate(volumes.tolist()):
+            if volume <= 0:
+                continue
+            plate = f"labware-plate-{k // 96 + 1}"
+            add("aspirate", {"pipetteId": pipette, "labwareId": reservoir, "wellName": source,
+                             "volume": volume, "flowRate": 274.7}, 3.5)
+            add("dispense", {"pipetteId": pipette, "labwareId": plate,
+                             "wellName": WELL_NAMES[k % 96], "volume": volume,
+                             "flowRate": 274.7}, 2.5)
+        add("dropTip", {"pipetteId": pipette, "labwareId": "fixedTrash", "wellName": "A1"}, 5.0)
+
+    return {"id": f"run-{seed}", "commands": {"data": commands, "meta": {"totalLength": len(commands)}}}
+
+
+def synthetic_plate_image(flags, pitch: float = 40.0, noise: float = 3.0, seed: int = 0) -> np.ndarray:
+    """
+    Top-down RGB image of a 96-well plate on a dark bench.
+
+    Clear wells are a uniform pale blue; precipitated wells are brighter and
+    speckled, the way a cloudy suspension looks under even lighting.
+
+    Args:
+        flags (array-like): 96 'y'/'n' flags in WELL_NAMES order.
+        pitch (float): Well spacing in pixels (9 mm on a real plate).
+        noise (float): Std of the per-pixel sensor noise.
+        seed (int): Random seed.
+
+    Returns:
+        np.ndarray: uint8 image, shape (height, width, 3), A1 at the top left.
+    """
+    rng = np.random.default_rng(seed)
+    flags = np.asarray(flags)
+    # SBS footprint 127.76 x 85.48 mm, A1 centre 14.38 / 11.24 mm from the corner
+    margin = 1.5 * pitch
+    width, height = int(14.2 * pitch + 2 * margin), int(9.5 * pitch + 2 * margin)
+    yy, xx = np.mgrid[0:height, 0:width].astype(float)
+
+    image = np.empty((height, width, 3))
+    image[:] = (60, 60, 65)
+    on_plate = ((xx >= margin) & (xx < margin + 14.2 * pitch)
+                & (yy >= margin) & (yy < margin + 9.5 * pitch))
+    image[on_plate] = (225, 225, 220)
+
+    radius = 0.35 * pitch
+    for k, flag in enumerate(flags):
+        cx = margin + (14.38 / 9 + k // 8) * pitch
+        cy = margin + (11.24 / 9 + k % 8) * pitch
+        x0, x1 = int(cx - radius), int(cx + radius) + 2
+        y0, y1 = int(cy - radius), int(cy + radius) + 2
+        inside = (xx[y0:y1, x0:x1] - cx) ** 2 + (yy[y0:y1, x0:x1] - cy) ** 2 <= radius ** 2
+        well = image[y0:y1, x0:x1]
+        if flag == "y":
+            speckle = rng.normal(0, 25, inside.shape)[..., None]
+            well[inside] = (np.array([195, 212, 235]) + speckle)[inside]
+        else:
+            well[inside] = (150, 190, 230)
+
+    image += rng.normal(0, noise, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
@@ -0,0 +1,258 @@
+"""
+Tip budgets and tip-rack allocation.
+
+Counts the exact tips a set of reagent passes uses under each tip policy,
+predicts the run time of each, keeps the policies the contamination rules
+allow and picks the cheapest. load_tip_racks then loads as many racks as
+that budget needs onto free deck slots, nearest the plate first, so a run
+can no longer stop halfway for want of tips.
+
+Policies, from fewest tips to most:
+
+- "never": one tip for every pass.
+- "per_reagent": a new tip for each reagent pass.
+- "per_column": a new tip for each plate column within a pass.
+- "per_well": a new tip for each destination well within a pass.
+"""
+import numpy as np
+
+from ot2tools.labware import SLOT_ORIGINS
+from ot2tools.multi_dispense import DEFAULT_TIMINGS, plan_multi_dispense, plan_single_transfers, predict_time
+
+POLICIES = ("never", "per_reagent", "per_column", "per_well")
+TIPS_PER_RACK = 96
+# Slots tip racks may go in; 12 is the fixed trash
+DECK_SLOTS = tuple(range(1, 12))
+# Rough per-tip costs (s) including the move to the rack or trash, fitted
+# to ot2tools.run_time like multi_dispense.DEFAULT_TIMINGS
+DEFAULT_TIP_TIMINGS = {"pick_up_tip": 3.2, "drop_tip": 2.7}
+
+
+class ContaminationRules:
+    """
+    Which tip reuse is acceptable.
+
+    Args:
+        share_between_reagents (bool): A tip may carry on to another reagent.
+        share_between_wells (bool): A tip may serve several wells. Set False
+            when dispensing into liquid, where the tip touches well contents.
+        share_between_columns (bool): A tip may serve wells in several columns.
+        max_dispenses_per_tip (int): Optional, cap on dispenses from one tip.
+    """
+
+    def __init__(self, share_between_reagents: bool = False, share_between_wells: bool = True,
+                 share_between_columns: bool = True, max_dispenses_per_tip: int = None):
+        self.share_between_reagents = share_between_reagents
+        self.share_between_wells = share_between_wells
+        self.share_between_columns = share_between_columns
+        self.max_dispenses_per_tip = max_dispenses_per_tip
+
+    def check(self, policy: str, n_reagents: int, max_dispenses: int) -> str:
+        """
+        Returns why a policy breaks the rules, or "" if it is allowed.
+        """
+        if policy == "never" and n_reagents > 1 and not self.share_between_reagents:
+            return "tip shared between reagents"
+        if policy in ("never", "per_reagent", "per_column") and not self.share_between_wells:
+            return "tip shared between wells"
+        if policy in ("never", "per_reagent") and not self.share_between_columns:
+            return "tip shared between columns"
+        if self.max_dispenses_per_tip is not None and max_dispenses > self.max_dispenses_per_tip:
+            return f"{max_dispenses} dispenses from one tip"
+        return ""
+
+    def __repr__(self):
+        return (f"ContaminationRules(share_between_reagents={self.share_between_reagents}, "
+                f"share_between_wells={self.share_between_wells}, "
+                f"share_between_columns={self.share_between_columns}, "
+                f"max_dispenses_per_tip={self.max_dispenses_per_tip})")
+
+
+def tip_groups(volumes, policy: str, n_rows: int = 8) -> list:
+    """
+    Splits a pass into the sets of wells served by one tip each.
+
+    Args:
+        volumes (array-like): Volume per destination, in plate.wells() order.
+        policy (str): One of POLICIES.
+        n_rows (int): Wells per plate column.
+
+    Returns:
+        list: Index arrays of the wells (with volume) each tip serves, in order.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown tip policy '{policy}', expected one of {POLICIES}.")
+    wells = np.flatnonzero(np.nan_to_num(np.asarray(volumes, dtype=np.float64)) > 0)
+    if not wells.size:
+        return []
+    if policy in ("never", "per_reagent"):
+        return [wells]
+    if policy == "per_well":
+        return [wells[i:i + 1] for i in range(wells.size)]
+    columns = wells // n_rows
+    bounds = np.flatnonzero(np.diff(columns)) + 1
+    return np.split(wells, bounds)
+
+
+def masked(volumes, wells) -> np.ndarray:
+    """
+    Copy of volumes with everything outside wells set to zero, so plans for one
+    tip keep the pass's destination indices.
+    """
+    volumes = np.asarray(volumes, dtype=np.float64)
+    result = np.zeros_like(volumes)
+    result[wells] = volumes[wells]
+    return result
+
+
+class TipBudget:
+    """
+    Tip use and predicted time of every policy for a set of passes.
+
+    Args:
+        rows (list): One dict per policy with policy, tips, seconds,
+            max_dispenses and reason (empty when allowed).
+    """
+
+    def __init__(self, rows: list):
+        self.rows = rows
+
+    @property
+    def allowed(self) -> list:
+        return [row for row in self.rows if not row["reason"]]
+
+    @property
+    def best(self) -> dict:
+        if not self.allowed:
+            raise ValueError("No tip policy satisfies the contamination rules.")
+        return min(self.allowed, key=lambda row: row["cost"])
+
+    @property
+    def policy(self) -> str:
+        return self.best["policy"]
+
+    @property
+    def tips(self) -> int:
+        return self.best["tips"]
+
+    def racks(self, tips_per_rack: int = TIPS_PER_RACK) -> int:
+        return racks_needed(self.tips, tips_per_rack)
+
+    def report(self) -> str:
+        lines = []
+        for row in self.rows:
+            status = "chosen" if row is self.best else (row["reason"] or "allowed")
+            lines.append(f"{row['policy']}: {row['tips']} tips, ~{row['seconds'] / 60:.1f} min "
+                         f"({status})")
+        return "; ".join(lines)
+
+    def __repr__(self):
+        return f"TipBudget(policy={self.policy!r}, tips={self.tips})"
+
+
+def plan_tips(passes, max_volume: float, disposal_volume: float = 0.0, rules: ContaminationRules = None,
+              n_rows: int = 8, timings: dict = None, tip_cost_s: float = None,
+              min_dispense: float = 0.0) -> TipBudget:
+    """
+    Counts tips and predicts run time for every policy.
+
+    Args:
+        passes (list): (name, volumes) per reagent pass, volumes in plate.wells() order.
+        max_volume (float): Pipette max volume.
+        disposal_volume (float): Disposal volume of shared-tip multi-dispenses.
+        rules (ContaminationRules): Allowed reuse. Defaults to no sharing
+            between reagents.
+        n_rows (int): Wells per plate column.
+        timings (dict): Optional, overrides for DEFAULT_TIMINGS and DEFAULT_TIP_TIMINGS.
+        tip_cost_s (float): Extra cost of one tip, in seconds, when ranking
+            policies. Defaults to the pick-up plus drop time of a tip
+            (DEFAULT_TIP_TIMINGS or timings), so a policy that saves a few
+            seconds by using many more tips does not win on time alone.
+        min_dispense (float): Shortest shared dispense, see plan_multi_dispense.
+
+    Returns:
+        TipBudget: Tips, time and rule check per policy.
+    """
+    rules = rules or ContaminationRules()
+    t = dict(DEFAULT_TIMINGS, **DEFAULT_TIP_TIMINGS, **(timings or {}))
+    if tip_cost_s is None:
+        tip_cost_s = t["pick_up_tip"] + t["drop_tip"]
+    n_reagents = sum(1 for _, volumes in passes if tip_groups(volumes, "per_reagent"))
+    rows = []
+    for policy in POLICIES:
+        tips, seconds, max_dispenses = 0, 0.0, 0
+        for _, volumes in passes:
+            for wells in tip_groups(volumes, policy, n_rows):
+                if policy == "per_well":
+                    plan = plan_single_transfers(masked(volumes, wells), max_volume)
+                else:
+                    plan = plan_multi_dispense(masked(volumes, wells), max_volume, disposal_volume,
+                                               min_dispense=min_dispense)
+                seconds += predict_time(plan, t)
+                tips += 1
+                max_dispenses = max(max_dispenses, plan.n_dispenses)
+        if policy == "never":
+            max_dispenses = sum(plan_multi_dispense(v, max_volume, disposal_volume,
+                                                    min_dispense=min_dispense).n_dispenses
+                                for _, v in passes)
+            tips = min(tips, 1)
+        seconds += tips * (t["pick_up_tip"] + t["drop_tip"])
+        rows.append({"policy": policy, "tips": tips, "seconds": seconds,
+                     "max_dispenses": max_dispenses, "cost": seconds + tips * tip_cost_s,
+                     "reason": rules.check(policy, n_reagents, max_dispenses)})
+    return TipBudget(rows)
+
+
+def racks_needed(n_tips: int, tips_per_rack: int = TIPS_PER_RACK, starting_tip: int = 0) -> int:
+    """
+    Racks holding n_tips when the first rack starts at tip index starting_tip.
+    """
+    return int(np.ceil((n_tips + starting_tip) / tips_per_rack)) if n_tips > 0 else 0
+
+
+def free_slots(protocol) -> list:
+    """
+    Deck slots with nothing loaded in them.
+    """
+    return [slot for slot in DECK_SLOTS if protocol.deck[slot] is None]
+
+
+def allocate_slots(n_racks: int, free, near=None) -> list:
+    """
+    Picks n_racks of the free slots, closest to the `near` slot first.
+
+    Raises:
+        ValueError: If there are not enough free slots.
+    """
+    free = list(free)
+    if n_racks > len(free):
+        raise ValueError(f"Design needs {n_racks} tip racks but only {len(free)} deck slots "
+                         f"are free ({free}).")
+    if near is not None:
+        origin = np.asarray(SLOT_ORIGINS[int(near)])
+        free.sort(key=lambda slot: (np.abs(np.asarray(SLOT_ORIGINS[slot]) - origin).sum(), slot))
+    return free[:n_racks]
+
+
+def load_tip_racks(protocol, load_name: str, n_tips: int, near=None, preferred=(), exclude=(),
+                   tips_per_rack: int = TIPS_PER_RACK) -> list:
+    """
+    Loads enough tip racks for n_tips onto free deck slots.
+
+    Args:
+        protocol: The ProtocolContext.
+        load_name (str): Tip rack load name.
+        n_tips (int): Tips the run will use, e.g. TipBudget.tips.
+        near: Optional, slot the racks should be close to (the plate).
+        preferred (tuple): Slots to fill first if free, e.g. the usual rack slot.
+        exclude (tuple): Free slots racks may not use, e.g. beside a Heater-Shaker.
+        tips_per_rack (int): Tips per rack.
+
+    Returns:
+        list: The loaded racks, in the order tips should be used.
+    """
+    n_racks = racks_needed(n_tips, tips_per_rack)
+    free = [slot for slot in free_slots(protocol) if slot not in exclude]
+    first = [slot for slot in preferred if slot in free][:n_racks]
+    rest = allocate_slots(n_racks - len(first), [s for s in free if s not in first], near)
+    return [protocol.load_labware(load_name, slot) for slot in first + rest]
@@ -0,0 +1,151 @@
+import numpy as np
+
+# One record per design row. "total" is Cu + Glycine (as in the original
+# process_arrays) and "water" is the DI water needed to bring the well up to x.
+PLAN_DTYPE = np.dtype([
+    ("well", np.int64),
+    ("cu", np.float64),
+    ("gly", np.float64),
+    ("water", np.float64),
+    ("total", np.float64),
+])
+
+
+class TransferPlan:
+    """
+    Columnar transfer plan for a Cu/Glycine design.
+
+    All quantities are computed in a single vectorized pass and held in a
+    NumPy structured array. Indexing or iterating the plan yields the same
+    per-well dictionaries that process_arrays used to return, so existing
+    protocols can keep using ``result["cu_array"]`` etc.
+
+    Args:
+        records (np.ndarray): Structured array with dtype PLAN_DTYPE.
+        x (float): Target volume of each well.
+    """
+
+    def __init__(self, records: np.ndarray, x: float):
+        if records.dtype != PLAN_DTYPE:
+            raise TypeError("records must use PLAN_DTYPE.")
+        self.records = records
+        self.x = float(x)
+
+    @classmethod
+    def from_columns(cls, cu_values, gly_values, x: float, wells=None) -> "TransferPlan":
+        """
+        Builds a plan from Cu and Glycine volume columns.
+
+        Args:
+            cu_values (array-like): Cu volumes (µL) per design row.
+            gly_values (array-like): Glycine volumes (µL) per design row.
+            x (float): Target volume of each well; DI water makes up the rest.
+            wells (array-like): Optional, well index for each row. Defaults to
+                the row number.
+
+        Returns:
+            TransferPlan: The computed plan.
+
+        Raises:
+            ValueError: If a volume is missing (NaN) or negative; the rows
+                are named as spreadsheet rows (header on row 1).
+        """
+        cu = np.asarray(cu_values, dtype=np.float64)
+        gly = np.asarray(gly_values, dtype=np.float64)
+        if cu.shape != gly.shape or cu.ndim != 1:
+            raise ValueError("Cu and Glycine columns must be 1-D and the same length.")
+        bad = np.flatnonzero(~(np.isfinite(cu) & np.isfinite(gly) & (cu >= 0) & (gly >= 0)))
+        if bad.size:
+            rows = ", ".join(str(row + 2) for row in bad[:10]) + (", ..." if bad.size > 10 else "")
+            raise ValueError(f"{bad.size} design rows have a missing or negative volume (rows {rows}).")
+
+        records = np.empty(cu.shape[0], dtype=PLAN_DTYPE)
+        records["well"] = np.arange(cu.shape[0]) if wells is None else wells
+        records["cu"] = cu
+        records["gly"] = gly
+        total = cu + gly
+        records["total"] = total
+
+        # DI water is the remaining volume to reach x, never negative
+        records["water"] = np.maximum(x - total, 0.0)
+        return cls(records, x)
+
+    @classmethod
+    def from_dataframe(cls, df, x: float) -> "TransferPlan":
+        """
+        Builds a plan from a DataFrame with 'Cu Values' and 'Glycine Values' columns.
+
+        Args:
+            df (pd.DataFrame): The design sheet.
+            x (float): Target volume of each well.
+
+        Returns:
+            TransferPlan: The computed plan.
+        """
+        if "Cu Values" not in df.columns or "Glycine Values" not in df.columns:
+            raise KeyError("Excel file must contain 'Cu Values' and 'Glycine Values' columns.")
+        return cls.from_columns(df["Cu Values"].to_numpy(), df["Glycine Values"].to_numpy(), x)
+
+    # Column accessors
+    @property
+    def well(self) -> np.ndarray:
+        return self.records["well"]
+
+    @property
+    def cu(self) -> np.ndarray:
+        return self.records["cu"]
+
+    @property
+    def gly(self) -> np.ndarray:
+        return self.records["gly"]
+
+    @property
+    def water(self) -> np.ndarray:
+        return self.records["water"]
+
+    @property
+    def total(self) -> np.ndarray:
+        return self.records["total"]
+
+    def select(self, mask) -> "TransferPlan":
+        """
+        Returns a new plan containing only the rows picked by a mask or index array.
+        """
+        return TransferPlan(self.records[mask], self.x)
+
+    def summary(self) -> dict:
+        """
+        Returns the row count, rows whose Cu + Glycine already exceed x, and
+        reagent totals (µL).
+        """
+        return {
+            "rows": len(self),
+            "over_volume": int(np.count_nonzero(self.total > self.x)),
+            "cu_total": float(self.cu.sum()),
+            "gly_total": float(self.gly.sum()),
+            "water_total": float(self.water.sum()),
+        }
+
+    # Per-well view used by run()
+    def __len__(self) -> int:
+        return self.records.shape[0]
+
+    def __getitem__(self, i):
+        # A row's dictionary, or a list of them for a slice, as process_arrays returned
+        if isinstance(i, slice):
+            return list(self.select(i))
+        row = self.records[i]
+        return {
+            "cu_array": float(row["cu"]),
+            "gly_array": float(row["gly"]),
+            "total": float(row["total"]),
+            "remaining": float(row["water"]),
+        }
+
+    def __iter__(self):
+        # tolist() converts every row to Python floats in one call
+        for _, cu, gly, water, total in self.records.tolist():
+            yield {"cu_array": cu, "gly_array": gly, "total": total, "remaining": water}
+
+    def __repr__(self) -> str:
+        return f"TransferPlan(rows={len(self)}, x={self.x:g})"
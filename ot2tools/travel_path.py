@@ -0,0 +1,274 @@
+import numpy as np
+
+from ot2tools.labware import SLOT_ORIGINS
+from ot2tools.multi_dispense import plan_multi_dispense
+
+# Default OT-2 gantry speeds (mm/s); protocols may lower them via ctx.max_speeds
+DEFAULT_SPEEDS = {"X": 600.0, "Y": 400.0, "Z": 125.0}
+# Arc heights (mm): moves between labware clear everything on the deck,
+# moves inside one labware only clear its own wells
+DECK_CLEARANCE_Z = 100.0
+WELL_CLEARANCE = 10.0
+
+
+def well_points(wells) -> np.ndarray:
+    """
+    Returns an (n, 3) array of the top of each Opentrons well, in deck coordinates.
+    """
+    return np.array([tuple(well.top().point) for well in wells], dtype=np.float64)
+
+
+def _move_costs(a: np.ndarray, b: np.ndarray, same_labware: np.ndarray, speeds: dict):
+    """
+    XY distance, Z distance and time of arc moves from points a to points b.
+    """
+    d = np.abs(b - a)
+    xy = np.hypot(d[:, 0], d[:, 1])
+    high = np.maximum(a[:, 2], b[:, 2])
+    clear = np.where(same_labware, high + WELL_CLEARANCE, np.maximum(DECK_CLEARANCE_Z, high))
+    z = (clear - a[:, 2]) + (clear - b[:, 2])
+    # X and Y move together, Z moves before and after
+    seconds = np.maximum(d[:, 0] / speeds["X"], d[:, 1] / speeds["Y"]) + z / speeds["Z"]
+    return xy, z, seconds
+
+
+def path_cost(points: np.ndarray, source: np.ndarray, wells, groups, speeds: dict = None) -> dict:
+    """
+    Estimates gantry travel for a reagent pass.
+
+    Every aspiration group starts at the source, visits its wells in order and
+    returns to the source for the next aspiration (or the disposal blow out).
+
+    Args:
+        points (np.ndarray): (n, 3) destination coordinates.
+        source (np.ndarray): (3,) coordinates of the source well.
+        wells (array-like): Destination index of each dispense, in visit order.
+        groups (array-like): Aspiration group of each dispense.
+        speeds (dict): Optional, per-axis speeds overriding DEFAULT_SPEEDS.
+
+    Returns:
+        dict: xy_mm, z_mm and seconds.
+    """
+    speeds = dict(DEFAULT_SPEEDS, **(speeds or {}))
+    wells = np.asarray(wells, dtype=np.int64)
+    groups = np.asarray(groups, dtype=np.int64)
+    if wells.size == 0:
+        return {"xy_mm": 0.0, "z_mm": 0.0, "seconds": 0.0}
+
+    starts = np.r_[True, groups[1:] != groups[:-1]]
+    ends = np.r_[groups[1:] != groups[:-1], True]
+    stops = points[wells]
+
+    # source -> first well of each group, well -> well, last well -> source
+    a = np.concatenate([np.repeat(source[None], starts.sum(), 0), stops[:-1][~ends[:-1]], stops[ends]])
+    b = np.concatenate([stops[starts], stops[1:][~starts[1:]], np.repeat(source[None], ends.sum(), 0)])
+    same = np.concatenate([np.zeros(starts.sum(), bool), np.ones((~ends[:-1]).sum(), bool),
+                           np.zeros(ends.sum(), bool)])
+    xy, z, seconds = _move_costs(a, b, same, speeds)
+    return {"xy_mm": float(xy.sum()), "z_mm": float(z.sum()), "seconds": float(seconds.sum())}
+
+
+def deck_slots(points: np.ndarray) -> np.ndarray:
+    """
+    Returns the deck slot each point lies over, from SLOT_ORIGINS.
+    """
+    pitch_x, pitch_y = SLOT_ORIGINS[2][0], SLOT_ORIGINS[4][1]
+    column = np.floor(points[:, 0] / pitch_x)
+    row = np.floor(points[:, 1] / pitch_y)
+    return (1 + column + 3 * row).astype(np.int64)
+
+
+def serpentine_order(points: np.ndarray, indices=None, labware=None) -> np.ndarray:
+    """
+    Orders wells plate by plate, and within each plate column by column,
+    reversing direction on every other column.
+
+    Args:
+        points (np.ndarray): (n, 3) well coordinates.
+        indices (array-like): Optional, subset of wells to order.
+        labware (array-like): Optional, plate of each point (any label).
+            Defaults to the deck slot it lies over. Plates are visited in
+            the order their first well appears in indices.
+
+    Returns:
+        np.ndarray: Ordered well indices.
+    """
+    indices = np.arange(len(points)) if indices is None else np.asarray(indices, dtype=np.int64)
+    labware = deck_slots(points) if labware is None else np.asarray(labware)
+    plates = labware[indices]
+    _, first = np.unique(plates, return_index=True)
+    order = []
+    for plate in plates[np.sort(first)]:
+        members = indices[plates == plate]
+        # Columns are numbered within the plate, so plates sharing an x never interleave
+        columns = np.unique(np.round(points[members, 0], 1), return_inverse=True)[1].ravel()
+        # Odd columns run back along y
+        y = np.where(columns % 2 == 0, -points[members, 1], points[members, 1])
+        order.append(members[np.lexsort((y, columns))])
+    return np.concatenate(order) if order else indices
+
+
+def nearest_neighbour_order(points: np.ndarray, start: np.ndarray, indices=None) -> np.ndarray:
+    """
+    Greedy tour that always visits the closest unvisited well next.
+
+    Args:
+        points (np.ndarray): (n, 3) well coordinates.
+        start (np.ndarray): (3,) position the tour starts from.
+        indices (array-like): Optional, subset of wells to order.
+
+    Returns:
+        np.ndarray: Ordered well indices.
+    """
+    indices = np.arange(len(points)) if indices is None else np.asarray(indices, dtype=np.int64)
+    xy = points[indices, :2]
+    unvisited = np.ones(len(indices), dtype=bool)
+    order = np.empty(len(indices), dtype=np.int64)
+    current = np.asarray(start, dtype=np.float64)[:2]
+    for k in range(len(indices)):
+        d = np.where(unvisited, np.sum((xy - current) ** 2, axis=1), np.inf)
+        i = int(np.argmin(d))
+        order[k], unvisited[i], current = i, False, xy[i]
+    return indices[order]
+
+
+def two_opt(points: np.ndarray, order, start: np.ndarray, end: np.ndarray = None,
+            max_passes: int = 20) -> np.ndarray:
+    """
+    Improves a path with 2-opt segment reversals, keeping both endpoints fixed.
+
+    Distances are XY only; every hop inside a plate has the same Z cost.
+
+    Args:
+        points (np.ndarray): (n, 3) well coordinates.
+        order (array-like): Initial well order.
+        start (np.ndarray): (3,) fixed position before the first well.
+        end (np.ndarray): Optional, fixed position after the last well. Defaults
+            to start, i.e. a round trip.
+        max_passes (int): Upper bound on improvement sweeps.
+
+    Returns:
+        np.ndarray: Improved well order.
+    """
+    order = np.asarray(order, dtype=np.int64).copy()
+    end = start if end is None else end
+    if order.size < 3:
+        return order
+    for _ in range(max_passes):
+        path = np.vstack([start[:2], points[order, :2], end[:2]])
+        improved = False
+        n = len(path)
+        for i in range(1, n - 2):
+            # Reverse path[i:j+1]; compare edges (i-1, i) + (j, j+1) against (i-1, j) + (i, j+1)
+            j = np.arange(i + 1, n - 1)
+            before = (np.linalg.norm(path[i - 1] - path[i]) +
+                      np.linalg.norm(path[j] - path[j + 1], axis=1))
+            after = (np.linalg.norm(path[i - 1] - path[j], axis=1) +
+                     np.linalg.norm(path[i] - path[j + 1], axis=1))
+            gain = before - after
+            k = int(np.argmax(gain))
+            if gain[k] > 1e-9:
+                path[i:j[k] + 1] = path[i:j[k] + 1][::-1]
+                order[i - 1:j[k]] = order[i - 1:j[k]][::-1]
+                improved = True
+        if not improved:
+            break
+    return order
+
+
+def order_wells(points: np.ndarray, source: np.ndarray, method: str = "2opt", indices=None) -> np.ndarray:
+    """
+    Computes a low-travel visit order for a reagent pass.
+
+    Args:
+        points (np.ndarray): (n, 3) well coordinates.
+        source (np.ndarray): (3,) coordinates of the source well.
+        method (str): "plate" (plate.wells() order), "serpentine", "nearest"
+            or "2opt" (nearest neighbour refined by 2-opt).
+        indices (array-like): Optional, subset of wells to order.
+
+    Returns:
+        np.ndarray: Ordered well indices.
+    """
+    indices = np.arange(len(points)) if indices is None else np.asarray(indices, dtype=np.int64)
+    if method == "plate":
+        return indices
+    if method == "serpentine":
+        return serpentine_order(points, indices)
+    if method == "nearest":
+        return nearest_neighbour_order(points, source, indices)
+    if method == "2opt":
+        return two_opt(points, nearest_neighbour_order(points, source, indices), source)
+    raise ValueError(f"Unknown ordering method: {method}")
+
+
+def optimize_groups(points: np.ndarray, source: np.ndarray, plan, method: str = "2opt"):
+    """
+    Reorders the wells inside each aspiration group of a DispensePlan.
+
+    Group membership and aspirate volumes are kept, so multi-dispense
+    grouping from an existing plan is respected.
+
+    Returns:
+        DispensePlan: The plan with each group's dispenses reordered.
+    """
+    wells, volumes = plan.wells.copy(), plan.volumes.copy()
+    bounds = np.r_[0, np.flatnonzero(np.diff(plan.group)) + 1, plan.group.size]
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        # Order the group's own stops, then map back to positions in the plan
+        local = lo + order_wells(points[plan.wells[lo:hi]], source, method)
+        wells[lo:hi], volumes[lo:hi] = plan.wells[local], plan.volumes[local]
+    return type(plan)(wells, volumes, plan.group.copy(), plan.disposal_volume)
+
+
+def plan_pass(points: np.ndarray, source: np.ndarray, volumes, max_volume: float,
+              disposal_volume: float = 0.0, method: str = "2opt", speeds: dict = None,
+              min_dispense: float = 0.0):
+    """
+    Plans a reagent pass in a low-travel order and compares it with plate order.
+
+    The whole pass is ordered first and then split into multi-dispense
+    groups along that order; each group is then re-optimized as a round
+    trip from the source.
+
+    Args:
+        points (np.ndarray): (n, 3) destination coordinates.
+        source (np.ndarray): (3,) coordinates of the source well.
+        volumes (array-like): Volume (µL) per destination.
+        max_volume (float): Pipette max volume.
+        disposal_volume (float): Disposal volume per aspiration.
+        method (str): Ordering method, see order_wells.
+        speeds (dict): Optional, per-axis speeds.
+        min_dispense (float): Shortest shared dispense, see plan_multi_dispense.
+
+    Returns:
+        tuple: (DispensePlan, report dict with baseline and optimized travel).
+    """
+    baseline = plan_multi_dispense(volumes, max_volume, disposal_volume, min_dispense=min_dispense)
+    target = np.flatnonzero(np.nan_to_num(np.asarray(volumes, dtype=np.float64)) > 0)
+    order = order_wells(points, source, method, target)
+    plan = plan_multi_dispense(volumes, max_volume, disposal_volume, order, min_dispense)
+    if method == "2opt":
+        plan = optimize_groups(points, source, plan, method)
+
+    before = path_cost(points, source, baseline.wells, baseline.group, speeds)
+    after = path_cost(points, source, plan.wells, plan.group, speeds)
+    return plan, {"before": before, "after": after}
+
+
+def merge_reports(reports) -> dict:
+    """
+    Sums several plan_pass reports, e.g. one per tip within a pass.
+    """
+    return {side: {key: sum(r[side][key] for r in reports) for key in reports[0][side]}
+            for side in ("before", "after")}
+
+
+def format_travel_report(name: str, report: dict) -> str:
+    """
+    Formats the report from plan_pass as a one-line summary.
+    """
+    before, after = report["before"], report["after"]
+    return (f"{name}: XY {before['xy_mm'] / 1000:.2f} -> {after['xy_mm'] / 1000:.2f} m, "
+            f"Z {before['z_mm'] / 1000:.2f} -> {after['z_mm'] / 1000:.2f} m, "
+            f"~{before['seconds'] - after['seconds']:.0f} s travel saved")
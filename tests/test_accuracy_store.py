@@ -0,0 +1,74 @@
+"""
+The accuracy store built from the seed CSV, and appends that stop part way.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ot2tools import REPO_ROOT, accuracy_store
+from ot2tools.accuracy_store import MANIFEST_NAME, AccuracyStore, seeded_store
+
+SEED = os.path.join(REPO_ROOT, "GraphicallyDisplayedData", "accuracy_runs.csv")
+
+
+def run_rows(measured, programmed=50.0):
+    return pd.DataFrame({"Channel": list("ABCD")[:len(measured)],
+                         "Programmed (µL)": programmed, "Measured (µL)": measured})
+
+
+def test_seeded_store_holds_the_csv(tmp_path):
+    seed = pd.read_csv(SEED, dtype={"Channel": str})
+    store = seeded_store(str(tmp_path / "store"), SEED)
+
+    assert [run["Run"] for run in store.runs] == seed["Run"].unique().tolist()
+    df = store.load()
+    assert df["Channel"].tolist() == seed["Channel"].tolist()
+    assert np.array_equal(df["Measured (µL)"], seed["Measured (µL)"])
+    # Opening it again does not append the seed twice
+    assert len(seeded_store(str(tmp_path / "store"), SEED).runs) == len(store.runs)
+
+
+def test_p1000_errors_match_the_recorded_table(tmp_path):
+    # % errors of the 24-tube p1000 run as recorded in the original table
+    recorded = [7.5, 5.0, 0.0, 1.875, 0.0, 1.25, 1.0714, 0.625, 0.5556, 0.75, 0.8333, 0.8333,
+                1.3462, 0.0, 1.0, 0.3125, 0.7353, 0.4167, 0.7895, 0.75, 0.2381, 0.3409, 0.5435,
+                0.5208]
+    df = seeded_store(str(tmp_path / "store"), SEED).load(runs=["p1000 24 tubes - Run 1"])
+    np.testing.assert_allclose(df["% Error"].abs(), recorded, atol=0.001)
+
+
+def test_append_runs_splits_on_the_run_column(tmp_path):
+    store = AccuracyStore(str(tmp_path))
+    df = pd.concat([run_rows([50, 51]).assign(Run="b"), run_rows([49, 50]).assign(Run="a")])
+    assert store.append_runs(df, pipette="p300_multi_gen2", timestamp="") == [1, 2]
+    assert [run["Run"] for run in store.runs] == ["b", "a"]
+    assert store.summary(["Pipette"])["N"].tolist() == [4]
+    with pytest.raises(ValueError):
+        store.append_runs(run_rows([50]), pipette="p300_multi_gen2")
+
+
+def test_interrupted_append_leaves_the_store_unchanged(tmp_path, monkeypatch):
+    store = AccuracyStore(str(tmp_path))
+    store.append(run_rows([50, 52]), "first", "p300_multi_gen2", timestamp="")
+    before = store.summary()
+
+    def crash(src, dst):
+        raise OSError("power cut")
+
+    monkeypatch.setattr(accuracy_store.os, "replace", crash)
+    with pytest.raises(OSError):
+        store.append(run_rows([40, 40]), "second", "p300_multi_gen2", timestamp="")
+    monkeypatch.undo()
+
+    reopened = AccuracyStore(str(tmp_path))
+    assert [run["Run"] for run in reopened.runs] == ["first"]
+    pd.testing.assert_frame_equal(reopened.summary(), before)
+    assert len(reopened.load()) == 2
+
+    # The run can be appended again, and only the current summary file is kept
+    reopened.append(run_rows([40, 40]), "second", "p300_multi_gen2", timestamp="")
+    assert reopened.summary(["Pipette"])["N"].tolist() == [4]
+    assert sorted(name for name in os.listdir(tmp_path) if name.startswith("summary")) == ["summary-00002.npz"]
+    assert MANIFEST_NAME in os.listdir(tmp_path)
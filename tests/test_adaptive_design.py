@@ -0,0 +1,45 @@
+"""
+Proposed plates stay within the pipette minimum and the well cap.
+"""
+import numpy as np
+import pytest
+
+from ot2tools.adaptive_design import main, min_volume_for, propose_plate, random_design, to_fractions
+from ot2tools.synthetic import synthetic_flags
+
+
+def test_the_minimum_comes_from_the_pipette():
+    assert min_volume_for("p300_single_gen2") == 20
+    assert min_volume_for("p20_single_gen2") == 1
+    assert min_volume_for("p1000_single_gen2", cap=300) == 100
+    assert min_volume_for("p300_single_gen2", min_volume=5) == 5
+    with pytest.raises(ValueError, match="Unknown pipette"):
+        min_volume_for("p50_single")
+
+
+def test_the_p1000_minimum_does_not_fit_the_default_cap():
+    with pytest.raises(ValueError, match="at least 100 µL each do not fit under a 75 µL cap"):
+        random_design(8)
+    with pytest.raises(ValueError, match="at least 100 µL"):
+        propose_plate(n=8)
+    with pytest.raises(SystemExit):
+        main(["--out", "unused.csv"])
+
+
+@pytest.mark.parametrize("pipette, cap", [("p300_single_gen2", 75.0), ("p1000_single_gen2", 300.0)])
+def test_designs_respect_the_pipette_minimum(pipette, cap):
+    minimum = min_volume_for(pipette, cap)
+    first = random_design(96, cap, rng=0, pipette=pipette)
+    wells = to_fractions(first, cap)
+    wells["Flag"] = synthetic_flags(wells["Cu Fraction"], wells["Gly Fraction"], 0.05, seed=0)
+    following = propose_plate(wells, 96, cap, well_volume=cap, n_boot=50, pipette=pipette)
+    for design in (first, following):
+        volumes = design[["Cu Values", "Glycine Values"]].to_numpy()
+        assert (volumes >= minimum).all()
+        assert (volumes.sum(axis=1) <= cap + 1e-9).all()
+
+
+def test_an_explicit_minimum_overrides_the_pipette():
+    design = random_design(96, 75.0, min_volume=5.0, rng=1)
+    assert design[["Cu Values", "Glycine Values"]].to_numpy().min() >= 5.0
+    assert np.any(design[["Cu Values", "Glycine Values"]].to_numpy() < 20)
@@ -0,0 +1,91 @@
+"""
+Batch accuracy readings through the mock:// balance reader.
+"""
+import importlib.util
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+from ot2tools import REPO_ROOT
+from ot2tools.balance_reader import RESULT_COLUMNS, describe, open_reader, parse_reading
+from ot2tools.flow_calibration import WATER_DENSITY
+
+CHECKITS = [os.path.join(REPO_ROOT, "ErrorTests", "Accuracy Tests 20uL", "checkit.py"),
+            os.path.join(REPO_ROOT, "ErrorTests", "Accuracy Tests 50 uL", "checkit.py")]
+
+
+class Context:
+    """The protocol's ctx.pause, recorded."""
+
+    def __init__(self):
+        self.pauses = []
+
+    def pause(self, message):
+        self.pauses.append(message)
+
+
+def batch_run(reader, ctx, volume=50.0, wells="ABCDEFGH"):
+    """checkit's batch loop: a column of wells per dispense, pausing only on flagged readings."""
+    for channel in wells:
+        reader.expect(f"{channel}1", volume, channel)
+        for row in reader.poll():
+            ctx.pause(describe(row, reader.tolerance))
+    for row in reader.wait(timeout=10):
+        ctx.pause(describe(row, reader.tolerance))
+
+
+@pytest.mark.parametrize("line, volume", [("50.25 uL", 50.25), ("ST,+0.0498 g", 49.8 / WATER_DENSITY),
+                                          ("  49.7 mg", 49.7 / WATER_DENSITY), ("OK", None)])
+def test_parse_reading(line, volume):
+    if volume is None:
+        assert parse_reading(line) is None
+    else:
+        assert parse_reading(line) == pytest.approx(volume, rel=1e-3)
+
+
+def test_batch_readings_are_tagged_and_written(tmp_path):
+    results = tmp_path / "readings.csv"
+    reader = open_reader("mock://?cv=0.5&seed=3", str(results), pipette="p300_multi_gen2", run="batch 1")
+    ctx = Context()
+    batch_run(reader, ctx)
+    reader.close()
+
+    assert ctx.pauses == []
+    assert reader.missing() == []
+    df = pd.read_csv(results, dtype={"Channel": str})
+    assert df.columns.tolist() == RESULT_COLUMNS
+    assert df["Well"].tolist() == [f"{channel}1" for channel in "ABCDEFGH"]
+    assert df["Channel"].tolist() == list("ABCDEFGH")
+    assert (df["Run"] == "batch 1").all() and (df["Pipette"] == "p300_multi_gen2").all()
+    assert df["Measured (µL)"].between(47, 53).all() and df["In Tolerance"].all()
+
+
+def test_out_of_tolerance_readings_pause_the_run(tmp_path):
+    reader = open_reader("mock://?bias=8&cv=0", tolerance=5, pipette="p300_multi_gen2")
+    ctx = Context()
+    batch_run(reader, ctx, wells="ABC")
+    reader.close()
+
+    assert len(ctx.pauses) == 3
+    assert ctx.pauses[0].startswith("Well A1 (channel A) read 54 µL for 50 µL (+8.0%), outside ±5%.")
+    assert [row["In Tolerance"] for row in reader.rows] == [False] * 3
+
+
+def test_unread_wells_are_missing():
+    reader = open_reader("mock://?delay=5")
+    reader.expect("A1", 20.0)
+    assert reader.wait(timeout=0.2) == []
+    assert reader.missing() == ["A1"]
+    reader.close()
+
+
+@pytest.mark.parametrize("path", CHECKITS, ids=lambda path: os.path.basename(os.path.dirname(path)))
+def test_checkit_loads_without_ot2tools(path, monkeypatch):
+    # A protocol uploaded on its own only needs ot2tools for batch runs
+    monkeypatch.setitem(sys.modules, "ot2tools.balance_reader", None)
+    spec = importlib.util.spec_from_file_location("checkit", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert module.get_values("batch_reader") == [""]
@@ -0,0 +1,41 @@
+"""
+Regression checks against the committed benchmark baseline.
+"""
+import json
+
+from ot2tools.benchmark import DEFAULT_BASELINE, STAGES, compare
+
+
+def results(seconds=0.010, peak_kb=100.0, retained_blocks=500):
+    return {"results": {"multi_dispense": {"1000": {"seconds": seconds, "peak_kb": peak_kb,
+                                                    "retained_blocks": retained_blocks}}}}
+
+
+def test_the_baseline_covers_every_stage():
+    with open(DEFAULT_BASELINE) as file:
+        baseline = json.load(file)
+    assert set(baseline["results"]) == {stage.name for stage in STAGES}
+    for sizes in baseline["results"].values():
+        for m in sizes.values():
+            assert set(m) == {"seconds", "peak_kb", "retained_blocks"}
+
+
+def test_time_memory_and_retained_blocks_are_compared():
+    assert compare(results(), results()) == []
+    assert len(compare(results(seconds=0.020), results())) == 1
+    assert len(compare(results(peak_kb=200), results())) == 1
+    flagged = compare(results(retained_blocks=1000), results())
+    assert len(flagged) == 1 and "retained_blocks 500 -> 1000" in flagged[0]
+
+
+def test_small_changes_are_noise():
+    # Under a millisecond or under 100 blocks, however large in percent
+    assert compare(results(seconds=0.0009), results(seconds=0.0001)) == []
+    assert compare(results(retained_blocks=90), results(retained_blocks=10)) == []
+
+
+def test_baselines_without_retained_blocks_still_compare():
+    old = results()
+    del old["results"]["multi_dispense"]["1000"]["retained_blocks"]
+    assert compare(results(retained_blocks=10 ** 6), old) == []
+    assert len(compare(results(seconds=1.0, retained_blocks=10 ** 6), old)) == 1
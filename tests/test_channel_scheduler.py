@@ -0,0 +1,108 @@
+"""
+Splitting a volume map between the 8-channel and the single channel.
+"""
+import numpy as np
+import pytest
+
+from ot2tools.channel_scheduler import N_ROWS, dispense_schedule, quantize, schedule_channels, to_grid
+
+
+class Well:
+    def __init__(self, name):
+        self.name = name
+
+    def top(self):
+        return self.name
+
+
+class Plate:
+    def columns(self):
+        return [[Well(f"{row}{c + 1}") for row in "ABCDEFGH"] for c in range(12)]
+
+    def wells(self):
+        return [well for column in self.columns() for well in column]
+
+
+class Pipette:
+    def __init__(self, log, name, max_volume=300):
+        self.log, self.name, self.max_volume = log, name, max_volume
+        self.tip_racks = []
+
+    def pick_up_tip(self):
+        self.log.append((self.name, "pick_up_tip"))
+
+    def drop_tip(self):
+        self.log.append((self.name, "drop_tip"))
+
+    def aspirate(self, volume, location):
+        self.log.append((self.name, "aspirate", volume))
+
+    def dispense(self, volume, location):
+        self.log.append((self.name, "dispense", volume, location))
+
+    def blow_out(self, location):
+        self.log.append((self.name, "blow_out"))
+
+
+def test_to_grid_reads_plate_wells_column_by_column():
+    grid = to_grid(np.arange(96.0))
+    assert grid[:, 0].tolist() == list(range(8))
+    assert grid[1, 2] == 17
+    with pytest.raises(ValueError, match="96 wells"):
+        to_grid(np.arange(95.0))
+
+
+def test_equal_columns_go_to_the_8_channel():
+    volumes = np.repeat(np.arange(12) * 10.0 + 50, N_ROWS)
+    volumes[8:16] = np.linspace(40, 41.4, 8)  # within a 1.5 µL tolerance
+    volumes[16] = 500  # above the 8-channel's range
+    strict = schedule_channels(volumes)
+    assert strict.multi["column"].tolist() == [0, 3, 4, 5, 6, 7, 8, 9, 10, 11]
+    loose = schedule_channels(volumes, tolerance=1.5)
+    assert loose.multi["column"].tolist() == [0, 1, 3, 4, 5, 6, 7, 8, 9, 10, 11]
+    assert loose.max_deviation == pytest.approx(0.7)
+    assert loose.single["well"].tolist() == list(range(16, 24))
+    assert loose.motions == 11 + 8
+
+
+def test_partial_columns_need_allow_partial():
+    volumes = np.zeros(96)
+    volumes[:6] = 100  # A1-F1
+    volumes[6:8] = [30, 60]
+    assert schedule_channels(volumes).multi.size == 0
+    hybrid = schedule_channels(volumes, allow_partial=True)
+    assert hybrid.multi[["column", "start_row", "n_rows"]].tolist() == [(0, 0, 6)]
+    assert hybrid.single["well"].tolist() == [6, 7]
+
+
+def test_quantize_snaps_near_identical_volumes():
+    assert quantize([49.8, 50.1, 50.6], 1.0).tolist() == [50, 50, 51]
+    assert quantize([49.8], 0).tolist() == [49.8]
+
+
+def test_report_gives_counts_for_both_plans_and_only_positive_savings():
+    volumes = np.full(96, 100.0)
+    volumes[:8] = np.arange(8) * 10 + 30
+    report = schedule_channels(volumes).report()
+    assert report["multi_motions"] == 11 and report["single_motions"] == 8
+    assert report["motions_saved"] == 96 - 19
+    assert report["tips_per_pass"] == 8 + 1 and report["baseline_tips_per_pass"] == 1
+    assert report["pickups_per_pass"] == 2 and report["baseline_pickups_per_pass"] == 1
+    assert report["tips_per_well"] == 96 and report["baseline_tips_per_well"] == 96
+    assert not any(key.startswith(("tips_saved", "pickups_saved")) for key in report)
+    assert all(value >= 0 for value in report.values())
+
+
+def test_dispense_schedule_runs_each_layout_with_one_tip_pickup():
+    volumes = np.full(96, 100.0)
+    volumes[:8] = np.arange(8) * 10 + 30
+    schedule = schedule_channels(volumes)
+    log = []
+    multi, single = Pipette(log, "multi"), Pipette(log, "single", max_volume=1000)
+    dispense_schedule(multi, single, "reservoir", Plate(), schedule, disposal_volume=10)
+    pickups = [entry[0] for entry in log if entry[1] == "pick_up_tip"]
+    assert pickups == ["multi", "single"] and schedule.pickups() == len(pickups)
+    multi_dispenses = [entry[3] for entry in log if entry[:2] == ("multi", "dispense")]
+    assert multi_dispenses == [f"H{c}" for c in range(2, 13)]
+    single_dispenses = [entry[2] for entry in log if entry[:2] == ("single", "dispense")]
+    assert single_dispenses == (np.arange(8) * 10 + 30).tolist()
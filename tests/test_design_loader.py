@@ -0,0 +1,81 @@
+"""
+The cached design loader: round trips, stale-cache pruning and sheet selection.
+"""
+import datetime
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ot2tools.design_loader import cache_path, file_hash, load_columns, load_design, save_columns
+
+
+def write_workbook(path, df):
+    df.to_excel(path, sheet_name="OT-2 Input", index=False)
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / "LabData.xlsx")
+    write_workbook(path, pd.DataFrame({"Cu Values": [10.0, 20.0], "Glycine Values": [5.0, 0.0]}))
+    return path
+
+
+def test_save_columns_round_trips_mixed_columns(tmp_path):
+    df = pd.DataFrame({
+        "volume": [1.5, 2.0, np.nan],
+        "count": [1, 2, 3],
+        "label": ["A1", None, 7],
+        3: [datetime.date(2024, 1, 2), datetime.time(9, 30), True],
+    })
+    path = str(tmp_path / "design.npz")
+    save_columns(df, path)
+    loaded = load_columns(path)
+    assert list(loaded.columns) == list(df.columns)
+    assert loaded["count"].dtype == df["count"].dtype
+    assert loaded["label"].tolist() == ["A1", None, 7]
+    assert loaded[3].tolist() == df[3].tolist()
+    pd.testing.assert_frame_equal(loaded[["volume", "count"]], df[["volume", "count"]])
+
+
+def test_second_load_is_served_from_the_cache(workbook, monkeypatch):
+    first = load_design(workbook)
+    cached = cache_path(workbook, "OT-2 Input", file_hash(workbook))
+    assert os.path.exists(cached)
+    monkeypatch.setattr(pd, "read_excel", lambda *args, **kwargs: pytest.fail("parsed the workbook again"))
+    pd.testing.assert_frame_equal(load_design(workbook), first)
+
+
+def test_editing_the_workbook_prunes_both_cache_formats(workbook):
+    load_design(workbook)
+    cache_dir = os.path.dirname(cache_path(workbook, "OT-2 Input", file_hash(workbook)))
+    old_format = os.path.join(cache_dir, "LabData.xlsx-OT-2_Input-0123456789abcdef.npz")
+    other_sheet = cache_path(workbook, "Results", "f" * 64)
+    for path in (old_format, other_sheet):
+        open(path, "wb").close()
+
+    write_workbook(workbook, pd.DataFrame({"Cu Values": [30.0], "Glycine Values": [1.0]}))
+    assert load_design(workbook)["Cu Values"].tolist() == [30.0]
+    assert sorted(os.listdir(cache_dir)) == sorted([
+        os.path.basename(cache_path(workbook, "OT-2 Input", file_hash(workbook))),
+        os.path.basename(other_sheet),
+    ])
+
+
+def test_similar_sheet_names_keep_separate_caches(tmp_path):
+    path = str(tmp_path / "LabData.xlsx")
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({"a": [1]}).to_excel(writer, sheet_name="OT-2 Input", index=False)
+        pd.DataFrame({"a": [2]}).to_excel(writer, sheet_name="OT-2_Input", index=False)
+    for _ in range(2):
+        assert load_design(path, "OT-2 Input")["a"].tolist() == [1]
+        assert load_design(path, "OT-2_Input")["a"].tolist() == [2]
+        assert load_design(path, 1)["a"].tolist() == [2]
+
+
+def test_every_sheet_is_rejected(workbook):
+    with pytest.raises(ValueError, match="single sheet"):
+        load_design(workbook, sheet_name=None)
+    with pytest.raises(ValueError, match="single sheet"):
+        load_design(workbook, sheet_name=None, use_cache=False)
@@ -0,0 +1,75 @@
+"""
+Calibrated settings lookups, in ot2tools and in the protocols' own copies.
+"""
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ot2tools import REPO_ROOT
+from ot2tools.flow_calibration import settings_for, sweep_grid
+
+PROTOCOLS = [os.path.join(REPO_ROOT, "ErrorTests", "p1000_Error_Test.py"),
+             os.path.join(REPO_ROOT, "ErrorTests", "Accuracy Tests 20uL", "checkit.py"),
+             os.path.join(REPO_ROOT, "ErrorTests", "Accuracy Tests 50 uL", "checkit.py")]
+SETTINGS = pd.DataFrame({"Pipette": ["p1000_single_gen2"] * 3 + ["p300_multi_gen2"],
+                         "Volume (µL)": [40.0, 200.0, 1000.0, 50.0],
+                         "Flow Rate (µL/s)": [137.0, 274.7, 500.0, 94.0],
+                         "Speed (mm/s)": [100.0, 200.0, 400.0, 50.0]})
+
+
+def load_protocol(path):
+    spec = importlib.util.spec_from_file_location(os.path.basename(path)[:-3], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_calibrated_volume_gets_its_own_setting():
+    row = settings_for(SETTINGS, "p1000_single_gen2", 200)
+    assert (row["Flow Rate (µL/s)"], row["Speed (mm/s)"]) == (274.7, 200.0)
+
+
+def test_between_calibrated_volumes_interpolates_on_log_volume():
+    row = settings_for(SETTINGS, "p1000_single_gen2", np.sqrt(200 * 1000))
+    assert row["Flow Rate (µL/s)"] == pytest.approx((274.7 + 500) / 2)
+    assert row["Speed (mm/s)"] == pytest.approx(300.0)
+    assert row["Volume (µL)"] == pytest.approx(np.sqrt(200 * 1000))
+
+
+@pytest.mark.parametrize("pipette, volume", [("p1000_single_gen2", 20), ("p1000_single_gen2", 1040),
+                                             ("p300_multi_gen2", 20), ("p20_single_gen2", 10)])
+def test_no_setting_outside_the_calibrated_range(pipette, volume):
+    assert settings_for(SETTINGS, pipette, volume) is None
+
+
+@pytest.mark.parametrize("path", PROTOCOLS, ids=os.path.basename)
+def test_protocol_copies_match(path, tmp_path):
+    protocol = load_protocol(path)
+    table = tmp_path / "flow_settings.csv"
+    SETTINGS.to_csv(table, index=False)
+    rows = protocol.read_table(str(table))
+    for pipette in SETTINGS["Pipette"].unique():
+        for volume in [10, 40, 50, 100, 200, 333.3, 960, 1000, 1040]:
+            expected = settings_for(SETTINGS, pipette, volume)
+            found = protocol.settings_for(rows, pipette, volume)
+            if expected is None:
+                assert found is None
+            else:
+                assert found["Flow Rate (µL/s)"] == pytest.approx(expected["Flow Rate (µL/s)"])
+                assert found["Speed (mm/s)"] == pytest.approx(expected["Speed (mm/s)"])
+    assert protocol.read_table(str(tmp_path / "missing.csv")) == []
+
+
+@pytest.mark.parametrize("path", PROTOCOLS, ids=os.path.basename)
+def test_protocol_run_trials(path, tmp_path):
+    protocol = load_protocol(path)
+    sweep = tmp_path / "sweep.csv"
+    grid = sweep_grid("p1000_single_gen2", [40, 200], [137, 274.7], [100, 200], per_run=3)
+    grid.to_csv(sweep, index=False)
+    trials = protocol.run_trials(str(sweep), "p1000_single_gen2", 2)
+    assert [int(trial["Trial"]) for trial in trials] == grid.loc[grid["Run"] == 2, "Trial"].tolist()
+    with pytest.raises(ValueError):
+        protocol.run_trials(str(sweep), "p1000_single_gen2", 9)
@@ -0,0 +1,74 @@
+"""
+Labware registry: custom_labware discovery, deduplication, well lookup and the opt-in cache.
+"""
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+from ot2tools import REPO_ROOT
+from ot2tools.labware import SLOT_ORIGINS, LabwareRegistry, find_custom_definitions
+
+CHECKIT = os.path.join(REPO_ROOT, "ErrorTests", "Accuracy Tests 20uL", "custom_labware",
+                       "Checkit 8 Well Plate 20 µL.json")
+
+
+def custom_folder(root, *parts):
+    folder = os.path.join(root, *parts, "custom_labware")
+    os.makedirs(folder)
+    return folder
+
+
+def test_identical_files_share_one_geometry(tmp_path):
+    root = str(tmp_path)
+    for protocol in ("Accuracy Tests 20uL", "Accuracy Tests 50 uL"):
+        shutil.copy(CHECKIT, custom_folder(root, "ErrorTests", protocol))
+    labware = LabwareRegistry(root)
+    assert len(labware.sources) == 2 and len(labware.geometries) == 1
+    duplicates = labware.duplicates()
+    assert list(duplicates) == ["checkit_8_wellplate_20ul"]
+    assert len(duplicates["checkit_8_wellplate_20ul"]) == 2
+    by_path = labware.get(duplicates["checkit_8_wellplate_20ul"][1])
+    assert by_path is labware.get("checkit_8_wellplate_20ul")
+
+
+def test_only_custom_labware_folders_near_the_root_are_scanned(tmp_path):
+    root = str(tmp_path)
+    shutil.copy(CHECKIT, custom_folder(root, "ErrorTests", "Accuracy Tests 20uL"))
+    # Too deep to be a protocol folder, and JSON outside custom_labware
+    shutil.copy(CHECKIT, custom_folder(root, "a", "b", "c"))
+    shutil.copy(CHECKIT, os.path.join(root, "plate.json"))
+    assert list(find_custom_definitions(root).values()) == [
+        os.path.join(root, "ErrorTests", "Accuracy Tests 20uL", "custom_labware", os.path.basename(CHECKIT))]
+
+
+def test_wells_are_looked_up_by_name_in_one_call():
+    plate = LabwareRegistry(REPO_ROOT).get(CHECKIT)
+    names = plate.names.tolist()
+    wells = [names[-1], names[0], names[-1], names[2]]
+    assert plate.indices(wells).tolist() == [len(names) - 1, 0, len(names) - 1, 2]
+    assert plate.indices(np.array(names)).tolist() == list(range(len(names)))
+    with pytest.raises(ValueError, match="has no wells \\['Z9'\\]"):
+        plate.indices([names[0], "Z9"])
+
+    tops = plate.coordinates(5, wells)
+    assert tops.shape == (4, 3)
+    expected = plate.centres[0] + plate.offset + [*SLOT_ORIGINS[5], plate.depths[0]]
+    np.testing.assert_allclose(tops[1], expected)
+    np.testing.assert_allclose(tops[0], tops[2])
+
+
+def test_the_cache_is_only_written_when_asked_for(tmp_path):
+    root = str(tmp_path / "repo")
+    shutil.copy(CHECKIT, custom_folder(root, "ErrorTests"))
+    LabwareRegistry(root)
+    assert os.listdir(root) == ["ErrorTests"]
+
+    cache_dir = str(tmp_path / "cache")
+    built = LabwareRegistry(root, cache_dir=cache_dir)
+    assert os.listdir(cache_dir) == ["registry.npz"]
+    reread = LabwareRegistry(root, cache_dir=cache_dir)
+    assert not reread._changed
+    np.testing.assert_array_equal(reread.get("checkit_8_wellplate_20ul").centres,
+                                  built.get("checkit_8_wellplate_20ul").centres)
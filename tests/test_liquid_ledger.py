@@ -0,0 +1,82 @@
+"""
+Reservoir ledger: aspirate heights, spreading a reagent over wells and running dry.
+"""
+import numpy as np
+import pytest
+
+from ot2tools.labware import load_definition
+from ot2tools.liquid_ledger import MIN_HEIGHT, SUBMERGE_DEPTH, LiquidLedger
+from ot2tools.multi_dispense import plan_multi_dispense
+
+# 100 mm² x 40 mm wells holding 4 mL; the dead volume is the 1 mm below MIN_HEIGHT
+GEOMETRY = {well: (100.0, 40.0, 4000.0) for well in ("A1", "A2", "A3", "A4")}
+
+
+def plan(volumes, max_volume=1000, disposal_volume=10):
+    return plan_multi_dispense(volumes, max_volume, disposal_volume)
+
+
+def test_heights_follow_the_liquid_down():
+    ledger = LiquidLedger(GEOMETRY)
+    ledger.load("A1", 3000, "Cu")
+    wells, heights = ledger.draw("A1", plan([400, 400, 400]))
+    # Two aspirations of 810 and 410 µL; 10 µL of each is blown back
+    after = np.array([3000 - 810, 3000 - 800 - 410])
+    assert wells == ["A1", "A1"]
+    np.testing.assert_allclose(heights, after / 100 - SUBMERGE_DEPTH)
+    assert ledger.volumes["A1"] == pytest.approx(3000 - 1200)
+
+
+def test_heights_never_go_below_the_api_default():
+    ledger = LiquidLedger(GEOMETRY)
+    ledger.load("A1", 700, "Cu")
+    _, heights = ledger.draw("A1", plan([500]))
+    assert heights.tolist() == [MIN_HEIGHT]
+
+
+def test_running_dry_stops_before_anything_moves():
+    ledger = LiquidLedger(GEOMETRY)
+    ledger.load("A1", 2000, "Cu")
+    ledger.load("A2", 4000, "Glycine")
+    with pytest.raises(ValueError, match="Cu runs dry in reservoir well A1 at aspiration 2 of 3"):
+        ledger.draw("A1", plan([990, 990, 990]))
+    assert ledger.volumes == {"A1": 2000, "A2": 4000}
+
+
+def test_draw_moves_on_to_the_next_well_of_the_same_liquid():
+    ledger = LiquidLedger(GEOMETRY)
+    ledger.load("A1", 2000, "Cu")
+    ledger.load("A2", 4000, "Glycine")
+    ledger.load("A3", 4000, "Cu")
+    wells, heights = ledger.draw("A1", plan([990] * 3))
+    assert wells == ["A1", "A3", "A3"]
+    np.testing.assert_allclose(heights, np.array([1000, 3000, 2010]) / 100 - SUBMERGE_DEPTH)
+    assert ledger.volumes == {"A1": 1010, "A2": 4000, "A3": 2020}
+    # A later pass starts from the first well again and skips it once it is too low
+    assert ledger.draw("A1", plan([500]))[0] == ["A1"]
+    assert ledger.draw("A1", plan([500]))[0] == ["A3"]
+    with pytest.raises(ValueError, match="runs dry in reservoir well A3"):
+        ledger.draw("A1", plan([990, 990]))
+    assert ledger.volumes == {"A1": 510, "A2": 4000, "A3": 1520}
+
+
+def test_fill_spreads_the_total_over_as_many_wells_as_it_needs():
+    ledger = LiquidLedger(GEOMETRY)
+    loads = ledger.fill(["A1", "A3", "A4"], 4000, max_aspirate=1000, name="Cu")
+    # Each well can give 4000 - 100 dead - 1000 slack = 2900 µL, so two wells
+    assert loads == [("A1", 3100.0), ("A3", 3100.0)]
+    wells, _ = ledger.draw("A1", plan([990] * 4 + [40]))
+    assert wells[0] == "A1" and wells[-1] == "A3"
+    with pytest.raises(ValueError, match="does not fit in reservoir wells A1, A2"):
+        LiquidLedger(GEOMETRY).fill(["A1", "A2"], 6000, max_aspirate=1000, name="Cu")
+
+
+def test_a_400_row_design_fits_the_nest_reservoir():
+    ledger = LiquidLedger.from_definition(load_definition("nest_12_reservoir_15ml"))
+    rng = np.random.default_rng(0)
+    cu = rng.uniform(0, 50, 400)
+    loads = ledger.fill(["A2", "A5", "A8", "A11"], cu.sum(), 1000, "Cu Stock Solution")
+    assert len(loads) == 1 + int(cu.sum() > 15000 - ledger._dead_volume("A2") - 1000)
+    wells, heights = ledger.draw("A2", plan(cu))
+    assert set(wells) == {well for well, _ in loads}
+    assert (heights >= MIN_HEIGHT).all()
@@ -0,0 +1,95 @@
+"""
+Pipetting next to a shaking Heater-Shaker is never scheduled or run.
+"""
+import pytest
+
+from ot2tools.module_scheduler import Step, heater_shaker_steps, pipette_resources, schedule
+from ot2tools.plate_layout import heater_shaker_neighbours
+
+
+class HeaterShakerContext:
+    """Records the module calls; named like the API class heater_shaker_neighbours looks for."""
+
+    def __init__(self, log):
+        self.log = log
+        self.parent = "7"
+
+    def set_target_temperature(self, celsius):
+        self.log.append("heat")
+
+    def wait_for_temperature(self):
+        pass
+
+    def set_and_wait_for_shake_speed(self, rpm):
+        self.log.append("shake")
+
+    def deactivate_shaker(self):
+        self.log.append("stop shaking")
+
+    def deactivate_heater(self):
+        self.log.append("stop heating")
+
+
+class Protocol:
+    def __init__(self, slot):
+        self.log = []
+        self.loaded_modules = {slot: HeaterShakerContext(self.log)}
+
+    def delay(self, seconds):
+        pass
+
+    def comment(self, message):
+        pass
+
+
+class Labware:
+    def __init__(self, slot):
+        self.parent = str(slot)
+
+
+@pytest.mark.parametrize("slot, expected", [(7, [4, 8, 10]), (4, [1, 5, 7]), (6, [3, 5, 9]),
+                                            (1, [2, 4]), (10, [7, 11])])
+def test_neighbours_include_front_and_back(slot, expected):
+    assert heater_shaker_neighbours(Protocol(slot)) == expected
+
+
+def test_pipette_resources_adds_neighbour_resource():
+    protocol = Protocol(7)
+    assert pipette_resources(protocol, [Labware(5), Labware(1)]) == ("pipette",)
+    assert pipette_resources(protocol, [Labware(5), Labware(4)]) == ("pipette", "hs_neighbours")
+    assert pipette_resources(protocol, [Labware(8)], ("pipette", "hs_plate")) == (
+        "pipette", "hs_plate", "hs_neighbours")
+
+
+def test_steps_next_to_the_module_wait_for_shaking_to_stop():
+    protocol = Protocol(7)
+    module = protocol.loaded_modules[7]
+    log = protocol.log
+
+    def pipette(name):
+        return lambda: log.append(name)
+
+    module_steps = heater_shaker_steps(protocol, module, heat_minutes=1, shake_minutes=5,
+                                       after=["fill module plate"])
+    steps = [
+        Step("fill module plate", 60, ("pipette", "hs_plate"), action=pipette("fill module plate")),
+        *module_steps,
+        Step("far deck plate", 60, pipette_resources(protocol, [Labware(2), Labware(3)]),
+             after=["fill module plate"], action=pipette("far deck plate")),
+        Step("rack beside module", 60, pipette_resources(protocol, [Labware(4)]),
+             after=["fill module plate"], action=pipette("rack beside module")),
+    ]
+    plan = schedule(steps)
+
+    shaking = (plan.start["shake"], plan.finish["shake"])
+    beside = (plan.start["rack beside module"], plan.finish["rack beside module"])
+    assert beside[1] <= shaking[0] or beside[0] >= shaking[1]
+    # The far plate still fills while the module heats
+    assert plan.start["far deck plate"] < plan.finish["heat"]
+
+    plan.run(protocol, clock=lambda: 0.0)
+    moves = [entry for entry in log if entry in ("rack beside module", "far deck plate")]
+    assert len(moves) == 2
+    # Nothing goes beside the module between the shake starting and stopping
+    during = log[log.index("shake"):log.index("stop shaking")]
+    assert "rack beside module" not in during
@@ -0,0 +1,79 @@
+"""
+Multi-dispense grouping, the shortest shared dispense and the volumes sent to the pipette.
+"""
+import numpy as np
+import pytest
+
+from ot2tools.multi_dispense import compare_plans, dispense_plan, plan_multi_dispense, plan_single_transfers
+
+
+class Well:
+    def __init__(self, name):
+        self.name = name
+
+    def bottom(self, z):
+        return f"{self.name} +{z:g}"
+
+
+class Pipette:
+    def __init__(self):
+        self.calls = []
+
+    def aspirate(self, volume, location):
+        self.calls.append(("aspirate", volume, location))
+
+    def dispense(self, volume, location):
+        self.calls.append(("dispense", volume, location))
+
+    def blow_out(self, location):
+        self.calls.append(("blow_out", location))
+
+
+def test_groups_fill_the_tip_up_to_the_disposal_volume():
+    plan = plan_multi_dispense([400, 300, 0, 280, 990, 2500], 1000, disposal_volume=10)
+    assert plan.wells.tolist() == [0, 1, 3, 4, 5, 5, 5]
+    assert plan.group.tolist() == [0, 0, 0, 1, 2, 3, 4]
+    assert (plan.aspirate_volumes <= 1000).all()
+    np.testing.assert_allclose(plan.volumes[-3:], 2500 / 3)
+    assert plan.volumes.sum() == pytest.approx(4470)
+
+
+def test_dispenses_below_the_minimum_get_their_own_aspiration():
+    volumes = [150, 40, 200, 60, 300]
+    plan = plan_multi_dispense(volumes, 1000, 10, min_dispense=100)
+    assert plan.group.tolist() == [0, 1, 2, 3, 4]
+    # The default shares aspirations at any volume
+    assert plan_multi_dispense(volumes, 1000, 10).n_aspirations == 1
+    mixed = plan_multi_dispense([150, 200, 60, 300], 1000, 10, min_dispense=100)
+    assert mixed.group.tolist() == [0, 0, 1, 2]
+
+
+def test_volumes_sent_to_the_pipette_are_rounded():
+    plan = plan_multi_dispense([0.1, 0.2, 994.6 - 0.3, 100 / 3], 1000, 5.0)
+    pipette = Pipette()
+    dispense_plan(pipette, "reservoir", list(range(4)), plan)
+    volumes = [call[1] for call in pipette.calls if call[0] != "blow_out"]
+    assert volumes == [round(v, 2) for v in volumes]
+    assert pipette.calls[0] == ("aspirate", 999.6, "reservoir")
+    assert ("dispense", 33.33, 3) in pipette.calls
+
+
+def test_each_aspiration_comes_from_and_blows_out_over_its_source():
+    plan = plan_multi_dispense([500, 500, 500], 1000, 10)
+    pipette = Pipette()
+    a1, a4 = Well("A1"), Well("A4")
+    dispense_plan(pipette, [a1, a4, a4], ["w0", "w1", "w2"], plan, aspirate_heights=[30, 5, 2])
+    assert pipette.calls == [
+        ("aspirate", 510.0, "A1 +30"), ("dispense", 500.0, "w0"), ("blow_out", a1),
+        ("aspirate", 510.0, "A4 +5"), ("dispense", 500.0, "w1"), ("blow_out", a4),
+        ("aspirate", 510.0, "A4 +2"), ("dispense", 500.0, "w2"), ("blow_out", a4),
+    ]
+
+
+def test_comparison_counts_one_aspiration_per_well_before_planning():
+    volumes = np.full(96, 40.0)
+    comparison = compare_plans(volumes, 1000, 10)
+    assert comparison["aspirations_before"] == plan_single_transfers(volumes, 1000).n_aspirations == 96
+    assert comparison["aspirations_after"] == 4
+    assert comparison["time_after_s"] < comparison["time_before_s"]
+    assert compare_plans(volumes, 1000, 10, min_dispense=100)["aspirations_after"] == 96
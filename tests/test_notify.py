@@ -0,0 +1,79 @@
+"""
+Which sound each event plays, through the mock:// sink.
+"""
+import importlib.util
+import os
+
+import pytest
+
+from ot2tools import REPO_ROOT, notify
+from ot2tools.notify import EVENTS, Notifier, notifier_for, open_sink
+
+PROTOCOLS = [os.path.join(REPO_ROOT, "DemoProtocolsForOT-2", "Speaker Test.py"),
+             os.path.join(REPO_ROOT, "DemoProtocolsForOT-2", "300uL_Tip_Rack_Blow_Out.py"),
+             os.path.join(REPO_ROOT, "ErrorTests", "p1000_Error_Test.py")]
+
+
+class Protocol:
+    def __init__(self, simulating=False):
+        self.simulating = simulating
+
+    def is_simulating(self):
+        return self.simulating
+
+
+def played(address, events=EVENTS):
+    sink = open_sink(address)
+    notes = Notifier([sink])
+    for event in events:
+        notes.notify(event)
+    notes.close(timeout=5)
+    return sink.played
+
+
+def test_the_path_is_only_the_run_started_sound():
+    assert played("mock:///etc/audio/speaker-test.mp3") == [("run_started", "/etc/audio/speaker-test.mp3")]
+
+
+def test_each_event_plays_its_own_file():
+    address = ("mock:///audio/start.mp3?error=/audio/alarm.mp3&plate_finished=/audio/plate.mp3"
+               "&run_finished=/audio/done.mp3")
+    assert played(address) == [("run_started", "/audio/start.mp3"), ("plate_finished", "/audio/plate.mp3"),
+                               ("error", "/audio/alarm.mp3"), ("run_finished", "/audio/done.mp3")]
+    assert played("mock://?error=/audio/alarm.mp3") == [("error", "/audio/alarm.mp3")]
+
+
+def test_unknown_event_is_rejected():
+    with pytest.raises(ValueError):
+        open_sink("sound:///audio/start.mp3?finished=/audio/done.mp3")
+
+
+def test_sound_sink_runs_the_player(monkeypatch):
+    commands = []
+    monkeypatch.setattr(notify.subprocess, "run", lambda command, **kwargs: commands.append(command))
+    sink = open_sink("sound:///audio/start.mp3?player=mpg321&error=/audio/alarm.mp3")
+    for event in EVENTS:
+        sink.send(event, "", "")
+    assert commands == [["mpg321", "-q", "/audio/start.mp3"], ["mpg321", "-q", "/audio/alarm.mp3"]]
+
+
+def test_simulation_skips_the_sound_but_not_the_mock(monkeypatch):
+    monkeypatch.setattr(notify.subprocess, "run", lambda command, **kwargs: pytest.fail("played a sound"))
+    notes = notifier_for(Protocol(simulating=True), "sound:///audio/start.mp3", "mock:///audio/start.mp3")
+    notes.run_started("deck ready")
+    notes.close(timeout=5)
+    assert [type(sink) for sink in notes.sinks] == [notify.MockSink]
+    assert notes.sinks[0].events[0][:2] == ("run_started", "deck ready")
+
+
+@pytest.mark.parametrize("path", PROTOCOLS)
+def test_protocols_play_their_sound_inline(monkeypatch, path):
+    spec = importlib.util.spec_from_file_location("speaker_protocol", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert not hasattr(module, "notifier_for")
+    commands = []
+    monkeypatch.setattr(module.subprocess, "Popen", lambda command, **kwargs: commands.append(command))
+    module.play_sound(Protocol(simulating=True), "/audio/start.mp3")
+    module.play_sound(Protocol(), "/audio/start.mp3")
+    assert commands == [["mpg123", "-q", "/audio/start.mp3"]]
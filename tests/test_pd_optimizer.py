@@ -0,0 +1,55 @@
+"""
+Round trip of an optimized Protocol Designer protocol: written, read back and schema 8 valid.
+"""
+import collections
+import json
+import os
+
+import pytest
+
+from ot2tools import REPO_ROOT, pd_optimizer
+
+ROBIN = os.path.join(REPO_ROOT, "DemoProtocolsForOT-2", "Robin Pixel Art.json")
+
+
+def delivered(protocol):
+    """(destination labware, well, source labware, well) -> µL dispensed, replaying the commands."""
+    source, totals = {}, collections.Counter()
+    for command in protocol["commands"]:
+        params = command.get("params", {})
+        if command["commandType"] == "aspirate":
+            source[params["pipetteId"]] = (params["labwareId"], params["wellName"])
+        elif command["commandType"] == "dispense":
+            totals[(params["labwareId"], params["wellName"]) + source[params["pipetteId"]]] += params["volume"]
+    return totals
+
+
+def test_the_optimized_pixel_art_round_trips_as_schema_8(tmp_path, capsys):
+    jsonschema = pytest.importorskip("jsonschema")
+    shared_data = pytest.importorskip("opentrons_shared_data")
+    schemas = shared_data.get_shared_data_root()
+    with open(schemas / "protocol" / "schemas" / "8.json") as file:
+        protocol_schema = json.load(file)
+    # The protocol schema takes any object as a command; each is checked on its own
+    with open(schemas / "command" / "schemas" / "8.json") as file:
+        command_schema = jsonschema.Draft7Validator(json.load(file))
+
+    assert pd_optimizer.main([ROBIN, "--out-dir", str(tmp_path)]) == 0
+    assert "Robin Pixel Art: commands 108 -> " in capsys.readouterr().out
+    original = pd_optimizer.load_protocol(ROBIN)
+    optimized = pd_optimizer.load_protocol(str(tmp_path / "Robin Pixel Art (optimized).json"))
+    jsonschema.validate(optimized, protocol_schema)
+    assert optimized["commandSchemaId"] == command_schema.schema["$id"]
+    for command in optimized["commands"]:
+        command_schema.validate(command)
+
+    before, after = pd_optimizer.command_counts(original), pd_optimizer.command_counts(optimized)
+    assert after["commands"] < before["commands"] and after["tips"] <= before["tips"]
+    assert len({command["key"] for command in optimized["commands"]}) == len(optimized["commands"])
+    # Every well gets the same liquid in the same volume
+    expected, actual = delivered(original), delivered(optimized)
+    assert actual.keys() == expected.keys()
+    assert all(actual[key] == pytest.approx(expected[key]) for key in expected)
+    # Labware definitions, liquids and the rest of the file are carried over untouched
+    for section in set(original) - {"commands"}:
+        assert optimized[section] == original[section], section
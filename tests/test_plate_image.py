@@ -0,0 +1,159 @@
+"""
+Precipitation flags read back from synthetic plate images and phone-style photos.
+"""
+import io
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ot2tools import plate_image
+from ot2tools.flags import FLAGS_SUFFIX
+from ot2tools.synthetic import WELL_NAMES, synthetic_design, synthetic_flags, synthetic_plate_image
+
+
+def design_flags(seed):
+    design = synthetic_design(96, seed=seed) / 75
+    return synthetic_flags(design["Cu Values"], design["Glycine Values"], ksp=0.05, noise=0.2, seed=seed)
+
+
+def phone_photo(flags, copper, pitch=36.0, angle=1.5, seed=0):
+    """
+    JPEG of a plate as a phone takes it: turned by angle degrees, well rims,
+    blue deepening with copper, cloudy precipitate, the same glare spot in
+    every well, light falling off to the right and corners, blur and noise.
+
+    Returns:
+        tuple: (JPEG bytes, (A1, A12, H1) well centres in pixels).
+    """
+    Image = pytest.importorskip("PIL.Image")
+    ImageFilter = pytest.importorskip("PIL.ImageFilter")
+    rng = np.random.default_rng(seed)
+    height, width = int(12.5 * pitch), int(17.5 * pitch)
+    yy, xx = np.mgrid[0:height, 0:width].astype(float)
+    theta = np.radians(angle)
+    cos, sin = np.cos(theta), np.sin(theta)
+    centre = np.array([width / 2 + 0.3 * pitch, height / 2 - 0.2 * pitch])
+    plate = np.array([14.2, 9.5]) * pitch
+    # Plate coordinates (u, v) from the plate's top-left corner
+    u = cos * (xx - centre[0]) + sin * (yy - centre[1]) + plate[0] / 2
+    v = -sin * (xx - centre[0]) + cos * (yy - centre[1]) + plate[1] / 2
+
+    image = np.empty((height, width, 3))
+    image[:] = (70, 68, 66)
+    image[(u >= 0) & (u < plate[0]) & (v >= 0) & (v < plate[1])] = (218, 220, 214)
+    cloud = Image.fromarray(rng.uniform(0, 255, (height // 6, width // 6)).astype(np.uint8))
+    cloud = np.asarray(cloud.resize((width, height), Image.BICUBIC), dtype=float) / 255 - 0.5
+    radius = 0.42 * pitch
+    wells = (np.array([14.38, 11.24]) / 9 + np.c_[np.arange(96) // 8, np.arange(96) % 8]) * pitch
+    for (cu, cv), flag, depth in zip(wells, flags, 0.35 + 0.65 * np.asarray(copper)):
+        r = np.hypot(u - cu, v - cv)
+        inside = r <= radius - 0.08 * pitch
+        image[(r <= radius) & ~inside] = (120, 122, 125)
+        clear = np.array([235, 240, 245]) - depth * np.array([150, 90, 25])
+        if flag == "y":
+            image[inside] = 0.45 * clear + 0.55 * np.array([215, 225, 235]) + 40 * cloud[inside, None]
+        else:
+            image[inside] = clear
+        image[np.hypot(u - cu + 0.15 * pitch, v - cv + 0.15 * pitch) < 0.07 * pitch] = 250
+    falloff = np.hypot(xx / width - 0.5, yy / height - 0.5)
+    image *= ((1 - 0.5 * falloff ** 2) * (1.08 - 0.16 * xx / width))[..., None]
+    image += rng.normal(0, 4, image.shape)
+    photo = Image.fromarray(np.clip(image, 0, 255).astype(np.uint8)).filter(ImageFilter.GaussianBlur(1.2))
+    buffer = io.BytesIO()
+    photo.save(buffer, format="JPEG", quality=80)
+
+    def to_image(point):
+        du, dv = np.asarray(point) - plate / 2
+        return tuple(centre + [cos * du - sin * dv, sin * du + cos * dv])
+    corners = (to_image(wells[0]), to_image(wells[88]), to_image(wells[7]))
+    return buffer.getvalue(), corners
+
+
+def flag_array(flags):
+    image = synthetic_plate_image(flags, seed=1) / 255
+    centres = plate_image.register_grid(image)
+    return plate_image.flag_wells(plate_image.well_features(image, centres))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_flags_match_the_precipitated_wells(seed):
+    flags = design_flags(seed)
+    result = flag_array(flags)
+
+    assert result["Well"].tolist() == WELL_NAMES
+    assert result.loc[result["Flag"] == "y", "Well"].tolist() == [
+        well for well, flag in zip(WELL_NAMES, flags) if flag == "y"]
+    assert (result["Confidence"] > 0.9).all()
+
+
+def test_single_precipitated_well():
+    flags = np.full(96, "n")
+    flags[WELL_NAMES.index("D7")] = "y"
+    result = flag_array(flags)
+    assert result.loc[result["Flag"] == "y", "Well"].tolist() == ["D7"]
+
+
+def test_clear_plate_has_no_precipitate():
+    result = flag_array(np.full(96, "n"))
+    assert (result["Flag"] == "n").all()
+
+
+def test_register_grid_finds_the_wells():
+    pitch = 40.0
+    image = synthetic_plate_image(design_flags(0), pitch=pitch) / 255
+    centres = plate_image.register_grid(image)
+    margin = 1.5 * pitch
+    a1 = (margin + 14.38 / 9 * pitch, margin + 11.24 / 9 * pitch)
+    h12 = (a1[0] + 11 * pitch, a1[1] + 7 * pitch)
+    expected = plate_image.grid_from_corners(a1, h12)
+    # Far closer than the half pitch that would put a sample in the next well
+    assert np.abs(centres - expected).max() < 0.15 * pitch
+
+
+def test_blank_wells_and_corners(tmp_path):
+    flags = design_flags(0)
+    path = tmp_path / "plate.png"
+    Image = pytest.importorskip("PIL.Image")
+    Image.fromarray(synthetic_plate_image(flags, pitch=30.0)).save(path)
+    a1 = (1.5 * 30 + 14.38 / 9 * 30, 1.5 * 30 + 11.24 / 9 * 30)
+    corners = (a1, (a1[0] + 11 * 30, a1[1]), (a1[0], a1[1] + 7 * 30))
+    blanks = [well for well, flag in zip(WELL_NAMES, flags) if flag == "n"][:10]
+    result = plate_image.flag_image(str(path), corners=corners, blank_wells=blanks)
+    assert result["Flag"].tolist() == list(flags)
+
+
+def test_flag_folder_writes_flags_files(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    flags = design_flags(2)
+    Image.fromarray(synthetic_plate_image(flags)).save(tmp_path / "run 1.png")
+    written = plate_image.flag_folder(str(tmp_path), str(tmp_path / "flags"), jobs=1, log=lambda line: None)
+
+    assert [os.path.basename(path) for path in written] == ["run 1" + FLAGS_SUFFIX]
+    assert pd.read_csv(written[0])["Flag"].tolist() == list(flags)
+
+
+@pytest.mark.parametrize("seed, angle", [(0, 0.0), (1, 1.5), (2, -1.0), (3, 1.5)])
+def test_flags_from_a_phone_photo(tmp_path, seed, angle):
+    flags = design_flags(seed)
+    copper = synthetic_design(96, seed=seed)["Cu Values"].to_numpy()
+    photo, corners = phone_photo(flags, copper / copper.max(), angle=angle, seed=seed)
+    path = tmp_path / "plate.jpg"
+    path.write_bytes(photo)
+
+    result = plate_image.flag_image(str(path), corners=corners)
+    assert result["Flag"].tolist() == list(flags)
+    assert (result["Confidence"] > 0.7).all()
+
+
+def test_a_straight_phone_photo_needs_no_corners(tmp_path):
+    flags = design_flags(1)
+    copper = synthetic_design(96, seed=1)["Cu Values"].to_numpy()
+    photo, corners = phone_photo(flags, copper / copper.max(), angle=0.0, seed=1)
+    path = tmp_path / "plate.jpg"
+    path.write_bytes(photo)
+
+    centres = plate_image.register_grid(plate_image.load_image(str(path)))
+    assert np.abs(centres - plate_image.grid_from_corners(*corners)).max() < 0.1 * 36
+    assert plate_image.flag_image(str(path))["Flag"].tolist() == list(flags)
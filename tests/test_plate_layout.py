@@ -0,0 +1,44 @@
+"""
+A design larger than one plate, built and simulated end to end through run().
+"""
+import os
+from collections import Counter, defaultdict
+
+import pytest
+
+from ot2tools import REPO_ROOT
+from ot2tools.synthetic import synthetic_design
+
+simulate = pytest.importorskip("opentrons.simulate")
+
+COMPLETE = os.path.join(REPO_ROOT, "ExperimentExampleCode", "CompleteExperimentCode.py")
+
+
+def test_400_rows_fill_five_plates(tmp_path, monkeypatch):
+    design = synthetic_design(400, seed=400)
+    design.to_excel(tmp_path / "LabData.xlsx", sheet_name="OT-2 Input", index=False)
+    monkeypatch.chdir(tmp_path)
+    with open(COMPLETE) as protocol_file:
+        runlog, _ = simulate.simulate(protocol_file, os.path.basename(COMPLETE))
+
+    filled, cu, sources = defaultdict(float), defaultdict(float), Counter()
+    reagent = None
+    for entry in runlog:
+        payload = entry["payload"]
+        if payload["text"].startswith("Aspirating"):
+            source = payload["location"].labware.as_well().well_name
+            sources[source] += 1
+            reagent = ("DI Water", "Cu", "Glycine")[(int(source[1:]) - 1) % 3]
+        elif payload["text"].startswith("Dispensing"):
+            filled[str(payload["location"].labware)] += payload["volume"]
+            if reagent == "Cu":
+                cu[str(payload["location"].labware)] += payload["volume"]
+
+    # Every design row gets its own well, topped up to 100 µL, on five plates
+    assert len(filled) == 400
+    assert {well.rsplit(" on slot ", 1)[1] for well in filled} == {"1", "2", "3", "4", "8"}
+    assert all(volume == pytest.approx(100, abs=0.05) for volume in filled.values())
+    expected = design["Cu Values"][design["Cu Values"] > 0]
+    assert sorted(cu.values()) == pytest.approx(sorted(expected), abs=0.05)
+    # DI water outgrows one reservoir well, so its pass moves on to A4
+    assert set(sources) >= {"A1", "A2", "A3", "A4"}
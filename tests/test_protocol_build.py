@@ -0,0 +1,41 @@
+"""
+CompleteExperimentCode built into a replay file that imports only opentrons.
+"""
+import ast
+import os
+
+import pytest
+
+from ot2tools import REPO_ROOT, protocol_build
+from ot2tools.synthetic import synthetic_design
+
+simulate = pytest.importorskip("opentrons.simulate")
+
+COMPLETE = os.path.join(REPO_ROOT, "ExperimentExampleCode", "CompleteExperimentCode.py")
+
+
+def commands(path, cwd, monkeypatch):
+    """Run-log text of a protocol simulated in cwd."""
+    monkeypatch.chdir(cwd)
+    with open(path) as protocol_file:
+        runlog, _ = simulate.simulate(protocol_file, os.path.basename(path))
+    return [entry["payload"]["text"] for entry in runlog]
+
+
+def test_the_built_experiment_imports_only_opentrons_and_replays_it(tmp_path, monkeypatch):
+    design_dir, robot_dir = tmp_path / "design", tmp_path / "robot"
+    design_dir.mkdir()
+    robot_dir.mkdir()
+    synthetic_design(96, seed=23).to_excel(design_dir / "LabData.xlsx", sheet_name="OT-2 Input", index=False)
+    built = robot_dir / ("CompleteExperimentCode" + protocol_build.BUILT_SUFFIX + ".py")
+    assert protocol_build.main([COMPLETE, "--cwd", str(design_dir), "--out", str(built)]) == 0
+
+    tree = ast.parse(built.read_text(encoding="utf-8"))
+    imported = {alias.name for node in ast.walk(tree) if isinstance(node, ast.Import) for alias in node.names}
+    imported |= {node.module for node in ast.walk(tree) if isinstance(node, ast.ImportFrom)}
+    assert imported == {"opentrons"}
+
+    # The built file runs without the spreadsheet and commands the robot the same way
+    expected = commands(COMPLETE, design_dir, monkeypatch)
+    assert any(text.startswith("Dispensing") for text in expected)
+    assert commands(str(built), robot_dir, monkeypatch) == expected
@@ -0,0 +1,60 @@
+"""
+The streaming run-log reader against the notebook's full json.load parse.
+
+data/run_log.json is a run log written by the Opentrons protocol engine
+for CompleteExperimentCode on a 24-row design (labware definitions cut
+down to their metadata, which keeps the "µL" display names).
+"""
+import io
+import json
+import os
+
+import numpy as np
+import pytest
+
+from ot2tools import analysis
+from ot2tools.run_log import extract_dispense_columns, iter_commands
+
+RUN_LOG = os.path.join(os.path.dirname(__file__), "data", "run_log.json")
+CHUNK_SIZES = [1, 2, 3, 7, 64, 1 << 16]
+
+
+@pytest.fixture(scope="module")
+def full_load():
+    return analysis.load_json(RUN_LOG)
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_iter_commands_matches_json_load(full_load, chunk_size):
+    assert list(iter_commands(RUN_LOG, chunk_size)) == full_load["commands"]["data"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5])
+def test_iter_commands_reads_text_files(full_load, chunk_size):
+    with open(RUN_LOG, "r", encoding="utf-8") as file:
+        assert list(iter_commands(file, chunk_size)) == full_load["commands"]["data"]
+
+
+@pytest.mark.parametrize("chunk_size", CHUNK_SIZES)
+def test_dispense_columns_match_notebook(full_load, chunk_size):
+    expected = analysis.create_dataframe(analysis.extract_dispense_data(full_load))
+    with open(RUN_LOG, "rb") as file:
+        columns = extract_dispense_columns(iter_commands(file, chunk_size))
+
+    assert columns["Well"].tolist() == expected["Well"].tolist()
+    # Same sums in the same order, so equal to the last bit
+    assert np.array_equal(columns["Cu (µL)"], expected["Cu (µL)"].to_numpy(dtype=np.float64))
+    assert np.array_equal(columns["Gly (µL)"], expected["Gly (µL)"].to_numpy(dtype=np.float64))
+
+
+def test_multibyte_character_split_across_chunks():
+    log = {"labware": [{"displayName": "Tip Rack 1000 µL"}],
+           "commands": {"data": [{"commandType": "comment", "params": {"message": "µ" * 5}}]}}
+    raw = json.dumps(log, ensure_ascii=False).encode("utf-8")
+    assert list(iter_commands(io.BytesIO(raw), chunk_size=1)) == log["commands"]["data"]
+
+
+def test_truncated_log_raises():
+    raw = b'{"commands": {"data": [{"commandType": "aspirate"'
+    with pytest.raises(ValueError):
+        list(iter_commands(io.BytesIO(raw), chunk_size=4))
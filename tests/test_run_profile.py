@@ -0,0 +1,72 @@
+"""
+Latency profile of the committed CompleteExperimentCode run log (see test_run_log).
+"""
+import os
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ot2tools import run_profile
+from ot2tools.run_log import extract_dispense_columns, iter_commands
+
+RUN_LOG = os.path.join(os.path.dirname(__file__), "data", "run_log.json")
+
+
+@pytest.fixture(scope="module")
+def profile():
+    return run_profile.profile_runs([RUN_LOG])
+
+
+def test_every_command_is_timed_from_its_stamps(profile):
+    commands = list(iter_commands(RUN_LOG))
+    assert len(profile) == len(commands)
+    assert (profile["Run"] == "run_log").all()
+    assert profile["Command"].tolist() == [command["commandType"] for command in commands]
+    assert profile["Duration (ms)"].notna().all() and (profile["Duration (ms)"] >= 0).all()
+
+    started, completed = (pd.Timestamp(commands[1][key]) for key in ("startedAt", "completedAt"))
+    assert profile.loc[1, "Duration (ms)"] == pytest.approx((completed - started).total_seconds() * 1000, abs=1e-3)
+    assert profile.loc[0, "Start (s)"] == 0 and np.isnan(profile.loc[0, "Gap (ms)"])
+
+
+def test_phases_follow_the_reservoir_well_aspirated(profile):
+    phases = profile["Phase"].tolist()
+    assert list(dict.fromkeys(phases)) == ["Setup", "Cu", "DI Water", "Glycine"]
+    # The tip pick-up before each reagent's first aspirate belongs to that reagent
+    for phase in ("Cu", "DI Water", "Glycine"):
+        assert profile.loc[profile["Phase"] == phase, "Command"].iloc[0] == "pickUpTip"
+    dispensed = profile[profile["Command"] == "dispense"].groupby("Phase")["Volume (µL)"].sum()
+    wells = extract_dispense_columns(RUN_LOG)
+    assert dispensed["Cu"] == pytest.approx(wells["Cu (µL)"].sum())
+    assert dispensed["Glycine"] == pytest.approx(wells["Gly (µL)"].sum())
+    assert set(profile.loc[profile["Command"] == "dispense", "Pipette"]) == {"p1000_single_gen2 (right)"}
+
+
+def test_summaries_add_up_to_the_measured_time(profile):
+    total = profile["Duration (ms)"].sum() / 1000
+    for by in ("Command", "Phase", ["Phase", "Command"]):
+        summary = run_profile.summarise(profile, by)
+        assert summary["Count"].sum() == len(profile)
+        assert summary["Total (s)"].sum() == pytest.approx(total, abs=0.1)
+        assert summary["Share (%)"].sum() == pytest.approx(100, abs=0.5)
+    slowest = run_profile.slowest(profile, 5)
+    assert slowest["Duration (ms)"].tolist() == sorted(slowest["Duration (ms)"], reverse=True)
+    assert run_profile.flame(profile).startswith("Total 0.0 min over 1 run(s)")
+
+
+def test_measured_time_sits_beside_the_plan(profile):
+    timeline = types.SimpleNamespace(events=[(0, 2000, "dispense", ""), (2, 500, "tip", ""),
+                                             (3, 100, "move", "")])
+    table = run_profile.compare_plan(profile, timeline).set_index("Category")
+    assert table.loc["pipetting", "Planned (s)"] == 2.1 and table.loc["tips", "Planned (s)"] == 0.5
+    assert table.loc["Total", "Measured (s)"] == pytest.approx(profile["Duration (ms)"].sum() / 1000, abs=0.01)
+
+
+def test_main_prints_the_report_and_writes_the_table(tmp_path, capsys):
+    out = tmp_path / "profile.csv"
+    assert run_profile.main([RUN_LOG, "--top", "3", "--by", "Phase", "--out", str(out)]) == 0
+    printed = capsys.readouterr().out
+    assert "By Phase:" in printed and "Slowest 3 commands:" in printed
+    assert len(pd.read_csv(out)) == len(list(iter_commands(RUN_LOG)))
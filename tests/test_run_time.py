@@ -0,0 +1,44 @@
+"""
+The kinematic estimator on the repository's protocols, and the per-step
+costs the planners use against it.
+"""
+import os
+import re
+
+import pytest
+
+from ot2tools import REPO_ROOT, run_time
+from ot2tools.synthetic import synthetic_design
+
+COMPLETE = os.path.join(REPO_ROOT, "ExperimentExampleCode", "CompleteExperimentCode.py")
+DEMOS = os.path.join(REPO_ROOT, "DemoProtocolsForOT-2")
+
+
+def kind_counts(timeline):
+    counts = {}
+    for _, _, kind, detail in timeline.events:
+        counts[kind, detail] = counts.get((kind, detail), 0) + 1
+    return counts
+
+
+@pytest.mark.parametrize("name", ["300uL_Tip_Rack_Blow_Out.py", "1000uL_Tip_Rack_Blow_Out.py"])
+def test_blow_out_into_the_trash_container(name):
+    timeline = run_time.estimate(os.path.join(DEMOS, name))
+    counts = kind_counts(timeline)
+    assert counts["blow_out", ""] == counts["tip", "pick up tip"] == counts["tip", "return tip"]
+    moves = [detail for _, _, kind, detail in timeline.events if kind == "move"]
+    assert any(run_time.TRASH_LOAD_NAME in detail for detail in moves)
+
+
+@pytest.mark.parametrize("rows", [96, 192])
+def test_planned_time_matches_the_kinematic_estimate(rows, tmp_path, monkeypatch):
+    design = synthetic_design(rows, seed=rows)
+    design.to_excel(tmp_path / "LabData.xlsx", sheet_name="OT-2 Input", index=False)
+    comments = []
+    monkeypatch.setattr(run_time.RecordingContext, "comment", lambda self, msg: comments.append(msg))
+
+    timeline = run_time.estimate(COMPLETE, str(tmp_path))
+    schedule = next(line for line in comments if line.startswith("Schedule:"))
+    planned = float(re.match(r"Schedule: ~([\d.]+) min", schedule).group(1)) * 60
+    # multi_dispense and tip_budget step costs are fitted to the kinematic moves
+    assert planned == pytest.approx(timeline.now, rel=0.1)
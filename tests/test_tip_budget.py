@@ -0,0 +1,80 @@
+"""
+Tip policy choice, rack counts and where load_tip_racks puts the racks.
+"""
+import numpy as np
+import pytest
+
+from ot2tools.tip_budget import (DEFAULT_TIP_TIMINGS, ContaminationRules, load_tip_racks, plan_tips,
+                                 racks_needed, tip_groups)
+
+# Three reagent passes over a 96-well plate, the middle one skipping a column
+PASSES = [("Cu", np.full(96, 20.0)), ("DI Water", np.r_[np.zeros(8), np.full(88, 40.0)]),
+          ("Glycine", np.full(96, 30.0))]
+
+
+class Protocol:
+    """Deck of slot -> labware name; load_labware fills a slot."""
+
+    def __init__(self, **loaded):
+        self.deck = {slot: None for slot in range(1, 13)}
+        self.deck.update({int(slot[1:]): name for slot, name in loaded.items()})
+
+    def load_labware(self, name, slot):
+        assert self.deck[slot] is None, f"slot {slot} is taken"
+        self.deck[slot] = name
+        return slot
+
+
+def test_tip_groups_split_passes_by_policy():
+    volumes = PASSES[1][1]
+    assert [g.size for g in tip_groups(volumes, "per_reagent")] == [88]
+    assert [g[0] for g in tip_groups(volumes, "per_column")] == list(range(8, 96, 8))
+    assert len(tip_groups(volumes, "per_well")) == 88
+    with pytest.raises(ValueError, match="Unknown tip policy"):
+        tip_groups(volumes, "per_plate")
+
+
+def test_the_cheapest_allowed_policy_is_chosen():
+    budget = plan_tips(PASSES, 1000, 10)
+    tips = {row["policy"]: row["tips"] for row in budget.rows}
+    assert tips == {"never": 1, "per_reagent": 3, "per_column": 35, "per_well": 280}
+    assert budget.policy == "per_reagent"
+    assert "between reagents" in budget.rows[0]["reason"]
+
+    assert plan_tips(PASSES, 1000, 10, ContaminationRules(share_between_reagents=True)).policy == "never"
+    assert plan_tips(PASSES, 1000, 10, ContaminationRules(share_between_columns=False)).policy == "per_column"
+    assert plan_tips(PASSES, 1000, 10, ContaminationRules(share_between_wells=False)).policy == "per_well"
+    assert plan_tips(PASSES, 1000, 10, ContaminationRules(max_dispenses_per_tip=50)).policy == "per_column"
+    with pytest.raises(ValueError, match="No tip policy"):
+        plan_tips(PASSES, 1000, 10, ContaminationRules(max_dispenses_per_tip=0)).policy
+
+
+def test_tips_cost_their_handling_time_by_default():
+    per_tip = DEFAULT_TIP_TIMINGS["pick_up_tip"] + DEFAULT_TIP_TIMINGS["drop_tip"]
+    for row in plan_tips(PASSES, 1000, 10).rows:
+        assert row["cost"] == pytest.approx(row["seconds"] + row["tips"] * per_tip)
+    for row in plan_tips(PASSES, 1000, 10, tip_cost_s=0).rows:
+        assert row["cost"] == row["seconds"]
+
+
+def test_racks_needed():
+    assert [racks_needed(n) for n in (0, 1, 96, 97, 280)] == [0, 1, 1, 2, 3]
+    assert racks_needed(90, starting_tip=10) == 2
+
+
+def test_racks_go_to_preferred_then_nearest_free_slots():
+    protocol = Protocol(s2="plate", s5="reservoir")
+    racks = load_tip_racks(protocol, "tiprack", 280, near=2, preferred=[4, 5])
+    # Slot 5 is taken; 1 and 3 are the free slots beside the plate
+    assert racks == [4, 1, 3]
+    assert load_tip_racks(Protocol(s2="plate"), "tiprack", 3, near=2, preferred=[4]) == [4]
+    assert load_tip_racks(Protocol(s2="plate"), "tiprack", 0, near=2) == []
+
+
+def test_excluded_and_full_decks_are_respected():
+    protocol = Protocol(s2="plate")
+    # Slots are closer front to back than side to side, so 8 comes before 6
+    assert load_tip_racks(protocol, "tiprack", 200, near=2, exclude=[1, 3, 4]) == [5, 8, 6]
+    full = Protocol(**{f"s{slot}": "plate" for slot in range(1, 11)})
+    with pytest.raises(ValueError, match="needs 2 tip racks but only 1 deck slots"):
+        load_tip_racks(full, "tiprack", 100)
@@ -0,0 +1,83 @@
+"""
+TransferPlan against the original per-row process_arrays loop.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ot2tools import REPO_ROOT
+from ot2tools.synthetic import synthetic_design
+from ot2tools.transfer_plan import TransferPlan
+
+TEMPLATE = os.path.join(REPO_ROOT, "ExperimentExampleCode", "TemplateExperimentCode.py")
+
+
+def baseline(df, x):
+    # process_arrays before TransferPlan
+    results = []
+    for cu, gly in zip(df["Cu Values"].to_numpy(), df["Glycine Values"].to_numpy()):
+        cu = float(cu)
+        gly = float(gly)
+        overall_total = cu + gly
+        remaining = float(x - overall_total)
+        results.append({"cu_array": cu, "gly_array": gly, "total": overall_total, "remaining": max(0, remaining)})
+    return results
+
+
+def design():
+    df = synthetic_design(50, cap=75.0, seed=4)
+    # Rows at and over the well volume get no water
+    df.loc[0] = [60.0, 40.0]
+    df.loc[1] = [70.0, 45.5]
+    return df
+
+
+def test_rows_match_the_per_row_loop():
+    df = design()
+    plan = TransferPlan.from_dataframe(df, 100)
+    expected = baseline(df, 100)
+    assert list(plan) == expected
+    assert [plan[i] for i in range(len(plan))] == expected
+    assert plan[3:7] == expected[3:7]
+    assert plan[-1] == expected[-1]
+
+
+def test_summary():
+    plan = TransferPlan.from_dataframe(design(), 100)
+    summary = plan.summary()
+    assert summary["rows"] == 50 and summary["over_volume"] == 1
+    assert summary["water_total"] == pytest.approx(sum(row["remaining"] for row in baseline(design(), 100)))
+    assert len(plan.select(plan.water > 0)) == 48
+
+
+@pytest.mark.parametrize("cu, gly", [(np.nan, 10.0), (10.0, np.nan), (-1.0, 10.0)])
+def test_missing_or_negative_volume_is_rejected(cu, gly):
+    df = design()
+    df.loc[5] = [cu, gly]
+    with pytest.raises(ValueError, match="rows 7"):
+        TransferPlan.from_dataframe(df, 100)
+
+
+def test_missing_column():
+    with pytest.raises(KeyError):
+        TransferPlan.from_dataframe(pd.DataFrame({"Cu Values": [1.0]}), 100)
+
+
+def test_template_copy_matches(tmp_path):
+    # The template keeps its own copy so it uploads without ot2tools; its
+    # run() is left for the user to write, so only the helpers are loaded
+    with open(TEMPLATE, "r", encoding="utf-8") as file:
+        source = file.read()
+    namespace = {}
+    exec(compile(source[:source.index("def run(")], TEMPLATE, "exec"), namespace)
+    df = design()
+    path = tmp_path / "LabData.csv"
+    df.to_csv(path, index=False)
+    namespace["read_excel"] = lambda file_path, sheet_name=None: pd.read_csv(file_path)
+    assert namespace["process_arrays"](str(path), None, 100) == baseline(df, 100)
+    df.loc[5] = [np.nan, 1.0]
+    df.to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        namespace["process_arrays"](str(path), None, 100)
@@ -0,0 +1,86 @@
+"""
+Well visit orders: serpentine plate by plate, nearest neighbour and 2-opt.
+"""
+import numpy as np
+import pytest
+
+from ot2tools.labware import SLOT_ORIGINS
+from ot2tools.travel_path import (deck_slots, nearest_neighbour_order, order_wells, path_cost, plan_pass,
+                                  serpentine_order, two_opt)
+
+
+def plate_points(slot):
+    """Tops of a 96-well plate's wells in plate.wells() order (A1, B1, ..., H12)."""
+    x0, y0 = SLOT_ORIGINS[slot]
+    column, row = np.divmod(np.arange(96), 8)
+    return np.c_[x0 + 14.38 + 9 * column, y0 + 74.24 - 9 * row, np.full(96, 15.7)]
+
+
+# Slots 2 and 5 line up, so their columns share x coordinates
+POINTS = np.vstack([plate_points(2), plate_points(5)])
+SOURCE = np.array([SLOT_ORIGINS[6][0] + 60, SLOT_ORIGINS[6][1] + 40, 30.0])
+
+
+def test_deck_slots_from_coordinates():
+    assert deck_slots(POINTS).tolist() == [2] * 96 + [5] * 96
+
+
+def test_serpentine_finishes_each_plate_before_the_next():
+    order = serpentine_order(POINTS)
+    assert sorted(order.tolist()) == list(range(192))
+    assert order[:96].max() < 96
+    # A1 -> H1 down the first column, then back up column 2
+    assert order[:10].tolist() == [0, 1, 2, 3, 4, 5, 6, 7, 15, 14]
+    # Plates are visited in the order their first well appears
+    assert (serpentine_order(POINTS, np.r_[96:192, 0:96])[:96] >= 96).all()
+    # An explicit labware label works the same as the slot
+    labels = np.repeat(["plate 1", "plate 2"], 96)
+    assert serpentine_order(POINTS, labware=labels).tolist() == order.tolist()
+
+
+def test_serpentine_keeps_to_the_given_wells():
+    subset = np.array([100, 3, 97, 8, 0])
+    # Slot 5 first, as its well comes first; each column runs from row A down
+    assert serpentine_order(POINTS, subset).tolist() == [97, 100, 0, 3, 8]
+
+
+def test_two_opt_untangles_a_crossed_path():
+    points = np.array([[0, 0, 0], [10, 10, 0], [10, 0, 0], [0, 10, 0]], dtype=np.float64)
+    start = np.array([-10.0, 0, 0])
+    crossed = np.array([0, 1, 2, 3])
+    order = two_opt(points, crossed, start)
+    assert sorted(order.tolist()) == [0, 1, 2, 3]
+    assert order.tolist() in ([0, 2, 1, 3], [0, 3, 1, 2], [3, 1, 2, 0])
+
+    def length(o):
+        path = np.vstack([start, points[o], start])[:, :2]
+        return np.linalg.norm(np.diff(path, axis=0), axis=1).sum()
+    assert length(order) < length(crossed)
+
+
+@pytest.mark.parametrize("method", ["plate", "serpentine", "nearest", "2opt"])
+def test_every_method_visits_each_well_once(method):
+    subset = np.flatnonzero(np.arange(192) % 3)
+    order = order_wells(POINTS, SOURCE, method, subset)
+    assert sorted(order.tolist()) == subset.tolist()
+
+
+def test_two_opt_is_no_longer_than_nearest_neighbour():
+    nearest = nearest_neighbour_order(POINTS, SOURCE)
+    improved = two_opt(POINTS, nearest, SOURCE)
+    cost = [path_cost(POINTS, SOURCE, o, np.zeros(o.size))["xy_mm"] for o in (nearest, improved)]
+    assert cost[1] <= cost[0]
+
+
+def test_unknown_method_is_rejected():
+    with pytest.raises(ValueError, match="Unknown ordering method"):
+        order_wells(POINTS, SOURCE, "spiral")
+
+
+def test_plan_pass_never_travels_further_than_plate_order():
+    volumes = np.random.default_rng(4).uniform(5, 60, 192)
+    for method in ("serpentine", "2opt"):
+        plan, report = plan_pass(POINTS, SOURCE, volumes, 1000, 10, method=method)
+        assert sorted(plan.wells.tolist()) == list(range(192))
+        assert plan.volumes.sum() == pytest.approx(volumes.sum())
+        assert report["after"]["xy_mm"] <= report["before"]["xy_mm"]